@@ -18,7 +18,7 @@ import rucio.api.permission
 import rucio.common.exception
 import rucio.core.identity
 
-from rucio.core import account as account_core
+from rucio.core import account as account_core, authentication
 from rucio.common.schema import validate_schema
 from rucio.db.sqla.constants import AccountType
 
@@ -57,6 +57,7 @@ def del_account(account, issuer):
         raise rucio.common.exception.AccessDenied('Account %s can not delete account' % (issuer))
 
     account_core.del_account(account)
+    authentication.revoke_account_auth_tokens(account)
 
 
 def get_account_info(account):
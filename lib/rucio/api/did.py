@@ -253,6 +253,15 @@ def get_metadata(scope, name):
     return did.get_metadata(scope=scope, name=name)
 
 
+def get_metadata_bulk(dids):
+    """
+    Get the metadata of a list of data identifiers
+
+    :param dids: List of dictionaries with the scope and name of the data identifiers.
+    """
+    return did.get_metadata_bulk(dids=dids)
+
+
 def set_status(scope, name, issuer, **kwargs):
     """
     Set data identifier status
@@ -12,7 +12,10 @@
   - Mario Lassnig, <mario.lassnig@cern.ch>, 2012
 '''
 
+from time import time
+
 from rucio.core import permission
+from rucio.core.monitor import add_request_stat
 
 
 def has_permission(issuer, action, kwargs):
@@ -25,4 +28,8 @@ def has_permission(issuer, action, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed to call the API call, otherwise False
     """
-    return permission.has_permission(issuer=issuer, action=action, kwargs=kwargs)
+    start_time = time()
+    try:
+        return permission.has_permission(issuer=issuer, action=action, kwargs=kwargs)
+    finally:
+        add_request_stat('permission', time() - start_time)
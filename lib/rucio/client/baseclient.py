@@ -31,6 +31,7 @@ from urlparse import urlparse
 from ConfigParser import NoOptionError, NoSectionError
 from dogpile.cache import make_region
 from requests import session
+from requests.adapters import HTTPAdapter
 from requests.status_codes import codes, _codes
 from requests.exceptions import SSLError
 from requests_kerberos import HTTPKerberosAuth
@@ -67,6 +68,10 @@ class BaseClient(object):
     """Main client class for accessing Rucio resources. Handles the authentication."""
 
     AUTH_RETRIES, REQUEST_RETRIES = 2, 3
+    # Connections kept open per host, raise it for applications sharing the client between many threads
+    POOL_MAXSIZE = 10
+    # Bytes read at once from the json streams
+    STREAM_CHUNK_SIZE = 64 * 1024
     TOKEN_PATH_PREFIX = get_tmp_dir() + '/.rucio_'
     TOKEN_PREFIX = 'auth_token_'
 
@@ -89,6 +94,16 @@ class BaseClient(object):
         self.list_hosts = []
         self.auth_host = auth_host
         self.session = session()
+        pool_maxsize = self.POOL_MAXSIZE
+        try:
+            pool_maxsize = int(config_get('client', 'pool_maxsize'))
+        except (NoOptionError, NoSectionError):
+            LOG.debug('pool_maxsize not specified in config file. Taking default.')
+        except ValueError:
+            LOG.debug('pool_maxsize must be an integer. Taking default.')
+        # The rucio and auth hosts are the only hosts, the connections are reused by all the threads using the client
+        for prefix in ('http://', 'https://'):
+            self.session.mount(prefix, HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize))
         self.user_agent = "%s/%s" % (user_agent, version.version_string())  # e.g. "rucio-clients/0.2.13"
         sys.argv[0] = sys.argv[0].split('/')[-1]
         self.script_id = '::'.join(sys.argv[0:2])
@@ -206,15 +221,17 @@ class BaseClient(object):
     def _load_json_data(self, response):
         """
         Helper method to correctly load json data based on the content type of the http response.
+        The json streams are decoded line by line while they are received, gzip compressed responses are inflated on the fly.
 
         :param response: the response received from the server.
         """
         if 'content-type' in response.headers and response.headers['content-type'] == 'application/x-json-stream':
-            for line in response.iter_lines():
+            for line in response.iter_lines(chunk_size=self.STREAM_CHUNK_SIZE):
                 if line:
                     yield parse_response(line)
         elif 'content-type' in response.headers and response.headers['content-type'] == 'application/json':
-            yield parse_response(response.text)
+            # the raw bytes, decoding the text would guess the charset of the whole body
+            yield parse_response(response.content)
         else:  # Exception ?
             yield response.text
 
@@ -232,7 +249,7 @@ class BaseClient(object):
         result, retry = None, 0
         hds = {'X-Rucio-Auth-Token': self.auth_token, 'X-Rucio-Account': self.account,
                'Connection': 'Keep-Alive', 'User-Agent': self.user_agent,
-               'X-Rucio-Script': self.script_id}
+               'X-Rucio-Script': self.script_id, 'Accept-Encoding': 'gzip'}
 
         if headers is not None:
             hds.update(headers)
@@ -0,0 +1,111 @@
+"""
+ Copyright European Organization for Nuclear Research (CERN)
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ You may not use this file except in compliance with the License.
+ You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+
+Checksums of files and streams, several algorithms are computed in a single pass over the data.
+"""
+
+import hashlib
+import zlib
+
+from Queue import Queue, Empty
+from threading import Thread
+
+# Size of the read buffer, a multiple of the page size
+BUFFER_SIZE = 4 * 1024 * 1024
+
+DEFAULT_ALGORITHMS = ('adler32', 'md5')
+
+
+class Checksummer(object):
+    """
+    Streaming computation of several checksums: feed the data with update, in order,
+    and get the hexadecimal digests at the end.
+    """
+
+    def __init__(self, algorithms=DEFAULT_ALGORITHMS):
+        """
+        :param algorithms: adler32 or any algorithm supported by hashlib, e.g. md5, sha1.
+        """
+        self.adler = 1L if 'adler32' in algorithms else None
+        self.hashes = [(algorithm, hashlib.new(algorithm)) for algorithm in algorithms if algorithm != 'adler32']
+        self.bytes = 0
+
+    def update(self, data):
+        """
+        Add a chunk of data to the checksums.
+
+        :param data: string or read-only buffer.
+        """
+        if self.adler is not None:
+            self.adler = zlib.adler32(data, self.adler)
+        for _, digest in self.hashes:
+            digest.update(data)
+        self.bytes += len(data)
+
+    def hexdigests(self):
+        """
+        :returns: Dictionary {algorithm: hexadecimal digest}, adler32 is padded to 8 characters.
+        """
+        digests = dict((algorithm, digest.hexdigest()) for algorithm, digest in self.hashes)
+        if self.adler is not None:
+            # backflip on 32bit
+            digests['adler32'] = str('%08x' % (self.adler & 0xffffffff))
+        return digests
+
+
+def file_checksums(path, algorithms=DEFAULT_ALGORITHMS, buffer_size=BUFFER_SIZE):
+    """
+    Compute the checksums of a file, reading it only once.
+
+    :param path: Path of the file.
+    :param algorithms: List of algorithms.
+    :param buffer_size: Size of the read buffer.
+    :returns: Dictionary {algorithm: hexadecimal digest}.
+    """
+    checksummer = Checksummer(algorithms)
+    # one buffer for the whole file, zlib only accepts read-only buffers
+    buf = bytearray(buffer_size)
+    with open(path, 'rb') as f:
+        while True:
+            size = f.readinto(buf)
+            if not size:
+                break
+            checksummer.update(buffer(buf, 0, size))
+    return checksummer.hexdigests()
+
+
+def files_checksums(paths, algorithms=DEFAULT_ALGORITHMS, threads=4):
+    """
+    Compute the checksums of several files in parallel.
+
+    :param paths: List of file paths.
+    :param algorithms: List of algorithms.
+    :param threads: Number of threads.
+    :returns: Dictionary {path: {algorithm: hexadecimal digest}}, the value is the exception for the files which could not be read.
+    """
+    results = {}
+    queue = Queue()
+    for path in set(paths):
+        queue.put(path)
+
+    def worker():
+        while True:
+            try:
+                path = queue.get_nowait()
+            except Empty:
+                return
+            try:
+                results[path] = file_checksums(path, algorithms)
+            except Exception as error:
+                results[path] = error
+
+    workers = [Thread(target=worker) for _ in xrange(max(1, min(threads, queue.qsize())))]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
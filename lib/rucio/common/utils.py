@@ -19,7 +19,6 @@ import os
 import pwd
 import re
 import subprocess
-import zlib
 
 
 from getpass import getuser
@@ -29,6 +28,7 @@ from logging.handlers import RotatingFileHandler
 from urllib import urlencode, quote
 from uuid import uuid4 as uuid
 
+from rucio.common.checksum import file_checksums
 from rucio.common.config import config_get
 
 try:
@@ -109,22 +109,23 @@ def adler32(file):
 
     :returns: Hexified string, padded to 8 values.
     """
-
-    # adler starting value is _not_ 0
-    adler = 1L
-
     try:
-        openFile = open(file, 'rb')
-        for line in openFile:
-            adler = zlib.adler32(line, adler)
+        return file_checksums(file, algorithms=('adler32', ))['adler32']
     except:
         raise Exception('FATAL - could not get checksum of file %s' % file)
 
-    # backflip on 32bit
-    if adler < 0:
-        adler = adler + 2 ** 32
 
-    return str('%08x' % adler)
+def md5(file):
+    """
+    Runs the MD5 algorithm (RFC-1321) on the binary content of the file named file and returns the hexadecimal digest
+
+    :param file: file name
+    :returns: string of 32 hexadecimal digits
+    """
+    try:
+        return file_checksums(file, algorithms=('md5', ))['md5']
+    except:
+        raise Exception('FATAL - could not get MD5 checksum of file %s' % file)
 
 
 def str_to_date(string):
@@ -174,11 +175,27 @@ def render_json_list(l):
     return json.dumps(l, cls=APIEncoder)
 
 
+def render_json_stream(rows, block_size=1000):
+    """ JSON render function for streams, newline-delimited JSON yielded in blocks of rows
+    """
+    encode = APIEncoder().encode
+    block = []
+    for row in rows:
+        block.append(encode(row))
+        if len(block) == block_size:
+            block.append('')
+            yield '\n'.join(block)
+            block = []
+    if block:
+        block.append('')
+        yield '\n'.join(block)
+
+
 def datetime_parser(dct):
     """ datetime parser
     """
     for k, v in dct.items():
-        if isinstance(v, basestring) and re.search(" UTC", v):
+        if isinstance(v, basestring) and " UTC" in v:
             try:
                 dct[k] = datetime.datetime.strptime(v, DATE_FORMAT)
             except:
@@ -186,10 +203,14 @@ def datetime_parser(dct):
     return dct
 
 
+# json.loads builds a new decoder for each call with an object_hook
+RESPONSE_DECODER = json.JSONDecoder(object_hook=datetime_parser)
+
+
 def parse_response(data):
     """ JSON render function
     """
-    return json.loads(data, object_hook=datetime_parser)
+    return RESPONSE_DECODER.decode(data)
 
 
 def generate_http_error(status_code, exc_cls, exc_msg):
@@ -18,6 +18,7 @@ from datetime import datetime
 from re import match
 from traceback import format_exc
 
+from repoze.lru import ExpiringLRUCache
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import exc
 
@@ -29,6 +30,9 @@ from rucio.db.sqla.constants import AccountStatus, AccountType
 from rucio.db.sqla.enum import EnumSymbol
 from rucio.db.sqla.session import read_session, transactional_session, stream_session
 
+# Attributes of the recently seen accounts, used by the permission checks
+ACCOUNT_ATTRIBUTES = ExpiringLRUCache(10000, default_timeout=30)
+
 
 @transactional_session
 def add_account(account, type, email, session=None):
@@ -223,6 +227,36 @@ def has_account_attribute(account, key, session=None):
     return False
 
 
+def list_cached_account_attributes(account):
+    """
+    Get all attributes defined for an account, cached for a short time.
+
+    :param account: the account name.
+
+    :returns: a list of all key, value pairs for this account.
+    """
+    attributes = ACCOUNT_ATTRIBUTES.get(account)
+    if attributes is None:
+        attributes = list_account_attributes(account=account)
+        ACCOUNT_ATTRIBUTES.put(account, attributes)
+    return attributes
+
+
+def has_cached_account_attribute(account, key):
+    """
+    Indicates whether the named key is present for the account, cached for a short time.
+
+    :param account: the account name.
+    :param key: the key for the attribute.
+
+    :returns: True or False
+    """
+    try:
+        return any(attribute['key'] == key for attribute in list_cached_account_attributes(account=account))
+    except exception.AccountNotFound:
+        return has_account_attribute(account=account, key=key)
+
+
 @transactional_session
 def add_account_attribute(account, key, value, session=None):
     """
@@ -252,6 +286,7 @@ def add_account_attribute(account, key, value, session=None):
             raise exception.Duplicate('Key {0} already exist for account {1}!'.format(key, account))
     except:
         raise exception.RucioException(str(format_exc()))
+    ACCOUNT_ATTRIBUTES.invalidate(account)
 
 
 @transactional_session
@@ -267,3 +302,4 @@ def del_account_attribute(account, key, session=None):
     if aid is None:
         raise exception.AccountNotFound('Attribute ({0}) does not exist for the account {1}!'.format(key, account))
     aid.delete(session=session)
+    ACCOUNT_ATTRIBUTES.invalidate(account)
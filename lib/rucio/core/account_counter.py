@@ -10,17 +10,24 @@
 # - Mario Lassnig, <mario.lassnig@cern.ch>, 2013-2014
 # - Martin Barisits, <martin.barisits@cern.ch>, 2014
 
+import sqlalchemy.orm
+
+from sqlalchemy import event
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.sql.expression import bindparam, text
+from sqlalchemy.sql import func
 
 import rucio.core.account
 import rucio.core.rse
 
+from rucio.common.utils import chunks
 from rucio.db.sqla import models
+from rucio.db.sqla.sautils import filter_thread_work
 from rucio.db.sqla.session import read_session, transactional_session
 
 MAX_COUNTERS = 10
 
+DELTAS_KEY = 'rucio.core.account_counter.deltas'
+
 
 @transactional_session
 def add_counter(rse_id, account, session=None):
@@ -66,14 +73,65 @@ def increase(rse_id, account, files, bytes, session=None):
     """
     Increments the specified counter by the specified amount.
 
+    The amounts are accumulated in the session and written as one update per account and RSE
+    when the transaction is committed.
+
     :param rse_id:  The id of the RSE.
     :param account: The account name.
     :param files:   The number of added/removed files.
     :param bytes:   The corresponding amount in bytes.
     :param session: The database session in use.
     """
+    deltas = session.info.setdefault(DELTAS_KEY, {})
+    delta_files, delta_bytes = deltas.get((account, rse_id), (0, 0))
+    deltas[(account, rse_id)] = (delta_files + files, delta_bytes + bytes)
+
+
+@transactional_session
+def increase_many(account, counters, session=None):
+    """
+    Increments several counters of an account.
+
+    :param account:  The account name.
+    :param counters: Dictionary {rse_id: (files, bytes)} of the amounts to add.
+    :param session:  The database session in use.
+    """
+    for rse_id, (files, bytes) in counters.iteritems():
+        increase(rse_id=rse_id, account=account, files=files, bytes=bytes, session=session)
 
-    models.UpdatedAccountCounter(account=account, rse_id=rse_id, files=files, bytes=bytes).save(session=session)
+
+def write_deltas(session):
+    """
+    Write the counter amounts accumulated in a session, one update per account and RSE.
+
+    :param session: The database session in use.
+    """
+    deltas = session.info.pop(DELTAS_KEY, None)
+    if not deltas:
+        return
+    session.flush()
+    session.bulk_insert_mappings(models.UpdatedAccountCounter, [{'account': account, 'rse_id': rse_id, 'files': files, 'bytes': bytes}
+                                                                for (account, rse_id), (files, bytes) in deltas.iteritems() if files or bytes])
+
+
+@event.listens_for(sqlalchemy.orm.Session, 'before_commit')
+def _write_deltas_before_commit(session):
+    """
+    Write the counter amounts of a transaction before it is committed.
+
+    :param session: The session being committed.
+    """
+    write_deltas(session)
+
+
+@event.listens_for(sqlalchemy.orm.Session, 'after_rollback')
+def _discard_deltas_after_rollback(session):
+    """
+    Discard the counter amounts of a rolled back transaction.
+
+    :param session: The rolled back session.
+    """
+    session.info.pop(DELTAS_KEY, None)
 
 
 @transactional_session
@@ -122,6 +180,41 @@ def get_counter(rse_id, account, session=None):
         return {'bytes': 0, 'files': 0, 'updated_at': None}
 
 
+@read_session
+def get_counters(account, rse_ids, session=None):
+    """
+    Returns the bytes of the counters of an account on several RSEs.
+
+    :param account:          The account name.
+    :param rse_ids:          List of RSE ids.
+    :param session:          The database session in use.
+    :returns:                Dictionary {rse_id: bytes}, RSEs without counter are not included.
+    """
+
+    counters = {}
+    rse_ids = list(rse_ids)
+    for chunk in [rse_ids[x:x + 500] for x in xrange(0, len(rse_ids), 500)]:
+        query = session.query(models.AccountUsage.rse_id, models.AccountUsage.bytes).\
+            filter(models.AccountUsage.account == account, models.AccountUsage.rse_id.in_(chunk))
+        for rse_id, bytes in query:
+            counters[rse_id] = bytes or 0
+    return counters
+
+
+def __filter_worker(query, total_workers, worker_number, session):
+    """
+    Restrict a query on the updated_account_counters to the account counters of a worker.
+
+    :param query:          The query.
+    :param total_workers:  Number of total workers.
+    :param worker_number:  id of the executing worker.
+    :param session:        Database session in use.
+    :returns:              The filtered query.
+    """
+    query = filter_thread_work(session=session, query=query, total_threads=total_workers + 1, thread_id=worker_number, hash_variable=('account', 'rse_id'))
+    return query
+
+
 @read_session
 def get_updated_account_counters(total_workers, worker_number, session=None):
     """
@@ -134,16 +227,7 @@ def get_updated_account_counters(total_workers, worker_number, session=None):
     """
     query = session.query(models.UpdatedAccountCounter.account, models.UpdatedAccountCounter.rse_id).\
         distinct(models.UpdatedAccountCounter.account, models.UpdatedAccountCounter.rse_id)
-
-    if total_workers > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('worker_number', worker_number),
-                          bindparam('total_workers', total_workers)]
-            query = query.filter(text('ORA_HASH(CONCAT(account, rse_id), :total_workers) = :worker_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            query = query.filter('mod(md5(concat(account, rse_id)), %s) = %s' % (total_workers + 1, worker_number))
-        elif session.bind.dialect.name == 'postgresql':
-            query = query.filter('mod(abs((\'x\'||md5(concat(account, rse_id)))::bit(32)::int), %s) = %s' % (total_workers + 1, worker_number))
+    query = __filter_worker(query, total_workers, worker_number, session=session)
 
     return query.all()
 
@@ -172,3 +256,45 @@ def update_account_counter(account, rse_id, session=None):
 
     for update in updated_account_counters:
         update.delete(flush=False, session=session)
+
+
+@transactional_session
+def update_account_counters(total_workers, worker_number, limit=10000, session=None):
+    """
+    Apply a batch of updated_account_counters to the account_counters, with one aggregation per chunk of updates.
+
+    :param total_workers:  Number of total workers.
+    :param worker_number:  id of the executing worker.
+    :param limit:          Maximum number of updates to apply.
+    :param session:        Database session in use.
+    :returns:              The number of applied updates.
+    """
+    query = session.query(models.UpdatedAccountCounter.id).\
+        order_by(models.UpdatedAccountCounter.created_at, models.UpdatedAccountCounter.id).\
+        limit(limit)
+    query = __filter_worker(query, total_workers, worker_number, session=session)
+    ids = [id for id, in query]
+
+    deltas = {}
+    for chunk in chunks(ids, 1000):
+        query = session.query(models.UpdatedAccountCounter.account,
+                              models.UpdatedAccountCounter.rse_id,
+                              func.sum(models.UpdatedAccountCounter.files),
+                              func.sum(models.UpdatedAccountCounter.bytes)).\
+            filter(models.UpdatedAccountCounter.id.in_(chunk)).\
+            group_by(models.UpdatedAccountCounter.account, models.UpdatedAccountCounter.rse_id)
+        for account, rse_id, files, bytes in query:
+            delta_files, delta_bytes = deltas.get((account, rse_id), (0, 0))
+            deltas[(account, rse_id)] = (delta_files + (files or 0), delta_bytes + (bytes or 0))
+        session.query(models.UpdatedAccountCounter).\
+            filter(models.UpdatedAccountCounter.id.in_(chunk)).\
+            delete(synchronize_session=False)
+
+    for (account, rse_id), (files, bytes) in deltas.iteritems():
+        rowcount = session.query(models.AccountUsage).\
+            filter_by(account=account, rse_id=rse_id).\
+            update({'bytes': models.AccountUsage.bytes + bytes, 'files': models.AccountUsage.files + files}, synchronize_session=False)
+        if not rowcount:
+            models.AccountUsage(rse_id=rse_id, account=account, files=files, bytes=bytes).save(flush=False, session=session)
+
+    return len(ids)
@@ -21,6 +21,7 @@ import hashlib
 # Create cache region used for token validation
 from dogpile.cache import make_region
 from dogpile.cache.api import NO_VALUE
+from repoze.lru import ExpiringLRUCache
 
 from rucio.common.utils import generate_uuid
 from rucio.core.account import account_exists
@@ -44,6 +45,11 @@ TOKENREGION = make_region(
     expiration_time=3600
 )
 
+# Per process caches in front of the token region: the valid tokens are kept for a short time
+# so that a revocation reaches every process, the unknown tokens are not looked up again.
+TOKEN_CACHE = ExpiringLRUCache(10000, default_timeout=10)
+BAD_TOKEN_CACHE = ExpiringLRUCache(10000, default_timeout=60)
+
 
 @read_session
 def exist_identity_account(identity, type, account, session=None):
@@ -182,18 +188,88 @@ def validate_auth_token(token):
 
     # Be gentle with bash variables, there can be whitespace
     token = token.strip()
+    now = datetime.datetime.utcnow()
+
+    # Check the process caches first
+    value = TOKEN_CACHE.get(token)
+    if value is not None:
+        if value['lifetime'] < now:
+            TOKEN_CACHE.invalidate(token)
+            return
+        return value
+    if BAD_TOKEN_CACHE.get(token):
+        return
+
+    # A revoked token can still be in the cache region, if it was read from the database before its revocation
+    if TOKENREGION.get(__revoked_key(token)) is not NO_VALUE:
+        BAD_TOKEN_CACHE.put(token, True)
+        return
 
     # Check if token ca be found in cache region
     value = TOKENREGION.get(token)
     if value is NO_VALUE:  # no cached entry found
         value = query_token(token)
         value and TOKENREGION.set(token, value)
-    elif value.get('lifetime', datetime.datetime(1970, 1, 1)) < datetime.datetime.utcnow():  # check if expired
+    elif value.get('lifetime', datetime.datetime(1970, 1, 1)) < now:  # check if expired
         TOKENREGION.delete(token)
         return
+
+    if not value:
+        BAD_TOKEN_CACHE.put(token, True)
+    else:
+        timeout = (value['lifetime'] - now).total_seconds()
+        TOKEN_CACHE.put(token, value, timeout=min(timeout, TOKEN_CACHE.default_timeout))
     return value
 
 
+def __revoked_key(token):
+    """
+    :param token: Authentication token as a variable-length string.
+    :returns: The key marking the token as revoked in the token region.
+    """
+    return 'revoked_%s' % hashlib.sha1(token).hexdigest()
+
+
+def __revoke(token):
+    """
+    Remove a token from the caches and mark it as revoked in the token region, until the expiration of the region.
+    The other processes drop the token once it expires in their own cache.
+
+    :param token: Authentication token as a variable-length string.
+    """
+    TOKENREGION.set(__revoked_key(token), True)
+    TOKENREGION.delete(token)
+    TOKEN_CACHE.invalidate(token)
+
+
+@transactional_session
+def revoke_auth_token(token, session=None):
+    """
+    Revoke an authentication token.
+
+    :param token: Authentication token as a variable-length string.
+    :param session: The database session in use.
+    """
+    token = token.strip()
+    session.query(models.Token).filter_by(token=token).delete()
+    __revoke(token)
+
+
+@transactional_session
+def revoke_account_auth_tokens(account, session=None):
+    """
+    Revoke all the authentication tokens of an account.
+
+    :param account: Account identifier as a string.
+    :param session: The database session in use.
+    """
+    query = session.query(models.Token.token).filter_by(account=account)
+    tokens = [token for token, in query]
+    query.delete(synchronize_session=False)
+    for token in tokens:
+        __revoke(token)
+
+
 @read_session
 def query_token(token, session=None):
     """
@@ -23,14 +23,14 @@ import random
 import sys
 
 from datetime import datetime, timedelta
-from hashlib import md5
 from re import match
 
 from sqlalchemy import and_, or_, exists
 from sqlalchemy.exc import DatabaseError, IntegrityError, CompileError
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql import not_, func
-from sqlalchemy.sql.expression import bindparam, text, Insert, select, true
+from sqlalchemy.sql.expression import bindparam, text, Insert, select, true, literal, literal_column
 
 import rucio.core.rule
 import rucio.core.replica  # import add_replicas
@@ -38,7 +38,7 @@ import rucio.common.policy
 
 from rucio.common import exception
 from rucio.common.config import config_get
-from rucio.common.utils import str_to_date, is_archive
+from rucio.common.utils import str_to_date, is_archive, chunks
 from rucio.core import account_counter, rse_counter
 from rucio.core.message import add_message
 from rucio.core.monitor import record_timer_block, record_counter
@@ -46,6 +46,7 @@ from rucio.core.naming_convention import validate_name
 from rucio.db.sqla import models
 from rucio.db.sqla.constants import DIDType, DIDReEvaluation, DIDAvailability, RuleState
 from rucio.db.sqla.enum import EnumSymbol
+from rucio.db.sqla.sautils import filter_thread_work, scope_name_in
 from rucio.db.sqla.session import read_session, transactional_session, stream_session
 
 
@@ -53,6 +54,9 @@ logging.basicConfig(stream=sys.stdout,
                     level=getattr(logging, config_get('common', 'loglevel').upper()),
                     format='%(asctime)s\t%(process)d\t%(levelname)s\t%(message)s')
 
+# Number of collections matched by a single hierarchical query
+COLLECTION_CHUNK_SIZE = 400
+
 
 @read_session
 def list_expired_dids(worker_number=None, total_workers=None, limit=None, session=None):
@@ -74,28 +78,8 @@ def list_expired_dids(worker_number=None, total_workers=None, limit=None, sessio
         order_by(models.DataIdentifier.expired_at).\
         with_hint(models.DataIdentifier, "index(DIDS DIDS_EXPIRED_AT_IDX)", 'oracle')
 
-    if worker_number and total_workers and total_workers - 1 > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('worker_number', worker_number - 1), bindparam('total_workers', total_workers - 1)]
-            query = query.filter(text('ORA_HASH(name, :total_workers) = :worker_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            query = query.filter(text('mod(md5(name), %s) = %s' % (total_workers - 1, worker_number - 1)))
-        elif session.bind.dialect.name == 'postgresql':
-            query = query.filter(text('mod(abs((\'x\'||md5(name))::bit(32)::int), %s) = %s' % (total_workers - 1, worker_number - 1)))
-        elif session.bind.dialect.name == 'sqlite':
-            row_count = 0
-            dids = list()
-            for scope, name, did_type, created_at, purge_replicas in query.yield_per(10):
-                if int(md5(name).hexdigest(), 16) % total_workers == worker_number - 1:
-                    dids.append({'scope': scope,
-                                 'name': name,
-                                 'did_type': did_type,
-                                 'created_at': created_at,
-                                 'purge_replicas': purge_replicas})
-                    row_count += 1
-                if limit and row_count >= limit:
-                    return dids
-            return dids
+    if worker_number and total_workers:
+        query = filter_thread_work(session=session, query=query, total_threads=total_workers, thread_id=worker_number - 1, hash_variable='name')
 
     if limit:
         query = query.limit(limit)
@@ -759,14 +743,7 @@ def list_new_dids(did_type, thread=None, total_threads=None, chunk_size=1000, se
         elif isinstance(did_type, EnumSymbol):
             query = query.filter_by(did_type=did_type)
 
-    if total_threads and (total_threads - 1) > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('thread_number', thread), bindparam('total_threads', total_threads - 1)]
-            query = query.filter(text('ORA_HASH(name, :total_threads) = :thread_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            query = query.filter(text('mod(md5(name), %s) = %s' % (total_threads - 1, thread)))
-        elif session.bind.dialect.name == 'postgresql':
-            query = query.filter(text('mod(abs((\'x\'||md5(name))::bit(32)::int), %s) = %s' % (total_threads - 1, thread)))
+    query = filter_thread_work(session=session, query=query, total_threads=total_threads, thread_id=thread, hash_variable='name')
 
     row_count = 0
     for chunk in query.yield_per(10):
@@ -887,6 +864,127 @@ def list_all_parent_dids(scope, name, session=None):
         list_all_parent_dids(scope=did.scope, name=did.name, session=session)
 
 
+@stream_session
+def list_collection_tree(dids, session=None):
+    """
+    List all descendant collections of a list of containers, no matter on what level.
+
+    The hierarchy is expanded with one query per chunk of containers: a recursive
+    common table expression on PostgreSQL, CONNECT BY on Oracle and one query per
+    level on the other databases. The sqlite3 module of Python 2 returns no result
+    description for a WITH statement without rows, so SQLite goes level by level.
+
+    :param dids:      List of (scope, name) tuples of the containers.
+    :param session:   The database session in use.
+    :returns:         List of dictionaries with scope, name, child_scope, child_name, child_type and level.
+    :rtype:           Generator.
+    """
+    dialect_name = session.bind.dialect.name
+    for chunk in chunks(sorted(set(dids)), COLLECTION_CHUNK_SIZE):
+        if dialect_name == 'postgresql':
+            query = __collection_tree_cte(dids=chunk, session=session)
+        elif dialect_name == 'oracle':
+            query = __collection_tree_connect_by(dids=chunk, session=session)
+        else:
+            query = __collection_tree_by_level(dids=chunk, session=session)
+        for scope, name, child_scope, child_name, child_type, level in query:
+            yield {'scope': scope, 'name': name,
+                   'child_scope': child_scope, 'child_name': child_name,
+                   'child_type': child_type, 'level': level}
+
+
+def __collection_tree_cte(dids, session):
+    """
+    Expand containers with a recursive common table expression.
+
+    :param dids:      List of (scope, name) tuples of the containers.
+    :param session:   The database session in use.
+    :returns:         Query of (scope, name, child_scope, child_name, child_type, level).
+    """
+    tree = session.query(models.DataIdentifierAssociation.scope,
+                         models.DataIdentifierAssociation.name,
+                         models.DataIdentifierAssociation.child_scope,
+                         models.DataIdentifierAssociation.child_name,
+                         models.DataIdentifierAssociation.child_type,
+                         literal(1).label('level')).\
+        filter(scope_name_in(models.DataIdentifierAssociation.scope,
+                             models.DataIdentifierAssociation.name,
+                             dids, session.bind.dialect.name)).\
+        filter(models.DataIdentifierAssociation.did_type == DIDType.CONTAINER).\
+        cte(name='collection_tree', recursive=True)
+
+    children = aliased(models.DataIdentifierAssociation)
+    tree = tree.union_all(session.query(children.scope,
+                                        children.name,
+                                        children.child_scope,
+                                        children.child_name,
+                                        children.child_type,
+                                        tree.c.level + 1).
+                          filter(tree.c.child_type == DIDType.CONTAINER).
+                          filter(children.scope == tree.c.child_scope,
+                                 children.name == tree.c.child_name))
+
+    return session.query(tree.c.scope, tree.c.name,
+                         tree.c.child_scope, tree.c.child_name,
+                         tree.c.child_type, tree.c.level).yield_per(1000)
+
+
+def __collection_tree_connect_by(dids, session):
+    """
+    Expand containers with an Oracle hierarchical query.
+
+    :param dids:      List of (scope, name) tuples of the containers.
+    :param session:   The database session in use.
+    :returns:         Query of (scope, name, child_scope, child_name, child_type, level).
+    """
+    start_with, bindparams = [], []
+    for i, (scope, name) in enumerate(dids):
+        start_with.append('(scope = :scope_%d AND name = :name_%d)' % (i, i))
+        bindparams.extend([bindparam('scope_%d' % i, scope), bindparam('name_%d' % i, name)])
+
+    hierarchy = text("START WITH did_type = 'C' AND (%s) "
+                     "CONNECT BY NOCYCLE PRIOR child_scope = scope AND PRIOR child_name = name AND PRIOR child_type = 'C'" % ' OR '.join(start_with),
+                     bindparams=bindparams)
+
+    return session.query(models.DataIdentifierAssociation.scope,
+                         models.DataIdentifierAssociation.name,
+                         models.DataIdentifierAssociation.child_scope,
+                         models.DataIdentifierAssociation.child_name,
+                         models.DataIdentifierAssociation.child_type,
+                         literal_column('LEVEL')).\
+        with_hint(models.DataIdentifierAssociation, "INDEX(CONTENTS CONTENTS_PK)", 'oracle').\
+        suffix_with(hierarchy).yield_per(1000)
+
+
+def __collection_tree_by_level(dids, session):
+    """
+    Expand containers level by level, with one query per level and chunk of containers.
+
+    :param dids:      List of (scope, name) tuples of the containers.
+    :param session:   The database session in use.
+    :returns:         Generator of (scope, name, child_scope, child_name, child_type, level).
+    """
+    level, parents, visited = 1, list(dids), set(dids)
+    while parents:
+        containers = []
+        for chunk in chunks(parents, COLLECTION_CHUNK_SIZE):
+            query = session.query(models.DataIdentifierAssociation.scope,
+                                  models.DataIdentifierAssociation.name,
+                                  models.DataIdentifierAssociation.child_scope,
+                                  models.DataIdentifierAssociation.child_name,
+                                  models.DataIdentifierAssociation.child_type).\
+                filter(scope_name_in(models.DataIdentifierAssociation.scope,
+                                     models.DataIdentifierAssociation.name,
+                                     chunk, session.bind.dialect.name)).\
+                filter(models.DataIdentifierAssociation.did_type == DIDType.CONTAINER)
+            for scope, name, child_scope, child_name, child_type in query.yield_per(1000):
+                yield scope, name, child_scope, child_name, child_type, level
+                if child_type == DIDType.CONTAINER and (child_scope, child_name) not in visited:
+                    visited.add((child_scope, child_name))
+                    containers.append((child_scope, child_name))
+        parents, level = containers, level + 1
+
+
 @transactional_session
 def list_child_datasets(scope, name, session=None):
     """
@@ -899,18 +997,11 @@ def list_child_datasets(scope, name, session=None):
     :rtype:           Generator
     """
 
-    result = []
-    query = session.query(models.DataIdentifierAssociation.child_scope,
-                          models.DataIdentifierAssociation.child_name,
-                          models.DataIdentifierAssociation.child_type).filter(models.DataIdentifierAssociation.scope == scope,
-                                                                              models.DataIdentifierAssociation.name == name,
-                                                                              models.DataIdentifierAssociation.child_type != DIDType.FILE)
-    query = query.with_hint(models.DataIdentifierAssociation, "INDEX(CONTENTS CONTENTS_PK)", 'oracle')
-    for child_scope, child_name, child_type in query.yield_per(5):
-        if child_type == DIDType.CONTAINER:
-            result.extend(list_child_datasets(scope=child_scope, name=child_name, session=session))
-        else:
-            result.append({'scope': child_scope, 'name': child_name, 'type': child_type})
+    result, datasets = [], set()
+    for did in list_collection_tree(dids=[(scope, name)], session=session):
+        if did['child_type'] == DIDType.DATASET and (did['child_scope'], did['child_name']) not in datasets:
+            datasets.add((did['child_scope'], did['child_name']))
+            result.append({'scope': did['child_scope'], 'name': did['child_name'], 'type': did['child_type']})
     return result
 
 
@@ -944,13 +1035,6 @@ def list_files(scope, name, long=False, session=None):
                        'adler32': did[3], 'guid': did[4] and did[4].upper(),
                        'events': did[5]}
         else:
-            cnt_query = session.\
-                query(models.DataIdentifierAssociation.child_scope,
-                      models.DataIdentifierAssociation.child_name,
-                      models.DataIdentifierAssociation.child_type).\
-                with_hint(models.DataIdentifierAssociation,
-                          "INDEX(CONTENTS CONTENTS_PK)", 'oracle')
-
             if long:
                 dst_cnt_query = session.\
                     query(models.DataIdentifierAssociation.child_scope,
@@ -979,29 +1063,33 @@ def list_files(scope, name, long=False, session=None):
                     with_hint(models.DataIdentifierAssociation,
                               "INDEX(CONTENTS CONTENTS_PK)", 'oracle')
 
-            dids = [(scope, name, did[7]), ]
-            while dids:
-                s, n, t = dids.pop()
-                if t == DIDType.DATASET:
-                    query = dst_cnt_query.\
-                        filter(and_(models.DataIdentifierAssociation.scope == s,
-                                    models.DataIdentifierAssociation.name == n))
-
-                    for child_scope, child_name, child_type, bytes, adler32, guid, events, lumiblocknr in query.yield_per(500):
-                        if long:
-                            yield {'scope': child_scope, 'name': child_name,
-                                   'bytes': bytes, 'adler32': adler32,
-                                   'guid': guid and guid.upper(),
-                                   'events': events,
-                                   'lumiblocknr': lumiblocknr}
-                        else:
-                            yield {'scope': child_scope, 'name': child_name,
-                                   'bytes': bytes, 'adler32': adler32,
-                                   'guid': guid and guid.upper(),
-                                   'events': events}
-                else:
-                    for child_scope, child_name, child_type in cnt_query.filter_by(scope=s, name=n).yield_per(500):
-                        dids.append((child_scope, child_name, child_type))
+            if did[7] == DIDType.DATASET:
+                datasets = [(scope, name)]
+            else:
+                datasets = set()
+                for collection in list_collection_tree(dids=[(scope, name)], session=session):
+                    if collection['child_type'] == DIDType.DATASET:
+                        datasets.add((collection['child_scope'], collection['child_name']))
+                datasets = sorted(datasets)
+
+            for chunk in chunks(datasets, COLLECTION_CHUNK_SIZE):
+                query = dst_cnt_query.\
+                    filter(scope_name_in(models.DataIdentifierAssociation.scope,
+                                         models.DataIdentifierAssociation.name,
+                                         chunk, session.bind.dialect.name))
+
+                for child_scope, child_name, child_type, bytes, adler32, guid, events, lumiblocknr in query.yield_per(500):
+                    if long:
+                        yield {'scope': child_scope, 'name': child_name,
+                               'bytes': bytes, 'adler32': adler32,
+                               'guid': guid and guid.upper(),
+                               'events': events,
+                               'lumiblocknr': lumiblocknr}
+                    else:
+                        yield {'scope': child_scope, 'name': child_name,
+                               'bytes': bytes, 'adler32': adler32,
+                               'guid': guid and guid.upper(),
+                               'events': events}
 
     except NoResultFound:
         raise exception.DataIdentifierNotFound("Data identifier '%(scope)s:%(name)s' not found" % locals())
@@ -1029,14 +1117,29 @@ def scope_list(scope, name=None, recursive=False, session=None):
         for row in s.yield_per(5):
             yield {'scope': scope, 'name': row.name, 'type': row.did_type, 'parent': None, 'level': 0}
 
-    def __diddriller(pdid):
-        query_associ = session.query(models.DataIdentifierAssociation).filter_by(scope=pdid['scope'], name=pdid['name'])
-        for row in query_associ.order_by('child_name').yield_per(5):
+    def __collections(pdid):
+        # Prefetch the whole collection hierarchy below a container in one query
+        collections = {}
+        if recursive and pdid['type'] == DIDType.CONTAINER:
+            for did in list_collection_tree(dids=[(pdid['scope'], pdid['name'])], session=session):
+                collections.setdefault((did['scope'], did['name']), []).append((did['child_scope'], did['child_name'], did['child_type']))
+        return collections
+
+    def __diddriller(pdid, collections):
+        if pdid['type'] == DIDType.CONTAINER and collections:
+            children = sorted(collections.get((pdid['scope'], pdid['name']), []), key=lambda child: child[1])
+        else:
+            children = session.query(models.DataIdentifierAssociation.child_scope,
+                                     models.DataIdentifierAssociation.child_name,
+                                     models.DataIdentifierAssociation.child_type).\
+                filter_by(scope=pdid['scope'], name=pdid['name']).\
+                order_by(models.DataIdentifierAssociation.child_name).yield_per(5)
+        for child_scope, child_name, child_type in children:
             parent = {'scope': pdid['scope'], 'name': pdid['name']}
-            cdid = {'scope': row.child_scope, 'name': row.child_name, 'type': row.child_type, 'parent': parent, 'level': pdid['level'] + 1}
+            cdid = {'scope': child_scope, 'name': child_name, 'type': child_type, 'parent': parent, 'level': pdid['level'] + 1}
             yield cdid
             if cdid['type'] != DIDType.FILE and recursive:
-                for did in __diddriller(cdid):
+                for did in __diddriller(cdid, collections):
                     yield did
 
     if name is None:
@@ -1051,11 +1154,11 @@ def scope_list(scope, name=None, recursive=False, session=None):
         for topdid in topdids:
             yield topdid
             if recursive:
-                for did in __diddriller(topdid):
+                for did in __diddriller(topdid, __collections(topdid)):
                     yield did
     else:
         for topdid in topdids:
-            for did in __diddriller(topdid):
+            for did in __diddriller(topdid, __collections(topdid)):
                 yield did
 
 
@@ -1235,6 +1338,27 @@ def get_metadata(scope, name, session=None):
         raise exception.DataIdentifierNotFound("Data identifier '%(scope)s:%(name)s' not found" % locals())
 
 
+@stream_session
+def get_metadata_bulk(dids, session=None):
+    """
+    Get the metadata of a list of data identifiers, the unknown data identifiers are skipped.
+
+    :param dids: List of dictionaries with the scope and name of the data identifiers.
+    :param session: The database session in use.
+    :returns: Generator of metadata dictionaries.
+    """
+    dialect_name = session.bind.dialect.name
+    for chunk in chunks(sorted(set([(did['scope'], did['name']) for did in dids])), COLLECTION_CHUNK_SIZE):
+        query = session.query(models.DataIdentifier).\
+            with_hint(models.DataIdentifier, "INDEX(DIDS DIDS_PK)", 'oracle').\
+            filter(scope_name_in(models.DataIdentifier.scope, models.DataIdentifier.name, chunk, dialect_name))
+        for row in query:
+            d = {}
+            for column in row.__table__.columns:
+                d[column.name] = getattr(row, column.name)
+            yield d
+
+
 @transactional_session
 def set_status(scope, name, session=None, **kwargs):
     """
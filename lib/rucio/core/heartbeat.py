@@ -11,8 +11,13 @@
 
 import datetime
 import hashlib
+import logging
+import os
+import socket
+import threading
+import traceback
 
-from sqlalchemy.sql import distinct
+from sqlalchemy.sql import and_, case, distinct, func, or_
 
 from rucio.db.sqla.models import Heartbeats
 from rucio.db.sqla.session import read_session, transactional_session
@@ -102,31 +107,89 @@ def live(executable, hostname, pid, thread, older_than=600, hash_executable=None
                    thread_id=thread.ident,
                    thread_name=thread.name).save(session=session)
 
-    # assign thread identifier
+    # assign thread identifier: the rank of the thread among the live threads of the executable
+    before = or_(Heartbeats.hostname < hostname,
+                 and_(Heartbeats.hostname == hostname, Heartbeats.pid < pid),
+                 and_(Heartbeats.hostname == hostname, Heartbeats.pid == pid, Heartbeats.thread_id < thread.ident))
+    query = session.query(func.count(), func.sum(case([(before, 1)], else_=0)))\
+                   .with_hint(Heartbeats, "index(HEARTBEATS HEARTBEATS_PK)", 'oracle')\
+                   .filter(Heartbeats.executable == hash_executable)\
+                   .filter(Heartbeats.updated_at >= datetime.datetime.utcnow() - datetime.timedelta(seconds=older_than))
+    nr_threads, assign_thread = query.one()
+    assign_thread = assign_thread or 0
+
+    return {'assign_thread': assign_thread,
+            'nr_threads': nr_threads}
+
+
+@transactional_session
+def live_many(executable, hostname, pid, threads, older_than=600, hash_executable=None, session=None):
+    """
+    Register the heartbeats of several threads of a process with one update,
+    and return the generation of the live threads of the executable.
+
+    :param executable: Executable name as a string, e.g., conveyor-submitter.
+    :param hostname: Hostname as a string, e.g., rucio-daemon-prod-01.cern.ch.
+    :param pid: UNIX Process ID as a number, e.g., 1234.
+    :param threads: List of Python Thread Objects.
+    :param older_than: Ignore specified heartbeats older than specified nr of seconds.
+    :param hash_executable: Hash of the executable.
+
+    :returns generation: Tuple (number, oldest creation, newest creation) of the live threads, it changes when threads join or leave.
+    """
+    if not hash_executable:
+        hash_executable = hashlib.sha256(executable).hexdigest()
+
+    now = datetime.datetime.utcnow()
+    threads = dict((thread.ident, thread) for thread in threads)
+    if threads:
+        query = session.query(Heartbeats)\
+            .filter_by(executable=hash_executable, hostname=hostname, pid=pid)\
+            .filter(Heartbeats.thread_id.in_(threads.keys()))
+        rowcount = query.update({'updated_at': now}, synchronize_session=False)
+        if rowcount < len(threads):
+            existing = set([thread_id for thread_id, in query.with_entities(Heartbeats.thread_id)])
+            for thread_id, thread in threads.iteritems():
+                if thread_id not in existing:
+                    Heartbeats(executable=hash_executable,
+                               readable=executable,
+                               hostname=hostname,
+                               pid=pid,
+                               thread_id=thread_id,
+                               thread_name=thread.name).save(session=session, flush=False)
+            session.flush()
+
+    return session.query(func.count(), func.min(Heartbeats.created_at), func.max(Heartbeats.created_at))\
+                  .with_hint(Heartbeats, "index(HEARTBEATS HEARTBEATS_PK)", 'oracle')\
+                  .filter(Heartbeats.executable == hash_executable)\
+                  .filter(Heartbeats.updated_at >= now - datetime.timedelta(seconds=older_than))\
+                  .one()
+
+
+@read_session
+def list_live_threads(executable, older_than=600, hash_executable=None, session=None):
+    """
+    List the live threads of an executable, in the order of their assignments.
+
+    :param executable: Executable name as a string, e.g., conveyor-submitter.
+    :param older_than: Ignore specified heartbeats older than specified nr of seconds.
+    :param hash_executable: Hash of the executable.
+
+    :returns: List of tuples (hostname, pid, thread_id).
+    """
+    if not hash_executable:
+        hash_executable = hashlib.sha256(executable).hexdigest()
+
     query = session.query(Heartbeats.hostname,
                           Heartbeats.pid,
                           Heartbeats.thread_id)\
                    .with_hint(Heartbeats, "index(HEARTBEATS HEARTBEATS_PK)", 'oracle')\
                    .filter(Heartbeats.executable == hash_executable)\
                    .filter(Heartbeats.updated_at >= datetime.datetime.utcnow() - datetime.timedelta(seconds=older_than))\
-                   .group_by(Heartbeats.hostname,
-                             Heartbeats.pid,
-                             Heartbeats.thread_id)\
                    .order_by(Heartbeats.hostname,
                              Heartbeats.pid,
                              Heartbeats.thread_id)
-    result = query.all()
-
-    # there is no universally applicable rownumber in SQLAlchemy
-    # so we have to do it in Python
-    assign_thread = 0
-    for r in xrange(len(result)):
-        if result[r][0] == hostname and result[r][1] == pid and result[r][2] == thread.ident:
-            assign_thread = r
-            break
-
-    return {'assign_thread': assign_thread,
-            'nr_threads': len(result)}
+    return [tuple(row) for row in query]
 
 
 @transactional_session
@@ -191,3 +254,128 @@ def list_heartbeats(session=None):
                                                           Heartbeats.thread_name)
 
     return query.all()
+
+
+class HeartbeatService(object):
+    """
+    Heartbeats of all the threads of a process running an executable, sent by one background thread.
+
+    The worker threads read their assignment from the service instead of the database.
+    The live threads are only listed again when their generation changes.
+    """
+
+    def __init__(self, executable, hostname=None, pid=None, interval=60, older_than=600, hash_executable=None):
+        """
+        :param executable: Executable name as a string, e.g., conveyor-submitter.
+        :param hostname: Hostname as a string, defaults to the name of this host.
+        :param pid: UNIX Process ID as a number, defaults to the id of this process.
+        :param interval: Number of seconds between two heartbeats.
+        :param older_than: Ignore heartbeats older than specified nr of seconds.
+        :param hash_executable: Hash of the executable.
+        """
+        self.executable = executable
+        self.hostname = hostname or socket.gethostname()
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.older_than = older_than
+        self.hash_executable = hash_executable or hashlib.sha256(executable).hexdigest()
+
+        self.threads = {}
+        self.generation = None
+        self.assignments = {}
+        self.nr_threads = 0
+        self.lock = threading.Lock()
+        self.beat_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.heartbeat_thread = None
+
+    def start(self):
+        """
+        Start the background heartbeat thread.
+        """
+        self.stopped.clear()
+        self.heartbeat_thread = threading.Thread(target=self.__run, name='Heartbeat: %s' % self.executable)
+        self.heartbeat_thread.daemon = True
+        self.heartbeat_thread.start()
+
+    def stop(self):
+        """
+        Stop the background heartbeat thread.
+        """
+        self.stopped.set()
+        if self.heartbeat_thread:
+            self.heartbeat_thread.join()
+            self.heartbeat_thread = None
+
+    def register(self, thread=None):
+        """
+        Add a thread to the heartbeats and return its assignment.
+
+        :param thread: Python Thread Object, defaults to the current thread.
+        :returns: Dictionary {assign_thread, nr_threads}
+        """
+        thread = thread or threading.current_thread()
+        with self.lock:
+            self.threads[thread.ident] = thread
+        self.beat()
+        return self.assignment(thread)
+
+    def unregister(self, thread=None):
+        """
+        Remove a thread from the heartbeats.
+
+        :param thread: Python Thread Object, defaults to the current thread.
+        """
+        thread = thread or threading.current_thread()
+        with self.lock:
+            self.threads.pop(thread.ident, None)
+        die(executable=self.executable, hostname=self.hostname, pid=self.pid, thread=thread, hash_executable=self.hash_executable)
+
+    def assignment(self, thread=None):
+        """
+        Return the last known assignment of a thread.
+
+        :param thread: Python Thread Object, defaults to the current thread.
+        :returns: Dictionary {assign_thread, nr_threads}
+        """
+        thread = thread or threading.current_thread()
+        with self.lock:
+            return {'assign_thread': self.assignments.get(thread.ident, 0),
+                    'nr_threads': max(self.nr_threads, 1)}
+
+    def beat(self):
+        """
+        Send the heartbeats of the registered threads and refresh the assignments if the live threads changed.
+        The threads which ended without unregistering are removed, so their share of the work is reassigned.
+        """
+        with self.beat_lock:
+            with self.lock:
+                dead_threads = [thread for thread in self.threads.values() if not thread.is_alive()]
+                for thread in dead_threads:
+                    del self.threads[thread.ident]
+                threads = self.threads.values()
+            for thread in dead_threads:
+                die(executable=self.executable, hostname=self.hostname, pid=self.pid, thread=thread, hash_executable=self.hash_executable)
+            generation = live_many(executable=self.executable, hostname=self.hostname, pid=self.pid, threads=threads,
+                                   older_than=self.older_than, hash_executable=self.hash_executable)
+            if generation == self.generation:
+                return
+            members = list_live_threads(executable=self.executable, older_than=self.older_than, hash_executable=self.hash_executable)
+            assignments = {}
+            for rank, (hostname, pid, thread_id) in enumerate(members):
+                if hostname == self.hostname and pid == self.pid:
+                    assignments[thread_id] = rank
+            with self.lock:
+                self.generation = generation
+                self.assignments = assignments
+                self.nr_threads = len(members)
+
+    def __run(self):
+        """
+        Main loop of the background heartbeat thread.
+        """
+        while not self.stopped.wait(self.interval):
+            try:
+                self.beat()
+            except Exception:
+                logging.error(traceback.format_exc())
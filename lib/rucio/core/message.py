@@ -15,13 +15,12 @@
 import json
 import re
 
-from sqlalchemy import or_
 from sqlalchemy.exc import DatabaseError, IntegrityError
-from sqlalchemy.sql.expression import bindparam, text
-
 
 from rucio.common.exception import InvalidObject, RucioException
+from rucio.common.utils import chunks
 from rucio.db.sqla.models import Message, MessageHistory
+from rucio.db.sqla.sautils import filter_thread_work
 from rucio.db.sqla.session import transactional_session
 
 
@@ -46,9 +45,33 @@ def add_message(event_type, payload, session=None):
     new_message.save(session=session, flush=False)
 
 
+@transactional_session
+def add_messages(messages, session=None):
+    """
+    Add several messages to be submitted asynchronously to a message broker, with one bulk insert.
+
+    :param messages: The messages as a list of dictionaries {event_type, payload}.
+    :param session: The database session to use.
+    """
+
+    try:
+        mappings = [{'event_type': message['event_type'], 'payload': json.dumps(message['payload'])} for message in messages]
+    except TypeError, e:
+        raise InvalidObject('Invalid JSON for payload: %(e)s' % locals())
+
+    try:
+        if mappings:
+            session.bulk_insert_mappings(Message, mappings)
+    except DatabaseError, e:
+        if re.match('.*ORA-12899.*', e.args[0]) \
+           or re.match('.*1406.*', e.args[0]):
+            raise RucioException('Could not persist message, payload too large')
+        raise RucioException(e.args)
+
+
 @transactional_session
 def retrieve_messages(bulk=1000, thread=None, total_threads=None, event_type=None,
-                      lock=False, session=None):
+                      lock=True, session=None):
     """
     Retrieve up to $bulk messages.
 
@@ -64,14 +87,7 @@ def retrieve_messages(bulk=1000, thread=None, total_threads=None, event_type=Non
     messages = []
     try:
         subquery = session.query(Message.id)
-        if total_threads and (total_threads - 1) > 0:
-            if session.bind.dialect.name == 'oracle':
-                bindparams = [bindparam('thread_number', thread), bindparam('total_threads', total_threads - 1)]
-                subquery = subquery.filter(text('ORA_HASH(id, :total_threads) = :thread_number', bindparams=bindparams))
-            elif session.bind.dialect.name == 'mysql':
-                subquery = subquery.filter('mod(md5(id), %s) = %s' % (total_threads - 1, thread))
-            elif session.bind.dialect.name == 'postgresql':
-                subquery = subquery.filter('mod(abs((\'x\'||md5(id))::bit(32)::int), %s) = %s' % (total_threads - 1, thread))
+        subquery = filter_thread_work(session=session, query=subquery, total_threads=total_threads, thread_id=thread, hash_variable='id')
 
         if event_type:
             subquery = subquery.filter_by(event_type=event_type)
@@ -90,8 +106,10 @@ def retrieve_messages(bulk=1000, thread=None, total_threads=None, event_type=Non
                               Message.created_at,
                               Message.event_type,
                               Message.payload)\
-            .filter(Message.id.in_(subquery))\
-            .with_for_update(nowait=True)
+            .filter(Message.id.in_(subquery))
+
+        if lock:
+            query = query.with_for_update(nowait=True)
 
         # Step 2:
         # MySQL does not support limits in nested queries, limit on the outer query instead.
@@ -117,18 +135,14 @@ def delete_messages(messages, session=None):
 
     :param messages: The messages to delete as a list of dictionaries.
     """
-    message_condition = []
-    for message in messages:
-        message_condition.append(Message.id == message['id'])
-
     try:
-        if message_condition:
+        for chunk in chunks(messages, 1000):
             session.query(Message).\
                 with_hint(Message, "index(messages MESSAGES_ID_PK)", 'oracle').\
-                filter(or_(*message_condition)).\
+                filter(Message.id.in_([message['id'] for message in chunk])).\
                 delete(synchronize_session=False)
 
-            session.bulk_insert_mappings(MessageHistory, messages)
+            session.bulk_insert_mappings(MessageHistory, chunk)
     except IntegrityError, e:
         raise RucioException(e.args)
 
@@ -16,6 +16,7 @@ Graphite counters
 import time
 
 from pystatsd import Client
+from threading import local
 
 from rucio.common.config import config_get
 
@@ -24,6 +25,9 @@ PORT = config_get('monitor', 'carbon_port')
 SCOPE = config_get('monitor', 'user_scope')
 CLIENT = Client(host=SERVER, port=PORT, prefix=SCOPE)
 
+# Statistics of the request handled by each thread, collected between start_request_stats and stop_request_stats
+REQUEST_STATS = local()
+
 
 def record_counter(counters, delta=1):
     """
@@ -91,3 +95,35 @@ class record_timer_block(object):
                 if s[1] != 0:
                     ms = ms / s[1]
                     record_timer(s[0], ms)
+
+
+def start_request_stats():
+    """
+    Start collecting the statistics of the request handled by the current thread.
+    """
+    REQUEST_STATS.stats = {}
+
+
+def stop_request_stats():
+    """
+    Stop collecting the statistics of the request handled by the current thread.
+
+    :returns: Dictionary {operation: [count, seconds]}.
+    """
+    stats = getattr(REQUEST_STATS, 'stats', None) or {}
+    REQUEST_STATS.stats = None
+    return stats
+
+
+def add_request_stat(operation, seconds):
+    """
+    Add an operation to the statistics of the request handled by the current thread, if they are collected.
+
+    :param operation: The name of the operation, e.g. db or permission.
+    :param seconds: The duration of the operation in seconds.
+    """
+    stats = getattr(REQUEST_STATS, 'stats', None)
+    if stats is not None:
+        stat = stats.setdefault(operation, [0, 0.])
+        stat[0] += 1
+        stat[1] += seconds
@@ -15,9 +15,12 @@
 # - Cedric Serfon, <cedric.serfon@cern.ch>, 2013-2017
 # - Joaquin Bogado, <joaquin.bogado@cern.ch>, 2015
 
+from repoze.lru import LRUCache
+
 import rucio.core.authentication
 import rucio.core.scope
-from rucio.core.account import list_account_attributes, has_account_attribute
+from rucio.common.exception import AccountNotFound
+from rucio.core.account import list_cached_account_attributes, has_cached_account_attribute
 from rucio.core.rse import list_rse_attributes
 from rucio.core.rse_expression_parser import parse_expression
 from rucio.core.rule import get_rule
@@ -34,70 +37,19 @@ def has_permission(issuer, action, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    perm = {'add_account': perm_add_account,
-            'del_account': perm_del_account,
-            'set_account_status': perm_set_account_status,
-            'add_rule': perm_add_rule,
-            'add_subscription': perm_add_subscription,
-            'add_scope': perm_add_scope,
-            'add_rse': perm_add_rse,
-            'update_rse': perm_update_rse,
-            'add_protocol': perm_add_protocol,
-            'del_protocol': perm_del_protocol,
-            'update_protocol': perm_update_protocol,
-            'declare_bad_file_replicas': perm_declare_bad_file_replicas,
-            'declare_suspicious_file_replicas': perm_declare_suspicious_file_replicas,
-            'add_replicas': perm_add_replicas,
-            'delete_replicas': perm_delete_replicas,
-            'skip_availability_check': perm_skip_availability_check,
-            'update_replicas_states': perm_update_replicas_states,
-            'add_rse_attribute': perm_add_rse_attribute,
-            'del_rse_attribute': perm_del_rse_attribute,
-            'del_rse': perm_del_rse,
-            'del_rule': perm_del_rule,
-            'update_rule': perm_update_rule,
-            'approve_rule': perm_approve_rule,
-            'update_subscription': perm_update_subscription,
-            'reduce_rule': perm_reduce_rule,
-            'get_auth_token_user_pass': perm_get_auth_token_user_pass,
-            'get_auth_token_gss': perm_get_auth_token_gss,
-            'get_auth_token_x509': perm_get_auth_token_x509,
-            'add_account_identity': perm_add_account_identity,
-            'add_did': perm_add_did,
-            'add_dids': perm_add_dids,
-            'attach_dids': perm_attach_dids,
-            'detach_dids': perm_detach_dids,
-            'attach_dids_to_dids': perm_attach_dids_to_dids,
-            'create_did_sample': perm_create_did_sample,
-            'set_metadata': perm_set_metadata,
-            'set_status': perm_set_status,
-            'queue_requests': perm_queue_requests,
-            'set_rse_usage': perm_set_rse_usage,
-            'set_rse_limits': perm_set_rse_limits,
-            'query_request': perm_query_request,
-            'get_request_by_did': perm_get_request_by_did,
-            'cancel_request': perm_cancel_request,
-            'get_next': perm_get_next,
-            'set_account_limit': perm_set_account_limit,
-            'delete_account_limit': perm_delete_account_limit,
-            'config_sections': perm_config,
-            'config_add_section': perm_config,
-            'config_has_section': perm_config,
-            'config_options': perm_config,
-            'config_has_option': perm_config,
-            'config_get': perm_config,
-            'config_items': perm_config,
-            'config_set': perm_config,
-            'config_remove_section': perm_config,
-            'config_remove_option': perm_config,
-            'get_account_usage': perm_get_account_usage,
-            'add_attribute': perm_add_account_attribute,
-            'del_attribute': perm_del_account_attribute,
-            'list_heartbeats': perm_list_heartbeats,
-            'resurrect': perm_resurrect,
-            'update_lifetime_exceptions': perm_update_lifetime_exceptions}
-
-    return perm.get(action, perm_default)(issuer=issuer, kwargs=kwargs)
+    if action not in ISSUER_ACTIONS:
+        return PERMISSIONS.get(action, perm_default)(issuer=issuer, kwargs=kwargs)
+
+    # the decision stays valid as long as the cached attributes of the issuer are the same
+    try:
+        attributes = list_cached_account_attributes(account=issuer)
+    except AccountNotFound:
+        return PERMISSIONS[action](issuer=issuer, kwargs=kwargs)
+    decision = DECISIONS.get((issuer, action))
+    if decision is None or decision[0] is not attributes:
+        decision = (attributes, PERMISSIONS[action](issuer=issuer, kwargs=kwargs))
+        DECISIONS.put((issuer, action), decision)
+    return decision[1]
 
 
 def perm_default(issuer, kwargs):
@@ -119,7 +71,7 @@ def perm_add_rse(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_update_rse(issuer, kwargs):
@@ -130,7 +82,7 @@ def perm_update_rse(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_add_rule(issuer, kwargs):
@@ -143,7 +95,7 @@ def perm_add_rule(issuer, kwargs):
     """
     if kwargs['account'] == issuer and not kwargs['locked']:
         return True
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
 
     return False
@@ -157,7 +109,7 @@ def perm_add_subscription(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
 
     return False
@@ -171,12 +123,12 @@ def perm_add_rse_attribute(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
     if kwargs['key'] in ['rule_deleters', 'auto_approve_bytes', 'auto_approve_files', 'rule_approvers', 'default_account_limit_bytes', 'default_limit_files', 'block_manual_approve']:
         # Check if user is a country admin
         admin_in_country = []
-        for kv in list_account_attributes(account=issuer):
+        for kv in list_cached_account_attributes(account=issuer):
             if kv['key'].startswith('country-') and kv['value'] == 'admin':
                 admin_in_country.append(kv['key'].partition('-')[2])
         if admin_in_country:
@@ -193,12 +145,12 @@ def perm_del_rse_attribute(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
     if kwargs['key'] in ['rule_deleters', 'auto_approve_bytes', 'auto_approve_files', 'rule_approvers', 'default_account_limit_bytes', 'default_limit_files', 'block_manual_approve']:
         # Check if user is a country admin
         admin_in_country = []
-        for kv in list_account_attributes(account=issuer):
+        for kv in list_cached_account_attributes(account=issuer):
             if kv['key'].startswith('country-') and kv['value'] == 'admin':
                 admin_in_country.append(kv['key'].partition('-')[2])
         if admin_in_country:
@@ -215,7 +167,7 @@ def perm_del_rse(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_add_account(issuer, kwargs):
@@ -248,7 +200,7 @@ def perm_set_account_status(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_add_scope(issuer, kwargs):
@@ -322,13 +274,13 @@ def perm_add_did(issuer, kwargs):
     :returns: True if account is allowed, otherwise False
     """
     # Check the accounts of the issued rules
-    if issuer != 'root' and not has_account_attribute(account=issuer, key='admin'):
+    if issuer != 'root' and not has_cached_account_attribute(account=issuer, key='admin'):
         for rule in kwargs.get('rules', []):
             if rule['account'] != issuer:
                 return False
 
     return issuer == 'root'\
-        or has_account_attribute(account=issuer, key='admin')\
+        or has_cached_account_attribute(account=issuer, key='admin')\
         or rucio.core.scope.is_scope_owner(scope=kwargs['scope'], account=issuer)\
         or kwargs['scope'] == u'mock'
 
@@ -342,13 +294,13 @@ def perm_add_dids(issuer, kwargs):
     :returns: True if account is allowed, otherwise False
     """
     # Check the accounts of the issued rules
-    if issuer != 'root' and not has_account_attribute(account=issuer, key='admin'):
+    if issuer != 'root' and not has_cached_account_attribute(account=issuer, key='admin'):
         for did in kwargs['dids']:
             for rule in did.get('rules', []):
                 if rule['account'] != issuer:
                     return False
 
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_attach_dids(issuer, kwargs):
@@ -360,7 +312,7 @@ def perm_attach_dids(issuer, kwargs):
     :returns: True if account is allowed, otherwise False
     """
     return issuer == 'root'\
-        or has_account_attribute(account=issuer, key='admin')\
+        or has_cached_account_attribute(account=issuer, key='admin')\
         or rucio.core.scope.is_scope_owner(scope=kwargs['scope'], account=issuer)\
         or kwargs['scope'] == 'mock'
 
@@ -373,7 +325,7 @@ def perm_attach_dids_to_dids(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
     else:
         attachments = kwargs['attachments']
@@ -394,7 +346,7 @@ def perm_create_did_sample(issuer, kwargs):
     :returns: True if account is allowed, otherwise False
     """
     return issuer == 'root'\
-        or has_account_attribute(account=issuer, key='admin')\
+        or has_cached_account_attribute(account=issuer, key='admin')\
         or rucio.core.scope.is_scope_owner(scope=kwargs['scope'], account=issuer)\
         or kwargs['scope'] == 'mock'
 
@@ -414,7 +366,7 @@ def perm_del_rule(issuer, kwargs):
 
     # Check if user is a country admin
     admin_in_country = []
-    for kv in list_account_attributes(account=issuer):
+    for kv in list_cached_account_attributes(account=issuer):
         if kv['key'].startswith('country-') and kv['value'] == 'admin':
             admin_in_country.append(kv['key'].partition('-')[2])
 
@@ -444,7 +396,7 @@ def perm_update_rule(issuer, kwargs):
     :returns: True if account is allowed to call the API call, otherwise False
     """
     # Admin accounts can do everything
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
 
     # Only admin accounts can change account, state, priority of a rule
@@ -456,7 +408,7 @@ def perm_update_rule(issuer, kwargs):
 
     # Country admins are allowed to change the rest.
     admin_in_country = []
-    for kv in list_account_attributes(account=issuer):
+    for kv in list_cached_account_attributes(account=issuer):
         if kv['key'].startswith('country-') and kv['value'] == 'admin':
             admin_in_country.append(kv['key'].partition('-')[2])
 
@@ -487,7 +439,7 @@ def perm_approve_rule(issuer, kwargs):
     :returns: True if account is allowed to call the API call, otherwise False
     """
     # Admin accounts can do everything
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
 
     rule = get_rule(rule_id=kwargs['rule_id'])
@@ -502,7 +454,7 @@ def perm_approve_rule(issuer, kwargs):
 
     # LOCALGROUPDISK/LOCALGROUPTAPE admins can approve the rule
     admin_in_country = []
-    for kv in list_account_attributes(account=issuer):
+    for kv in list_cached_account_attributes(account=issuer):
         if kv['key'].startswith('country-') and kv['value'] == 'admin':
             admin_in_country.append(kv['key'].partition('-')[2])
     if admin_in_country:
@@ -514,7 +466,7 @@ def perm_approve_rule(issuer, kwargs):
 
     # GROUPDISK admins can approve the rule
     admin_for_phys_group = []
-    for kv in list_account_attributes(account=issuer):
+    for kv in list_cached_account_attributes(account=issuer):
         if kv['key'].startswith('group-') and kv['value'] == 'admin':
             admin_for_phys_group.append(kv['key'].partition('-')[2])
     if admin_for_phys_group:
@@ -535,7 +487,7 @@ def perm_reduce_rule(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed to call the API call, otherwise False
     """
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
     return False
 
@@ -548,7 +500,7 @@ def perm_update_subscription(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
 
     return False
@@ -573,7 +525,7 @@ def perm_set_metadata(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin') or rucio.core.scope.is_scope_owner(scope=kwargs['scope'], account=issuer)
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin') or rucio.core.scope.is_scope_owner(scope=kwargs['scope'], account=issuer)
 
 
 def perm_set_status(issuer, kwargs):
@@ -585,10 +537,10 @@ def perm_set_status(issuer, kwargs):
     :returns: True if account is allowed, otherwise False
     """
     if kwargs.get('open', False):
-        if issuer != 'root' and not has_account_attribute(account=issuer, key='admin'):
+        if issuer != 'root' and not has_cached_account_attribute(account=issuer, key='admin'):
             return False
 
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin') or rucio.core.scope.is_scope_owner(scope=kwargs['scope'], account=issuer)
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin') or rucio.core.scope.is_scope_owner(scope=kwargs['scope'], account=issuer)
 
 
 def perm_add_protocol(issuer, kwargs):
@@ -599,7 +551,7 @@ def perm_add_protocol(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_del_protocol(issuer, kwargs):
@@ -610,7 +562,7 @@ def perm_del_protocol(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_update_protocol(issuer, kwargs):
@@ -621,7 +573,7 @@ def perm_update_protocol(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_declare_bad_file_replicas(issuer, kwargs):
@@ -632,8 +584,8 @@ def perm_declare_bad_file_replicas(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    is_cloud_admin = bool(filter(lambda x: (x['key'].startswith('cloud-')) and (x['value'] == 'admin'), list_account_attributes(account=issuer)))
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin') or is_cloud_admin
+    is_cloud_admin = bool(filter(lambda x: (x['key'].startswith('cloud-')) and (x['value'] == 'admin'), list_cached_account_attributes(account=issuer)))
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin') or is_cloud_admin
 
 
 def perm_declare_suspicious_file_replicas(issuer, kwargs):
@@ -658,7 +610,7 @@ def perm_add_replicas(issuer, kwargs):
     rse = str(kwargs.get('rse', ''))
     phys_group = []
 
-    for kv in list_account_attributes(account=issuer):
+    for kv in list_cached_account_attributes(account=issuer):
         if kv['key'].startswith('group-') and kv['value'] in ['admin', 'user']:
             phys_group.append(kv['key'].partition('-')[2])
     if phys_group:
@@ -672,7 +624,7 @@ def perm_add_replicas(issuer, kwargs):
         or rse.endswith('MOCK')\
         or rse.endswith('LOCALGROUPDISK')\
         or issuer == 'root'\
-        or has_account_attribute(account=issuer, key='admin')
+        or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_skip_availability_check(issuer, kwargs):
@@ -683,7 +635,7 @@ def perm_skip_availability_check(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_delete_replicas(issuer, kwargs):
@@ -708,7 +660,7 @@ def perm_update_replicas_states(issuer, kwargs):
     rse = str(kwargs.get('rse', ''))
     phys_group = []
 
-    for kv in list_account_attributes(account=issuer):
+    for kv in list_cached_account_attributes(account=issuer):
         if kv['key'].startswith('group-') and kv['value'] in ['admin', 'user']:
             phys_group.append(kv['key'].partition('-')[2])
     if phys_group:
@@ -722,7 +674,7 @@ def perm_update_replicas_states(issuer, kwargs):
         or rse.endswith('MOCK')\
         or rse.endswith('LOCALGROUPDISK')\
         or issuer == 'root'\
-        or has_account_attribute(account=issuer, key='admin')
+        or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_queue_requests(issuer, kwargs):
@@ -799,7 +751,7 @@ def perm_set_rse_limits(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed to call the API call, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_set_account_limit(issuer, kwargs):
@@ -810,11 +762,11 @@ def perm_set_account_limit(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
     # Check if user is a country admin
     admin_in_country = []
-    for kv in list_account_attributes(account=issuer):
+    for kv in list_cached_account_attributes(account=issuer):
         if kv['key'].startswith('country-') and kv['value'] == 'admin':
             admin_in_country.append(kv['key'].partition('-')[2])
     if admin_in_country and list_rse_attributes(rse=kwargs['rse'], rse_id=None).get('country') in admin_in_country:
@@ -830,11 +782,11 @@ def perm_delete_account_limit(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed, otherwise False
     """
-    if issuer == 'root' or has_account_attribute(account=issuer, key='admin'):
+    if issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin'):
         return True
     # Check if user is a country admin
     admin_in_country = []
-    for kv in list_account_attributes(account=issuer):
+    for kv in list_cached_account_attributes(account=issuer):
         if kv['key'].startswith('country-') and kv['value'] == 'admin':
             admin_in_country.append(kv['key'].partition('-')[2])
     if admin_in_country and list_rse_attributes(rse=kwargs['rse'], rse_id=None).get('country') in admin_in_country:
@@ -850,7 +802,7 @@ def perm_config(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed to call the API call, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_get_account_usage(issuer, kwargs):
@@ -872,7 +824,7 @@ def perm_add_account_attribute(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed to call the API call, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_del_account_attribute(issuer, kwargs):
@@ -905,7 +857,7 @@ def perm_resurrect(issuer, kwargs):
     :param kwargs: List of arguments for the action.
     :returns: True if account is allowed to call the API call, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
 
 
 def perm_update_lifetime_exceptions(issuer, kwargs):
@@ -915,4 +867,79 @@ def perm_update_lifetime_exceptions(issuer, kwargs):
     :param issuer: Account identifier which issues the command.
     :returns: True if account is allowed to call the API call, otherwise False
     """
-    return issuer == 'root' or has_account_attribute(account=issuer, key='admin')
+    return issuer == 'root' or has_cached_account_attribute(account=issuer, key='admin')
+
+
+# Dispatch table of the actions
+PERMISSIONS = {'add_account': perm_add_account,
+               'del_account': perm_del_account,
+               'set_account_status': perm_set_account_status,
+               'add_rule': perm_add_rule,
+               'add_subscription': perm_add_subscription,
+               'add_scope': perm_add_scope,
+               'add_rse': perm_add_rse,
+               'update_rse': perm_update_rse,
+               'add_protocol': perm_add_protocol,
+               'del_protocol': perm_del_protocol,
+               'update_protocol': perm_update_protocol,
+               'declare_bad_file_replicas': perm_declare_bad_file_replicas,
+               'declare_suspicious_file_replicas': perm_declare_suspicious_file_replicas,
+               'add_replicas': perm_add_replicas,
+               'delete_replicas': perm_delete_replicas,
+               'skip_availability_check': perm_skip_availability_check,
+               'update_replicas_states': perm_update_replicas_states,
+               'add_rse_attribute': perm_add_rse_attribute,
+               'del_rse_attribute': perm_del_rse_attribute,
+               'del_rse': perm_del_rse,
+               'del_rule': perm_del_rule,
+               'update_rule': perm_update_rule,
+               'approve_rule': perm_approve_rule,
+               'update_subscription': perm_update_subscription,
+               'reduce_rule': perm_reduce_rule,
+               'get_auth_token_user_pass': perm_get_auth_token_user_pass,
+               'get_auth_token_gss': perm_get_auth_token_gss,
+               'get_auth_token_x509': perm_get_auth_token_x509,
+               'add_account_identity': perm_add_account_identity,
+               'add_did': perm_add_did,
+               'add_dids': perm_add_dids,
+               'attach_dids': perm_attach_dids,
+               'detach_dids': perm_detach_dids,
+               'attach_dids_to_dids': perm_attach_dids_to_dids,
+               'create_did_sample': perm_create_did_sample,
+               'set_metadata': perm_set_metadata,
+               'set_status': perm_set_status,
+               'queue_requests': perm_queue_requests,
+               'set_rse_usage': perm_set_rse_usage,
+               'set_rse_limits': perm_set_rse_limits,
+               'query_request': perm_query_request,
+               'get_request_by_did': perm_get_request_by_did,
+               'cancel_request': perm_cancel_request,
+               'get_next': perm_get_next,
+               'set_account_limit': perm_set_account_limit,
+               'delete_account_limit': perm_delete_account_limit,
+               'config_sections': perm_config,
+               'config_add_section': perm_config,
+               'config_has_section': perm_config,
+               'config_options': perm_config,
+               'config_has_option': perm_config,
+               'config_get': perm_config,
+               'config_items': perm_config,
+               'config_set': perm_config,
+               'config_remove_section': perm_config,
+               'config_remove_option': perm_config,
+               'get_account_usage': perm_get_account_usage,
+               'add_attribute': perm_add_account_attribute,
+               'del_attribute': perm_del_account_attribute,
+               'list_heartbeats': perm_list_heartbeats,
+               'resurrect': perm_resurrect,
+               'update_lifetime_exceptions': perm_update_lifetime_exceptions}
+
+# Actions depending only on the issuer and its attributes, their decisions are cached
+ISSUER_ACTIONS = frozenset(['add_account', 'add_attribute', 'add_protocol', 'add_rse', 'add_subscription', 'cancel_request',
+                            'config_add_section', 'config_get', 'config_has_option', 'config_has_section', 'config_items', 'config_options',
+                            'config_remove_option', 'config_remove_section', 'config_sections', 'config_set', 'declare_bad_file_replicas',
+                            'declare_suspicious_file_replicas', 'del_account', 'del_protocol', 'del_rse', 'delete_replicas',
+                            'get_account_usage', 'get_next', 'get_request_by_did', 'list_heartbeats', 'query_request', 'queue_requests',
+                            'reduce_rule', 'resurrect', 'set_account_status', 'set_rse_limits', 'set_rse_usage', 'skip_availability_check',
+                            'update_lifetime_exceptions', 'update_protocol', 'update_rse', 'update_subscription'])
+DECISIONS = LRUCache(10000)
@@ -13,11 +13,12 @@
 import datetime
 
 from sqlalchemy import and_, or_, exists, not_
-from sqlalchemy.sql.expression import bindparam, text, select, false
+from sqlalchemy.sql.expression import select, false
 
 from rucio.common.utils import chunks
 from rucio.core.rse import get_rse_id
 from rucio.db.sqla import models
+from rucio.db.sqla.sautils import filter_thread_work
 from rucio.db.sqla.session import read_session, transactional_session
 
 
@@ -119,14 +120,8 @@ def list_quarantined_replicas(rse, limit, worker_number=None, total_workers=None
                    models.RSEFileAssociation.rse_id == models.QuarantinedReplica.rse_id))
     query = query.filter(not_(stmt))
 
-    if worker_number and total_workers and total_workers - 1 > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('worker_number', worker_number - 1), bindparam('total_workers', total_workers - 1)]
-            query = query.filter(text('ORA_HASH(path, :total_workers) = :worker_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            query = query.filter('mod(md5(path), %s) = %s' % (total_workers - 1, worker_number - 1))
-        elif session.bind.dialect.name == 'postgresql':
-            query = query.filter('mod(abs((\'x\'||md5(path))::bit(32)::int), %s) = %s' % (total_workers - 1, worker_number - 1))
+    if worker_number and total_workers:
+        query = filter_thread_work(session=session, query=query, total_threads=total_workers, thread_id=worker_number - 1, hash_variable='path')
 
     return [{'path': path,
              'rse': rse,
@@ -19,6 +19,7 @@
 from collections import defaultdict
 from curses.ascii import isprint
 from datetime import datetime, timedelta
+from itertools import islice
 from json import dumps
 from re import match
 from traceback import format_exc
@@ -26,8 +27,9 @@ from traceback import format_exc
 from sqlalchemy import func, and_, or_, exists, not_
 from sqlalchemy.exc import DatabaseError, IntegrityError
 from sqlalchemy.orm.exc import FlushError, NoResultFound
-from sqlalchemy.sql.expression import case, bindparam, select, text, false
+from sqlalchemy.sql.expression import bindparam, case, select, text, false
 
+import rucio.core.did
 import rucio.core.lock
 
 from rucio.common import exception
@@ -37,10 +39,16 @@ from rucio.core.rse_counter import decrease, increase
 from rucio.core.rse_expression_parser import parse_expression
 from rucio.db.sqla import models
 from rucio.db.sqla.constants import DIDType, ReplicaState, OBSOLETE, DIDAvailability, BadFilesStatus
+from rucio.db.sqla.sautils import filter_thread_work, scope_name_in
 from rucio.db.sqla.session import (read_session, stream_session, transactional_session,
                                    DEFAULT_SCHEMA_NAME)
 from rucio.rse import rsemanager as rsemgr
 
+# Number of DIDs matched by a single list_replicas query
+DID_CHUNK_SIZE = 400
+# Number of replicas for which the PFNs are built in one pass
+PFN_BLOCK_SIZE = 1000
+
 
 @read_session
 def get_bad_replicas_summary(rse_expression=None, from_date=None, to_date=None, session=None):
@@ -184,14 +192,7 @@ def list_bad_replicas_history(limit=10000, thread=None, total_threads=None, sess
     query = session.query(models.BadReplicas.scope, models.BadReplicas.name, models.BadReplicas.rse_id).\
         filter(models.BadReplicas.state == BadFilesStatus.BAD)
 
-    if total_threads and (total_threads - 1) > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('thread_number', thread), bindparam('total_threads', total_threads - 1)]
-            query = query.filter(text('ORA_HASH(name, :total_threads) = :thread_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            query = query.filter(text('mod(md5(name), %s) = %s' % (total_threads - 1, thread)))
-        elif session.bind.dialect.name == 'postgresql':
-            query = query.filter(text('mod(abs((\'x\'||md5(name))::bit(32)::int), %s) = %s' % (total_threads - 1, thread)))
+    query = filter_thread_work(session=session, query=query, total_threads=total_threads, thread_id=thread, hash_variable='name')
 
     query = query.limit(limit)
 
@@ -468,14 +469,7 @@ def list_bad_replicas(limit=10000, thread=None, total_threads=None, session=None
                               models.RSEFileAssociation.rse_id).\
             filter(models.RSEFileAssociation.state == ReplicaState.BAD)
 
-    if total_threads and (total_threads - 1) > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('thread_number', thread), bindparam('total_threads', total_threads - 1)]
-            query = query.filter(text('ORA_HASH(name, :total_threads) = :thread_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            query = query.filter(text('mod(md5(name), %s) = %s' % (total_threads - 1, thread)))
-        elif session.bind.dialect.name == 'postgresql':
-            query = query.filter(text('mod(abs((\'x\'||md5(name))::bit(32)::int), %s) = %s' % (total_threads - 1, thread)))
+    query = filter_thread_work(session=session, query=query, total_threads=total_threads, thread_id=thread, hash_variable='name')
 
     query = query.limit(limit)
     rows = []
@@ -545,46 +539,37 @@ def _resolve_dids(dids, unavailable, ignore_availability, all_states, session):
     :param ignore_availability: Ignore the RSE blacklisting.
     :param all_states: Return all replicas whatever state they are in. Adds an extra 'states' entry in the result dictionary.
     :param session: The database session in use.
+
+    :returns: The set of (scope, name) tuples of files, the dataset clause and the state clause.
     """
-    did_clause, dataset_clause, file_clause, files = [], [], [], []
-    for did in [dict(tupleized) for tupleized in set(tuple(item.items()) for item in dids)]:
+    collections, containers, datasets, files = set(), set(), set(), set()
+    for did in dids:
         if 'type' in did and did['type'] in (DIDType.FILE, DIDType.FILE.value) or 'did_type' in did and did['did_type'] in (DIDType.FILE, DIDType.FILE.value):
-            files.append({'scope': did['scope'], 'name': did['name']})
-            file_clause.append(and_(models.RSEFileAssociation.scope == did['scope'],
-                                    models.RSEFileAssociation.name == did['name']))
-
+            files.add((did['scope'], did['name']))
         else:
-            did_clause.append(and_(models.DataIdentifier.scope == did['scope'],
-                                   models.DataIdentifier.name == did['name']))
+            collections.add((did['scope'], did['name']))
 
-    if did_clause:
-        for scope, name, did_type in session.query(models.DataIdentifier.scope,
-                                                   models.DataIdentifier.name,
-                                                   models.DataIdentifier.did_type).with_hint(models.DataIdentifier, "INDEX(DIDS DIDS_PK)", 'oracle').filter(or_(*did_clause)):
+    for chunk in chunks(sorted(collections), DID_CHUNK_SIZE):
+        did_query = session.query(models.DataIdentifier.scope,
+                                  models.DataIdentifier.name,
+                                  models.DataIdentifier.did_type).\
+            with_hint(models.DataIdentifier, "INDEX(DIDS DIDS_PK)", 'oracle').\
+            filter(scope_name_in(models.DataIdentifier.scope, models.DataIdentifier.name, chunk, session.bind.dialect.name))
+        for scope, name, did_type in did_query:
             if did_type == DIDType.FILE:
-                files.append({'scope': scope, 'name': name})
-                file_clause.append(and_(models.RSEFileAssociation.scope == scope,
-                                        models.RSEFileAssociation.name == name))
-
+                files.add((scope, name))
             elif did_type == DIDType.DATASET:
-                dataset_clause.append(and_(models.DataIdentifierAssociation.scope == scope,
-                                           models.DataIdentifierAssociation.name == name))
-
+                datasets.add((scope, name))
             else:  # Container
-                content_query = session.query(models.DataIdentifierAssociation.child_scope,
-                                              models.DataIdentifierAssociation.child_name,
-                                              models.DataIdentifierAssociation.child_type)
-                content_query = content_query.with_hint(models.DataIdentifierAssociation, "INDEX(CONTENTS CONTENTS_PK)", 'oracle')
-                child_dids = [(scope, name)]
-                while child_dids:
-                    s, n = child_dids.pop()
-                    for tmp_did in content_query.filter_by(scope=s, name=n):
-                        if tmp_did.child_type == DIDType.DATASET:
-                            dataset_clause.append(and_(models.DataIdentifierAssociation.scope == tmp_did.child_scope,
-                                                       models.DataIdentifierAssociation.name == tmp_did.child_name))
-
-                        else:
-                            child_dids.append((tmp_did.child_scope, tmp_did.child_name))
+                containers.add((scope, name))
+
+    if containers:
+        for did in rucio.core.did.list_collection_tree(dids=containers, session=session):
+            if did['child_type'] == DIDType.DATASET:
+                datasets.add((did['child_scope'], did['child_name']))
+
+    dataset_clause = [and_(models.DataIdentifierAssociation.scope == scope,
+                           models.DataIdentifierAssociation.name == name) for scope, name in sorted(datasets)]
 
     state_clause = None
     if not all_states:
@@ -597,7 +582,7 @@ def _resolve_dids(dids, unavailable, ignore_availability, all_states, session):
                                models.RSEFileAssociation.state == ReplicaState.UNAVAILABLE,
                                models.RSEFileAssociation.state == ReplicaState.COPYING)
 
-    return file_clause, dataset_clause, state_clause, files
+    return files, dataset_clause, state_clause
 
 
 def _list_replicas_for_datasets(dataset_clause, state_clause, rse_clause, session):
@@ -639,167 +624,181 @@ def _list_replicas_for_datasets(dataset_clause, state_clause, rse_clause, sessio
         yield replica
 
 
-def _list_replicas_for_files(file_clause, state_clause, files, rse_clause, session):
+def _list_replicas_for_files(files, state_clause, rse_clause, session):
     """
     List file replicas for a list of files.
 
+    The files are matched in chunks of DID_CHUNK_SIZE with a single query per chunk,
+    the replicas of a file are returned consecutively.
+
+    :param files: The set of (scope, name) tuples of the files.
     :param session: The database session in use.
     """
-    for replica_condition in chunks(file_clause, 50):
-
-        if state_clause is None:
-            if rse_clause is None:
-                whereclause = and_(models.RSEFileAssociation.rse_id == models.RSE.id,
-                                   models.RSE.deleted == false(),
-                                   models.RSE.staging_area == false(),
-                                   or_(*replica_condition))
-            else:
-                whereclause = and_(models.RSEFileAssociation.rse_id == models.RSE.id,
-                                   models.RSE.deleted == false(),
-                                   models.RSE.staging_area == false(),
-                                   or_(*replica_condition),
-                                   or_(*rse_clause))
-        else:
-            if rse_clause is None:
-                whereclause = and_(models.RSEFileAssociation.rse_id == models.RSE.id,
-                                   models.RSE.deleted == false(),
-                                   models.RSE.staging_area == false(),
-                                   state_clause,
-                                   or_(*replica_condition))
-            else:
-                whereclause = and_(models.RSEFileAssociation.rse_id == models.RSE.id,
-                                   models.RSE.deleted == false(),
-                                   models.RSE.staging_area == false(),
-                                   state_clause,
-                                   or_(*replica_condition),
-                                   or_(*rse_clause))
-
-        replica_query = select(columns=(models.RSEFileAssociation.scope,
-                                        models.RSEFileAssociation.name,
-                                        models.RSEFileAssociation.bytes,
-                                        models.RSEFileAssociation.md5,
-                                        models.RSEFileAssociation.adler32,
-                                        models.RSEFileAssociation.path,
-                                        models.RSEFileAssociation.state,
-                                        models.RSE.rse,
-                                        models.RSE.rse_type,
-                                        models.RSE.volatile),
-                               whereclause=whereclause,
-                               order_by=(models.RSEFileAssociation.scope,
-                                         models.RSEFileAssociation.name)).\
-            with_hint(models.RSEFileAssociation.scope, text="INDEX(REPLICAS REPLICAS_PK)", dialect_name='oracle').\
-            compile()
-
-        for replica in session.execute(replica_query.statement, replica_query.params).fetchall():
-            {'scope': replica[0], 'name': replica[1]} in files and files.remove({'scope': replica[0], 'name': replica[1]})
+    for chunk in chunks(sorted(files), DID_CHUNK_SIZE):
+        replica_query = session.query(models.RSEFileAssociation.scope,
+                                      models.RSEFileAssociation.name,
+                                      models.RSEFileAssociation.bytes,
+                                      models.RSEFileAssociation.md5,
+                                      models.RSEFileAssociation.adler32,
+                                      models.RSEFileAssociation.path,
+                                      models.RSEFileAssociation.state,
+                                      models.RSE.rse,
+                                      models.RSE.rse_type,
+                                      models.RSE.volatile).\
+            with_hint(models.RSEFileAssociation, text="INDEX(REPLICAS REPLICAS_PK)", dialect_name='oracle').\
+            join(models.RSE, models.RSEFileAssociation.rse_id == models.RSE.id).\
+            filter(models.RSE.deleted == false()).\
+            filter(models.RSE.staging_area == false()).\
+            filter(scope_name_in(models.RSEFileAssociation.scope, models.RSEFileAssociation.name, chunk, session.bind.dialect.name)).\
+            order_by(models.RSEFileAssociation.scope,
+                     models.RSEFileAssociation.name)
+
+        if state_clause is not None:
+            replica_query = replica_query.filter(and_(state_clause))
+
+        if rse_clause:
+            replica_query = replica_query.filter(or_(*rse_clause))
+
+        found = set()
+        for replica in replica_query.yield_per(500):
+            found.add((replica[0], replica[1]))
             yield replica
 
-    if files:
-        file_wo_clause = []
-        for file in files:
-            file_wo_clause.append(and_(models.DataIdentifier.scope == file['scope'],
-                                       models.DataIdentifier.name == file['name']))
-        files_wo_replicas_query = session.query(models.DataIdentifier.scope,
-                                                models.DataIdentifier.name,
-                                                models.DataIdentifier.bytes,
-                                                models.DataIdentifier.md5,
-                                                models.DataIdentifier.adler32).\
-            filter_by(did_type=DIDType.FILE).filter(or_(*file_wo_clause)).\
-            with_hint(models.DataIdentifier, text="INDEX(DIDS DIDS_PK)", dialect_name='oracle')
+        files_wo_replicas = [did for did in chunk if did not in found]
+        if files_wo_replicas:
+            files_wo_replicas_query = session.query(models.DataIdentifier.scope,
+                                                    models.DataIdentifier.name,
+                                                    models.DataIdentifier.bytes,
+                                                    models.DataIdentifier.md5,
+                                                    models.DataIdentifier.adler32).\
+                filter_by(did_type=DIDType.FILE).\
+                filter(scope_name_in(models.DataIdentifier.scope, models.DataIdentifier.name, files_wo_replicas, session.bind.dialect.name)).\
+                with_hint(models.DataIdentifier, text="INDEX(DIDS DIDS_PK)", dialect_name='oracle')
+
+            for scope, name, bytes, md5, adler32 in files_wo_replicas_query:
+                yield scope, name, bytes, md5, adler32, None, None, None, None, None
+
+
+def _get_read_protocols(rse_settings, schemes):
+    """
+    Create the read protocols of a RSE for the given schemes.
+
+    :param rse_settings: The RSE settings.
+    :param schemes: A list of schemes, if empty the preferred read protocol is used.
+
+    :returns: A list of protocol objects.
+    """
+    rse_schemes = schemes or []
+    if not rse_schemes:
+        try:
+            rse_schemes = [rsemgr.select_protocol(rse_settings=rse_settings,
+                                                  operation='read')['scheme']]
+        except:
+            print format_exc()
+
+    protocols = []
+    for s in rse_schemes:
+        try:
+            protocols.append(rsemgr.create_protocol(rse_settings=rse_settings,
+                                                    operation='read',
+                                                    scheme=s))
+        except exception.RSEProtocolNotSupported:
+            pass  # no need to be verbose
+        except:
+            print format_exc()
+    return protocols
+
+
+def _build_pfns(protocol, lfns):
+    """
+    Build the PFNs of a block of files with one protocol.
 
-        for scope, name, bytes, md5, adler32 in files_wo_replicas_query:
-            yield scope, name, bytes, md5, adler32, None, None, None, None, None
-            {'scope': scope, 'name': name} in files and files.remove({'scope': scope, 'name': name})
+    :param protocol: The protocol object.
+    :param lfns: A list of (scope, name, path) tuples.
 
-        # if files:
-        #    raise exception.DataIdentifierNotFound("Files not found %s", str(files))
+    :returns: A list with the PFN of every file, None for the files failing.
+    """
+    if 'determinism_type' in protocol.attributes:  # Path is deterministic and cached by the protocol
+        lfns = [(scope, name, None) for scope, name, path in lfns]
+    try:
+        return protocol.lfns2pfns_bulk(lfns)
+    except:
+        # Fall back to the single files to isolate the failing ones
+        pfns = []
+        for lfn in lfns:
+            try:
+                pfns.extend(protocol.lfns2pfns_bulk([lfn]))
+            except:
+                # temporary protection
+                print format_exc()
+                pfns.append(None)
+        return pfns
 
 
-def _list_replicas(dataset_clause, file_clause, state_clause, show_pfns, schemes, files, rse_clause, session):
+def _list_replicas(dataset_clause, state_clause, show_pfns, schemes, files, rse_clause, session):
 
     files = [dataset_clause and _list_replicas_for_datasets(dataset_clause, state_clause, rse_clause, session),
-             file_clause and _list_replicas_for_files(file_clause, state_clause, files, rse_clause, session)]
+             files and _list_replicas_for_files(files, state_clause, rse_clause, session)]
 
-    file, tmp_protocols, rse_info, pfns_cache = {}, {}, {}, {}
+    file, tmp_protocols, rse_info = {}, {}, {}
     for replicas in filter(None, files):
-        for scope, name, bytes, md5, adler32, path, state, rse, rse_type, volatile in replicas:
-
-            pfns = []
-            if show_pfns and rse:
-
-                if rse not in rse_info:
-                    rse_info[rse] = rsemgr.get_rse_info(rse, session=session)
-
-                if rse not in tmp_protocols:
-
-                    rse_schemes = schemes or []
-                    if not rse_schemes:
-                        try:
-                            rse_schemes = [rsemgr.select_protocol(rse_settings=rse_info[rse],
-                                                                  operation='read')['scheme']]
-                        except:
-                            print format_exc()
-
-                    protocols = []
-                    for s in rse_schemes:
-                        try:
-                            protocols.append(rsemgr.create_protocol(rse_settings=rse_info[rse],
-                                                                    operation='read',
-                                                                    scheme=s))
-                        except exception.RSEProtocolNotSupported:
-                            pass  # no need to be verbose
-                        except:
-                            print format_exc()
-                    tmp_protocols[rse] = protocols
-
-                # get pfns
-                for protocol in tmp_protocols[rse]:
-                    if 'determinism_type' in protocol.attributes:  # PFN is cachable
-                        try:
-                            path = pfns_cache['%s:%s:%s' % (protocol.attributes['determinism_type'], scope, name)]
-                        except KeyError:  # No cache entry scope:name found for this protocol
-                            path = protocol._get_path(scope, name)
-                            pfns_cache['%s:%s:%s' % (protocol.attributes['determinism_type'], scope, name)] = path
-
-                    try:
-                        pfn = protocol.lfns2pfns(lfns={'scope': scope,
-                                                       'name': name,
-                                                       'path': path}).\
-                            values()[0]
-                        pfns.append(pfn)
-                    except:
-                        # temporary protection
-                        print format_exc()
-
-                    if protocol.attributes['scheme'] == 'srm':
-                        try:
-                            file['space_token'] = protocol.attributes['extended_attributes']['space_token']
-                        except KeyError:
-                            file['space_token'] = None
-
-            if 'scope' in file and 'name' in file:
-                if file['scope'] == scope and file['name'] == name:
-                    file['rses'][rse] += pfns
-                    file['states'][rse] = str(state)
-                    for pfn in pfns:
-                        file['pfns'][pfn] = {'rse': rse,
-                                             'type': str(rse_type),
-                                             'volatile': volatile}
-                else:
-                    yield file
-                    file = {}
-
-            if not ('scope' in file and 'name' in file):
-                file = {'scope': scope, 'name': name, 'bytes': bytes,
-                        'md5': md5, 'adler32': adler32,
-                        'pfns': {}, 'rses': defaultdict(list),
-                        'states': {rse: str(state)}}
-                if rse:
-                    file['rses'][rse] = pfns
-                    for pfn in pfns:
-                        file['pfns'][pfn] = {'rse': rse,
-                                             'type': str(rse_type),
-                                             'volatile': volatile}
+        while True:
+            block = list(islice(replicas, PFN_BLOCK_SIZE))
+            if not block:
+                break
+
+            # Build the PFNs of the whole block with one call per RSE and protocol
+            block_pfns = defaultdict(list)
+            if show_pfns:
+                rse_lfns = defaultdict(list)
+                for i, (scope, name, bytes, md5, adler32, path, state, rse, rse_type, volatile) in enumerate(block):
+                    if rse:
+                        rse_lfns[rse].append((i, (scope, name, path)))
+
+                for rse, lfns in rse_lfns.iteritems():
+                    if rse not in tmp_protocols:
+                        rse_info[rse] = rsemgr.get_rse_info(rse, session=session)
+                        tmp_protocols[rse] = _get_read_protocols(rse_settings=rse_info[rse], schemes=schemes)
+
+                    for protocol in tmp_protocols[rse]:
+                        for (i, lfn), pfn in zip(lfns, _build_pfns(protocol, [lfn for i, lfn in lfns])):
+                            if pfn is not None:
+                                block_pfns[i].append(pfn)
+
+            for i, (scope, name, bytes, md5, adler32, path, state, rse, rse_type, volatile) in enumerate(block):
+
+                pfns = block_pfns.get(i, [])
+                if show_pfns and rse:
+                    for protocol in tmp_protocols[rse]:
+                        if protocol.attributes['scheme'] == 'srm':
+                            try:
+                                file['space_token'] = protocol.attributes['extended_attributes']['space_token']
+                            except KeyError:
+                                file['space_token'] = None
+
+                if 'scope' in file and 'name' in file:
+                    if file['scope'] == scope and file['name'] == name:
+                        file['rses'][rse] += pfns
+                        file['states'][rse] = str(state)
+                        for pfn in pfns:
+                            file['pfns'][pfn] = {'rse': rse,
+                                                 'type': str(rse_type),
+                                                 'volatile': volatile}
+                    else:
+                        yield file
+                        file = {}
+
+                if not ('scope' in file and 'name' in file):
+                    file = {'scope': scope, 'name': name, 'bytes': bytes,
+                            'md5': md5, 'adler32': adler32,
+                            'pfns': {}, 'rses': defaultdict(list),
+                            'states': {rse: str(state)}}
+                    if rse:
+                        file['rses'][rse] = pfns
+                        for pfn in pfns:
+                            file['pfns'][pfn] = {'rse': rse,
+                                                 'type': str(rse_type),
+                                                 'volatile': volatile}
 
     if 'scope' in file and 'name' in file:
         yield file
@@ -823,16 +822,16 @@ def list_replicas(dids, schemes=None, unavailable=False, request_id=None,
     :param rse_expression: The RSE expression to restrict list_replicas on a set of RSEs.
     :param session: The database session in use.
     """
-    file_clause, dataset_clause, state_clause, files = _resolve_dids(dids=dids, unavailable=unavailable,
-                                                                     ignore_availability=ignore_availability,
-                                                                     all_states=all_states, session=session)
+    files, dataset_clause, state_clause = _resolve_dids(dids=dids, unavailable=unavailable,
+                                                        ignore_availability=ignore_availability,
+                                                        all_states=all_states, session=session)
 
     rse_clause = []
     if rse_expression:
         for rse in parse_expression(expression=rse_expression, session=session):
             rse_clause.append(models.RSEFileAssociation.rse_id == rse['id'])
 
-    for file in _list_replicas(dataset_clause, file_clause, state_clause, pfns, schemes, files, rse_clause, session):
+    for file in _list_replicas(dataset_clause, state_clause, pfns, schemes, files, rse_clause, session):
         yield file
 
 
@@ -1240,14 +1239,8 @@ def list_unlocked_replicas(rse, limit, bytes=None, rse_id=None, worker_number=No
                    models.RSEFileAssociation.name == models.Request.name))
     query = query.filter(not_(stmt))
 
-    if worker_number and total_workers and total_workers - 1 > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('worker_number', worker_number - 1), bindparam('total_workers', total_workers - 1)]
-            query = query.filter(text('ORA_HASH(name, :total_workers) = :worker_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            query = query.filter(text('mod(md5(name), %s) = %s' % (total_workers - 1, worker_number - 1)))
-        elif session.bind.dialect.name == 'postgresql':
-            query = query.filter(text('mod(abs((\'x\'||md5(name))::bit(32)::int), %s) = %s' % (total_workers - 1, worker_number - 1)))
+    if worker_number and total_workers:
+        query = filter_thread_work(session=session, query=query, total_threads=total_workers, thread_id=worker_number - 1, hash_variable='name')
 
     needed_space = bytes
     total_bytes, total_files = 0, 0
@@ -1389,6 +1382,75 @@ def touch_replica(replica, session=None):
     return True
 
 
+@transactional_session
+def touch_replicas(replicas, session=None):
+    """
+    Update the accessed_at timestamp of several file replicas/dids with one statement per table,
+    but don't wait if a row is locked.
+
+    :param replicas: a list of dictionaries with the rse_id, scope, name and accessed_at of the affected replicas.
+    :param session: The database session in use.
+
+    :returns: True, if successful, False if a row is locked, then no replica is updated.
+    """
+    if not replicas:
+        return True
+
+    replica_table = models.RSEFileAssociation.__table__
+    did_table = models.DataIdentifier.__table__
+    now = datetime.utcnow()
+
+    # The same replica or file can be touched several times, the latest access is kept
+    params, dids, rse_dids = {}, {}, {}
+    for replica in replicas:
+        param = {'r_rse_id': replica['rse_id'],
+                 'r_scope': replica['scope'],
+                 'r_name': replica['name'],
+                 'r_accessed_at': replica.get('accessed_at') or now}
+        for touched, key in ((params, (replica['rse_id'], replica['scope'], replica['name'])), (dids, (replica['scope'], replica['name']))):
+            if key not in touched or touched[key]['r_accessed_at'] < param['r_accessed_at']:
+                touched[key] = param
+        rse_dids.setdefault(replica['rse_id'], set()).add((replica['scope'], replica['name']))
+
+    try:
+        session.query(models.RSEFileAssociation.rse_id).\
+            filter(or_(*[and_(models.RSEFileAssociation.rse_id == rse_id,
+                              scope_name_in(models.RSEFileAssociation.scope, models.RSEFileAssociation.name, list(rse_dids[rse_id]), session.bind.dialect.name))
+                         for rse_id in rse_dids])).\
+            with_for_update(nowait=True).all()
+
+        session.execute(replica_table.update().
+                        where(and_(replica_table.c.rse_id == bindparam('r_rse_id'),
+                                   replica_table.c.scope == bindparam('r_scope'),
+                                   replica_table.c.name == bindparam('r_name'))).
+                        values(accessed_at=bindparam('r_accessed_at'),
+                               tombstone=case([(and_(replica_table.c.tombstone != None,  # NOQA
+                                                     replica_table.c.tombstone != OBSOLETE),
+                                                bindparam('r_accessed_at'))],
+                                              else_=replica_table.c.tombstone)).
+                        with_hint("index(REPLICAS REPLICAS_PK)", dialect_name='oracle'),
+                        params.values())
+
+        session.query(models.DataIdentifier.scope).\
+            filter(scope_name_in(models.DataIdentifier.scope, models.DataIdentifier.name, dids.keys(), session.bind.dialect.name)).\
+            filter_by(did_type=DIDType.FILE).\
+            with_for_update(nowait=True).all()
+
+        session.execute(did_table.update().
+                        where(and_(did_table.c.scope == bindparam('r_scope'),
+                                   did_table.c.name == bindparam('r_name'),
+                                   did_table.c.did_type == DIDType.FILE)).
+                        values(accessed_at=bindparam('r_accessed_at')).
+                        with_hint("INDEX(DIDS DIDS_PK)", dialect_name='oracle'),
+                        dids.values())
+
+    except DatabaseError:
+        session.rollback()
+        return False
+
+    return True
+
+
 @transactional_session
 def update_replica_state(rse, scope, name, state, session=None):
     """
@@ -25,7 +25,7 @@ from dogpile.cache.api import NoValue
 
 from sqlalchemy import and_, or_, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.sql.expression import asc, bindparam, text, false, true
+from sqlalchemy.sql.expression import asc, false, true
 
 from rucio.common.config import config_get
 from rucio.common.exception import RequestNotFound, RucioException, UnsupportedOperation
@@ -35,7 +35,8 @@ from rucio.core.monitor import record_counter, record_timer
 from rucio.core.rse import get_rse_id, get_rse_name, get_rse_transfer_limits
 from rucio.db.sqla import models
 from rucio.db.sqla.constants import RequestState, RequestType, FTSState, ReplicaState, LockState
-from rucio.db.sqla.session import read_session, transactional_session
+from rucio.db.sqla.sautils import filter_thread_work
+from rucio.db.sqla.session import read_session, stream_session, transactional_session
 from rucio.transfertool import fts3
 
 
@@ -269,11 +270,11 @@ def queue_requests(requests, session=None):
         if req['attributes']['activity'] not in transfer_limits:
             transfer_limits[req['attributes']['activity']] = {req['dest_rse_id']: get_transfer_limits(req['attributes']['activity'], req['dest_rse_id'])}
         elif req['dest_rse_id'] not in transfer_limits[req['attributes']['activity']]:
-            transfer_limits[req['attributes']['activity']] = {req['dest_rse_id']: get_transfer_limits(req['attributes']['activity'], req['dest_rse_id'])}
+            transfer_limits[req['attributes']['activity']][req['dest_rse_id']] = get_transfer_limits(req['attributes']['activity'], req['dest_rse_id'])
 
     # Check existing requests
+    existing_requests = set()
     if request_clause:
-        existing_requests = []
         for requests_condition in chunks(request_clause, 1000):
             query_existing_requests = session.query(models.Request.scope,
                                                     models.Request.name,
@@ -283,12 +284,12 @@ def queue_requests(requests, session=None):
                           'oracle').\
                 filter(or_(*requests_condition))
             for request in query_existing_requests:
-                existing_requests.append(request)
+                existing_requests.add(tuple(request))
 
     new_requests, sources, messages = [], [], []
     for request in requests:
 
-        if req['request_type'] == RequestType.TRANSFER and (request['scope'], request['name'], request['dest_rse_id']) in existing_requests:
+        if request['request_type'] == RequestType.TRANSFER and (request['scope'], request['name'], request['dest_rse_id']) in existing_requests:
             logging.warn('Request TYPE %s for DID %s:%s at RSE %s exists - ignoring' % (request['request_type'],
                                                                                         request['scope'],
                                                                                         request['name'],
@@ -573,23 +574,7 @@ def get_next(request_type, state, limit=100, older_than=None, rse=None, activity
         elif activity:
             query = query.filter(models.Request.activity == activity)
 
-        if (total_processes - 1) > 0:
-            if session.bind.dialect.name == 'oracle':
-                bindparams = [bindparam('process_number', process), bindparam('total_processes', total_processes - 1)]
-                query = query.filter(text('ORA_HASH(rule_id, :total_processes) = :process_number', bindparams=bindparams))
-            elif session.bind.dialect.name == 'mysql':
-                query = query.filter('mod(md5(rule_id), %s) = %s' % (total_processes - 1, process))
-            elif session.bind.dialect.name == 'postgresql':
-                query = query.filter('mod(abs((\'x\'||md5(rule_id))::bit(32)::int), %s) = %s' % (total_processes - 1, process))
-
-        if (total_threads - 1) > 0:
-            if session.bind.dialect.name == 'oracle':
-                bindparams = [bindparam('thread_number', thread), bindparam('total_threads', total_threads - 1)]
-                query = query.filter(text('ORA_HASH(rule_id, :total_threads) = :thread_number', bindparams=bindparams))
-            elif session.bind.dialect.name == 'mysql':
-                query = query.filter('mod(md5(rule_id), %s) = %s' % (total_threads - 1, thread))
-            elif session.bind.dialect.name == 'postgresql':
-                query = query.filter('mod(abs((\'x\'||md5(rule_id))::bit(32)::int), %s) = %s' % (total_threads - 1, thread))
+        query = filter_thread_work(session=session, query=query, total_threads=total_processes * total_threads, thread_id=process * total_threads + thread, hash_variable='rule_id')
 
         if share:
             query = query.limit(activity_shares[share])
@@ -666,23 +651,7 @@ def get_next_transfers(request_type, state, limit=100, older_than=None, rse=None
         elif activity:
             query = query.filter(models.Request.activity == activity)
 
-        if (total_processes - 1) > 0:
-            if session.bind.dialect.name == 'oracle':
-                bindparams = [bindparam('process_number', process), bindparam('total_processes', total_processes - 1)]
-                query = query.filter(text('ORA_HASH(rule_id, :total_processes) = :process_number', bindparams=bindparams))
-            elif session.bind.dialect.name == 'mysql':
-                query = query.filter('mod(md5(rule_id), %s) = %s' % (total_processes - 1, process))
-            elif session.bind.dialect.name == 'postgresql':
-                query = query.filter('mod(abs((\'x\'||md5(rule_id))::bit(32)::int), %s) = %s' % (total_processes - 1, process))
-
-        if (total_threads - 1) > 0:
-            if session.bind.dialect.name == 'oracle':
-                bindparams = [bindparam('thread_number', thread), bindparam('total_threads', total_threads - 1)]
-                query = query.filter(text('ORA_HASH(rule_id, :total_threads) = :thread_number', bindparams=bindparams))
-            elif session.bind.dialect.name == 'mysql':
-                query = query.filter('mod(md5(rule_id), %s) = %s' % (total_threads - 1, thread))
-            elif session.bind.dialect.name == 'postgresql':
-                query = query.filter('mod(abs((\'x\'||md5(rule_id))::bit(32)::int), %s) = %s' % (total_threads - 1, thread))
+        query = filter_thread_work(session=session, query=query, total_threads=total_processes * total_threads, thread_id=process * total_threads + thread, hash_variable='rule_id')
 
         if share:
             query = query.limit(activity_shares[share])
@@ -1199,7 +1168,7 @@ def cancel_request_external_id(transfer_id, transfer_host):
         raise RucioException('Could not cancel FTS3 transfer %s on %s: %s' % (transfer_id, transfer_host, traceback.format_exc()))
 
 
-@read_session
+@stream_session
 def list_transfer_requests_and_source_replicas(process=None, total_processes=None, thread=None, total_threads=None,
                                                limit=None, activity=None, older_than=None, rses=None, session=None):
     """
@@ -1214,7 +1183,7 @@ def list_transfer_requests_and_source_replicas(process=None, total_processes=Non
     :param older_than: Only select requests older than this DateTime.
     :param rses: List of rse_id to select requests.
     :param session: Database session to use.
-    :returns: List.
+    :returns: Generator of request x source rows, the rows of a request are consecutive.
     """
     if total_processes > 1 and total_processes == total_threads:
         raise RucioException("Total process %s is the same with total threads %s, will create potential same hash" % (total_processes, total_threads))
@@ -1241,23 +1210,10 @@ def list_transfer_requests_and_source_replicas(process=None, total_processes=Non
     if activity:
         sub_requests = sub_requests.filter(models.Request.activity == activity)
 
-    if (total_processes - 1) > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('process_number', process), bindparam('total_processes', total_processes - 1)]
-            sub_requests = sub_requests.filter(text('ORA_HASH(rule_id, :total_processes) = :process_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            sub_requests = sub_requests.filter('mod(md5(rule_id), %s) = %s' % (total_processes - 1, process))
-        elif session.bind.dialect.name == 'postgresql':
-            sub_requests = sub_requests.filter('mod(abs((\'x\'||md5(rule_id))::bit(32)::int), %s) = %s' % (total_processes - 1, process))
-
-    if (total_threads - 1) > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('thread_number', thread), bindparam('total_threads', total_threads - 1)]
-            sub_requests = sub_requests.filter(text('ORA_HASH(rule_id, :total_threads) = :thread_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            sub_requests = sub_requests.filter('mod(md5(rule_id), %s) = %s' % (total_threads - 1, thread))
-        elif session.bind.dialect.name == 'postgresql':
-            sub_requests = sub_requests.filter('mod(abs((\'x\'||md5(rule_id))::bit(32)::int), %s) = %s' % (total_threads - 1, thread))
+    sub_requests = filter_thread_work(session=session, query=sub_requests, total_threads=total_processes * total_threads, thread_id=process * total_threads + thread, hash_variable='rule_id')
+
+    if rses:
+        sub_requests = sub_requests.filter(models.Request.dest_rse_id.in_(rses))
 
     if limit:
         sub_requests = sub_requests.limit(limit)
@@ -1297,17 +1253,11 @@ def list_transfer_requests_and_source_replicas(process=None, total_processes=Non
         .with_hint(models.Source, "+ index(sources SOURCES_PK)", 'oracle')\
         .outerjoin(models.Distance, and_(sub_requests.c.dest_rse_id == models.Distance.dest_rse_id,
                                          models.RSEFileAssociation.rse_id == models.Distance.src_rse_id))\
-        .with_hint(models.Distance, "+ index(distances DISTANCES_PK)", 'oracle')
+        .with_hint(models.Distance, "+ index(distances DISTANCES_PK)", 'oracle')\
+        .order_by(sub_requests.c.id)
 
-    if rses:
-        result = []
-        for item in query.all():
-            dest_rse_id = item[9]
-            if dest_rse_id in rses:
-                result.append(item)
-        return result
-    else:
-        return query.all()
+    for item in query.yield_per(1000):
+        yield item
 
 
 @read_session
@@ -1349,23 +1299,7 @@ def list_stagein_requests_and_source_replicas(process=None, total_processes=None
     if activity:
         sub_requests = sub_requests.filter(models.Request.activity == activity)
 
-    if (total_processes - 1) > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('process_number', process), bindparam('total_processes', total_processes - 1)]
-            sub_requests = sub_requests.filter(text('ORA_HASH(rule_id, :total_processes) = :process_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            sub_requests = sub_requests.filter('mod(md5(rule_id), %s) = %s' % (total_processes - 1, process))
-        elif session.bind.dialect.name == 'postgresql':
-            sub_requests = sub_requests.filter('mod(abs((\'x\'||md5(rule_id))::bit(32)::int), %s) = %s' % (total_processes - 1, process))
-
-    if (total_threads - 1) > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('thread_number', thread), bindparam('total_threads', total_threads - 1)]
-            sub_requests = sub_requests.filter(text('ORA_HASH(rule_id, :total_threads) = :thread_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            sub_requests = sub_requests.filter('mod(md5(rule_id), %s) = %s' % (total_threads - 1, thread))
-        elif session.bind.dialect.name == 'postgresql':
-            sub_requests = sub_requests.filter('mod(abs((\'x\'||md5(rule_id))::bit(32)::int), %s) = %s' % (total_threads - 1, thread))
+    sub_requests = filter_thread_work(session=session, query=sub_requests, total_threads=total_processes * total_threads, thread_id=process * total_threads + thread, hash_variable='rule_id')
 
     if limit:
         sub_requests = sub_requests.limit(limit)
@@ -14,13 +14,21 @@
 # - Thomas Beermann, <thomas.beermann@cern.ch>, 2014
 # - Wen Guan, <wen.guan@cern.ch>, 2015-2016
 
+from copy import deepcopy
+from datetime import datetime, timedelta
 from re import match
 from StringIO import StringIO
 
 import json
+import threading
+import time
+
 import sqlalchemy
 import sqlalchemy.orm
 
+from dogpile.cache import make_region
+from dogpile.cache.api import NoValue
+from sqlalchemy import event
 from sqlalchemy.exc import DatabaseError, IntegrityError, OperationalError
 from sqlalchemy.orm import aliased
 from sqlalchemy.orm.exc import FlushError
@@ -35,6 +43,289 @@ from rucio.db.sqla import models
 from rucio.db.sqla.constants import RSEType
 from rucio.db.sqla.session import read_session, transactional_session, stream_session
 
+# The shared region only holds the generation of the RSE snapshot, which is changed
+# by every process modifying RSEs, RSE attributes, protocols or limits.
+REGION = make_region().configure('dogpile.cache.memcached',
+                                 expiration_time=3600,
+                                 arguments={'url': "127.0.0.1:11211", 'distributed_lock': True})
+
+SNAPSHOT_GENERATION_KEY = 'rse_snapshot_generation'
+SNAPSHOT_GENERATION_CHECK_INTERVAL = 10
+SNAPSHOT_REFRESH_INTERVAL = 60
+SNAPSHOT_MAX_AGE = 3600
+# Rows updated shortly before the watermark are read again, to tolerate clock skew between the writers
+SNAPSHOT_WATERMARK_MARGIN = 300
+SNAPSHOT_PENDING_KEY = 'rse_snapshot_pending'
+
+PROTOCOL_COLUMNS = (models.RSEProtocols.hostname,
+                    models.RSEProtocols.scheme,
+                    models.RSEProtocols.port,
+                    models.RSEProtocols.prefix,
+                    models.RSEProtocols.impl,
+                    models.RSEProtocols.read_lan,
+                    models.RSEProtocols.write_lan,
+                    models.RSEProtocols.delete_lan,
+                    models.RSEProtocols.read_wan,
+                    models.RSEProtocols.write_wan,
+                    models.RSEProtocols.delete_wan,
+                    models.RSEProtocols.third_party_copy,
+                    models.RSEProtocols.extended_attributes)
+
+
+def _protocol_dict(row):
+    """
+    Convert a row of the protocol columns to the protocol dictionary of get_rse_protocols.
+
+    :param row: The row.
+
+    :returns: The protocol dictionary.
+    """
+    p = {'hostname': row.hostname,
+         'scheme': row.scheme,
+         'port': row.port,
+         'prefix': row.prefix if row.prefix is not None else '',
+         'impl': row.impl,
+         'domains': {
+             'lan': {'read': row.read_lan,
+                     'write': row.write_lan,
+                     'delete': row.delete_lan},
+             'wan': {'read': row.read_wan,
+                     'write': row.write_wan,
+                     'delete': row.delete_wan,
+                     'third_party_copy': row.third_party_copy}
+         },
+         'extended_attributes': row.extended_attributes}
+
+    try:
+        p['extended_attributes'] = json.load(StringIO(p['extended_attributes']))
+    except ValueError:
+        pass  # If value is not a JSON string
+    return p
+
+
+class RSESnapshot(object):
+    """
+    Process-wide, versioned in-memory snapshot of the RSE metadata: the RSEs with their attributes, protocols and limits.
+
+    The snapshot is refreshed incrementally from the updated_at watermark of the RSE tables and invalidated
+    by the write functions of this module. Changes of other processes are picked up through the shared generation,
+    or without the shared cache through the updated_at of the RSE, which is touched by every change of its metadata,
+    so that the hard deletions of attributes, protocols and limits are seen as well.
+    The entries are replaced, never modified, so readers do not need to lock.
+    """
+
+    def __init__(self):
+        """
+        Create an empty RSESnapshot, it is loaded on first use.
+        """
+        self.lock = threading.Lock()
+        self.valid = False
+        self.version = 0
+        self.generation = None
+        self.checked_at = 0
+        self.loaded_at = 0
+        self.refreshed_at = 0
+        self.watermark = None
+        self.dirty = set()
+        self.entries = {}
+        self.ids = {}
+
+    def invalidate(self, rse_ids):
+        """
+        Mark RSEs as stale, in this process and in all other processes sharing the cache.
+
+        :param rse_ids:  Set of the changed RSE ids, None stands for all RSEs.
+        """
+        with self.lock:
+            if None in rse_ids:
+                self.valid = False
+            else:
+                self.dirty.update(rse_ids)
+            generation = utils.generate_uuid()
+            REGION.set(SNAPSHOT_GENERATION_KEY, generation)
+            self.generation = generation
+
+    def get(self, session):
+        """
+        Return the snapshot, refreshing it if it is stale.
+
+        :param session:  The database session in use.
+        :returns:        The RSESnapshot, or None if the session has uncommitted changes of RSE metadata.
+        """
+        if session.info.get(SNAPSHOT_PENDING_KEY):
+            return None
+
+        now = time.time()
+        if now - self.checked_at > SNAPSHOT_GENERATION_CHECK_INTERVAL:
+            self.checked_at = now
+            generation = REGION.get(SNAPSHOT_GENERATION_KEY)
+            if isinstance(generation, NoValue):
+                generation = None
+            if generation != self.generation:
+                self.generation = generation
+                self.valid = False
+
+        if not self.valid or now - self.loaded_at > SNAPSHOT_MAX_AGE:
+            with self.lock:
+                if not self.valid or time.time() - self.loaded_at > SNAPSHOT_MAX_AGE:
+                    self.load(session=session)
+        elif self.dirty or now - self.refreshed_at > SNAPSHOT_REFRESH_INTERVAL:
+            with self.lock:
+                self.refresh(session=session)
+        return self
+
+    def load(self, session):
+        """
+        Load the metadata of all RSEs.
+
+        :param session:  The database session in use.
+        """
+        self.valid, self.dirty = True, set()
+        watermark = datetime.utcnow() - timedelta(seconds=SNAPSHOT_WATERMARK_MARGIN)
+        entries = self.__query(rse_ids=None, session=session)
+        self.entries, self.ids = entries, self.__names(entries)
+        self.watermark = watermark
+        self.loaded_at = self.refreshed_at = time.time()
+        self.version += 1
+
+    def refresh(self, session):
+        """
+        Reload the stale RSEs, and the RSEs updated since the watermark once the refresh interval passed.
+
+        :param session:  The database session in use.
+        """
+        rse_ids, self.dirty = self.dirty, set()
+        if time.time() - self.refreshed_at > SNAPSHOT_REFRESH_INTERVAL:
+            watermark = datetime.utcnow() - timedelta(seconds=SNAPSHOT_WATERMARK_MARGIN)
+            for column in (models.RSE.id, models.RSEAttrAssociation.rse_id, models.RSEProtocols.rse_id, models.RSELimit.rse_id):
+                query = session.query(column).filter(column.class_.updated_at >= self.watermark).distinct()
+                rse_ids.update([rse_id for rse_id, in query])
+            self.watermark = watermark
+            self.refreshed_at = time.time()
+        if not rse_ids:
+            return
+
+        loaded = self.__query(rse_ids=rse_ids, session=session)
+        entries = dict(self.entries)
+        for rse_id in rse_ids:
+            if rse_id in loaded:
+                entries[rse_id] = loaded[rse_id]
+            else:
+                entries.pop(rse_id, None)
+        if entries != self.entries:
+            self.entries, self.ids = entries, self.__names(entries)
+            self.version += 1
+
+    def lookup(self, rse=None, rse_id=None):
+        """
+        Return the entry of a RSE, or None if the RSE is not in the snapshot.
+
+        :param rse:     The RSE name.
+        :param rse_id:  The RSE id. To be used if the rse parameter is none.
+        :returns:       Dictionary {'rse': columns, 'attributes': {key: value}, 'protocols': [protocols], 'limits': {name: value}}
+        """
+        if rse:
+            rse_id = self.ids.get(rse)
+        return self.entries.get(rse_id)
+
+    @staticmethod
+    def __names(entries):
+        """
+        Map the RSE names to the RSE ids.
+
+        :param entries:  The snapshot entries.
+        :returns:        Dictionary {name: id}
+        """
+        return dict([(entry['rse']['rse'], rse_id) for rse_id, entry in entries.iteritems()])
+
+    @staticmethod
+    def __query(rse_ids, session):
+        """
+        Read the metadata of RSEs from the database.
+
+        :param rse_ids:  The RSE ids, None for all RSEs.
+        :param session:  The database session in use.
+        :returns:        Dictionary {rse_id: entry} of the RSEs which are not deleted.
+        """
+        false_value = False  # To make pep8 checker happy ...
+        entries = {}
+        for chunk in (utils.chunks(list(rse_ids), 500) if rse_ids is not None else [None]):
+            query = session.query(models.RSE).filter(models.RSE.deleted == false_value)
+            if chunk:
+                query = query.filter(models.RSE.id.in_(chunk))
+            for row in query:
+                entries[row.id] = {'rse': dict([(column.name, getattr(row, column.name)) for column in row.__table__.columns]),
+                                   'attributes': {},
+                                   'protocols': [],
+                                   'limits': {}}
+
+            query = session.query(models.RSEAttrAssociation.rse_id, models.RSEAttrAssociation.key, models.RSEAttrAssociation.value)
+            if chunk:
+                query = query.filter(models.RSEAttrAssociation.rse_id.in_(chunk))
+            for rse_id, key, value in query:
+                if rse_id in entries:
+                    entries[rse_id]['attributes'][key] = value
+
+            query = session.query(models.RSEProtocols.rse_id, *PROTOCOL_COLUMNS)
+            if chunk:
+                query = query.filter(models.RSEProtocols.rse_id.in_(chunk))
+            for row in query:
+                if row.rse_id in entries:
+                    entries[row.rse_id]['protocols'].append(_protocol_dict(row))
+
+            query = session.query(models.RSELimit.rse_id, models.RSELimit.name, models.RSELimit.value)
+            if chunk:
+                query = query.filter(models.RSELimit.rse_id.in_(chunk))
+            for rse_id, name, value in query:
+                if rse_id in entries:
+                    entries[rse_id]['limits'][name] = value
+        return entries
+
+
+SNAPSHOT = RSESnapshot()
+
+
+@read_session
+def get_rse_snapshot(session=None):
+    """
+    Return the process-wide RSE snapshot, refreshed if it is stale.
+
+    :param session: The database session in use.
+
+    :returns: The RSESnapshot, or None if the session has uncommitted changes of RSE metadata.
+    """
+    return SNAPSHOT.get(session=session)
+
+
+def invalidate_rse_snapshot(rse_id=None, session=None):
+    """
+    Invalidate the RSE snapshot for a RSE, or for all RSEs. To be called whenever RSE metadata is changed.
+    With a session the invalidation is published once its transaction is committed,
+    until then the session reads the RSE metadata from the database.
+    The updated_at of the RSE is touched in the same transaction, for the snapshots of the other processes.
+
+    :param rse_id:  The id of the changed RSE, None for all RSEs.
+    :param session: The database session in use.
+    """
+    if session is None:
+        SNAPSHOT.invalidate(rse_ids=set([rse_id]))
+    else:
+        if rse_id is not None:
+            session.query(models.RSE).filter_by(id=rse_id).update({'updated_at': datetime.utcnow()}, synchronize_session=False)
+        session.info.setdefault(SNAPSHOT_PENDING_KEY, set()).add(rse_id)
+
+
+@event.listens_for(sqlalchemy.orm.Session, 'after_commit')
+def _publish_snapshot_invalidation(session):
+    """
+    Publish the RSE snapshot invalidations of a committed transaction.
+
+    :param session: The committed session.
+    """
+    rse_ids = session.info.pop(SNAPSHOT_PENDING_KEY, None)
+    if rse_ids:
+        SNAPSHOT.invalidate(rse_ids=rse_ids)
+
 
 @transactional_session
 def add_rse(rse, deterministic=True, volatile=False, city=None, region_code=None, country_name=None, continent=None, time_zone=None, ISP=None, staging_area=False, session=None):
@@ -63,6 +354,8 @@ def add_rse(rse, deterministic=True, volatile=False, city=None, region_code=None
     except DatabaseError, e:
         raise exception.RucioException(e.args)
 
+    invalidate_rse_snapshot(rse_id=new_rse.id, session=session)
+
     # Add rse name as a RSE-Tag
     add_rse_attribute(rse=rse, key=rse, value=True, session=session)
 
@@ -104,6 +397,18 @@ def sort_rses(rses, session=None):
     if len(rses) == 1:
         return rses
 
+    snapshot = SNAPSHOT.get(session=session)
+    if snapshot and all(snapshot.lookup(rse_id=rse['id']) for rse in rses):
+        query = session.query(models.RSEUsage.rse_id).\
+            filter(or_(models.RSEUsage.source == 'srm', models.RSEUsage.source == 'gsiftp')).\
+            filter(models.RSEUsage.rse_id.in_([rse['id'] for rse in rses])).\
+            order_by(models.RSEUsage.free.asc())
+        sorted_rses = []
+        for rse_id, in query:
+            columns = snapshot.lookup(rse_id=rse_id)['rse']
+            sorted_rses.append({'rse': columns['rse'], 'staging_area': columns['staging_area'], 'id': rse_id})
+        return sorted_rses
+
     false_value = False
     query = session.query(models.RSE.rse, models.RSE.staging_area, models.RSEUsage.rse_id).\
         filter(or_(models.RSEUsage.source == 'srm', models.RSEUsage.source == 'gsiftp')).\
@@ -131,6 +436,7 @@ def del_rse(rse, session=None):
     except sqlalchemy.orm.exc.NoResultFound:
         raise exception.RSENotFound('RSE \'%s\' cannot be found' % rse)
     old_rse.delete(session=session)
+    invalidate_rse_snapshot(rse_id=old_rse.id, session=session)
     del_rse_attribute(rse=rse, key=rse, session=session)
 
 
@@ -145,6 +451,12 @@ def get_rse(rse, rse_id=None, session=None):
 
     :raises RSENotFound: If referred RSE was not found in the database.
     """
+    snapshot = SNAPSHOT.get(session=session)
+    entry = snapshot and snapshot.lookup(rse=rse, rse_id=rse_id)
+    if entry:
+        tmp = models.RSE(**entry['rse'])
+        tmp['type'] = tmp.rse_type
+        return tmp
 
     false_value = False  # To make pep8 checker happy ...
     try:
@@ -176,6 +488,10 @@ def get_rse_id(rse, session=None):
 
     :raises RSENotFound: If referred RSE was not found in the database.
     """
+    snapshot = SNAPSHOT.get(session=session)
+    entry = snapshot and snapshot.lookup(rse=rse)
+    if entry:
+        return entry['rse']['id']
     try:
         return session.query(models.RSE.id).filter_by(rse=rse).one()[0]
     except sqlalchemy.orm.exc.NoResultFound:
@@ -194,6 +510,10 @@ def get_rse_name(rse_id, session=None):
 
     :raises RSENotFound: If referred RSE was not found in the database.
     """
+    snapshot = SNAPSHOT.get(session=session)
+    entry = snapshot and snapshot.lookup(rse_id=rse_id)
+    if entry:
+        return entry['rse']['rse']
     try:
         return session.query(models.RSE.rse).filter_by(id=rse_id).one()[0]
     except sqlalchemy.orm.exc.NoResultFound:
@@ -256,6 +576,9 @@ def list_rses(filters={}, session=None):
                 d[column.name] = getattr(row, column.name)
             rse_list.append(d)
     else:
+        snapshot = SNAPSHOT.get(session=session)
+        if snapshot:
+            return sorted([dict(entry['rse']) for entry in snapshot.entries.itervalues()], key=lambda rse: rse['rse'])
 
         query = session.query(models.RSE).filter_by(deleted=False).order_by(models.RSE.rse)
         for row in query:
@@ -286,6 +609,7 @@ def add_rse_attribute(rse, key, value, session=None):
         new_rse_attr.save(session=session)
     except IntegrityError:
         raise exception.Duplicate("RSE attribute '%(key)s-%(value)s\' for RSE '%(rse)s' already exists!" % locals())
+    invalidate_rse_snapshot(rse_id=rse_id, session=session)
     return True
 
 
@@ -304,6 +628,7 @@ def del_rse_attribute(rse, key, session=None):
     query = session.query(models.RSEAttrAssociation).filter_by(rse_id=rse_id).filter(models.RSEAttrAssociation.key == key)
     rse_attr = query.one()
     rse_attr.delete(session=session)
+    invalidate_rse_snapshot(rse_id=rse_id, session=session)
     return True
 
 
@@ -319,6 +644,11 @@ def list_rse_attributes(rse, rse_id=None, session=None):
 
     :returns: A dictionary with RSE attributes for a RSE.
     """
+    snapshot = SNAPSHOT.get(session=session)
+    entry = snapshot and snapshot.lookup(rse=None if rse_id else rse, rse_id=rse_id)
+    if entry:
+        return dict(entry['attributes'])
+
     rse_attrs = {}
     if rse_id is None:
         rse_id = get_rse_id(rse=rse, session=session)
@@ -340,6 +670,10 @@ def has_rse_attribute(rse_id, key, session=None):
 
     :returns: True or False
     """
+    snapshot = SNAPSHOT.get(session=session)
+    entry = snapshot and snapshot.lookup(rse_id=rse_id)
+    if entry:
+        return key in entry['attributes']
     if session.query(models.RSEAttrAssociation.value).filter_by(rse_id=rse_id, key=key).first():
         return True
     return False
@@ -370,6 +704,50 @@ def get_rses_with_attribute(key, session=None):
     return rse_list
 
 
+@read_session
+def list_all_rse_attributes(session=None):
+    """
+    List the attributes of all RSEs.
+
+    :param session: The database session in use.
+
+    :returns: A list of (rse_id, key, value) tuples.
+    """
+    query = session.query(models.RSEAttrAssociation.rse_id,
+                          models.RSEAttrAssociation.key,
+                          models.RSEAttrAssociation.value)
+    return query.all()
+
+
+@read_session
+def get_rses_attributes(rse_ids, session=None):
+    """
+    List the attributes of several RSEs.
+
+    :param rse_ids: List of RSE ids.
+    :param session: The database session in use.
+
+    :returns: A dictionary {rse_id: {key: value}}.
+    """
+    rse_attrs = {}
+    snapshot = SNAPSHOT.get(session=session)
+    missing = []
+    for rse_id in rse_ids:
+        entry = snapshot and snapshot.lookup(rse_id=rse_id)
+        if entry:
+            rse_attrs[rse_id] = dict(entry['attributes'])
+        else:
+            rse_attrs[rse_id] = {}
+            missing.append(rse_id)
+
+    for chunk in utils.chunks(missing, 500):
+        query = session.query(models.RSEAttrAssociation.rse_id, models.RSEAttrAssociation.key, models.RSEAttrAssociation.value).\
+            filter(models.RSEAttrAssociation.rse_id.in_(chunk))
+        for rse_id, key, value in query:
+            rse_attrs[rse_id][key] = value
+    return rse_attrs
+
+
 @read_session
 def get_rse_attribute(key, rse_id=None, session=None):
     """
@@ -381,6 +759,12 @@ def get_rse_attribute(key, rse_id=None, session=None):
 
     :returns: A list with RSE attribute values for a Key.
     """
+    if rse_id:
+        snapshot = SNAPSHOT.get(session=session)
+        entry = snapshot and snapshot.lookup(rse_id=rse_id)
+        if entry:
+            return [entry['attributes'][key]] if key in entry['attributes'] else []
+
     rse_attrs = []
     if rse_id:
         query = session.query(models.RSEAttrAssociation.value).filter_by(rse_id=rse_id, key=key).distinct()
@@ -444,6 +828,28 @@ def get_rse_usage(rse, source=None, rse_id=None, session=None):
     return usage
 
 
+@read_session
+def get_rses_usage(rse_ids, sources, session=None):
+    """
+    Get the usage information of several RSEs.
+
+    :param rse_ids: List of RSE ids.
+    :param sources: List of information sources, e.g. storage.
+    :param session: The database session in use.
+
+    :returns: A dictionary {rse_id: {source: {'used', 'free', 'total', 'updated_at'}}}.
+    """
+    usage = {}
+    rse_ids = list(rse_ids)
+    for chunk in utils.chunks(rse_ids, 500):
+        query = session.query(models.RSEUsage).filter(models.RSEUsage.rse_id.in_(chunk), models.RSEUsage.source.in_(sources))
+        for row in query:
+            usage.setdefault(row.rse_id, {})[row.source] = {'used': row.used, 'free': row.free,
+                                                            'total': (row.free or 0) + (row.used or 0),
+                                                            'updated_at': row.updated_at}
+    return usage
+
+
 @transactional_session
 def set_rse_limits(rse, name, value, session=None):
     """
@@ -460,6 +866,7 @@ def set_rse_limits(rse, name, value, session=None):
     rse_limit = models.RSELimit(rse_id=rse_id, name=name, value=value)
     rse_limit = session.merge(rse_limit)
     rse_limit.save(session=session)
+    invalidate_rse_snapshot(rse_id=rse_id, session=session)
     return True
 
 
@@ -474,6 +881,13 @@ def get_rse_limits(rse, name=None, rse_id=None, session=None):
 
     :returns: A dictionary with the limits {'limit.name': limit.value}.
     """
+    snapshot = SNAPSHOT.get(session=session)
+    entry = snapshot and snapshot.lookup(rse=None if rse_id else rse, rse_id=rse_id)
+    if entry:
+        if name:
+            return {name: entry['limits'][name]} if name in entry['limits'] else {}
+        return dict(entry['limits'])
+
     if not rse_id:
         rse_id = get_rse_id(rse=rse, session=session)
 
@@ -486,6 +900,37 @@ def get_rse_limits(rse, name=None, rse_id=None, session=None):
     return limits
 
 
+@read_session
+def get_rses_limits(rse_ids, name=None, session=None):
+    """
+    Get the limits of several RSEs.
+
+    :param rse_ids: List of RSE ids.
+    :param name: A Limit name.
+    :param session: The database session in use.
+
+    :returns: A dictionary {rse_id: {'limit.name': limit.value}}.
+    """
+    limits = {}
+    snapshot = SNAPSHOT.get(session=session)
+    missing = []
+    for rse_id in rse_ids:
+        entry = snapshot and snapshot.lookup(rse_id=rse_id)
+        if entry:
+            limits[rse_id] = dict([(key, value) for key, value in entry['limits'].iteritems() if not name or key == name])
+        else:
+            limits[rse_id] = {}
+            missing.append(rse_id)
+
+    for chunk in utils.chunks(missing, 500):
+        query = session.query(models.RSELimit.rse_id, models.RSELimit.name, models.RSELimit.value).filter(models.RSELimit.rse_id.in_(chunk))
+        if name:
+            query = query.filter(models.RSELimit.name == name)
+        for rse_id, limit_name, value in query:
+            limits[rse_id][limit_name] = value
+    return limits
+
+
 @transactional_session
 def set_rse_transfer_limits(rse, activity, rse_id=None, rse_expression=None, max_transfers=0, transfers=0, waitings=0, session=None):
     """
@@ -654,6 +1099,7 @@ def add_protocol(rse, parameter, session=None):
              or match('.*OperationalError.*cannot be null.*', e.args[0]):
             raise exception.InvalidObject('Missing values!')
         raise e
+    invalidate_rse_snapshot(rse_id=rid, session=session)
     return new_protocol
 
 
@@ -695,50 +1141,22 @@ def get_rse_protocols(rse, schemes=None, session=None):
     for op in utils.rse_supported_protocol_operations():
         info['%s_protocol' % op] = 1  # 1 indicates the default protocol
 
-    query = None
+    if schemes and not type(schemes) is list:
+        schemes = [schemes]
+
+    snapshot = SNAPSHOT.get(session=session)
+    entry = snapshot and snapshot.lookup(rse_id=_rse.id)
+    if entry:
+        info['protocols'] = [deepcopy(p) for p in entry['protocols'] if not schemes or p['scheme'] in schemes]
+        return info
+
     terms = [models.RSEProtocols.rse_id == _rse.id]
     if schemes:
-        if not type(schemes) is list:
-            schemes = [schemes]
         terms.extend([models.RSEProtocols.scheme.in_(schemes)])
 
-    query = session.query(models.RSEProtocols.hostname,
-                          models.RSEProtocols.scheme,
-                          models.RSEProtocols.port,
-                          models.RSEProtocols.prefix,
-                          models.RSEProtocols.impl,
-                          models.RSEProtocols.read_lan,
-                          models.RSEProtocols.write_lan,
-                          models.RSEProtocols.delete_lan,
-                          models.RSEProtocols.read_wan,
-                          models.RSEProtocols.write_wan,
-                          models.RSEProtocols.delete_wan,
-                          models.RSEProtocols.third_party_copy,
-                          models.RSEProtocols.extended_attributes).filter(*terms)
-
+    query = session.query(*PROTOCOL_COLUMNS).filter(*terms)
     for row in query:
-        p = {'hostname': row.hostname,
-             'scheme': row.scheme,
-             'port': row.port,
-             'prefix': row.prefix if row.prefix is not None else '',
-             'impl': row.impl,
-             'domains': {
-                 'lan': {'read': row.read_lan,
-                         'write': row.write_lan,
-                         'delete': row.delete_lan},
-                 'wan': {'read': row.read_wan,
-                         'write': row.write_wan,
-                         'delete': row.delete_wan,
-                         'third_party_copy': row.third_party_copy}
-             },
-             'extended_attributes': row.extended_attributes}
-
-        try:
-            p['extended_attributes'] = json.load(StringIO(p['extended_attributes']))
-        except ValueError:
-            pass  # If value is not a JSON string
-
-        info['protocols'].append(p)
+        info['protocols'].append(_protocol_dict(row))
     return info
 
 
@@ -844,6 +1262,7 @@ def update_protocols(rse, scheme, data, hostname, port, session=None):
                         val += 1
 
         up.update(data, flush=True, session=session)
+        invalidate_rse_snapshot(rse_id=rid, session=session)
     except (IntegrityError, OperationalError) as e:
         if 'UNIQUE'.lower() in e.args[0].lower() or 'Duplicate' in e.args[0]:  # Covers SQLite, Oracle and MySQL error
             raise exception.Duplicate('Protocol \'%s\' on port %s already registered for  \'%s\' with hostname \'%s\'.' % (scheme, port, rse, hostname))
@@ -891,6 +1310,7 @@ def del_protocols(rse, scheme, hostname=None, port=None, session=None):
 
     for row in p:
         row.delete(session=session)
+    invalidate_rse_snapshot(rse_id=rid, session=session)
 
     # Filling gaps in protocol priorities
     for domain in utils.rse_supported_protocol_domains():
@@ -938,6 +1358,7 @@ def update_rse(rse, parameters, session=None):
                 availability = availability & ~availability_mapping[key]
     param['availability'] = availability
     query.update(param)
+    invalidate_rse_snapshot(rse_id=rse_id, session=session)
     if 'name' in parameters:
         add_rse_attribute(rse=parameters['name'], key=parameters['name'], value=1, session=session)
         query = session.query(models.RSEAttrAssociation).filter_by(rse_id=rse_id).filter(models.RSEAttrAssociation.key == rse)
@@ -10,13 +10,20 @@
 # - Mario Lassnig, <mario.lassnig@cern.ch>, 2013-2014
 # - Martin Barisits, <martin.barisits@cern.ch>, 2014
 
+import sqlalchemy.orm
+
+from sqlalchemy import event
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.sql.expression import bindparam, text
+from sqlalchemy.sql import func
 
 from rucio.common.exception import CounterNotFound
+from rucio.common.utils import chunks
 from rucio.db.sqla import models
+from rucio.db.sqla.sautils import filter_thread_work
 from rucio.db.sqla.session import read_session, transactional_session
 
+DELTAS_KEY = 'rucio.core.rse_counter.deltas'
+
 
 @transactional_session
 def add_counter(rse_id, session=None):
@@ -35,13 +42,63 @@ def increase(rse_id, files, bytes, session=None):
     """
     Increments the specified counter by the specified amount.
 
+    The amounts are accumulated in the session and written as one update per RSE
+    when the transaction is committed.
+
     :param rse_id:  The id of the RSE.
     :param files:   The number of added files.
     :param bytes:   The number of added bytes.
     :param session: The database session in use.
     """
-    models.UpdatedRSECounter(rse_id=rse_id, files=files, bytes=bytes).\
-        save(session=session)
+    deltas = session.info.setdefault(DELTAS_KEY, {})
+    delta_files, delta_bytes = deltas.get(rse_id, (0, 0))
+    deltas[rse_id] = (delta_files + files, delta_bytes + bytes)
+
+
+@transactional_session
+def increase_many(counters, session=None):
+    """
+    Increments several counters.
+
+    :param counters: Dictionary {rse_id: (files, bytes)} of the amounts to add.
+    :param session:  The database session in use.
+    """
+    for rse_id, (files, bytes) in counters.iteritems():
+        increase(rse_id=rse_id, files=files, bytes=bytes, session=session)
+
+
+def write_deltas(session):
+    """
+    Write the counter amounts accumulated in a session, one update per RSE.
+
+    :param session: The database session in use.
+    """
+    deltas = session.info.pop(DELTAS_KEY, None)
+    if not deltas:
+        return
+    session.flush()
+    session.bulk_insert_mappings(models.UpdatedRSECounter, [{'rse_id': rse_id, 'files': files, 'bytes': bytes}
+                                                            for rse_id, (files, bytes) in deltas.iteritems() if files or bytes])
+
+
+@event.listens_for(sqlalchemy.orm.Session, 'before_commit')
+def _write_deltas_before_commit(session):
+    """
+    Write the counter amounts of a transaction before it is committed.
+
+    :param session: The session being committed.
+    """
+    write_deltas(session)
+
+
+@event.listens_for(sqlalchemy.orm.Session, 'after_rollback')
+def _discard_deltas_after_rollback(session):
+    """
+    Discard the counter amounts of a rolled back transaction.
+
+    :param session: The rolled back session.
+    """
+    session.info.pop(DELTAS_KEY, None)
 
 
 @transactional_session
@@ -92,6 +149,20 @@ def get_counter(rse_id, session=None):
         raise CounterNotFound()
 
 
+def __filter_worker(query, total_workers, worker_number, session):
+    """
+    Restrict a query on the updated_rse_counters to the RSEs of a worker.
+
+    :param query:          The query.
+    :param total_workers:  Number of total workers.
+    :param worker_number:  id of the executing worker.
+    :param session:        Database session in use.
+    :returns:              The filtered query.
+    """
+    query = filter_thread_work(session=session, query=query, total_threads=total_workers + 1, thread_id=worker_number, hash_variable='rse_id')
+    return query
+
+
 @read_session
 def get_updated_rse_counters(total_workers, worker_number, session=None):
     """
@@ -104,16 +175,7 @@ def get_updated_rse_counters(total_workers, worker_number, session=None):
     """
     query = session.query(models.UpdatedRSECounter.rse_id).\
         distinct(models.UpdatedRSECounter.rse_id)
-
-    if total_workers > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('worker_number', worker_number),
-                          bindparam('total_workers', total_workers)]
-            query = query.filter(text('ORA_HASH(rse_id, :total_workers) = :worker_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            query = query.filter('mod(md5(rse_id), %s) = %s' % (total_workers + 1, worker_number))
-        elif session.bind.dialect.name == 'postgresql':
-            query = query.filter('mod(abs((\'x\'||md5(rse_id))::bit(32)::int), %s) = %s' % (total_workers + 1, worker_number))
+    query = __filter_worker(query, total_workers, worker_number, session=session)
 
     results = query.all()
     return [result.rse_id for result in results]
@@ -140,3 +202,42 @@ def update_rse_counter(rse_id, session=None):
 
     for update in updated_rse_counters:
         update.delete(flush=False, session=session)
+
+
+@transactional_session
+def update_rse_counters(total_workers, worker_number, limit=10000, session=None):
+    """
+    Apply a batch of updated_rse_counters to the rse_counters, with one aggregation per chunk of updates.
+
+    :param total_workers:  Number of total workers.
+    :param worker_number:  id of the executing worker.
+    :param limit:          Maximum number of updates to apply.
+    :param session:        Database session in use.
+    :returns:              The number of applied updates.
+    """
+    query = session.query(models.UpdatedRSECounter.id).\
+        order_by(models.UpdatedRSECounter.created_at, models.UpdatedRSECounter.id).\
+        limit(limit)
+    query = __filter_worker(query, total_workers, worker_number, session=session)
+    ids = [id for id, in query]
+
+    deltas = {}
+    for chunk in chunks(ids, 1000):
+        query = session.query(models.UpdatedRSECounter.rse_id,
+                              func.sum(models.UpdatedRSECounter.files),
+                              func.sum(models.UpdatedRSECounter.bytes)).\
+            filter(models.UpdatedRSECounter.id.in_(chunk)).\
+            group_by(models.UpdatedRSECounter.rse_id)
+        for rse_id, files, bytes in query:
+            delta_files, delta_bytes = deltas.get(rse_id, (0, 0))
+            deltas[rse_id] = (delta_files + (files or 0), delta_bytes + (bytes or 0))
+        session.query(models.UpdatedRSECounter).\
+            filter(models.UpdatedRSECounter.id.in_(chunk)).\
+            delete(synchronize_session=False)
+
+    for rse_id, (files, bytes) in deltas.iteritems():
+        session.query(models.RSEUsage).\
+            filter_by(rse_id=rse_id, source='rucio').\
+            update({'used': models.RSEUsage.used + bytes, 'files': models.RSEUsage.files + files}, synchronize_session=False)
+
+    return len(ids)
@@ -15,14 +15,15 @@
 import abc
 import re
 import string
+import threading
 
-from dogpile.cache import make_region
-from dogpile.cache.api import NoValue
-from hashlib import sha256
+from repoze.lru import LRUCache
+
+import rucio.core.rse
 
 from rucio.common import schema
 from rucio.common.exception import InvalidRSEExpression, RSEBlacklisted
-from rucio.core.rse import list_rses, get_rses_with_attribute, get_rse_attribute
+from rucio.db.sqla.constants import RSEType
 from rucio.db.sqla.session import transactional_session
 
 
@@ -36,10 +37,9 @@ COMPLEMENT = r'(\\%s)' % (PRIMITIVE)
 
 PATTERN = r'^%s(%s|%s|%s)*' % (PRIMITIVE, UNION, INTERSECTION, COMPLEMENT)
 
+AVAILABILITY_MAPPING = {'availability_read': 4, 'availability_write': 2, 'availability_delete': 1}
 
-REGION = make_region().configure('dogpile.cache.memcached',
-                                 expiration_time=3600,
-                                 arguments={'url': "127.0.0.1:11211", 'distributed_lock': True})
+COMPILED_EXPRESSIONS = LRUCache(10000)
 
 
 @transactional_session
@@ -53,34 +53,8 @@ def parse_expression(expression, filter=None, session=None):
     :returns:             A list of rse dictionaries.
     :raises:              InvalidRSEExpression, RSENotFound, RSEBlacklisted
     """
-    result = REGION.get(sha256(expression).hexdigest())
-    if type(result) is NoValue:
-        # Evaluate the correctness of the parentheses
-        parantheses_open_count = 0
-        parantheses_close_count = 0
-        for char in expression:
-            if (char == '('):
-                parantheses_open_count += 1
-            elif (char == ')'):
-                parantheses_close_count += 1
-            if (parantheses_close_count > parantheses_open_count):
-                raise InvalidRSEExpression('Problem with parantheses.')
-        if (parantheses_open_count != parantheses_close_count):
-            raise InvalidRSEExpression('Problem with parantheses.')
-
-        # Check the expression pattern
-        match = re.match(PATTERN, expression)
-        if match is None:
-            raise InvalidRSEExpression('Expression does not comply to RSE Expression syntax')
-        else:
-            if match.group() != expression:
-                raise InvalidRSEExpression('Expression does not comply to RSE Expression syntax')
-        result_tuple = __resolve_term_expression(expression)[0].resolve_elements(session=session)
-        # result_tuple = ([rse_ids], {rse_id: {rse_info}})
-        result = []
-        for rse in list(result_tuple[0]):
-            result.append(result_tuple[1][rse])
-        REGION.set(sha256(expression).hexdigest(), result)
+    index = INDEX.get(session=session)
+    result = index.get_rses(compile_expression(expression).resolve_elements(index=index))
 
     if not result:
         raise InvalidRSEExpression('RSE Expression resulted in an empty set.')
@@ -101,6 +75,45 @@ def parse_expression(expression, filter=None, session=None):
     return final_result
 
 
+def compile_expression(expression):
+    """
+    Validate a RSE expression and compile it into a tree of BaseExpressionElements.
+    Compiled expressions are kept in a process-wide LRU cache.
+
+    :param expression:  RSE expression, e.g: 'CERN|BNL'.
+    :returns:           The root BaseExpressionElement of the expression.
+    :raises:            InvalidRSEExpression
+    """
+    compiled = COMPILED_EXPRESSIONS.get(expression)
+    if compiled is not None:
+        return compiled
+
+    # Evaluate the correctness of the parentheses
+    parantheses_open_count = 0
+    parantheses_close_count = 0
+    for char in expression:
+        if (char == '('):
+            parantheses_open_count += 1
+        elif (char == ')'):
+            parantheses_close_count += 1
+        if (parantheses_close_count > parantheses_open_count):
+            raise InvalidRSEExpression('Problem with parantheses.')
+    if (parantheses_open_count != parantheses_close_count):
+        raise InvalidRSEExpression('Problem with parantheses.')
+
+    # Check the expression pattern
+    match = re.match(PATTERN, expression)
+    if match is None:
+        raise InvalidRSEExpression('Expression does not comply to RSE Expression syntax')
+    else:
+        if match.group() != expression:
+            raise InvalidRSEExpression('Expression does not comply to RSE Expression syntax')
+
+    compiled = __resolve_term_expression(expression)[0]
+    COMPILED_EXPRESSIONS.put(expression, compiled)
+    return compiled
+
+
 def __resolve_term_expression(expression):
     """
     Resolves a Term Expression and returns an object of type BaseExpressionElement
@@ -197,17 +210,180 @@ def __extract_term(expression):
     raise SystemError('This point in the code should not be reachable')
 
 
+class RSEAttributeIndex(object):
+    """
+    Immutable in-memory index of the RSEs and their attributes.
+
+    Every RSE is assigned a bit position, so that sets of RSEs are represented as integer
+    bitmaps and the set operators of an expression become bitwise operations.
+    """
+
+    def __init__(self, rses=None, attributes=None, version=None):
+        """
+        Build the index from the RSEs and RSE attributes.
+
+        :param rses:        List of RSE dictionaries.
+        :param attributes:  List of (rse_id, key, value) tuples.
+        :param version:     The version of the RSE snapshot the index is built from.
+        """
+        rses, attributes = rses or [], attributes or []
+        positions, columns = {}, {}
+        for position, rse in enumerate(rses):
+            positions[rse['id']] = position
+        for column in (rses[0].keys() if rses else []):
+            columns[column] = dict([(position, rse[column]) for position, rse in enumerate(rses)])
+
+        values, bitmaps, all_rses = {}, {}, 0
+        for rse_id, key, value in attributes:
+            if rse_id not in positions:
+                continue
+            position = positions[rse_id]
+            values.setdefault(key, {})[position] = value
+            bitmap_key = (key, normalize_attribute_value(value))
+            bitmaps[bitmap_key] = bitmaps.get(bitmap_key, 0) | (1 << position)
+            # Only RSEs with at least one attribute are matched by expressions
+            all_rses |= 1 << position
+
+        self.rses, self.columns, self.values, self.bitmaps, self.all_rses = rses, columns, values, bitmaps, all_rses
+        self.version = version
+
+    def get_rses(self, bitmap):
+        """
+        Convert a bitmap to the list of RSE dictionaries.
+
+        :param bitmap:  Bitmap of RSEs.
+        :returns:       List of RSE dictionaries.
+        """
+        result = []
+        position = 0
+        while bitmap:
+            if bitmap & 1:
+                result.append(dict(self.rses[position]))
+            bitmap >>= 1
+            position += 1
+        return result
+
+    def equal(self, key, value):
+        """
+        Return the bitmap of RSEs where the key is equal to the value.
+        Keys which are RSE properties (e.g. rse_type or availability_write) are matched against the RSE itself.
+
+        :param key:    The attribute key.
+        :param value:  The attribute value.
+        :returns:      Bitmap of RSEs.
+        """
+        if key in AVAILABILITY_MAPPING:
+            mask = AVAILABILITY_MAPPING[key]
+            return self.__match_column('availability', lambda availability: bool((availability or 0) & mask) == bool(value))
+        elif key == 'rse_type':
+            rse_type = RSEType.from_sym(value)
+            return self.__match_column(key, lambda column_value: column_value == rse_type)
+        elif key in self.columns:
+            value = normalize_attribute_value(value)
+            return self.__match_column(key, lambda column_value: normalize_attribute_value(column_value) == value)
+        return self.bitmaps.get((key, normalize_attribute_value(value)), 0)
+
+    def compare(self, key, comparator):
+        """
+        Return the bitmap of RSEs having a numeric attribute for which the comparator is True.
+
+        :param key:         The attribute key.
+        :param comparator:  Function receiving the float value of the attribute.
+        :returns:           Bitmap of RSEs.
+        """
+        bitmap = 0
+        for position, value in self.values.get(key, {}).iteritems():
+            try:
+                if comparator(float(value)):
+                    bitmap |= 1 << position
+            except ValueError:
+                continue
+        return bitmap
+
+    def __match_column(self, column, matches):
+        """
+        Return the bitmap of RSEs where the RSE column matches.
+
+        :param column:   The RSE column.
+        :param matches:  Function receiving the column value.
+        :returns:        Bitmap of RSEs.
+        """
+        bitmap = 0
+        for position, value in self.columns[column].iteritems():
+            if matches(value):
+                bitmap |= 1 << position
+        return bitmap & self.all_rses
+
+
+class RSEAttributeIndexCache(object):
+    """
+    Process-wide RSEAttributeIndex, rebuilt when the RSE snapshot changes.
+
+    A rebuilt index replaces the previous one, so an index returned by get is never modified
+    and an expression is resolved and converted to RSEs against the same index.
+    """
+
+    def __init__(self):
+        """
+        Create an empty RSEAttributeIndexCache, the index is built on first use.
+        """
+        self.lock = threading.Lock()
+        self.index = RSEAttributeIndex()
+
+    def get(self, session):
+        """
+        Return the index, rebuilding it if the RSE snapshot changed.
+
+        :param session:  Database session in use.
+        :returns:        The RSEAttributeIndex.
+        """
+        snapshot = rucio.core.rse.get_rse_snapshot(session=session)
+        if snapshot is None:
+            # The session has uncommitted changes of RSEs, index the RSEs as seen by the session
+            return RSEAttributeIndex(rses=rucio.core.rse.list_rses(session=session),
+                                     attributes=rucio.core.rse.list_all_rse_attributes(session=session))
+
+        index = self.index
+        if snapshot.version != index.version:
+            with self.lock:
+                # The entries are read after the version, so they are at least as recent
+                version = snapshot.version
+                entries = snapshot.entries
+                index = self.index
+                if version != index.version:
+                    index = RSEAttributeIndex(rses=sorted([dict(entry['rse']) for entry in entries.itervalues()], key=lambda rse: rse['rse']),
+                                              attributes=[(rse_id, key, value) for rse_id, entry in entries.iteritems() for key, value in entry['attributes'].iteritems()],
+                                              version=version)
+                    self.index = index
+        return index
+
+
+INDEX = RSEAttributeIndexCache()
+
+
+def normalize_attribute_value(value):
+    """
+    Normalize an attribute value the same way it is stored in the database.
+
+    :param value:  The attribute value.
+    :returns:      String representation of the value.
+    """
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value)
+
+
 class BaseExpressionElement:
     __metaclass__ = abc.ABCMeta
 
     @abc.abstractmethod
-    def resolve_elements(self, session):
+    def resolve_elements(self, index):
         """
-        Resolve the ExpressionElement and return a set of RSE ids
+        Resolve the ExpressionElement and return a bitmap of RSEs
 
-        :param session:  Database session in use
-        :returns:        (Set of RSE ids, Dictionary of RSE dicts)
-        :rtype:          (Set of Strings, Dictionary of RSE dicts organized by rse_id)
+        :param index:    The RSEAttributeIndex to resolve against
+        :returns:        Bitmap of RSEs
+        :rtype:          Integer
         """
         pass
 
@@ -227,17 +403,11 @@ class RSEAttributeEqualCheck(BaseExpressionElement):
         self.key = key
         self.value = value
 
-    def resolve_elements(self, session):
+    def resolve_elements(self, index):
         """
         Inherited from :py:func:`BaseExpressionElement.resolve_elements`
         """
-        output = list_rses({self.key: self.value}, session=session)
-        if not output:
-            return (set(), {})
-        rse_dict = {}
-        for rse in output:
-            rse_dict[rse['id']] = rse
-        return (set([rse['id'] for rse in output]), rse_dict)
+        return index.equal(self.key, self.value)
 
 
 class RSEAttributeSmallerCheck(BaseExpressionElement):
@@ -255,24 +425,11 @@ class RSEAttributeSmallerCheck(BaseExpressionElement):
         self.key = key
         self.value = value
 
-    def resolve_elements(self, session):
+    def resolve_elements(self, index):
         """
         Inherited from :py:func:`BaseExpressionElement.resolve_elements`
         """
-        rse_list = get_rses_with_attribute(key=self.key, session=session)
-        if not rse_list:
-            return (set(), {})
-
-        output = []
-        rse_dict = {}
-        for rse in rse_list:
-            try:
-                if float(get_rse_attribute(key=self.key, rse_id=rse['id'], session=session)[0]) < float(self.value):
-                    rse_dict[rse['id']] = rse
-                    output.append(rse['id'])
-            except ValueError:
-                continue
-        return (set(output), rse_dict)
+        return index.compare(self.key, lambda value: value < float(self.value))
 
 
 class RSEAttributeLargerCheck(BaseExpressionElement):
@@ -290,24 +447,11 @@ class RSEAttributeLargerCheck(BaseExpressionElement):
         self.key = key
         self.value = value
 
-    def resolve_elements(self, session):
+    def resolve_elements(self, index):
         """
         Inherited from :py:func:`BaseExpressionElement.resolve_elements`
         """
-        rse_list = get_rses_with_attribute(key=self.key, session=session)
-        if not rse_list:
-            return (set(), {})
-
-        output = []
-        rse_dict = {}
-        for rse in rse_list:
-            try:
-                if float(get_rse_attribute(key=self.key, rse_id=rse['id'], session=session)[0]) > float(self.value):
-                    rse_dict[rse['id']] = rse
-                    output.append(rse['id'])
-            except ValueError:
-                continue
-        return (set(output), rse_dict)
+        return index.compare(self.key, lambda value: value > float(self.value))
 
 
 class BaseRSEOperator(BaseExpressionElement):
@@ -357,13 +501,11 @@ class ComplementOperator(BaseRSEOperator):
         """
         self.right_term = right_term
 
-    def resolve_elements(self, session):
+    def resolve_elements(self, index):
         """
         Inherited from :py:func:`BaseExpressionElement.resolve_elements`
         """
-        left_term_tuple = self.left_term.resolve_elements(session=session)
-        right_term_tuple = self.right_term.resolve_elements(session=session)
-        return (left_term_tuple[0] - right_term_tuple[0], dict(left_term_tuple[1].items() + right_term_tuple[1].items()))
+        return self.left_term.resolve_elements(index=index) & ~self.right_term.resolve_elements(index=index)
 
 
 class UnionOperator(BaseRSEOperator):
@@ -391,13 +533,11 @@ class UnionOperator(BaseRSEOperator):
         """
         self.right_term = right_term
 
-    def resolve_elements(self, session):
+    def resolve_elements(self, index):
         """
         Inherited from :py:func:`BaseExpressionElement.resolve_elements`
         """
-        left_term_tuple = self.left_term.resolve_elements(session=session)
-        right_term_tuple = self.right_term.resolve_elements(session=session)
-        return (left_term_tuple[0] | right_term_tuple[0], dict(left_term_tuple[1].items() + right_term_tuple[1].items()))
+        return self.left_term.resolve_elements(index=index) | self.right_term.resolve_elements(index=index)
 
 
 class IntersectOperator(BaseRSEOperator):
@@ -425,10 +565,8 @@ class IntersectOperator(BaseRSEOperator):
         """
         self.right_term = right_term
 
-    def resolve_elements(self, session):
+    def resolve_elements(self, index):
         """
         Inherited from :py:func:`BaseExpressionElement.resolve_elements`
         """
-        left_term_tuple = self.left_term.resolve_elements(session=session)
-        right_term_tuple = self.right_term.resolve_elements(session=session)
-        return (left_term_tuple[0] & right_term_tuple[0], dict(left_term_tuple[1].items() + right_term_tuple[1].items()))
+        return self.left_term.resolve_elements(index=index) & self.right_term.resolve_elements(index=index)
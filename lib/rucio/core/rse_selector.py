@@ -13,9 +13,9 @@ from random import uniform, shuffle
 
 from rucio.common.exception import InsufficientAccountLimit, InsufficientTargetRSEs, InvalidRuleWeight
 from rucio.core.account import has_account_attribute
-from rucio.core.account_counter import get_counter
-from rucio.core.account_limit import get_account_limit
-from rucio.core.rse import list_rse_attributes, has_rse_attribute
+from rucio.core.account_counter import get_counters
+from rucio.core.account_limit import get_account_limits
+from rucio.core.rse import get_rses_attributes, get_rses_limits, get_rses_usage
 from rucio.db.sqla.session import read_session
 
 
@@ -40,53 +40,59 @@ class RSESelector():
         self.account = account
         self.rses = []  # [{'rse_id':, 'weight':, 'staging_area'}]
         self.copies = copies
-        if weight is not None:
-            for rse in rses:
-                attributes = list_rse_attributes(rse=None, rse_id=rse['id'], session=session)
-                availability_write = True if rse.get('availability', 7) & 2 else False
-                if weight not in attributes:
+        attributes = get_rses_attributes(rse_ids=[rse['id'] for rse in rses], session=session)
+        for rse in rses:
+            rse_attributes = attributes[rse['id']]
+            availability_write = True if rse.get('availability', 7) & 2 else False
+            if weight is not None:
+                if weight not in rse_attributes:
                     continue  # The RSE does not have the required weight set, therefore it is ignored
                 try:
-                    self.rses.append({'rse_id': rse['id'],
-                                      'weight': float(attributes[weight]),
-                                      'mock_rse': attributes.get('mock', False),
-                                      'availability_write': availability_write,
-                                      'staging_area': rse['staging_area']})
+                    rse_weight = float(rse_attributes[weight])
                 except ValueError:
                     raise InvalidRuleWeight('The RSE with id \'%s\' has a non-number specified for the weight \'%s\'' % (rse['id'], weight))
-        else:
-            for rse in rses:
-                mock_rse = has_rse_attribute(rse['id'], 'mock', session=session)
-                availability_write = True if rse.get('availability', 7) & 2 else False
-                self.rses.append({'rse_id': rse['id'],
-                                  'weight': 1,
-                                  'mock_rse': mock_rse,
-                                  'availability_write': availability_write,
-                                  'staging_area': rse['staging_area']})
+                mock_rse = rse_attributes.get('mock', False)
+            else:
+                rse_weight = 1
+                mock_rse = 'mock' in rse_attributes
+            self.rses.append({'rse_id': rse['id'],
+                              'weight': rse_weight,
+                              'mock_rse': mock_rse,
+                              'availability_write': availability_write,
+                              'staging_area': rse['staging_area']})
 
         if len(self.rses) < self.copies:
             raise InsufficientTargetRSEs('Target RSE set not sufficient for number of copies. (%s copies requested, RSE set size %s)' % (self.copies, len(self.rses)))
 
+        rse_ids = [rse['rse_id'] for rse in self.rses if not rse['mock_rse']]
         if has_account_attribute(account=account, key='admin', session=session) or ignore_account_limit:
             for rse in self.rses:
                 rse['quota_left'] = float('inf')
         else:
+            limits = get_account_limits(account=account, rse_ids=rse_ids, session=session)
+            counters = get_counters(account=account, rse_ids=rse_ids, session=session)
             for rse in self.rses:
                 if rse['mock_rse']:
                     rse['quota_left'] = float('inf')
+                elif rse['rse_id'] not in limits:
+                    rse['quota_left'] = 0
                 else:
-                    # TODO: Add RSE-space-left here!
-                    limit = get_account_limit(account=account, rse_id=rse['rse_id'], session=session)
-                    if limit is None:
-                        rse['quota_left'] = 0
-                    else:
-                        rse['quota_left'] = limit - get_counter(rse_id=rse['rse_id'], account=account, session=session)['bytes']
+                    rse['quota_left'] = limits[rse['rse_id']] - counters.get(rse['rse_id'], 0)
 
         self.rses = [rse for rse in self.rses if rse['quota_left'] > 0]
 
         if len(self.rses) < self.copies:
             raise InsufficientAccountLimit('There is insufficient quota on any of the target RSE\'s to fullfill the operation.')
 
+        space_left = self.__get_space_left(rse_ids=[rse['rse_id'] for rse in self.rses if not rse['mock_rse']], attributes=attributes, session=session)
+        for rse in self.rses:
+            rse['space_left'] = space_left.get(rse['rse_id'], float('inf'))
+
+        self.rses = [rse for rse in self.rses if rse['space_left'] > 0]
+
+        if len(self.rses) < self.copies:
+            raise InsufficientTargetRSEs('There is insufficient free space on the target RSE\'s to fullfill the operation.')
+
     def select_rse(self, size, preferred_rse_ids, copies=0, blacklist=[], prioritize_order_over_weight=False):
         """
         Select n RSEs to replicate data to.
@@ -113,6 +119,10 @@ class RSESelector():
         rses = [rse for rse in rses if rse['quota_left'] > size]
         if len(rses) < count:
             raise InsufficientAccountLimit('There is insufficient quota on any of the target RSE\'s to fullfill the operation.')
+        # Remove rses which do not have enough free space
+        rses = [rse for rse in rses if rse['space_left'] > size]
+        if len(rses) < count:
+            raise InsufficientTargetRSEs('There is insufficient free space on the target RSE\'s to fullfill the operation.')
 
         for copy in range(count):
             # Remove rses already in the result set
@@ -154,8 +164,38 @@ class RSESelector():
         for element in self.rses:
             if element['rse_id'] == rse[0]:
                 element['quota_left'] -= size
+                element['space_left'] -= size
                 return
 
+    @staticmethod
+    def __get_space_left(rse_ids, attributes, session):
+        """
+        Return the space left on the RSEs, which is the free space above the MinFreeSpace limit of the RSE.
+        The sourceForTotalSpace and sourceForUsedSpace attributes select the usage sources, as in the reaper.
+
+        :param rse_ids:     List of RSE ids.
+        :param attributes:  Dictionary {rse_id: {key: value}} of the RSE attributes.
+        :param session:     DB Session in use.
+        :returns:           Dictionary {rse_id: bytes}, RSEs without usage information are not included.
+        """
+        sources = {}
+        for rse_id in rse_ids:
+            sources[rse_id] = (attributes[rse_id].get('sourceForTotalSpace', 'storage'), attributes[rse_id].get('sourceForUsedSpace', 'storage'))
+        if not sources:
+            return {}
+
+        usage = get_rses_usage(rse_ids=rse_ids, sources=list(set([source for pair in sources.values() for source in pair])), session=session)
+        limits = get_rses_limits(rse_ids=rse_ids, name='MinFreeSpace', session=session)
+        space_left = {}
+        for rse_id in rse_ids:
+            source_for_total_space, source_for_used_space = sources[rse_id]
+            rse_usage = usage.get(rse_id, {})
+            if source_for_total_space not in rse_usage or source_for_used_space not in rse_usage:
+                continue
+            free = rse_usage[source_for_total_space]['total'] - (rse_usage[source_for_used_space]['used'] or 0)
+            space_left[rse_id] = free - (limits[rse_id].get('MinFreeSpace') or 0)
+        return space_left
+
     def __choose_rse(self, rses):
         """
         Choose an RSE based on weighting.
@@ -21,9 +21,10 @@ from re import match
 from string import Template
 
 from sqlalchemy.exc import IntegrityError, StatementError
+from sqlalchemy.orm import class_mapper, make_transient_to_detached
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql import func
-from sqlalchemy.sql.expression import and_, or_, bindparam, text, true, null
+from sqlalchemy.sql.expression import and_, or_, text, true, null
 
 import rucio.core.did
 import rucio.core.lock  # import get_replica_locks, get_files_and_replica_locks_of_dataset
@@ -38,7 +39,7 @@ from rucio.common.exception import (InvalidRSEExpression, InvalidReplicationRule
                                     InvalidObject, RSEBlacklisted, RuleReplaceFailed, RequestNotFound,
                                     ManualRuleApprovalBlocked, UnsupportedOperation)
 from rucio.common.schema import validate_schema
-from rucio.common.utils import str_to_date, sizefmt
+from rucio.common.utils import str_to_date, sizefmt, chunks
 from rucio.core import account_counter, rse_counter
 from rucio.core.account import get_account
 from rucio.core.lifetime_exception import define_eol
@@ -53,6 +54,7 @@ from rucio.db.sqla import models
 from rucio.db.sqla.constants import (LockState, ReplicaState, RuleState, RuleGrouping,
                                      DIDAvailability, DIDReEvaluation, DIDType,
                                      RequestType, RuleNotification, OBSOLETE, RSEType)
+from rucio.db.sqla.sautils import filter_thread_work
 from rucio.db.sqla.session import read_session, transactional_session, stream_session
 
 logging.basicConfig(stream=sys.stdout,
@@ -1297,13 +1299,17 @@ def reduce_rule(rule_id, copies, exclude_expression=None, session=None):
 
 
 @transactional_session
-def re_evaluate_did(scope, name, rule_evaluation_action, session=None):
+def re_evaluate_did(scope, name, rule_evaluation_action, updated_did_ids=None, session=None):
     """
     Re-Evaluates a did.
 
+    All the pending events of the did can be coalesced into one evaluation: the detached
+    children are evaluated once, then all the attached children at once.
+
     :param scope:                   The scope of the did to be re-evaluated.
     :param name:                    The name of the did to be re-evaluated.
-    :param rule_evaluation_action:  The Rule evaluation action.
+    :param rule_evaluation_action:  The Rule evaluation action, or a list of actions.
+    :param updated_did_ids:         Ids of the updated_dids rows to delete with the evaluation.
     :param session:                 The database session in use.
     :raises:                        DataIdentifierNotFound
     """
@@ -1314,10 +1320,15 @@ def re_evaluate_did(scope, name, rule_evaluation_action, session=None):
     except NoResultFound:
         raise DataIdentifierNotFound()
 
-    if rule_evaluation_action == DIDReEvaluation.ATTACH:
-        __evaluate_did_attach(did, session=session)
+    if isinstance(rule_evaluation_action, (list, tuple, set)):
+        actions = set(rule_evaluation_action)
     else:
+        actions = set([rule_evaluation_action])
+
+    if DIDReEvaluation.DETACH in actions:
         __evaluate_did_detach(did, session=session)
+    if DIDReEvaluation.ATTACH in actions:
+        __evaluate_did_attach(did, session=session)
 
     # Update size and length of did
     if session.bind.dialect.name == 'oracle':
@@ -1337,6 +1348,9 @@ def re_evaluate_did(scope, name, rule_evaluation_action, session=None):
                                         name=name,
                                         did_type=did.did_type).save(session=session)
 
+    if updated_did_ids:
+        delete_updated_dids(ids=updated_did_ids, session=session)
+
 
 @read_session
 def get_updated_dids(total_workers, worker_number, limit=100, blacklisted_dids=[], session=None):
@@ -1354,15 +1368,7 @@ def get_updated_dids(total_workers, worker_number, limit=100, blacklisted_dids=[
                           models.UpdatedDID.name,
                           models.UpdatedDID.rule_evaluation_action)
 
-    if total_workers > 0:
-        if session.bind.dialect.name == 'oracle':
-            bindparams = [bindparam('worker_number', worker_number),
-                          bindparam('total_workers', total_workers)]
-            query = query.filter(text('ORA_HASH(name, :total_workers) = :worker_number', bindparams=bindparams))
-        elif session.bind.dialect.name == 'mysql':
-            query = query.filter(text('mod(md5(name), %s) = %s' % (total_workers + 1, worker_number)))
-        elif session.bind.dialect.name == 'postgresql':
-            query = query.filter(text('mod(abs((\'x\'||md5(name))::bit(32)::int), %s) = %s' % (total_workers + 1, worker_number)))
+    query = filter_thread_work(session=session, query=query, total_threads=total_workers + 1, thread_id=worker_number, hash_variable='name')
 
     if limit:
         fetched_dids = query.order_by(models.UpdatedDID.created_at).limit(limit).all()
@@ -1398,14 +1404,7 @@ def get_rules_beyond_eol(date_check, worker_number, total_workers, session):
                           models.ReplicationRule.expires_at).\
         filter(models.ReplicationRule.eol_at < date_check)
 
-    if session.bind.dialect.name == 'oracle':
-        bindparams = [bindparam('worker_number', worker_number),
-                      bindparam('total_workers', total_workers)]
-        query = query.filter(text('ORA_HASH(name, :total_workers) = :worker_number', bindparams=bindparams))
-    elif session.bind.dialect.name == 'mysql':
-        query = query.filter(text('mod(md5(name), %s) = %s' % (total_workers + 1, worker_number)))
-    elif session.bind.dialect.name == 'postgresql':
-        query = query.filter(text('mod(abs((\'x\'||md5(name))::bit(32)::int), %s) = %s' % (total_workers + 1, worker_number)))
+    query = filter_thread_work(session=session, query=query, total_threads=total_workers + 1, thread_id=worker_number, hash_variable='name')
     return [rule for rule in query.all()]
 
 
@@ -1427,14 +1426,7 @@ def get_expired_rules(total_workers, worker_number, limit=100, blacklisted_rules
         with_hint(models.ReplicationRule, "index(rules RULES_EXPIRES_AT_IDX)", 'oracle').\
         order_by(models.ReplicationRule.expires_at)  # NOQA
 
-    if session.bind.dialect.name == 'oracle':
-        bindparams = [bindparam('worker_number', worker_number),
-                      bindparam('total_workers', total_workers)]
-        query = query.filter(text('ORA_HASH(name, :total_workers) = :worker_number', bindparams=bindparams))
-    elif session.bind.dialect.name == 'mysql':
-        query = query.filter('mod(md5(name), %s) = %s' % (total_workers + 1, worker_number))
-    elif session.bind.dialect.name == 'postgresql':
-        query = query.filter('mod(abs((\'x\'||md5(name))::bit(32)::int), %s) = %s' % (total_workers + 1, worker_number))
+    query = filter_thread_work(session=session, query=query, total_threads=total_workers + 1, thread_id=worker_number, hash_variable='name')
 
     if limit:
         fetched_rules = query.limit(limit).all()
@@ -1475,14 +1467,7 @@ def get_injected_rules(total_workers, worker_number, limit=100, blacklisted_rule
             filter(models.ReplicationRule.state == RuleState.INJECT).\
             order_by(models.ReplicationRule.created_at)
 
-    if session.bind.dialect.name == 'oracle':
-        bindparams = [bindparam('worker_number', worker_number),
-                      bindparam('total_workers', total_workers)]
-        query = query.filter(text('ORA_HASH(name, :total_workers) = :worker_number', bindparams=bindparams))
-    elif session.bind.dialect.name == 'mysql':
-        query = query.filter('mod(md5(name), %s) = %s' % (total_workers + 1, worker_number))
-    elif session.bind.dialect.name == 'postgresql':
-        query = query.filter('mod(abs((\'x\'||md5(name))::bit(32)::int), %s) = %s' % (total_workers + 1, worker_number))
+    query = filter_thread_work(session=session, query=query, total_threads=total_workers + 1, thread_id=worker_number, hash_variable='name')
 
     if limit:
         fetched_rules = query.limit(limit).all()
@@ -1531,14 +1516,7 @@ def get_stuck_rules(total_workers, worker_number, delta=600, limit=10, blacklist
                        models.ReplicationRule.locked == true())).\
             order_by(models.ReplicationRule.updated_at)
 
-    if session.bind.dialect.name == 'oracle':
-        bindparams = [bindparam('worker_number', worker_number),
-                      bindparam('total_workers', total_workers)]
-        query = query.filter(text('ORA_HASH(name, :total_workers) = :worker_number', bindparams=bindparams))
-    elif session.bind.dialect.name == 'mysql':
-        query = query.filter('mod(md5(name), %s) = %s' % (total_workers + 1, worker_number))
-    elif session.bind.dialect.name == 'postgresql':
-        query = query.filter('mod(abs((\'x\'||md5(name))::bit(32)::int), %s) = %s' % (total_workers + 1, worker_number))
+    query = filter_thread_work(session=session, query=query, total_threads=total_workers + 1, thread_id=worker_number, hash_variable='name')
 
     if limit:
         fetched_rules = query.limit(limit).all()
@@ -1567,6 +1545,18 @@ def delete_updated_did(id, session=None):
     session.query(models.UpdatedDID).filter(models.UpdatedDID.id == id).delete()
 
 
+@transactional_session
+def delete_updated_dids(ids, session=None):
+    """
+    Delete updated_dids by id.
+
+    :param ids:                     List of ids of the rows to delete.
+    :param session:                 The database session in use.
+    """
+    for chunk in chunks(ids, 1000):
+        session.query(models.UpdatedDID).filter(models.UpdatedDID.id.in_(chunk)).delete(synchronize_session=False)
+
+
 @transactional_session
 def update_rules_for_lost_replica(scope, name, rse_id, nowait=False, session=None):
     """
@@ -2122,21 +2112,8 @@ def __find_stuck_locks_and_repair_them(datasetfiles, locks, replicas, source_rep
                                                                      rule=rule,
                                                                      source_rses=source_rses,
                                                                      session=session)
-    # Add the replicas
-    session.add_all([item for sublist in replicas_to_create.values() for item in sublist])
-    session.flush()
-
-    # Add the locks
-    session.add_all([item for sublist in locks_to_create.values() for item in sublist])
-    session.flush()
-
-    # Increase rse_counters
-    for rse_id in replicas_to_create.keys():
-        rse_counter.increase(rse_id=rse_id, files=len(replicas_to_create[rse_id]), bytes=sum([replica.bytes for replica in replicas_to_create[rse_id]]), session=session)
-
-    # Increase account_counters
-    for rse_id in locks_to_create.keys():
-        account_counter.increase(rse_id=rse_id, account=rule.account, files=len(locks_to_create[rse_id]), bytes=sum([lock.bytes for lock in locks_to_create[rse_id]]), session=session)
+    # Add the replicas and locks, increase the rse and account counters
+    __insert_replicas_and_locks(replicas_to_create=replicas_to_create, locks_to_create=locks_to_create, account=rule.account, session=session)
 
     # Decrease account_counters
     for rse_id in locks_to_delete:
@@ -2649,21 +2626,8 @@ def __create_locks_replicas_transfers(datasetfiles, locks, replicas, source_repl
                                                                                    preferred_rse_ids=preferred_rse_ids,
                                                                                    source_rses=source_rses,
                                                                                    session=session)
-    # Add the replicas
-    session.add_all([item for sublist in replicas_to_create.values() for item in sublist])
-    session.flush()
-
-    # Add the locks
-    session.add_all([item for sublist in locks_to_create.values() for item in sublist])
-    session.flush()
-
-    # Increase rse_counters
-    for rse_id in replicas_to_create.keys():
-        rse_counter.increase(rse_id=rse_id, files=len(replicas_to_create[rse_id]), bytes=sum([replica.bytes for replica in replicas_to_create[rse_id]]), session=session)
-
-    # Increase account_counters
-    for rse_id in locks_to_create.keys():
-        account_counter.increase(rse_id=rse_id, account=rule.account, files=len(locks_to_create[rse_id]), bytes=sum([lock.bytes for lock in locks_to_create[rse_id]]), session=session)
+    # Add the replicas and locks, increase the rse and account counters
+    __insert_replicas_and_locks(replicas_to_create=replicas_to_create, locks_to_create=locks_to_create, account=rule.account, session=session)
 
     # Add the transfers
     logging.debug("Rule %s  [%d/%d/%d] queued %d transfers" % (str(rule.id), rule.locks_ok_cnt, rule.locks_replicating_cnt, rule.locks_stuck_cnt, len(transfers_to_create)))
@@ -2672,6 +2636,56 @@ def __create_locks_replicas_transfers(datasetfiles, locks, replicas, source_repl
     logging.debug("Finished creating locks and replicas for rule %s [%d/%d/%d]" % (str(rule.id), rule.locks_ok_cnt, rule.locks_replicating_cnt, rule.locks_stuck_cnt))
 
 
+def __insert_replicas_and_locks(replicas_to_create, locks_to_create, account, session):
+    """
+    Insert the new replicas and locks of a rule in bulk and increase the counters.
+
+    :param replicas_to_create:  Dictionary {rse_id: [replica]} of the replicas to create.
+    :param locks_to_create:     Dictionary {rse_id: [lock]} of the locks to create.
+    :param account:             The account of the rule.
+    :param session:             The database session in use.
+    :raises:                    IntegrityError
+    """
+    # Flush the changes of the existing replicas first
+    session.flush()
+
+    __bulk_insert_objects(model=models.RSEFileAssociation, objects=[item for sublist in replicas_to_create.values() for item in sublist], session=session)
+    __bulk_insert_objects(model=models.ReplicaLock, objects=[item for sublist in locks_to_create.values() for item in sublist], session=session)
+
+    if replicas_to_create:
+        rse_counter.increase_many(counters=dict((rse_id, (len(replicas), sum([replica.bytes for replica in replicas])))
+                                                for rse_id, replicas in replicas_to_create.iteritems()),
+                                  session=session)
+    if locks_to_create:
+        account_counter.increase_many(account=account,
+                                      counters=dict((rse_id, (len(locks), sum([lock.bytes for lock in locks])))
+                                                    for rse_id, locks in locks_to_create.iteritems()),
+                                      session=session)
+
+
+def __bulk_insert_objects(model, objects, session):
+    """
+    Insert new objects with executemany statements, instead of flushing them through the unit of work.
+
+    The objects are then attached to the session as persistent objects, so that later
+    changes of the objects, e.g. the lock_cnt of a replica, are still flushed as updates.
+
+    :param model:    The model class of the objects.
+    :param objects:  List of transient objects of the model.
+    :param session:  The database session in use.
+    :raises:         IntegrityError
+    """
+    keys = [prop.key for prop in class_mapper(model).column_attrs]
+    mappings = []
+    for obj in objects:
+        mappings.append(dict([(key, obj.__dict__[key]) for key in keys if key in obj.__dict__]))
+    for chunk in chunks(mappings, 1000):
+        session.bulk_insert_mappings(model, chunk)
+    for obj in objects:
+        make_transient_to_detached(obj)
+        session.add(obj)
+
+
 @transactional_session
 def __delete_lock_and_update_replica(lock, purge_replicas=False, nowait=False, session=None):
     """
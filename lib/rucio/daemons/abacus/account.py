@@ -18,7 +18,7 @@ import time
 import traceback
 
 from rucio.common.config import config_get
-from rucio.core.account_counter import get_updated_account_counters, update_account_counter
+from rucio.core.account_counter import get_updated_account_counters, update_account_counter, update_account_counters
 
 graceful_stop = threading.Event()
 
@@ -27,7 +27,7 @@ logging.basicConfig(stream=sys.stdout,
                     format='%(asctime)s\t%(process)d\t%(levelname)s\t%(message)s')
 
 
-def account_update(once=False, process=0, total_processes=1, thread=0, threads_per_process=1):
+def account_update(once=False, process=0, total_processes=1, thread=0, threads_per_process=1, bulk=None):
     """
     Main loop to check and update the Account Counters.
     """
@@ -37,6 +37,25 @@ def account_update(once=False, process=0, total_processes=1, thread=0, threads_p
     logging.info('account_update: started')
 
     while not graceful_stop.is_set():
+        if bulk:
+            try:
+                # Apply the updates of this worker in batches, until a batch is not full
+                applied = bulk
+                while applied == bulk and not graceful_stop.is_set():
+                    start_time = time.time()
+                    applied = update_account_counters(total_workers=total_processes * threads_per_process - 1,
+                                                      worker_number=process * threads_per_process + thread,
+                                                      limit=bulk)
+                    logging.debug('account_update[%s/%s]: applied %d updates in %f' % (process * threads_per_process + thread, total_processes * threads_per_process - 1, applied, time.time() - start_time))
+                if not applied and not once:
+                    logging.info('account_update[%s/%s] did not get any work' % (process * threads_per_process + thread, total_processes * threads_per_process - 1))
+                    time.sleep(10)
+            except Exception:
+                logging.error(traceback.format_exc())
+            if once:
+                break
+            continue
+
         try:
             # Select a bunch of rses for to update for this worker
             start = time.time()  # NOQA
@@ -74,16 +93,16 @@ def stop(signum=None, frame=None):
     graceful_stop.set()
 
 
-def run(once=False, process=0, total_processes=1, threads_per_process=11):
+def run(once=False, process=0, total_processes=1, threads_per_process=11, bulk=None):
     """
     Starts up the Abacus-Account threads.
     """
     if once:
         logging.info('main: executing one iteration only')
-        account_update(once)
+        account_update(once, bulk=bulk)
     else:
         logging.info('main: starting threads')
-        threads = [threading.Thread(target=account_update, kwargs={'process': process, 'total_processes': total_processes, 'once': once, 'thread': i, 'threads_per_process': threads_per_process}) for i in xrange(0, threads_per_process)]
+        threads = [threading.Thread(target=account_update, kwargs={'process': process, 'total_processes': total_processes, 'once': once, 'thread': i, 'threads_per_process': threads_per_process, 'bulk': bulk}) for i in xrange(0, threads_per_process)]
         [t.start() for t in threads]
         logging.info('main: waiting for interrupts')
         # Interruptible joins require a timeout.
@@ -0,0 +1,291 @@
+# Copyright European Organization for Nuclear Research (CERN)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+"""
+Asynchronous submission scheduler of the conveyor.
+
+Jobs are queued per FTS host and handed to the worker threads as soon as the host and the links
+of the job have a free submission slot, so a slow FTS host only holds back its own jobs.
+The number of files submitted per job adapts to the latency and to the errors of each host.
+"""
+
+import logging
+import threading
+import time
+import traceback
+
+from collections import deque
+
+from rucio.core.monitor import record_counter, record_gauge
+
+
+class HostState(object):
+    """
+    Pending jobs, in-flight submissions and adaptive job size of one FTS host.
+    """
+
+    def __init__(self, job_size):
+        self.pending = deque()
+        self.pending_files = 0
+        self.inflight = 0
+        self.job_size = job_size
+        self.latency = None
+        self.errors = 0
+
+
+class SubmissionScheduler(object):
+    """
+    Schedule the submission of the transfer jobs with per host and per link concurrency limits.
+
+    The job size of a host grows additively while its submissions succeed within the target latency,
+    and is halved when a submission fails or is too slow.
+    """
+
+    def __init__(self, submit, total_threads=1, max_inflight_per_host=None, max_inflight_per_link=None,
+                 min_job_size=1, max_job_size=200, target_latency=60, latency_weight=0.3, name='transfer_submitter'):
+        """
+        :param submit:                 Function called as submit(external_host, job), returns a true value if the job was submitted.
+        :param total_threads:          Number of worker threads.
+        :param max_inflight_per_host:  Maximum number of concurrent submissions to one FTS host, defaults to total_threads.
+        :param max_inflight_per_link:  Maximum number of concurrent submissions of one source/destination link, unlimited by default.
+        :param min_job_size:           Minimum number of files per job.
+        :param max_job_size:           Maximum number of files per job, also the initial job size.
+        :param target_latency:         Target submission latency in seconds.
+        :param latency_weight:         Weight of the last submission in the moving average of the latency.
+        :param name:                   Name used in the monitoring metrics.
+        """
+        self.submit = submit
+        self.total_threads = total_threads
+        self.max_inflight_per_host = max_inflight_per_host or total_threads
+        self.max_inflight_per_link = max_inflight_per_link
+        self.min_job_size = max(min_job_size, 1)
+        self.max_job_size = max(max_job_size, self.min_job_size)
+        self.target_latency = target_latency
+        self.latency_weight = latency_weight
+        self.name = name
+
+        self.hosts = {}
+        self.links = {}
+        self.request_ids = set()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.next_host = 0
+        self.workers = []
+
+    def start(self):
+        """
+        Start the worker threads.
+        """
+        for _ in xrange(self.total_threads):
+            worker = threading.Thread(target=self.__work)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self, timeout=None):
+        """
+        Wait for the in-flight submissions and stop the worker threads. The pending jobs are dropped,
+        their requests are still queued in the database.
+
+        :param timeout:  Maximum time to wait for the in-flight submissions in seconds.
+        """
+        with self.condition:
+            self.stopped = True
+            for host in self.hosts.values():
+                host.pending.clear()
+                host.pending_files = 0
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = []
+
+    def add(self, grouped_jobs):
+        """
+        Queue jobs for submission.
+
+        :param grouped_jobs:  Dictionary {external_host: [job]} as returned by bulk_group_transfer.
+        """
+        with self.condition:
+            for external_host, jobs in grouped_jobs.iteritems():
+                if external_host not in self.hosts:
+                    self.hosts[external_host] = HostState(self.max_job_size)
+                host = self.hosts[external_host]
+                for job in jobs:
+                    host.pending.append(job)
+                    host.pending_files += len(job['files'])
+                    self.request_ids.update([file['metadata']['request_id'] for file in job['files']])
+            self.condition.notify_all()
+
+    def pending_files(self):
+        """
+        Return the number of files queued but not yet submitted.
+        """
+        with self.condition:
+            return sum([host.pending_files for host in self.hosts.values()])
+
+    def is_scheduled(self, request_id):
+        """
+        Check if a request is queued or in-flight.
+
+        :param request_id:  The request id.
+        """
+        with self.condition:
+            return request_id in self.request_ids
+
+    def scheduled_request_ids(self):
+        """
+        Return a copy of the requests queued or in-flight. Taken before reading the queued requests from
+        the database, it still contains the requests submitted during the read.
+        """
+        with self.condition:
+            return set(self.request_ids)
+
+    def unscheduled(self, transfers, scheduled):
+        """
+        Drop the transfers of the requests queued or in-flight, now or when the snapshot was taken.
+
+        :param transfers:  Dictionary {request_id: transfer} read from the database.
+        :param scheduled:  Snapshot returned by scheduled_request_ids before the read.
+        :returns:          Dictionary {request_id: transfer} of the requests to schedule.
+        """
+        with self.condition:
+            return dict([(request_id, transfer) for request_id, transfer in transfers.iteritems()
+                         if request_id not in scheduled and request_id not in self.request_ids])
+
+    def wait_pending(self, below, timeout=None):
+        """
+        Wait until less than a number of files are queued, to refill the queue.
+
+        :param below:    Number of queued files.
+        :param timeout:  Maximum time to wait in seconds.
+        :returns:        True if the queue is below the number of files.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self.condition:
+            while not self.stopped and sum([host.pending_files for host in self.hosts.values()]) >= below:
+                remaining = deadline - time.time() if deadline is not None else 1
+                if remaining <= 0:
+                    return False
+                self.condition.wait(min(remaining, 1))
+            return True
+
+    def wait(self, timeout=None):
+        """
+        Wait until all the queued jobs are submitted.
+
+        :param timeout:  Maximum time to wait in seconds.
+        :returns:        True if all the jobs were submitted.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self.condition:
+            while not self.stopped and self.request_ids:
+                remaining = deadline - time.time() if deadline is not None else 1
+                if remaining <= 0:
+                    return False
+                self.condition.wait(min(remaining, 1))
+            return not self.request_ids
+
+    @staticmethod
+    def __links(files):
+        """
+        Return the source/destination links of a list of files.
+        """
+        return set([(file['metadata'].get('src_rse'), file['metadata'].get('dst_rse')) for file in files])
+
+    def __link_available(self, links):
+        """
+        Check if every link of a job is below its limit.
+        """
+        if not self.max_inflight_per_link:
+            return True
+        return all([self.links.get(link, 0) < self.max_inflight_per_link for link in links])
+
+    def __next_job(self):
+        """
+        Take the next submittable job, round robin over the hosts. Called with the condition held.
+
+        :returns:  (external_host, job, links) or None.
+        """
+        external_hosts = sorted(self.hosts)
+        for i in xrange(len(external_hosts)):
+            external_host = external_hosts[(self.next_host + i) % len(external_hosts)]
+            host = self.hosts[external_host]
+            if not host.pending or host.inflight >= self.max_inflight_per_host:
+                continue
+            for index, job in enumerate(host.pending):
+                files = job['files'][:host.job_size]
+                links = self.__links(files)
+                if not self.__link_available(links):
+                    continue
+                if len(files) < len(job['files']):
+                    host.pending[index] = {'files': job['files'][host.job_size:], 'job_params': job['job_params']}
+                    job = {'files': files, 'job_params': job['job_params']}
+                else:
+                    del host.pending[index]
+                host.pending_files -= len(files)
+                host.inflight += 1
+                for link in links:
+                    self.links[link] = self.links.get(link, 0) + 1
+                self.next_host = (self.next_host + i + 1) % len(external_hosts)
+                return external_host, job, links
+        return None
+
+    def __feedback(self, external_host, success, duration):
+        """
+        Adapt the job size of a host to the outcome of a submission. Called with the condition held.
+        """
+        host = self.hosts[external_host]
+        if host.latency is None:
+            host.latency = duration
+        else:
+            host.latency = self.latency_weight * duration + (1 - self.latency_weight) * host.latency
+
+        if not success:
+            host.errors += 1
+            host.job_size = max(self.min_job_size, host.job_size / 2)
+        elif host.latency > self.target_latency:
+            host.job_size = max(self.min_job_size, host.job_size / 2)
+        else:
+            host.errors = 0
+            host.job_size = min(self.max_job_size, host.job_size + max(1, self.max_job_size / 10))
+        record_gauge('daemons.conveyor.%s.scheduler.%s.job_size' % (self.name, external_host.replace('.', '_').replace(':', '_').replace('/', '_')), host.job_size)
+
+    def __work(self):
+        """
+        Worker thread, submit the jobs as their host and links have free slots.
+        """
+        while True:
+            with self.condition:
+                next_job = None
+                while not self.stopped:
+                    next_job = self.__next_job()
+                    if next_job:
+                        break
+                    self.condition.wait(1)
+                if not next_job:
+                    return
+            external_host, job, links = next_job
+
+            ts = time.time()
+            success = False
+            try:
+                success = bool(self.submit(external_host, job))
+            except:
+                logging.error('Failed to submit a job to %s: %s' % (external_host, traceback.format_exc()))
+            if not success:
+                record_counter('daemons.conveyor.%s.scheduler.errors' % self.name)
+
+            with self.condition:
+                host = self.hosts[external_host]
+                host.inflight -= 1
+                for link in links:
+                    self.links[link] -= 1
+                    if not self.links[link]:
+                        del self.links[link]
+                self.request_ids.difference_update([file['metadata']['request_id'] for file in job['files']])
+                self.__feedback(external_host, success, time.time() - ts)
+                self.condition.notify_all()
@@ -25,12 +25,12 @@ import traceback
 
 from collections import defaultdict
 from ConfigParser import NoOptionError
-from threadpool import ThreadPool, makeRequests
 
 from rucio.common.config import config_get
 from rucio.core import heartbeat
 from rucio.core.monitor import record_counter, record_timer
 
+from rucio.daemons.conveyor.scheduler import SubmissionScheduler
 from rucio.daemons.conveyor.utils import get_rses, get_transfers, bulk_group_transfer, submit_transfer
 
 logging.basicConfig(stream=sys.stdout,
@@ -89,6 +89,19 @@ def submitter(once=False, rses=[], mock=False,
         max_time_in_queue['default'] = 168
     logging.debug("Maximum time in queue for different activities: %s" % max_time_in_queue)
 
+    try:
+        max_inflight_per_host = int(config_get('conveyor', 'max_inflight_per_host'))
+    except NoOptionError:
+        max_inflight_per_host = total_threads
+    try:
+        max_inflight_per_link = int(config_get('conveyor', 'max_inflight_per_link'))
+    except NoOptionError:
+        max_inflight_per_link = None
+    try:
+        target_latency = float(config_get('conveyor', 'submit_target_latency'))
+    except NoOptionError:
+        target_latency = timeout / 2 if timeout else 60
+
     executable = ' '.join(sys.argv)
     hostname = socket.getfqdn()
     pid = os.getpid()
@@ -100,7 +113,13 @@ def submitter(once=False, rses=[], mock=False,
                                                                                                 hb['assign_thread'], hb['nr_threads'],
                                                                                                 timeout))
 
-    threadPool = ThreadPool(total_threads)
+    def submit(external_host, job):
+        return submit_transfer(external_host=external_host, job=job, submitter='transfer_submitter', process=process,
+                               thread=hb['assign_thread'], cachedir=cachedir, timeout=timeout)
+
+    scheduler = SubmissionScheduler(submit, total_threads=total_threads, max_inflight_per_host=max_inflight_per_host,
+                                    max_inflight_per_link=max_inflight_per_link, max_job_size=group_bulk, target_latency=target_latency)
+    scheduler.start()
     activity_next_exe_time = defaultdict(time.time)
     sleeping = False
 
@@ -127,16 +146,29 @@ def submitter(once=False, rses=[], mock=False,
                     continue
                 sleeping = False
 
+                # refill the queue of the scheduler as soon as it falls below one bulk, without waiting for the slowest host
+                while not scheduler.wait_pending(below=bulk, timeout=10):
+                    if graceful_stop.is_set():
+                        break
+                    hb = heartbeat.live(executable, hostname, pid, hb_thread, older_than=3600)
+                if graceful_stop.is_set():
+                    break
+
                 logging.info("%s:%s Starting to get transfer transfers for %s" % (process, hb['assign_thread'], activity))
                 ts = time.time()
+                # the requests still queued in the scheduler are returned again, ask for that many more.
+                # A request in-flight during the read can be returned as queued and be done by the time it is filtered,
+                # so the requests scheduled before the read are filtered out as well
+                scheduled = scheduler.scheduled_request_ids()
                 transfers = get_transfers(process=process, total_processes=total_processes,
                                           thread=hb['assign_thread'],
                                           total_threads=hb['nr_threads'],
-                                          failover_schemes=failover_scheme, limit=bulk,
+                                          failover_schemes=failover_scheme, limit=bulk + scheduler.pending_files(),
                                           activity=activity, rses=rse_ids, schemes=scheme,
                                           mock=mock, max_sources=max_sources,
                                           bring_online=bring_online,
                                           retry_other_fts=retry_other_fts)
+                transfers = scheduler.unscheduled(transfers, scheduled)
                 record_timer('daemons.conveyor.transfer_submitter.get_transfers.per_transfer', (time.time() - ts) * 1000 / (len(transfers) if len(transfers) else 1))
                 record_counter('daemons.conveyor.transfer_submitter.get_transfers', len(transfers))
                 record_timer('daemons.conveyor.transfer_submitter.get_transfers.transfers', len(transfers))
@@ -149,14 +181,9 @@ def submitter(once=False, rses=[], mock=False,
                 record_timer('daemons.conveyor.transfer_submitter.bulk_group_transfer', (time.time() - ts) * 1000 / (len(transfers) if len(transfers) else 1))
 
                 logging.info("%s:%s Starting to submit transfers for %s" % (process, hb['assign_thread'], activity))
-                for external_host in grouped_jobs:
-                    for job in grouped_jobs[external_host]:
-                        # submit transfers
-                        # job_requests = makeRequests(submit_transfer, args_list=[((external_host, job, 'transfer_submitter', process, thread), {})])
-                        job_requests = makeRequests(submit_transfer, args_list=[((), {'external_host': external_host, 'job': job, 'submitter': 'transfer_submitter', 'process': process,
-                                                                                      'thread': hb['assign_thread'], 'cachedir': cachedir, 'timeout': timeout})])
-                        [threadPool.putRequest(job_req) for job_req in job_requests]
-                threadPool.wait()
+                scheduler.add(grouped_jobs)
+                if once:
+                    scheduler.wait()
 
                 if len(transfers) < group_bulk:
                     logging.info('%i:%i - only %s transfers for %s which is less than group bulk %s, sleep %s seconds' % (process, hb['assign_thread'], len(transfers), activity, group_bulk, sleep_time))
@@ -170,7 +197,7 @@ def submitter(once=False, rses=[], mock=False,
 
     logging.info('%s:%s graceful stop requested' % (process, hb['assign_thread']))
 
-    threadPool.dismissWorkers(total_threads, do_join=True)
+    scheduler.stop()
     heartbeat.die(executable, hostname, pid, hb_thread)
 
     logging.info('%s:%s graceful stop done' % (process, hb['assign_thread']))
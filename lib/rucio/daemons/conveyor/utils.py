@@ -17,6 +17,7 @@ Methods common to different conveyor submitter daemons.
 """
 import math
 import datetime
+import itertools
 import json
 import logging
 import random
@@ -311,357 +312,413 @@ def get_unavailable_read_rse_ids(session=None):
     return result
 
 
-@read_session
-def get_transfer_requests_and_source_replicas(process=None, total_processes=None, thread=None, total_threads=None,
-                                              limit=None, activity=None, older_than=None, rses=None, schemes=None,
-                                              bring_online=43200, retry_other_fts=False, failover_schemes=None, session=None):
-    req_sources = request.list_transfer_requests_and_source_replicas(process=process, total_processes=total_processes, thread=thread, total_threads=total_threads,
-                                                                     limit=limit, activity=activity, older_than=older_than, rses=rses, session=session)
+class TransferProtocolCache(object):
+    """
+    Cache of the RSE information, RSE attributes and protocol objects used while building transfers.
+    Protocols are cached per (RSE, operation, schemes), unsupported combinations are remembered too.
+    """
+
+    def __init__(self, session=None):
+        """
+        :param session:  The database session in use.
+        """
+        self.session = session
+        self.rses_info = {}
+        self.rse_attrs = {}
+        self.protocols = {}
+
+    def get_rse_info(self, rse_id, rse=None):
+        """
+        Return the RSE information of rsemgr.get_rse_info.
+
+        :param rse_id:  The RSE id.
+        :param rse:     The RSE name, resolved from the id if not given.
+        """
+        if rse_id not in self.rses_info:
+            if rse is None:
+                rse = rse_core.get_rse_name(rse_id=rse_id, session=self.session)
+            self.rses_info[rse_id] = rsemgr.get_rse_info(rse, session=self.session)
+        return self.rses_info[rse_id]
+
+    def get_rse_attributes(self, rse_id):
+        """
+        Return the attributes of a RSE.
+
+        :param rse_id:  The RSE id.
+        """
+        if rse_id not in self.rse_attrs:
+            self.rse_attrs[rse_id] = get_rse_attributes(rse_id, session=self.session)
+        return self.rse_attrs[rse_id]
+
+    def get_protocol(self, rse_id, operation, schemes):
+        """
+        Return the protocol object for the operation on the RSE, or None if no protocol supports it.
+
+        :param rse_id:     The RSE id, its information must already be cached.
+        :param operation:  The operation, e.g. read or write.
+        :param schemes:    List of allowed schemes, or None.
+        """
+        key = (rse_id, operation, tuple(schemes) if schemes else None)
+        if key not in self.protocols:
+            try:
+                self.protocols[key] = rsemgr.create_protocol(self.rses_info[rse_id], operation, schemes)
+            except RSEProtocolNotSupported:
+                logging.error('Operation "%s" not supported by %s with schemes %s' % (operation, self.rses_info[rse_id]['rse'], schemes))
+                self.protocols[key] = None
+        return self.protocols[key]
 
-    unavailable_read_rse_ids = get_unavailable_read_rse_ids(session=session)
 
-    bring_online_local = bring_online
-    transfers, rses_info, protocols, rse_attrs, reqs_no_source, reqs_only_tape_source, reqs_scheme_mismatch = {}, {}, {}, {}, [], [], []
-    for id, rule_id, scope, name, md5, adler32, bytes, activity, attributes, previous_attempt_id, dest_rse_id, source_rse_id, rse, deterministic, rse_type, path, retry_count, src_url, ranking, link_ranking in req_sources:
-        transfer_src_type = "DISK"
-        transfer_dst_type = "DISK"
-        allow_tape_source = True
-        try:
-            if rses and dest_rse_id not in rses:
-                continue
+def __is_tape(rse_info):
+    """
+    Check if a RSE is a tape RSE.
 
-            current_schemes = schemes
-            if previous_attempt_id and failover_schemes:
-                current_schemes = failover_schemes
+    :param rse_info:  The RSE information.
+    """
+    return rse_info['rse_type'] == RSEType.TAPE or rse_info['rse_type'] == 'TAPE'
 
-            if id not in transfers:
-                if id not in reqs_no_source:
-                    reqs_no_source.append(id)
 
-                # source_rse_id will be None if no source replicas
-                # rse will be None if rse is staging area
-                if source_rse_id is None or rse is None:
-                    continue
+def __top_ranking(sources):
+    """
+    Return the highest ranking of the sources found so far.
 
-                if link_ranking is None:
-                    logging.debug("Request %s: no link from %s to %s" % (id, source_rse_id, dest_rse_id))
-                    continue
+    :param sources:  List of (rse, protocol, path, source_rse_id, ranking, link_ranking) tuples.
+    """
+    avail_top_ranking = None
+    for source in sources:
+        if avail_top_ranking is None:
+            avail_top_ranking = source[4]
+            continue
+        if source[4] is not None and source[4] > avail_top_ranking:
+            avail_top_ranking = source[4]
+    return avail_top_ranking
+
+
+def __build_transfer(rows, cache, unavailable_read_rse_ids, schemes, bring_online, retry_other_fts, failover_schemes):
+    """
+    Select the sources of one request and build its transfer. The source urls are not computed yet.
+
+    :param rows:  The request x source rows of the request.
+    :returns:     (transfer, outcome) with the transfer dictionary or None, and the outcome 'transfer', 'no_source' or 'scheme_mismatch'.
+    """
+    id, rule_id, scope, name, md5, adler32, bytes, activity, attributes, previous_attempt_id, dest_rse_id = rows[0][:11]
+    retry_count = rows[0][16]
+
+    current_schemes = schemes
+    if previous_attempt_id and failover_schemes:
+        current_schemes = failover_schemes
+
+    attr = None
+    if attributes:
+        if type(attributes) is dict:
+            attr = json.loads(json.dumps(attributes))
+        else:
+            attr = json.loads(str(attributes))
 
-                if source_rse_id in unavailable_read_rse_ids:
-                    continue
+    # parse source expression
+    allowed_rses = None
+    source_replica_expression = attr["source_replica_expression"] if (attr and "source_replica_expression" in attr) else None
+    if source_replica_expression:
+        try:
+            allowed_rses = [x['rse'] for x in parse_expression(source_replica_expression, session=cache.session)]
+        except InvalidRSEExpression, e:
+            logging.error("Invalid RSE exception %s: %s" % (source_replica_expression, e))
+            return None, 'no_source'
 
-                # Get destination rse information and protocol
-                if dest_rse_id not in rses_info:
-                    dest_rse = rse_core.get_rse_name(rse_id=dest_rse_id, session=session)
-                    rses_info[dest_rse_id] = rsemgr.get_rse_info(dest_rse, session=session)
-                if dest_rse_id not in rse_attrs:
-                    rse_attrs[dest_rse_id] = get_rse_attributes(dest_rse_id, session=session)
-
-                attr = None
-                if attributes:
-                    if type(attributes) is dict:
-                        attr = json.loads(json.dumps(attributes))
-                    else:
-                        attr = json.loads(str(attributes))
-
-                # parse source expression
-                source_replica_expression = attr["source_replica_expression"] if (attr and "source_replica_expression" in attr) else None
-                if source_replica_expression:
-                    try:
-                        parsed_rses = parse_expression(source_replica_expression, session=session)
-                    except InvalidRSEExpression, e:
-                        logging.error("Invalid RSE exception %s: %s" % (source_replica_expression, e))
-                        continue
-                    else:
-                        allowed_rses = [x['rse'] for x in parsed_rses]
-                        if rse not in allowed_rses:
-                            continue
+    # parse allow tape source expression, not finally version.
+    # The first source is always allowed, the attribute only excludes the additional tape sources.
+    allow_tape_source = attr["allow_tape_source"] if (attr and "allow_tape_source" in attr) else True
 
-                # parse allow tape source expression, not finally version.
-                # allow_tape_source = attr["allow_tape_source"] if (attr and "allow_tape_source" in attr) else True
-                allow_tape_source = True
-
-                # Get protocol
-                if dest_rse_id not in protocols:
-                    try:
-                        protocols[dest_rse_id] = rsemgr.create_protocol(rses_info[dest_rse_id], 'write', current_schemes)
-                    except RSEProtocolNotSupported:
-                        logging.error('Operation "write" not supported by %s with schemes %s' % (rses_info[dest_rse_id]['rse'], current_schemes))
-                        if id in reqs_no_source:
-                            reqs_no_source.remove(id)
-                        if id not in reqs_scheme_mismatch:
-                            reqs_scheme_mismatch.append(id)
-                        continue
+    transfer, scheme_mismatch = None, False
+    for row in rows:
+        source_rse_id, rse, path, ranking, link_ranking = row[11], row[12], row[15], row[18], row[19]
+        if ranking is None:
+            ranking = 0
 
-                # get dest space token
-                dest_spacetoken = None
-                if protocols[dest_rse_id].attributes and \
-                   'extended_attributes' in protocols[dest_rse_id].attributes and \
-                   protocols[dest_rse_id].attributes['extended_attributes'] and \
-                   'space_token' in protocols[dest_rse_id].attributes['extended_attributes']:
-                    dest_spacetoken = protocols[dest_rse_id].attributes['extended_attributes']['space_token']
-
-                # Compute the destination url
-                if rses_info[dest_rse_id]['deterministic']:
-                    dest_url = protocols[dest_rse_id].lfns2pfns(lfns={'scope': scope, 'name': name}).values()[0]
-                else:
-                    # compute dest url in case of non deterministic
-                    # naming convention, etc.
-                    dsn = 'other'
-                    if attr and 'ds_name' in attr:
-                        dsn = attr["ds_name"]
+        # source_rse_id will be None if no source replicas
+        # rse will be None if rse is staging area
+        if source_rse_id is None or rse is None:
+            continue
 
-                    else:
-                        # select a containing dataset
-                        for parent in did.list_parent_dids(scope, name):
-                            if parent['type'] == DIDType.DATASET:
-                                dsn = parent['name']
-                                break
-                    # DQ2 path always starts with /, but prefix might not end with /
-                    naming_convention = rse_attrs[dest_rse_id].get('naming_convention', None)
-                    dest_path = construct_surl(dsn, name, naming_convention)
-                    if rses_info[dest_rse_id]['rse_type'] == RSEType.TAPE or rses_info[dest_rse_id]['rse_type'] == 'TAPE':
-                        if retry_count or activity == 'Recovery':
-                            dest_path = '%s_%i' % (dest_path, int(time.time()))
-
-                    dest_url = protocols[dest_rse_id].lfns2pfns(lfns={'scope': scope, 'name': name, 'path': dest_path}).values()[0]
-
-                # get allowed source scheme
-
-                # TODO Change this to get the schema compatibilities from a better/centralized place
-                # scheme_map = {'srm': ['srm', 'gsiftp'], 'gsiftp': ['srm', 'gsiftp'], 'https': ['https', 'davs', 's3'], 'davs': ['https', 'davs'], 's3': ['https', 's3']}
-                # src_schemes = scheme_map.get(dest_scheme, [dest_scheme])
-
-                src_schemes = []
-                dest_scheme = dest_url.split("://")[0]
-                if dest_scheme in ['srm', 'gsiftp']:
-                    src_schemes = ['srm', 'gsiftp']
-                elif dest_scheme in ['https']:
-                    src_schemes = ['https', 'davs', 's3']
-                elif dest_scheme in ['davs']:
-                    src_schemes = ['https', 'davs']
-                elif dest_scheme in ['s3']:
-                    src_schemes = ['https', 's3']
-                else:
-                    src_schemes = [dest_scheme]
-
-                # Compute the sources: urls, etc
-                if source_rse_id not in rses_info:
-                    # source_rse = rse_core.get_rse_name(rse_id=source_rse_id, session=session)
-                    source_rse = rse
-                    rses_info[source_rse_id] = rsemgr.get_rse_info(source_rse, session=session)
-
-                # Get protocol
-                source_rse_id_key = '%s_%s' % (source_rse_id, '_'.join(src_schemes))
-                if source_rse_id_key not in protocols:
-                    try:
-                        protocols[source_rse_id_key] = rsemgr.create_protocol(rses_info[source_rse_id], 'read', src_schemes)
-                    except RSEProtocolNotSupported:
-                        logging.error('Operation "read" not supported by %s with schemes %s' % (rses_info[source_rse_id]['rse'], src_schemes))
-                        if id in reqs_no_source:
-                            reqs_no_source.remove(id)
-                        if id not in reqs_scheme_mismatch:
-                            reqs_scheme_mismatch.append(id)
-                        continue
+        if link_ranking is None:
+            logging.debug("Request %s: no link from %s to %s" % (id, source_rse_id, dest_rse_id))
+            continue
 
-                source_url = protocols[source_rse_id_key].lfns2pfns(lfns={'scope': scope, 'name': name, 'path': path}).values()[0]
-
-                # Extend the metadata dictionary with request attributes
-                overwrite, bring_online = True, None
-                if rses_info[source_rse_id]['rse_type'] == RSEType.TAPE or rses_info[source_rse_id]['rse_type'] == 'TAPE':
-                    bring_online = bring_online_local
-                    transfer_src_type = "TAPE"
-                    if not allow_tape_source:
-                        if id not in reqs_only_tape_source:
-                            reqs_only_tape_source.append(id)
-                        if id in reqs_no_source:
-                            reqs_no_source.remove(id)
-                        continue
+        if source_rse_id in unavailable_read_rse_ids:
+            continue
 
-                if rses_info[dest_rse_id]['rse_type'] == RSEType.TAPE or rses_info[dest_rse_id]['rse_type'] == 'TAPE':
-                    overwrite = False
-                    transfer_dst_type = "TAPE"
+        if allowed_rses is not None and rse not in allowed_rses:
+            continue
 
-                # get external_host
-                fts_hosts = rse_attrs[dest_rse_id].get('fts', None)
-                if not fts_hosts:
-                    logging.error('Source RSE %s FTS attribute not defined - SKIP REQUEST %s' % (rse, id))
-                    continue
-                if retry_count is None:
-                    retry_count = 0
-                fts_list = fts_hosts.split(",")
+        if transfer is None:
+            dest_rse_info = cache.get_rse_info(dest_rse_id)
+            dest_rse_attrs = cache.get_rse_attributes(dest_rse_id)
 
-                external_host = fts_list[0]
-                if retry_other_fts:
-                    external_host = fts_list[retry_count % len(fts_list)]
+            # Get protocol
+            dest_protocol = cache.get_protocol(dest_rse_id, 'write', current_schemes)
+            if dest_protocol is None:
+                scheme_mismatch = True
+                continue
 
-                if id in reqs_no_source:
-                    reqs_no_source.remove(id)
-                if id in reqs_only_tape_source:
-                    reqs_only_tape_source.remove(id)
+            # get dest space token
+            dest_spacetoken = None
+            if dest_protocol.attributes and \
+               'extended_attributes' in dest_protocol.attributes and \
+               dest_protocol.attributes['extended_attributes'] and \
+               'space_token' in dest_protocol.attributes['extended_attributes']:
+                dest_spacetoken = dest_protocol.attributes['extended_attributes']['space_token']
+
+            # Compute the destination url
+            if dest_rse_info['deterministic']:
+                dest_url = dest_protocol.lfns2pfns(lfns={'scope': scope, 'name': name}).values()[0]
+            else:
+                # compute dest url in case of non deterministic
+                # naming convention, etc.
+                dsn = 'other'
+                if attr and 'ds_name' in attr:
+                    dsn = attr["ds_name"]
 
-                file_metadata = {'request_id': id,
-                                 'scope': scope,
-                                 'name': name,
-                                 'activity': activity,
-                                 'request_type': str(RequestType.TRANSFER).lower(),
-                                 'src_type': transfer_src_type,
-                                 'dst_type': transfer_dst_type,
-                                 'src_rse': rse,
-                                 'dst_rse': rses_info[dest_rse_id]['rse'],
-                                 'src_rse_id': source_rse_id,
-                                 'dest_rse_id': dest_rse_id,
-                                 'filesize': bytes,
-                                 'md5': md5,
-                                 'adler32': adler32,
-                                 'verify_checksum': rse_attrs[dest_rse_id].get('verify_checksum', True)}
+                else:
+                    # select a containing dataset
+                    for parent in did.list_parent_dids(scope, name, session=cache.session):
+                        if parent['type'] == DIDType.DATASET:
+                            dsn = parent['name']
+                            break
+                # DQ2 path always starts with /, but prefix might not end with /
+                naming_convention = dest_rse_attrs.get('naming_convention', None)
+                dest_path = construct_surl(dsn, name, naming_convention)
+                if __is_tape(dest_rse_info):
+                    if retry_count or activity == 'Recovery':
+                        dest_path = '%s_%i' % (dest_path, int(time.time()))
+
+                dest_url = dest_protocol.lfns2pfns(lfns={'scope': scope, 'name': name, 'path': dest_path}).values()[0]
+
+            # get allowed source scheme
+
+            # TODO Change this to get the schema compatibilities from a better/centralized place
+            # scheme_map = {'srm': ['srm', 'gsiftp'], 'gsiftp': ['srm', 'gsiftp'], 'https': ['https', 'davs', 's3'], 'davs': ['https', 'davs'], 's3': ['https', 's3']}
+            # src_schemes = scheme_map.get(dest_scheme, [dest_scheme])
+
+            src_schemes = []
+            dest_scheme = dest_url.split("://")[0]
+            if dest_scheme in ['srm', 'gsiftp']:
+                src_schemes = ['srm', 'gsiftp']
+            elif dest_scheme in ['https']:
+                src_schemes = ['https', 'davs', 's3']
+            elif dest_scheme in ['davs']:
+                src_schemes = ['https', 'davs']
+            elif dest_scheme in ['s3']:
+                src_schemes = ['https', 's3']
+            else:
+                src_schemes = [dest_scheme]
 
-                if previous_attempt_id:
-                    file_metadata['previous_attempt_id'] = previous_attempt_id
+            # Get protocol
+            source_rse_info = cache.get_rse_info(source_rse_id, rse)
+            source_protocol = cache.get_protocol(source_rse_id, 'read', src_schemes)
+            if source_protocol is None:
+                scheme_mismatch = True
+                continue
 
-                transfers[id] = {'request_id': id,
-                                 'schemes': src_schemes,
-                                 # 'src_urls': [source_url],
-                                 'sources': [(rse, source_url, source_rse_id, ranking if ranking is not None else 0, link_ranking)],
-                                 'dest_urls': [dest_url],
-                                 'src_spacetoken': None,
-                                 'dest_spacetoken': dest_spacetoken,
-                                 'overwrite': overwrite,
-                                 'bring_online': bring_online,
-                                 'copy_pin_lifetime': attr.get('lifetime', -1),
-                                 'external_host': external_host,
-                                 'selection_strategy': 'auto',
-                                 'rule_id': rule_id,
-                                 'file_metadata': file_metadata}
+            # Extend the metadata dictionary with request attributes
+            overwrite, transfer_bring_online = True, None
+            transfer_src_type, transfer_dst_type = "DISK", "DISK"
+            if __is_tape(source_rse_info):
+                transfer_bring_online = bring_online
+                transfer_src_type = "TAPE"
+
+            if __is_tape(dest_rse_info):
+                overwrite = False
+                transfer_dst_type = "TAPE"
+
+            # get external_host
+            fts_hosts = dest_rse_attrs.get('fts', None)
+            if not fts_hosts:
+                logging.error('Source RSE %s FTS attribute not defined - SKIP REQUEST %s' % (rse, id))
+                continue
+            fts_list = fts_hosts.split(",")
+
+            external_host = fts_list[0]
+            if retry_other_fts:
+                external_host = fts_list[(retry_count or 0) % len(fts_list)]
+
+            file_metadata = {'request_id': id,
+                             'scope': scope,
+                             'name': name,
+                             'activity': activity,
+                             'request_type': str(RequestType.TRANSFER).lower(),
+                             'src_type': transfer_src_type,
+                             'dst_type': transfer_dst_type,
+                             'src_rse': rse,
+                             'dst_rse': dest_rse_info['rse'],
+                             'src_rse_id': source_rse_id,
+                             'dest_rse_id': dest_rse_id,
+                             'filesize': bytes,
+                             'md5': md5,
+                             'adler32': adler32,
+                             'verify_checksum': dest_rse_attrs.get('verify_checksum', True)}
+
+            if previous_attempt_id:
+                file_metadata['previous_attempt_id'] = previous_attempt_id
+
+            transfer = {'request_id': id,
+                        'schemes': src_schemes,
+                        # The sources are (rse, protocol, path, source_rse_id, ranking, link_ranking) until their urls are computed
+                        'sources': [(rse, source_protocol, path, source_rse_id, ranking, link_ranking)],
+                        'dest_urls': [dest_url],
+                        'src_spacetoken': None,
+                        'dest_spacetoken': dest_spacetoken,
+                        'overwrite': overwrite,
+                        'bring_online': transfer_bring_online,
+                        'copy_pin_lifetime': attr.get('lifetime', -1) if attr else -1,
+                        'external_host': external_host,
+                        'selection_strategy': 'auto',
+                        'rule_id': rule_id,
+                        'file_metadata': file_metadata}
+            continue
+
+        # TAPE should not mixed with Disk and should not use as first try
+        # If there is a source whose ranking is no less than the Tape ranking, Tape will not be used.
+        if __is_tape(cache.get_rse_info(source_rse_id, rse)):
+            # current src_rse is Tape
+            if not allow_tape_source:
+                continue
+            if not transfer['bring_online']:
+                # the sources already founded are disks.
+                if __top_ranking(transfer['sources']) >= ranking:
+                    # current Tape source is not the highest ranking, will use disk sources
+                    continue
+                transfer['sources'] = []
+                transfer['bring_online'] = bring_online
+                transfer['file_metadata']['src_type'] = "TAPE"
+                transfer['file_metadata']['src_rse'] = rse
             else:
-                schemes = transfers[id]['schemes']
-
-                # source_rse_id will be None if no source replicas
-                # rse will be None if rse is staging area
-                if source_rse_id is None or rse is None:
+                # the sources already founded is Tape too.
+                # multiple Tape source replicas are not allowed in FTS3.
+                if transfer['sources'][0][4] > ranking or (transfer['sources'][0][4] == ranking and transfer['sources'][0][5] >= link_ranking):
                     continue
+                transfer['sources'] = []
+                transfer['bring_online'] = bring_online
+                transfer['file_metadata']['src_rse'] = rse
+        elif transfer['bring_online']:
+            # current src_rse is Disk, the founded sources are Tape
+            if ranking >= __top_ranking(transfer['sources']):
+                # current disk replica has higher ranking than founded sources
+                # remove founded Tape sources
+                transfer['sources'] = []
+                transfer['bring_online'] = None
+                transfer['file_metadata']['src_type'] = "DISK"
+                transfer['file_metadata']['src_rse'] = rse
+            else:
+                continue
 
-                if link_ranking is None:
-                    logging.debug("Request %s: no link from %s to %s" % (id, source_rse_id, dest_rse_id))
-                    continue
+        # Get protocol
+        source_protocol = cache.get_protocol(source_rse_id, 'read', transfer['schemes'])
+        if source_protocol is None:
+            continue
+        transfer['sources'].append((rse, source_protocol, path, source_rse_id, ranking, link_ranking))
 
-                if source_rse_id in unavailable_read_rse_ids:
-                    continue
+    if transfer:
+        return transfer, 'transfer'
+    return None, 'scheme_mismatch' if scheme_mismatch else 'no_source'
 
-                attr = None
-                if attributes:
-                    if type(attributes) is dict:
-                        attr = json.loads(json.dumps(attributes))
-                    else:
-                        attr = json.loads(str(attributes))
-
-                # parse source expression
-                source_replica_expression = attr["source_replica_expression"] if (attr and "source_replica_expression" in attr) else None
-                if source_replica_expression:
-                    try:
-                        parsed_rses = parse_expression(source_replica_expression, session=session)
-                    except InvalidRSEExpression, e:
-                        logging.error("Invalid RSE exception %s: %s" % (source_replica_expression, e))
-                        continue
-                    else:
-                        allowed_rses = [x['rse'] for x in parsed_rses]
-                        if rse not in allowed_rses:
-                            continue
 
-                # parse allow tape source expression, not finally version.
-                allow_tape_source = attr["allow_tape_source"] if (attr and "allow_tape_source" in attr) else True
-
-                # Compute the sources: urls, etc
-                if source_rse_id not in rses_info:
-                    # source_rse = rse_core.get_rse_name(rse_id=source_rse_id, session=session)
-                    source_rse = rse
-                    rses_info[source_rse_id] = rsemgr.get_rse_info(source_rse, session=session)
-
-                if ranking is None:
-                    ranking = 0
-                # TAPE should not mixed with Disk and should not use as first try
-                # If there is a source whose ranking is no less than the Tape ranking, Tape will not be used.
-                if rses_info[source_rse_id]['rse_type'] == RSEType.TAPE or rses_info[source_rse_id]['rse_type'] == 'TAPE':
-                    # current src_rse is Tape
-                    if not allow_tape_source:
-                        continue
-                    if not transfers[id]['bring_online']:
-                        # the sources already founded are disks.
-
-                        avail_top_ranking = None
-                        founded_sources = transfers[id]['sources']
-                        for founded_source in founded_sources:
-                            if avail_top_ranking is None:
-                                avail_top_ranking = founded_source[3]
-                                continue
-                            if founded_source[3] is not None and founded_source[3] > avail_top_ranking:
-                                avail_top_ranking = founded_source[3]
+def __compute_source_urls(transfers):
+    """
+    Compute the source urls of a block of transfers, with one lfns2pfns_bulk call per protocol.
 
-                        if avail_top_ranking >= ranking:
-                            # current Tape source is not the highest ranking, will use disk sources
-                            continue
-                        else:
-                            transfers[id]['sources'] = []
-                            transfers[id]['bring_online'] = bring_online_local
-                            transfer_src_type = "TAPE"
-                            transfers[id]['file_metadata']['src_type'] = transfer_src_type
-                            transfers[id]['file_metadata']['src_rse'] = rse
-                    else:
-                        # the sources already founded is Tape too.
-                        # multiple Tape source replicas are not allowed in FTS3.
-                        if transfers[id]['sources'][0][3] > ranking or (transfers[id]['sources'][0][3] == ranking and transfers[id]['sources'][0][4] >= link_ranking):
-                            continue
-                        else:
-                            transfers[id]['sources'] = []
-                            transfers[id]['bring_online'] = bring_online_local
-                            transfers[id]['file_metadata']['src_rse'] = rse
-                else:
-                    # current src_rse is Disk
-                    if transfers[id]['bring_online']:
-                        # the founded sources are Tape
-
-                        avail_top_ranking = None
-                        founded_sources = transfers[id]['sources']
-                        for founded_source in founded_sources:
-                            if avail_top_ranking is None:
-                                avail_top_ranking = founded_source[3]
-                                continue
-                            if founded_source[3] is not None and founded_source[3] > avail_top_ranking:
-                                avail_top_ranking = founded_source[3]
-
-                        if ranking >= avail_top_ranking:
-                            # current disk replica has higher ranking than founded sources
-                            # remove founded Tape sources
-                            transfers[id]['sources'] = []
-                            transfers[id]['bring_online'] = None
-                            transfer_src_type = "DISK"
-                            transfers[id]['file_metadata']['src_type'] = transfer_src_type
-                            transfers[id]['file_metadata']['src_rse'] = rse
-                        else:
-                            continue
+    :param transfers:  List of transfers with (rse, protocol, path, source_rse_id, ranking, link_ranking) sources.
+    :returns:          List of the transfers whose urls could be computed, the sources are (rse, source_url, source_rse_id, ranking, link_ranking).
+    """
+    lfns = {}
+    for transfer in transfers:
+        for rse, protocol, path, source_rse_id, ranking, link_ranking in transfer['sources']:
+            lfns.setdefault(protocol, []).append((transfer['file_metadata']['scope'], transfer['file_metadata']['name'], path))
 
-                # Get protocol
-                source_rse_id_key = '%s_%s' % (source_rse_id, '_'.join(schemes))
-                if source_rse_id_key not in protocols:
-                    try:
-                        protocols[source_rse_id_key] = rsemgr.create_protocol(rses_info[source_rse_id], 'read', schemes)
-                    except RSEProtocolNotSupported:
-                        logging.error('Operation "read" not supported by %s with schemes %s' % (rses_info[source_rse_id]['rse'], schemes))
-                        if id not in reqs_scheme_mismatch:
-                            reqs_scheme_mismatch.append(id)
-                        continue
-                source_url = protocols[source_rse_id_key].lfns2pfns(lfns={'scope': scope, 'name': name, 'path': path}).values()[0]
+    urls = {}
+    for protocol, protocol_lfns in lfns.iteritems():
+        try:
+            pfns = protocol.lfns2pfns_bulk(protocol_lfns)
+        except:
+            logging.warning("Failed to compute source urls in bulk, computing them one by one: %s" % traceback.format_exc())
+            pfns = []
+            for lfn in protocol_lfns:
+                try:
+                    pfns.append(protocol.lfns2pfns_bulk([lfn])[0])
+                except:
+                    logging.critical("Exception happened when trying to get the source url of %s:%s: %s" % (lfn[0], lfn[1], traceback.format_exc()))
+                    pfns.append(None)
+        for lfn, pfn in zip(protocol_lfns, pfns):
+            urls[(protocol, lfn)] = pfn
+
+    result = []
+    for transfer in transfers:
+        sources = []
+        for rse, protocol, path, source_rse_id, ranking, link_ranking in transfer['sources']:
+            source_url = urls[(protocol, (transfer['file_metadata']['scope'], transfer['file_metadata']['name'], path))]
+            if source_url is not None:
+                sources.append((rse, source_url, source_rse_id, ranking, link_ranking))
+        if sources:
+            transfer['sources'] = sources
+            result.append(transfer)
+    return result
 
-                # transfers[id]['src_urls'].append((source_rse_id, source_url))
-                transfers[id]['sources'].append((rse, source_url, source_rse_id, ranking, link_ranking))
 
+@read_session
+def get_transfers_from_sources(req_sources, schemes=None, bring_online=43200, retry_other_fts=False, failover_schemes=None, block_size=1000, session=None):
+    """
+    Build the transfers from a stream of request x source rows.
+
+    The rows are grouped by request as they arrive, they must be ordered by request id. The sources of every request
+    are selected in one pass, then the source urls are computed in blocks of requests, one bulk call per protocol.
+
+    :param req_sources:       Iterable of rows as returned by request.list_transfer_requests_and_source_replicas.
+    :param schemes:           List of allowed schemes.
+    :param bring_online:      Bring online timeout for tape sources.
+    :param retry_other_fts:   Retry the requests on the other FTS hosts of the destination.
+    :param failover_schemes:  List of schemes for the retried requests.
+    :param block_size:        Number of requests per block of source url computation.
+    :param session:           The database session in use.
+    :returns:                 (transfers, reqs_no_source, reqs_scheme_mismatch, reqs_only_tape_source), reqs_only_tape_source is
+                              always empty as the first source of a request is used even if it is a tape.
+    """
+    unavailable_read_rse_ids = set(get_unavailable_read_rse_ids(session=session))
+    cache = TransferProtocolCache(session=session)
+
+    transfers, reqs_no_source, reqs_scheme_mismatch, reqs_only_tape_source = {}, [], [], []
+    block = []
+    for id, rows in itertools.groupby(req_sources, key=lambda row: row[0]):
+        try:
+            transfer, outcome = __build_transfer(rows=list(rows), cache=cache, unavailable_read_rse_ids=unavailable_read_rse_ids,
+                                                 schemes=schemes, bring_online=bring_online, retry_other_fts=retry_other_fts,
+                                                 failover_schemes=failover_schemes)
         except:
             logging.critical("Exception happened when trying to get transfer for request %s: %s" % (id, traceback.format_exc()))
             break
 
+        if outcome == 'no_source':
+            reqs_no_source.append(id)
+        elif outcome == 'scheme_mismatch':
+            reqs_scheme_mismatch.append(id)
+        else:
+            block.append(transfer)
+            if len(block) >= block_size:
+                transfers.update([(t['request_id'], t) for t in __compute_source_urls(block)])
+                block = []
+
+    transfers.update([(t['request_id'], t) for t in __compute_source_urls(block)])
     return transfers, reqs_no_source, reqs_scheme_mismatch, reqs_only_tape_source
 
 
+@read_session
+def get_transfer_requests_and_source_replicas(process=None, total_processes=None, thread=None, total_threads=None,
+                                              limit=None, activity=None, older_than=None, rses=None, schemes=None,
+                                              bring_online=43200, retry_other_fts=False, failover_schemes=None, session=None):
+    req_sources = request.list_transfer_requests_and_source_replicas(process=process, total_processes=total_processes, thread=thread, total_threads=total_threads,
+                                                                     limit=limit, activity=activity, older_than=older_than, rses=rses, session=session)
+
+    return get_transfers_from_sources(req_sources, schemes=schemes, bring_online=bring_online, retry_other_fts=retry_other_fts,
+                                      failover_schemes=failover_schemes, session=session)
+
+
 @read_session
 def get_stagein_requests_and_source_replicas(process=None, total_processes=None, thread=None, total_threads=None, failover_schemes=None,
                                              limit=None, activity=None, older_than=None, rses=None, mock=False, schemes=None,
@@ -917,6 +974,11 @@ def get_transfers(process=None, total_processes=None, thread=None, total_threads
 
 
 def submit_transfer(external_host, job, submitter='submitter', cachedir=None, process=0, thread=0, timeout=None):
+    """
+    Submit a job to a FTS host and register the state of its requests.
+
+    :returns: The external id of the job, or None if the submission failed.
+    """
     # prepare submitting
     xfers_ret = {}
     try:
@@ -999,6 +1061,8 @@ def submit_transfer(external_host, job, submitter='submitter', cachedir=None, pr
                 request.cancel_request_external_id(eid, external_host)
         except:
             logging.error("%s:%s Failed to cancel transfers %s on %s with error: %s" % (process, thread, eid, external_host, traceback.format_exc()))
+        return None
+    return eid
 
 
 def schedule_requests():
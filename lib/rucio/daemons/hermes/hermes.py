@@ -18,7 +18,7 @@
 import json
 import logging
 import os
-import random
+import Queue
 import smtplib
 import socket
 import ssl
@@ -26,6 +26,7 @@ import sys
 import threading
 import time
 import traceback
+import uuid
 
 from email.mime.text import MIMEText
 from sqlalchemy.orm.exc import NoResultFound
@@ -142,6 +143,33 @@ class HermesListener(stomp.ConnectionListener):
         __init__
         '''
         self.__broker = broker
+        self.__receipts = {}
+        self.__lock = threading.Lock()
+
+    def expect_receipt(self, receipt):
+        '''
+        Register a receipt to wait for, returns the event set when it is received.
+        '''
+        event = threading.Event()
+        with self.__lock:
+            self.__receipts[receipt] = event
+        return event
+
+    def forget_receipt(self, receipt):
+        '''
+        Stop waiting for a receipt.
+        '''
+        with self.__lock:
+            self.__receipts.pop(receipt, None)
+
+    def on_receipt(self, headers, body):
+        '''
+        Receipt handler
+        '''
+        with self.__lock:
+            event = self.__receipts.pop(headers.get('receipt-id'), None)
+        if event:
+            event.set()
 
     def on_error(self, headers, body):
         '''
@@ -150,10 +178,172 @@ class HermesListener(stomp.ConnectionListener):
         logging.error('[broker] [%s]: %s', self.__broker, body)
 
 
+class BrokerSender(threading.Thread):
+    '''
+    Sender thread of one broker connection.
+
+    The messages of its queue are sent in batches, the last message of a batch requests a receipt
+    from the broker which confirms the whole batch.
+    '''
+    def __init__(self, conn, listener, connect, destination, delivered, failed,
+                 batch_size=100, queue_size=1000, receipt_timeout=30):
+        '''
+        :param conn: The STOMP connection.
+        :param listener: The HermesListener of the connection.
+        :param connect: Function called to (re)connect the connection.
+        :param destination: The destination of the messages.
+        :param delivered: Function called with the list of messages confirmed by the broker.
+        :param failed: Function called with the list of messages which could not be delivered.
+        :param batch_size: Maximum number of messages per receipt.
+        :param queue_size: Maximum number of messages queued for the broker.
+        :param receipt_timeout: Number of seconds to wait for a receipt.
+        '''
+        super(BrokerSender, self).__init__()
+        self.daemon = True
+        self.conn = conn
+        self.broker = conn.transport._Transport__host_and_ports[0][0]
+        self.listener = listener
+        self.connect = connect
+        self.destination = destination
+        self.delivered = delivered
+        self.failed = failed
+        self.batch_size = batch_size
+        self.receipt_timeout = receipt_timeout
+        self.queue = Queue.Queue(queue_size)
+        self.healthy = True
+        self.stopped = threading.Event()
+
+    def stop(self):
+        '''
+        Stop the thread once its queue is empty.
+        '''
+        self.stopped.set()
+
+    def __next_batch(self):
+        '''
+        Take the next batch of messages from the queue, waits at most one second for the first one.
+        '''
+        try:
+            batch = [self.queue.get(timeout=1)]
+        except Queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Queue.Empty:
+                break
+        return batch
+
+    def __send(self, batch):
+        '''
+        Send a batch of messages, returns True if the broker confirmed it.
+        '''
+        if not self.conn.is_connected():
+            record_counter('daemons.hermes.reconnect.%s' % self.broker.split('.')[0])
+            self.connect(self.conn)
+
+        receipt = str(uuid.uuid4())
+        event = self.listener.expect_receipt(receipt)
+        try:
+            for i, message in enumerate(batch):
+                headers = {'persistent': 'true'}
+                if i == len(batch) - 1:
+                    headers['receipt'] = receipt
+                self.conn.send(body=message['body'], destination=self.destination, headers=headers)
+            if not event.wait(self.receipt_timeout):
+                logging.warn('[broker] [%s]: no receipt for %i messages after %s seconds', self.broker, len(batch), self.receipt_timeout)
+                return False
+            return True
+        finally:
+            self.listener.forget_receipt(receipt)
+
+    def run(self):
+        '''
+        Main loop of the sender.
+        '''
+        while not (self.stopped.is_set() and self.queue.empty()):
+            batch = self.__next_batch()
+            if not batch:
+                continue
+            if self.stopped.is_set() and not self.healthy:
+                # Do not retry an unavailable broker on shutdown, the messages stay in the table
+                self.failed(batch)
+                continue
+            try:
+                success = self.__send(batch)
+            except stomp.exception.NotConnectedException as error:
+                logging.warn('Could not deliver message due to NotConnectedException: %s', str(error))
+                success = False
+            except stomp.exception.ConnectFailedException as error:
+                logging.warn('Could not deliver message due to ConnectFailedException: %s', str(error))
+                success = False
+            except Exception as error:
+                logging.warn('Could not deliver message: %s', str(error))
+                logging.critical(traceback.format_exc())
+                success = False
+
+            self.healthy = success
+            if success:
+                record_counter('daemons.hermes.delivered', delta=len(batch))
+                self.delivered(batch)
+            else:
+                record_counter('daemons.hermes.failed', delta=len(batch))
+                self.failed(batch)
+
+
+class MessageDeleter(threading.Thread):
+    '''
+    Deleter thread, deletes and archives the delivered messages in bulks.
+    '''
+    def __init__(self, done, bulk=1000, delay=1):
+        '''
+        :param done: Function called with the list of deleted messages.
+        :param bulk: Maximum number of messages per deletion.
+        :param delay: Maximum number of seconds a delivered message waits for its deletion.
+        '''
+        super(MessageDeleter, self).__init__()
+        self.daemon = True
+        self.done = done
+        self.bulk = bulk
+        self.delay = delay
+        self.queue = Queue.Queue()
+        self.stopped = threading.Event()
+
+    def stop(self):
+        '''
+        Stop the thread once its queue is empty.
+        '''
+        self.stopped.set()
+
+    def run(self):
+        '''
+        Main loop of the deleter.
+        '''
+        while not (self.stopped.is_set() and self.queue.empty()):
+            to_delete = []
+            deadline = time.time() + self.delay
+            while len(to_delete) < self.bulk:
+                try:
+                    to_delete.append(self.queue.get(timeout=max(deadline - time.time(), 0.01)))
+                except Queue.Empty:
+                    break
+            if not to_delete:
+                continue
+            try:
+                delete_messages(to_delete)
+            except Exception:
+                logging.critical(traceback.format_exc())
+            self.done(to_delete)
+
+
 def deliver_messages(once=False, brokers_resolved=None, thread=0, bulk=1000, delay=10,
-                     broker_timeout=3, broker_retry=3):
+                     broker_timeout=3, broker_retry=3, send_batch=100, receipt_timeout=30):
     '''
     Main loop to deliver messages to a broker.
+
+    The messages are dispatched to one sender thread per broker, the delivered messages
+    are deleted in bulks by a deleter thread. New messages are only retrieved while less
+    than two bulks of messages are in flight.
     '''
     logging.info('[broker] starting - threads (%i) bulk (%i)', thread, bulk)
 
@@ -174,7 +364,36 @@ def deliver_messages(once=False, brokers_resolved=None, thread=0, bulk=1000, del
         password = config_get('messaging-hermes', 'password')
         port = config_get_int('messaging-hermes', 'nonssl_port')
 
-    conns = []
+    def connect(conn):
+        ''' (Re)connect a broker connection. '''
+        host_and_ports = conn.transport._Transport__host_and_ports[0][0]
+        conn.start()
+        if not use_ssl:
+            logging.info('[broker] connecting with USERPASS to %s', host_and_ports)
+            conn.connect(username, password, wait=True)
+        else:
+            logging.info('[broker] connecting with SSL to %s', host_and_ports)
+            conn.connect(wait=True)
+
+    destination = config_get('messaging-hermes', 'destination')
+
+    inflight = set()
+    inflight_condition = threading.Condition()
+
+    def release(messages):
+        ''' Remove messages from the messages in flight. '''
+        with inflight_condition:
+            inflight.difference_update([message['id'] for message in messages])
+            inflight_condition.notify_all()
+
+    deleter = MessageDeleter(done=release, bulk=bulk)
+
+    def delivered(messages):
+        ''' Queue the delivered messages for deletion. '''
+        for message in messages:
+            deleter.queue.put(message['to_delete'])
+
+    senders = []
     for broker in brokers_resolved:
         if not use_ssl:
             logging.info('[broker] setting up username/password authentication: %s' % broker)
@@ -191,11 +410,12 @@ def deliver_messages(once=False, brokers_resolved=None, thread=0, bulk=1000, del
                                      keepalive=True,
                                      timeout=broker_timeout)
 
-        con.set_listener('rucio-hermes',
-                         HermesListener(con.transport._Transport__host_and_ports[0]))
+        listener = HermesListener(con.transport._Transport__host_and_ports[0])
+        con.set_listener('rucio-hermes', listener)
 
-        conns.append(con)
-    destination = config_get('messaging-hermes', 'destination')
+        senders.append(BrokerSender(conn=con, listener=listener, connect=connect, destination=destination,
+                                    delivered=delivered, failed=release, batch_size=send_batch,
+                                    queue_size=bulk, receipt_timeout=receipt_timeout))
 
     executable = 'hermes [broker]'
     hostname = socket.getfqdn()
@@ -206,7 +426,12 @@ def deliver_messages(once=False, brokers_resolved=None, thread=0, bulk=1000, del
     sanity_check(executable=executable, hostname=hostname, pid=pid, thread=heartbeat_thread)
     GRACEFUL_STOP.wait(1)
 
+    deleter.start()
+    for sender in senders:
+        sender.start()
+
     while not GRACEFUL_STOP.is_set():
+        messages = []
         try:
             t_start = time.time()
 
@@ -214,117 +439,58 @@ def deliver_messages(once=False, brokers_resolved=None, thread=0, bulk=1000, del
                              thread=heartbeat_thread)
 
             logging.debug('[broker] %i:%i - using: %s', heartbeat['assign_thread'],
-                          heartbeat['nr_threads'],
-                          [conn.transport._Transport__host_and_ports[0][0] for conn in conns])
+                          heartbeat['nr_threads'], [sender.broker for sender in senders])
+
+            # Backpressure: wait for the brokers and the deletions to catch up
+            with inflight_condition:
+                while len(inflight) >= 2 * bulk and not GRACEFUL_STOP.is_set():
+                    inflight_condition.wait(1)
+                skip = set(inflight)
 
-            messages = retrieve_messages(bulk=bulk,
+            # The messages in flight are still in the table, retrieve enough rows to skip them
+            messages = retrieve_messages(bulk=bulk + len(skip),
                                          thread=heartbeat['assign_thread'],
-                                         total_threads=heartbeat['nr_threads'])
+                                         total_threads=heartbeat['nr_threads'],
+                                         lock=False)
+            messages = [message for message in messages if message['id'] not in skip][:bulk]
 
             if messages:
 
                 logging.debug('[broker] %i:%i - retrieved %i messages',
                               heartbeat['assign_thread'], heartbeat['nr_threads'],
                               len(messages))
-                to_delete = []
+                with inflight_condition:
+                    inflight.update([message['id'] for message in messages])
+
                 for message in messages:
+                    __log_message(message, heartbeat)
+                    to_delete = {'id': message['id'],
+                                 'created_at': message['created_at'],
+                                 'updated_at': message['created_at'],
+                                 'event_type': message['event_type']}
                     try:
-                        conn = random.sample(conns, 1)[0]
-                        if not conn.is_connected():
-                            host_and_ports = conn.transport._Transport__host_and_ports[0][0]
-                            record_counter('daemons.hermes.reconnect.%s' % host_and_ports.split('.')[0])
-                            conn.start()
-                            if not use_ssl:
-                                logging.info('[broker] %i:%i - connecting with USERPASS to %s',
-                                             heartbeat['assign_thread'],
-                                             heartbeat['nr_threads'],
-                                             host_and_ports)
-                                conn.connect(username, password, wait=True)
-                            else:
-                                logging.info('[broker] %i:%i - connecting with SSL to %s',
-                                             heartbeat['assign_thread'],
-                                             heartbeat['nr_threads'],
-                                             host_and_ports)
-                                conn.connect(wait=True)
-                        conn.send(body=json.dumps({'event_type': str(message['event_type']).lower(),
-                                                   'payload': message['payload'],
-                                                   'created_at': str(message['created_at'])}),
-                                  destination=destination,
-                                  headers={'persistent': 'true'})
-                        to_delete.append({'id': message['id'],
-                                          'created_at': message['created_at'],
-                                          'updated_at': message['created_at'],
-                                          'payload': json.dumps(message['payload']),
-                                          'event_type': message['event_type']})
+                        body = json.dumps({'event_type': str(message['event_type']).lower(),
+                                           'payload': message['payload'],
+                                           'created_at': str(message['created_at'])})
+                        to_delete['payload'] = json.dumps(message['payload'])
                     except ValueError:
                         logging.warn('Cannot serialize payload to JSON: %s',
                                      str(message['payload']))
-                        to_delete.append({'id': message['id'],
-                                          'created_at': message['created_at'],
-                                          'updated_at': message['created_at'],
-                                          'payload': str(message['payload']),
-                                          'event_type': message['event_type']})
-                        continue
-                    except stomp.exception.NotConnectedException as error:
-                        logging.warn('Could not deliver message due to NotConnectedException: %s',
-                                     str(error))
-                        continue
-                    except stomp.exception.ConnectFailedException as error:
-                        logging.warn('Could not deliver message due to ConnectFailedException: %s',
-                                     str(error))
-                        continue
-                    except Exception as error:
-                        logging.warn('Could not deliver message: %s', str(error))
-                        logging.critical(traceback.format_exc())
+                        to_delete['payload'] = str(message['payload'])
+                        deleter.queue.put(to_delete)
                         continue
 
-                    if str(message['event_type']).lower().startswith('transfer') or str(message['event_type']).lower().startswith('stagein'):
-                        logging.debug('[broker] %i:%i - event_type: %s, scope: %s, name: %s, rse: %s, request-id: %s, transfer-id: %s, created_at: %s',
-                                      heartbeat['assign_thread'], heartbeat['nr_threads'],
-                                      str(message['event_type']).lower(),
-                                      message['payload'].get('scope', None),
-                                      message['payload'].get('name', None),
-                                      message['payload'].get('dst-rse', None),
-                                      message['payload'].get('request-id', None),
-                                      message['payload'].get('transfer-id', None),
-                                      str(message['created_at']))
-
-                    elif str(message['event_type']).lower().startswith('dataset'):
-                        logging.debug('[broker] %i:%i - event_type: %s, scope: %s, name: %s, rse: %s, rule-id: %s, created_at: %s)',
-                                      heartbeat['assign_thread'],
-                                      heartbeat['nr_threads'],
-                                      str(message['event_type']).lower(),
-                                      message['payload']['scope'],
-                                      message['payload']['name'],
-                                      message['payload']['rse'],
-                                      message['payload']['rule_id'],
-                                      str(message['created_at']))
-
-                    elif str(message['event_type']).lower().startswith('deletion'):
-                        if 'url' not in message['payload']:
-                            message['payload']['url'] = 'unknown'
-                        logging.debug('[broker] %i:%i - event_type: %s, scope: %s, name: %s, rse: %s, url: %s, created_at: %s)',
-                                      heartbeat['assign_thread'],
-                                      heartbeat['nr_threads'],
-                                      str(message['event_type']).lower(),
-                                      message['payload']['scope'],
-                                      message['payload']['name'],
-                                      message['payload']['rse'],
-                                      message['payload']['url'],
-                                      str(message['created_at']))
-                    else:
-                        logging.debug('[broker] %i:%i - other message: %s',
-                                      heartbeat['assign_thread'], heartbeat['nr_threads'],
-                                      message)
+                    # Prefer the healthy brokers with the shortest queue
+                    sender = min(senders, key=lambda sender: (not sender.healthy, sender.queue.qsize()))
+                    sender.queue.put({'id': message['id'], 'body': body, 'to_delete': to_delete})
 
-                delete_messages(to_delete)
                 logging.info('[broker] %i:%i - submitted %i messages',
                              heartbeat['assign_thread'],
                              heartbeat['nr_threads'],
-                             len(to_delete))
+                             len(messages))
 
-                if once:
-                    break
+            if once:
+                break
 
         except NoResultFound:
             # silence this error: https://its.cern.ch/jira/browse/RUCIO-1699
@@ -332,22 +498,75 @@ def deliver_messages(once=False, brokers_resolved=None, thread=0, bulk=1000, del
         except:
             logging.critical(traceback.format_exc())
 
-        t_delay = delay - (time.time() - t_start)
-        t_delay = t_delay if t_delay > 0 else 0
-        if t_delay:
-            logging.debug('[broker] %i:%i - sleeping %s seconds',
-                          heartbeat['assign_thread'], heartbeat['nr_threads'], t_delay)
-        time.sleep(t_delay)
+        # Only wait if the last retrieval did not fill a bulk
+        if len(messages) < bulk:
+            t_delay = delay - (time.time() - t_start)
+            t_delay = t_delay if t_delay > 0 else 0
+            if t_delay:
+                logging.debug('[broker] %i:%i - sleeping %s seconds',
+                              heartbeat['assign_thread'], heartbeat['nr_threads'], t_delay)
+            GRACEFUL_STOP.wait(t_delay)
 
     logging.debug('[broker] %i:%i - graceful stop requested',
                   heartbeat['assign_thread'], heartbeat['nr_threads'])
 
+    for sender in senders:
+        sender.stop()
+    for sender in senders:
+        sender.join()
+    deleter.stop()
+    deleter.join()
+
     die(executable, hostname, pid, heartbeat_thread)
 
     logging.debug('[broker] %i:%i - graceful stop done', heartbeat['assign_thread'],
                   heartbeat['nr_threads'])
 
 
+def __log_message(message, heartbeat):
+    '''
+    Log the identifiers of a message.
+    '''
+    if str(message['event_type']).lower().startswith('transfer') or str(message['event_type']).lower().startswith('stagein'):
+        logging.debug('[broker] %i:%i - event_type: %s, scope: %s, name: %s, rse: %s, request-id: %s, transfer-id: %s, created_at: %s',
+                      heartbeat['assign_thread'], heartbeat['nr_threads'],
+                      str(message['event_type']).lower(),
+                      message['payload'].get('scope', None),
+                      message['payload'].get('name', None),
+                      message['payload'].get('dst-rse', None),
+                      message['payload'].get('request-id', None),
+                      message['payload'].get('transfer-id', None),
+                      str(message['created_at']))
+
+    elif str(message['event_type']).lower().startswith('dataset'):
+        logging.debug('[broker] %i:%i - event_type: %s, scope: %s, name: %s, rse: %s, rule-id: %s, created_at: %s)',
+                      heartbeat['assign_thread'],
+                      heartbeat['nr_threads'],
+                      str(message['event_type']).lower(),
+                      message['payload']['scope'],
+                      message['payload']['name'],
+                      message['payload']['rse'],
+                      message['payload']['rule_id'],
+                      str(message['created_at']))
+
+    elif str(message['event_type']).lower().startswith('deletion'):
+        if 'url' not in message['payload']:
+            message['payload']['url'] = 'unknown'
+        logging.debug('[broker] %i:%i - event_type: %s, scope: %s, name: %s, rse: %s, url: %s, created_at: %s)',
+                      heartbeat['assign_thread'],
+                      heartbeat['nr_threads'],
+                      str(message['event_type']).lower(),
+                      message['payload']['scope'],
+                      message['payload']['name'],
+                      message['payload']['rse'],
+                      message['payload']['url'],
+                      str(message['created_at']))
+    else:
+        logging.debug('[broker] %i:%i - other message: %s',
+                      heartbeat['assign_thread'], heartbeat['nr_threads'],
+                      message)
+
+
 def stop(signum=None, frame=None):
     '''
     Graceful exit.
@@ -32,7 +32,7 @@ from sqlalchemy.exc import DatabaseError
 
 from rucio.common.config import config_get
 from rucio.common.exception import DatabaseException, UnsupportedOperation, RuleNotFound
-from rucio.core.heartbeat import live, die, sanity_check
+from rucio.core.heartbeat import live, die, sanity_check, HeartbeatService
 from rucio.core.rule import delete_rule, get_expired_rules
 from rucio.core.monitor import record_counter
 from rucio.db.sqla.util import get_db_time
@@ -44,9 +44,11 @@ logging.basicConfig(stream=sys.stdout,
                     format='%(asctime)s\t%(process)d\t%(levelname)s\t%(message)s')
 
 
-def rule_cleaner(once=False):
+def rule_cleaner(once=False, heartbeat_service=None):
     """
     Main loop to check for expired replication rules
+
+    The heartbeats are sent by the heartbeat service of the process, if given.
     """
 
     hostname = socket.gethostname()
@@ -56,13 +58,19 @@ def rule_cleaner(once=False):
     paused_rules = {}  # {rule_id: datetime}
 
     # Make an initial heartbeat so that all judge-cleaners have the correct worker number on the next try
-    live(executable='rucio-judge-cleaner', hostname=hostname, pid=pid, thread=current_thread)
+    if heartbeat_service:
+        heartbeat_service.register(current_thread)
+    else:
+        live(executable='rucio-judge-cleaner', hostname=hostname, pid=pid, thread=current_thread)
     graceful_stop.wait(1)
 
     while not graceful_stop.is_set():
         try:
             # heartbeat
-            heartbeat = live(executable='rucio-judge-cleaner', hostname=hostname, pid=pid, thread=current_thread)
+            if heartbeat_service:
+                heartbeat = heartbeat_service.assignment(current_thread)
+            else:
+                heartbeat = live(executable='rucio-judge-cleaner', hostname=hostname, pid=pid, thread=current_thread)
 
             start = time.time()
 
@@ -124,7 +132,10 @@ def rule_cleaner(once=False):
         if once:
             break
 
-    die(executable='rucio-judge-cleaner', hostname=hostname, pid=pid, thread=current_thread)
+    if heartbeat_service:
+        heartbeat_service.unregister(current_thread)
+    else:
+        die(executable='rucio-judge-cleaner', hostname=hostname, pid=pid, thread=current_thread)
 
 
 def stop(signum=None, frame=None):
@@ -151,8 +162,11 @@ def run(once=False, threads=1):
         rule_cleaner(once)
     else:
         logging.info('Cleaner starting %s threads' % str(threads))
-        threads = [threading.Thread(target=rule_cleaner, kwargs={'once': once}) for i in xrange(0, threads)]
+        heartbeat_service = HeartbeatService(executable='rucio-judge-cleaner', hostname=hostname)
+        heartbeat_service.start()
+        threads = [threading.Thread(target=rule_cleaner, kwargs={'once': once, 'heartbeat_service': heartbeat_service}) for i in xrange(0, threads)]
         [t.start() for t in threads]
         # Interruptible joins require a timeout.
         while threads[0].is_alive():
             [t.join(timeout=3.14) for t in threads]
+        heartbeat_service.stop()
@@ -21,6 +21,7 @@ import threading
 import time
 import traceback
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from re import match
 from random import randint
@@ -30,8 +31,8 @@ from sqlalchemy.orm.exc import FlushError
 
 from rucio.common.config import config_get
 from rucio.common.exception import DatabaseException, DataIdentifierNotFound, ReplicationRuleCreationTemporaryFailed
-from rucio.core.heartbeat import live, die, sanity_check
-from rucio.core.rule import re_evaluate_did, get_updated_dids, delete_updated_did
+from rucio.core.heartbeat import live, die, sanity_check, HeartbeatService
+from rucio.core.rule import re_evaluate_did, get_updated_dids, delete_updated_dids
 from rucio.core.monitor import record_counter
 
 graceful_stop = threading.Event()
@@ -41,9 +42,13 @@ logging.basicConfig(stream=sys.stdout,
                     format='%(asctime)s\t%(process)d\t%(levelname)s\t%(message)s')
 
 
-def re_evaluator(once=False):
+def re_evaluator(once=False, bulk=1000, heartbeat_service=None):
     """
     Main loop to check the re-evaluation of dids.
+
+    The pending events of a did are coalesced: all the rows of a did fetched in one bulk
+    are evaluated together and deleted in the same transaction.
+    The heartbeats are sent by the heartbeat service of the process, if given.
     """
 
     hostname = socket.gethostname()
@@ -53,13 +58,19 @@ def re_evaluator(once=False):
     paused_dids = {}  # {(scope, name): datetime}
 
     # Make an initial heartbeat so that all judge-evaluators have the correct worker number on the next try
-    live(executable='rucio-judge-evaluator', hostname=hostname, pid=pid, thread=current_thread, older_than=60 * 30)
+    if heartbeat_service:
+        heartbeat_service.register(current_thread)
+    else:
+        live(executable='rucio-judge-evaluator', hostname=hostname, pid=pid, thread=current_thread, older_than=60 * 30)
     graceful_stop.wait(1)
 
     while not graceful_stop.is_set():
         try:
             # heartbeat
-            heartbeat = live(executable='rucio-judge-evaluator', hostname=hostname, pid=pid, thread=current_thread, older_than=60 * 30)
+            if heartbeat_service:
+                heartbeat = heartbeat_service.assignment(current_thread)
+            else:
+                heartbeat = live(executable='rucio-judge-evaluator', hostname=hostname, pid=pid, thread=current_thread, older_than=60 * 30)
 
             start = time.time()  # NOQA
 
@@ -69,7 +80,7 @@ def re_evaluator(once=False):
             # Select a bunch of dids for re evaluation for this worker
             dids = get_updated_dids(total_workers=heartbeat['nr_threads'] - 1,
                                     worker_number=heartbeat['assign_thread'],
-                                    limit=100,
+                                    limit=bulk,
                                     blacklisted_dids=[key for key in paused_dids])
             logging.debug('re_evaluator[%s/%s] index query time %f fetch size is %d' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, time.time() - start, len(dids)))
 
@@ -78,32 +89,29 @@ def re_evaluator(once=False):
                 logging.debug('re_evaluator[%s/%s] did not get any work (paused_dids=%s)' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, str(len(paused_dids))))
                 graceful_stop.wait(30)
             else:
-                done_dids = {}
+                # Coalesce the events of each did, keeping the order of the oldest event
+                grouped_dids = OrderedDict()
                 for did in dids:
+                    if (did.scope, did.name) not in grouped_dids:
+                        grouped_dids[(did.scope, did.name)] = {'actions': set(), 'ids': []}
+                    grouped_dids[(did.scope, did.name)]['actions'].add(did.rule_evaluation_action)
+                    grouped_dids[(did.scope, did.name)]['ids'].append(did.id)
+                record_counter('rule.judge.evaluator.coalesced_events', len(dids) - len(grouped_dids))
+
+                for (scope, name), events in grouped_dids.iteritems():
                     if graceful_stop.is_set():
                         break
 
-                    # Check if this did has already been operated on
-                    if '%s:%s' % (did.scope, did.name) in done_dids:
-                        if did.rule_evaluation_action in done_dids['%s:%s' % (did.scope, did.name)]:
-                            logging.debug('re_evaluator[%s/%s]: evaluation of %s:%s already done' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, did.scope, did.name))
-                            delete_updated_did(id=did.id)
-                            continue
-                    else:
-                        done_dids['%s:%s' % (did.scope, did.name)] = []
-
                     try:
                         start_time = time.time()
-                        re_evaluate_did(scope=did.scope, name=did.name, rule_evaluation_action=did.rule_evaluation_action)
-                        logging.debug('re_evaluator[%s/%s]: evaluation of %s:%s took %f' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, did.scope, did.name, time.time() - start_time))
-                        delete_updated_did(id=did.id)
-                        done_dids['%s:%s' % (did.scope, did.name)].append(did.rule_evaluation_action)
+                        re_evaluate_did(scope=scope, name=name, rule_evaluation_action=events['actions'], updated_did_ids=events['ids'])
+                        logging.debug('re_evaluator[%s/%s]: evaluation of %s:%s (%d events) took %f' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, scope, name, len(events['ids']), time.time() - start_time))
                     except DataIdentifierNotFound, e:
-                        delete_updated_did(id=did.id)
+                        delete_updated_dids(ids=events['ids'])
                     except (DatabaseException, DatabaseError), e:
                         if match('.*ORA-00054.*', str(e.args[0])):
-                            paused_dids[(did.scope, did.name)] = datetime.utcnow() + timedelta(seconds=randint(60, 600))
-                            logging.warning('re_evaluator[%s/%s]: Locks detected for %s:%s' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, did.scope, did.name))
+                            paused_dids[(scope, name)] = datetime.utcnow() + timedelta(seconds=randint(60, 600))
+                            logging.warning('re_evaluator[%s/%s]: Locks detected for %s:%s' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, scope, name))
                             record_counter('rule.judge.exceptions.LocksDetected')
                         elif match('.*QueuePool.*', str(e.args[0])):
                             logging.warning(traceback.format_exc())
@@ -116,10 +124,10 @@ def re_evaluator(once=False):
                             record_counter('rule.judge.exceptions.%s' % e.__class__.__name__)
                     except ReplicationRuleCreationTemporaryFailed, e:
                         record_counter('rule.judge.exceptions.%s' % e.__class__.__name__)
-                        logging.warning('re_evaluator[%s/%s]: Replica Creation temporary failed, retrying later for %s:%s' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, did.scope, did.name))
+                        logging.warning('re_evaluator[%s/%s]: Replica Creation temporary failed, retrying later for %s:%s' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, scope, name))
                     except FlushError, e:
                         record_counter('rule.judge.exceptions.%s' % e.__class__.__name__)
-                        logging.warning('re_evaluator[%s/%s]: Flush error for %s:%s' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, did.scope, did.name))
+                        logging.warning('re_evaluator[%s/%s]: Flush error for %s:%s' % (heartbeat['assign_thread'], heartbeat['nr_threads'] - 1, scope, name))
         except (DatabaseException, DatabaseError), e:
             if match('.*QueuePool.*', str(e.args[0])):
                 logging.warning(traceback.format_exc())
@@ -137,7 +145,10 @@ def re_evaluator(once=False):
         if once:
             break
 
-    die(executable='rucio-judge-evaluator', hostname=hostname, pid=pid, thread=current_thread)
+    if heartbeat_service:
+        heartbeat_service.unregister(current_thread)
+    else:
+        die(executable='rucio-judge-evaluator', hostname=hostname, pid=pid, thread=current_thread)
 
 
 def stop(signum=None, frame=None):
@@ -148,7 +159,7 @@ def stop(signum=None, frame=None):
     graceful_stop.set()
 
 
-def run(once=False, threads=1):
+def run(once=False, threads=1, bulk=1000):
     """
     Starts up the Judge-Eval threads.
     """
@@ -157,11 +168,14 @@ def run(once=False, threads=1):
     sanity_check(executable='rucio-judge-evaluator', hostname=hostname)
 
     if once:
-        re_evaluator(once)
+        re_evaluator(once, bulk=bulk)
     else:
         logging.info('Evaluator starting %s threads' % str(threads))
-        threads = [threading.Thread(target=re_evaluator, kwargs={'once': once}) for i in xrange(0, threads)]
+        heartbeat_service = HeartbeatService(executable='rucio-judge-evaluator', hostname=hostname, older_than=60 * 30)
+        heartbeat_service.start()
+        threads = [threading.Thread(target=re_evaluator, kwargs={'once': once, 'bulk': bulk, 'heartbeat_service': heartbeat_service}) for i in xrange(0, threads)]
         [t.start() for t in threads]
         # Interruptible joins require a timeout.
         while threads[0].is_alive():
             [t.join(timeout=3.14) for t in threads]
+        heartbeat_service.stop()
@@ -28,7 +28,7 @@ from sqlalchemy.exc import DatabaseError
 
 from rucio.common.config import config_get
 from rucio.common.exception import DatabaseException, RuleNotFound, RSEBlacklisted, ReplicationRuleCreationTemporaryFailed
-from rucio.core.heartbeat import live, die, sanity_check
+from rucio.core.heartbeat import live, die, sanity_check, HeartbeatService
 from rucio.core.rule import inject_rule, get_injected_rules
 from rucio.core.monitor import record_counter
 
@@ -39,9 +39,11 @@ logging.basicConfig(stream=sys.stdout,
                     format='%(asctime)s\t%(process)d\t%(levelname)s\t%(message)s')
 
 
-def rule_injector(once=False):
+def rule_injector(once=False, heartbeat_service=None):
     """
     Main loop to check for asynchronous creation of replication rules
+
+    The heartbeats are sent by the heartbeat service of the process, if given.
     """
 
     hostname = socket.gethostname()
@@ -51,13 +53,19 @@ def rule_injector(once=False):
     paused_rules = {}  # {rule_id: datetime}
 
     # Make an initial heartbeat so that all judge-inectors have the correct worker number on the next try
-    live(executable='rucio-judge-injector', hostname=hostname, pid=pid, thread=current_thread, older_than=2 * 60 * 60)
+    if heartbeat_service:
+        heartbeat_service.register(current_thread)
+    else:
+        live(executable='rucio-judge-injector', hostname=hostname, pid=pid, thread=current_thread, older_than=2 * 60 * 60)
     graceful_stop.wait(1)
 
     while not graceful_stop.is_set():
         try:
             # heartbeat
-            heartbeat = live(executable='rucio-judge-injector', hostname=hostname, pid=pid, thread=current_thread, older_than=2 * 60 * 60)
+            if heartbeat_service:
+                heartbeat = heartbeat_service.assignment(current_thread)
+            else:
+                heartbeat = live(executable='rucio-judge-injector', hostname=hostname, pid=pid, thread=current_thread, older_than=2 * 60 * 60)
 
             start = time.time()
 
@@ -126,7 +134,10 @@ def rule_injector(once=False):
         if once:
             break
 
-    die(executable='rucio-judge-injector', hostname=hostname, pid=pid, thread=current_thread)
+    if heartbeat_service:
+        heartbeat_service.unregister(current_thread)
+    else:
+        die(executable='rucio-judge-injector', hostname=hostname, pid=pid, thread=current_thread)
 
 
 def stop(signum=None, frame=None):
@@ -149,8 +160,11 @@ def run(once=False, threads=1):
         rule_injector(once)
     else:
         logging.info('Injector starting %s threads' % str(threads))
-        threads = [threading.Thread(target=rule_injector, kwargs={'once': once}) for i in xrange(0, threads)]
+        heartbeat_service = HeartbeatService(executable='rucio-judge-injector', hostname=hostname, older_than=2 * 60 * 60)
+        heartbeat_service.start()
+        threads = [threading.Thread(target=rule_injector, kwargs={'once': once, 'heartbeat_service': heartbeat_service}) for i in xrange(0, threads)]
         [t.start() for t in threads]
         # Interruptible joins require a timeout.
         while threads[0].is_alive():
             [t.join(timeout=3.14) for t in threads]
+        heartbeat_service.stop()
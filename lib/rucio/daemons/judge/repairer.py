@@ -28,7 +28,7 @@ from sqlalchemy.exc import DatabaseError
 
 from rucio.common.config import config_get
 from rucio.common.exception import DatabaseException
-from rucio.core.heartbeat import live, die, sanity_check
+from rucio.core.heartbeat import live, die, sanity_check, HeartbeatService
 from rucio.core.rule import repair_rule, get_stuck_rules
 from rucio.core.monitor import record_counter
 
@@ -39,9 +39,11 @@ logging.basicConfig(filename='%s/%s.log' % (config_get('common', 'logdir'), __na
                     format='%(asctime)s\t%(process)d\t%(levelname)s\t%(message)s')
 
 
-def rule_repairer(once=False):
+def rule_repairer(once=False, heartbeat_service=None):
     """
     Main loop to check for STUCK replication rules
+
+    The heartbeats are sent by the heartbeat service of the process, if given.
     """
 
     hostname = socket.gethostname()
@@ -51,13 +53,19 @@ def rule_repairer(once=False):
     paused_rules = {}  # {rule_id: datetime}
 
     # Make an initial heartbeat so that all judge-repairers have the correct worker number on the next try
-    live(executable='rucio-judge-repairer', hostname=hostname, pid=pid, thread=current_thread, older_than=60 * 30)
+    if heartbeat_service:
+        heartbeat_service.register(current_thread)
+    else:
+        live(executable='rucio-judge-repairer', hostname=hostname, pid=pid, thread=current_thread, older_than=60 * 30)
     graceful_stop.wait(1)
 
     while not graceful_stop.is_set():
         try:
             # heartbeat
-            heartbeat = live(executable='rucio-judge-repairer', hostname=hostname, pid=pid, thread=current_thread, older_than=60 * 30)
+            if heartbeat_service:
+                heartbeat = heartbeat_service.assignment(current_thread)
+            else:
+                heartbeat = live(executable='rucio-judge-repairer', hostname=hostname, pid=pid, thread=current_thread, older_than=60 * 30)
 
             start = time.time()
 
@@ -119,7 +127,10 @@ def rule_repairer(once=False):
         if once:
             break
 
-    die(executable='rucio-judge-repairer', hostname=hostname, pid=pid, thread=current_thread)
+    if heartbeat_service:
+        heartbeat_service.unregister(current_thread)
+    else:
+        die(executable='rucio-judge-repairer', hostname=hostname, pid=pid, thread=current_thread)
 
 
 def stop(signum=None, frame=None):
@@ -142,8 +153,11 @@ def run(once=False, threads=1):
         rule_repairer(once)
     else:
         logging.info('Repairer starting %s threads' % str(threads))
-        threads = [threading.Thread(target=rule_repairer, kwargs={'once': once}) for i in xrange(0, threads)]
+        heartbeat_service = HeartbeatService(executable='rucio-judge-repairer', hostname=hostname, older_than=60 * 30)
+        heartbeat_service.start()
+        threads = [threading.Thread(target=rule_repairer, kwargs={'once': once, 'heartbeat_service': heartbeat_service}) for i in xrange(0, threads)]
         [t.start() for t in threads]
         # Interruptible joins require a timeout.
         while threads[0].is_alive():
             [t.join(timeout=3.14) for t in threads]
+        heartbeat_service.stop()
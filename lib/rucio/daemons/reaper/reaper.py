@@ -27,6 +27,9 @@ import threading
 import time
 import traceback
 
+from collections import defaultdict
+from threadpool import ThreadPool, WorkRequest, NoResultsPending
+
 from rucio.db.sqla.constants import ReplicaState
 from rucio.common.config import config_get
 from rucio.common.exception import (SourceNotFound, ServiceUnavailable, RSEAccessDenied,
@@ -36,8 +39,8 @@ from rucio.common.exception import (SourceNotFound, ServiceUnavailable, RSEAcces
 from rucio.common.utils import chunks
 from rucio.core import monitor
 from rucio.core import rse as rse_core
-from rucio.core.heartbeat import live, die, sanity_check
-from rucio.core.message import add_message
+from rucio.core.heartbeat import live, die, sanity_check, HeartbeatService
+from rucio.core.message import add_messages
 from rucio.core.replica import (list_unlocked_replicas, update_replicas_states,
                                 delete_replicas)
 from rucio.core.rse import get_rse_attribute, sort_rses
@@ -109,11 +112,125 @@ def __check_rse_usage(rse, rse_id):
     return max_being_deleted_files, needed_free_space, used, free
 
 
+def __resolve_pfns(rse_info, scheme, replicas, worker_number, child_number):
+    """
+    Internal method to set the PFNs of a chunk of replicas with one protocol instance.
+
+    :param rse_info: the RSE settings.
+    :param scheme: the scheme to use for the deletion.
+    :param replicas: the replicas, their 'pfn' key is set in place (None if the PFN cannot be resolved).
+    :param worker_number: the worker number.
+    :param child_number: the child number.
+    """
+    prot = rsemgr.create_protocol(rse_info, 'delete', scheme=scheme)
+    try:
+        pfns = prot.lfns2pfns_bulk([(replica['scope'], replica['name'], replica['path']) for replica in replicas])
+    except (ReplicaUnAvailable, ReplicaNotFound):
+        # Resolve the replicas one by one to single out the unavailable ones
+        pfns = []
+        for replica in replicas:
+            try:
+                pfns.append(prot.lfns2pfns_bulk([(replica['scope'], replica['name'], replica['path'])])[0])
+            except (ReplicaUnAvailable, ReplicaNotFound) as error:
+                pfns.append(error)
+
+    for replica, pfn in zip(replicas, pfns):
+        if isinstance(pfn, Exception):
+            err_msg = 'Failed to get pfn UNAVAILABLE replica %s:%s on %s with error %s' % (replica['scope'], replica['name'], rse_info['rse'], str(pfn))
+            logging.warning('Reaper %s-%s: %s', worker_number, child_number, err_msg)
+            replica['pfn'] = None
+        else:
+            replica['pfn'] = str(pfn)
+
+
+def __delete_files(rse_info, scheme, replicas):
+    """
+    Internal method to physically delete a batch of replicas on one RSE. Runs in the deletion pool.
+
+    :param rse_info: the RSE settings.
+    :param scheme: the scheme to use for the deletion.
+    :param replicas: the replicas with their PFN.
+
+    :returns: the scheme used, the duration of the deletion and a dict with the PFN as key and None, or the deletion error, as value.
+    """
+    prot = rsemgr.create_protocol(rse_info, 'delete', scheme=scheme)
+    start = time.time()
+    prot.connect()
+    try:
+        status = prot.delete_bulk([replica['pfn'] for replica in replicas])
+    finally:
+        prot.close()
+    return prot.attributes['scheme'], time.time() - start, status
+
+
+def __catalog_deletions(rse_info, replicas, status, scheme, duration, worker_number, child_number):
+    """
+    Internal method to remove the deleted replicas from the catalog and to report the outcome of the deletions.
+
+    :param rse_info: the RSE settings.
+    :param replicas: the replicas.
+    :param status: dict with the PFN as key and the deletion error as value, missing PFNs are considered deleted.
+    :param scheme: the scheme used for the deletion, None if no physical deletion was done.
+    :param duration: the duration of the deletion of the replicas in seconds.
+    :param worker_number: the worker number.
+    :param child_number: the child number.
+    """
+    deleted_files, messages = [], []
+    duration = duration / len(replicas) if replicas else 0
+    for replica in replicas:
+        error = status.get(replica['pfn'])
+        payload = {'scope': replica['scope'],
+                   'name': replica['name'],
+                   'rse': rse_info['rse'],
+                   'file-size': replica['bytes'],
+                   'bytes': replica['bytes'],
+                   'url': replica['pfn']}
+        if error is None:
+            deleted_files.append({'scope': replica['scope'], 'name': replica['name']})
+            payload['duration'] = duration
+            messages.append({'event_type': 'deletion-done', 'payload': payload})
+            if scheme:
+                monitor.record_timer('daemons.reaper.delete.%s.%s' % (scheme, rse_info['rse']), duration * 1000)
+            logging.info('Reaper %s-%s: Deletion SUCCESS of %s:%s as %s on %s in %s seconds', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse_info['rse'], duration)
+        elif isinstance(error, SourceNotFound):
+            err_msg = 'Reaper %s-%s: Deletion NOTFOUND of %s:%s as %s on %s' % (worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse_info['rse'])
+            logging.warning(err_msg)
+            deleted_files.append({'scope': replica['scope'], 'name': replica['name']})
+            if replica['state'] == ReplicaState.AVAILABLE:
+                payload['reason'] = str(err_msg)
+                messages.append({'event_type': 'deletion-failed', 'payload': payload})
+        else:
+            if isinstance(error, (ServiceUnavailable, RSEAccessDenied, ResourceTemporaryUnavailable)):
+                logging.warning('Reaper %s-%s: Deletion NOACCESS of %s:%s as %s on %s: %s', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse_info['rse'], str(error))
+            else:
+                logging.critical('Reaper %s-%s: Deletion CRITICAL of %s:%s as %s on %s: %s', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse_info['rse'], str(error))
+            payload['reason'] = str(error)
+            messages.append({'event_type': 'deletion-failed', 'payload': payload})
+
+    try:
+        add_messages(messages)
+        start = time.time()
+        with monitor.record_timer_block('reaper.delete_replicas'):
+            delete_replicas(rse=rse_info['rse'], files=deleted_files)
+        logging.debug('Reaper %s-%s: delete_replicas successes %s %s %s', worker_number, child_number, rse_info['rse'], len(deleted_files), time.time() - start)
+        monitor.record_counter(counters='reaper.deletion.done', delta=len(deleted_files))
+    except DatabaseException as error:
+        logging.warning('Reaper %s-%s: DatabaseException %s', worker_number, child_number, str(error))
+    except UnsupportedOperation as error:
+        logging.warning('Reaper %s-%s: UnsupportedOperation %s', worker_number, child_number, str(error))
+    except:
+        logging.critical(traceback.format_exc())
+
+
 def reaper(rses, worker_number=1, child_number=1, total_children=1, chunk_size=100,
-           once=False, greedy=False, scheme=None, delay_seconds=0):
+           once=False, greedy=False, scheme=None, delay_seconds=0, deletion_threads=4, deletion_threads_per_rse=2, heartbeat_service=None):
     """
     Main loop to select and delete files.
 
+    The physical deletions run on a pool of threads so that slow storages do not hold back
+    the other RSEs. Each pool request deletes one chunk of files with the bulk deletion of the protocol.
+    The heartbeats are sent by the heartbeat service of the worker, if given.
+
     :param rses: List of RSEs the reaper should work against. If empty, it considers all RSEs.
     :param worker_number: The worker number.
     :param child_number: The child number.
@@ -122,7 +239,10 @@ def reaper(rses, worker_number=1, child_number=1, total_children=1, chunk_size=1
     :param once: If True, only runs one iteration of the main loop.
     :param greedy: If True, delete right away replicas with tombstone.
     :param scheme: Force the reaper to use a particular protocol, e.g., mock.
-    :param exclude_rses: RSE expression to exclude RSEs from the Reaper.
+    :param delay_seconds: The delay to query replicas in BEING_DELETED state.
+    :param deletion_threads: The number of threads doing the physical deletions.
+    :param deletion_threads_per_rse: The maximum number of concurrent deletions on one RSE, the MaxDeletionThreads limit of the RSE takes precedence.
+    :param heartbeat_service: The HeartbeatService of the worker, the thread sends its own heartbeats if None.
     """
     logging.info('Starting Reaper: Worker %(worker_number)s, '
                  'child %(child_number)s will work on RSEs: ' % locals() + ', '.join([rse['rse'] for rse in rses]))
@@ -136,22 +256,55 @@ def reaper(rses, worker_number=1, child_number=1, total_children=1, chunk_size=1
     hash_executable = hashlib.sha256(sys.argv[0] + ''.join(rse_names)).hexdigest()
     sanity_check(executable=None, hostname=hostname)
 
+    pool = ThreadPool(deletion_threads)
+    in_flight = defaultdict(int)
+
+    def deletion_done(request, result):
+        """ Callback of the deletion pool, called in the reaper thread. """
+        in_flight[request.kwds['rse_info']['id']] -= 1
+        used_scheme, duration, status = result
+        __catalog_deletions(rse_info=request.kwds['rse_info'], replicas=request.kwds['replicas'], status=status,
+                            scheme=used_scheme, duration=duration, worker_number=worker_number, child_number=child_number)
+
+    def deletion_failed(request, exc_info):
+        """ Callback of the deletion pool for deletions which could not be started, e.g. connection errors. """
+        in_flight[request.kwds['rse_info']['id']] -= 1
+        error = exc_info[1]
+        if not isinstance(error, (ServiceUnavailable, RSEAccessDenied, ResourceTemporaryUnavailable)):
+            logging.critical(''.join(traceback.format_exception(*exc_info)))
+        __catalog_deletions(rse_info=request.kwds['rse_info'], replicas=request.kwds['replicas'],
+                            status=dict((replica['pfn'], error) for replica in request.kwds['replicas']),
+                            scheme=None, duration=0, worker_number=worker_number, child_number=child_number)
+
+    def poll_deletions():
+        """ Process the finished deletions, if any. """
+        try:
+            pool.poll()
+        except NoResultsPending:
+            pass
+
+    if heartbeat_service:
+        heartbeat_service.register(thread)
+
     nothing_to_do = {}
     while not GRACEFUL_STOP.is_set():
         try:
             # heartbeat
-            heartbeat = live(executable=executable, hostname=hostname, pid=pid, thread=thread, hash_executable=hash_executable)
+            if not heartbeat_service:
+                heartbeat = live(executable=executable, hostname=hostname, pid=pid, thread=thread, hash_executable=hash_executable)
             checkpoint_time = datetime.datetime.now()
             # logging.info('Reaper({0[worker_number]}/{0[child_number]}): Live gives {0[heartbeat]}'.format(locals()))
 
             max_deleting_rate = 0
             for rse in sort_rses(rses):
                 try:
-                    if checkpoint_time + datetime.timedelta(minutes=1) < datetime.datetime.now():
+                    if not heartbeat_service and checkpoint_time + datetime.timedelta(minutes=1) < datetime.datetime.now():
                         heartbeat = live(executable=executable, hostname=hostname, pid=pid, thread=thread, hash_executable=hash_executable)
                         # logging.info('Reaper({0[worker_number]}/{0[child_number]}): Live gives {0[heartbeat]}'.format(locals()))
                         checkpoint_time = datetime.datetime.now()
 
+                    poll_deletions()
+
                     if rse['id'] in nothing_to_do and nothing_to_do[rse['id']] > datetime.datetime.now():
                         continue
                     logging.info('Reaper %s-%s: Running on RSE %s %s', worker_number, child_number,
@@ -202,108 +355,49 @@ def reaper(rses, worker_number=1, child_number=1, total_children=1, chunk_size=1
                                      nothing_to_do[rse['id']])
                         continue
 
-                    prot = rsemgr.create_protocol(rse_info, 'delete', scheme=scheme)
+                    max_deletions = rse_core.get_rse_limits(rse=rse['rse'], rse_id=rse['id']).get('MaxDeletionThreads') or deletion_threads_per_rse
                     for files in chunks(replicas, chunk_size):
                         logging.debug('Reaper %s-%s: Running on : %s', worker_number, child_number, str(files))
                         try:
                             update_replicas_states(replicas=[dict(replica.items() + [('state', ReplicaState.BEING_DELETED), ('rse_id', rse['id'])]) for replica in files], nowait=True)
-                            for replica in files:
-                                try:
-                                    replica['pfn'] = str(rsemgr.lfns2pfns(rse_settings=rse_info,
-                                                                          lfns=[{'scope': replica['scope'], 'name': replica['name'], 'path': replica['path']}],
-                                                                          operation='delete', scheme=scheme).values()[0])
-                                except (ReplicaUnAvailable, ReplicaNotFound) as error:
-                                    err_msg = 'Failed to get pfn UNAVAILABLE replica %s:%s on %s with error %s' % (replica['scope'], replica['name'], rse['rse'], str(error))
-                                    logging.warning('Reaper %s-%s: %s', worker_number, child_number, err_msg)
-                                    replica['pfn'] = None
-
-                                add_message('deletion-planned', {'scope': replica['scope'],
-                                                                 'name': replica['name'],
-                                                                 'file-size': replica['bytes'],
-                                                                 'bytes': replica['bytes'],
-                                                                 'url': replica['pfn'],
-                                                                 'rse': rse_info['rse']})
+                            __resolve_pfns(rse_info=rse_info, scheme=scheme, replicas=files, worker_number=worker_number, child_number=child_number)
+                            add_messages([{'event_type': 'deletion-planned',
+                                           'payload': {'scope': replica['scope'],
+                                                       'name': replica['name'],
+                                                       'file-size': replica['bytes'],
+                                                       'bytes': replica['bytes'],
+                                                       'url': replica['pfn'],
+                                                       'rse': rse_info['rse']}} for replica in files])
 
                             monitor.record_counter(counters='reaper.deletion.being_deleted', delta=len(files))
 
-                            try:
-                                deleted_files = []
-                                prot.connect()
-                                for replica in files:
-                                    try:
-                                        logging.info('Reaper %s-%s: Deletion ATTEMPT of %s:%s as %s on %s', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'])
-                                        start = time.time()
-                                        if rse['staging_area'] or rse['rse'].endswith("STAGING"):
-                                            logging.warning('Reaper %s-%s: Deletion STAGING of %s:%s as %s on %s, will only delete the catalog and not do physical deletion',
-                                                            worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'])
-                                        else:
-                                            if replica['pfn']:
-                                                prot.delete(replica['pfn'])
-                                            else:
-                                                logging.warning('Reaper %s-%s: Deletion UNAVAILABLE of %s:%s as %s on %s', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'])
-                                        monitor.record_timer('daemons.reaper.delete.%s.%s' % (prot.attributes['scheme'], rse['rse']), (time.time() - start) * 1000)
-                                        duration = time.time() - start
-
-                                        deleted_files.append({'scope': replica['scope'], 'name': replica['name']})
-
-                                        add_message('deletion-done', {'scope': replica['scope'],
-                                                                      'name': replica['name'],
-                                                                      'rse': rse_info['rse'],
-                                                                      'file-size': replica['bytes'],
-                                                                      'bytes': replica['bytes'],
-                                                                      'url': replica['pfn'],
-                                                                      'duration': duration})
-                                        logging.info('Reaper %s-%s: Deletion SUCCESS of %s:%s as %s on %s in %s seconds', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'], duration)
-                                    except SourceNotFound:
-                                        err_msg = 'Reaper %s-%s: Deletion NOTFOUND of %s:%s as %s on %s' % (worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'])
-                                        logging.warning(err_msg)
-                                        deleted_files.append({'scope': replica['scope'], 'name': replica['name']})
-                                        if replica['state'] == ReplicaState.AVAILABLE:
-                                            add_message('deletion-failed', {'scope': replica['scope'],
-                                                                            'name': replica['name'],
-                                                                            'rse': rse_info['rse'],
-                                                                            'file-size': replica['bytes'],
-                                                                            'bytes': replica['bytes'],
-                                                                            'url': replica['pfn'],
-                                                                            'reason': str(err_msg)})
-                                    except (ServiceUnavailable, RSEAccessDenied, ResourceTemporaryUnavailable) as error:
-                                        logging.warning('Reaper %s-%s: Deletion NOACCESS of %s:%s as %s on %s: %s', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'], str(error))
-                                        add_message('deletion-failed', {'scope': replica['scope'],
-                                                                        'name': replica['name'],
-                                                                        'rse': rse_info['rse'],
-                                                                        'file-size': replica['bytes'],
-                                                                        'bytes': replica['bytes'],
-                                                                        'url': replica['pfn'],
-                                                                        'reason': str(error)})
-                                    except Exception as error:
-                                        logging.critical('Reaper %s-%s: Deletion CRITICAL of %s:%s as %s on %s: %s', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'], str(traceback.format_exc()))
-                                        add_message('deletion-failed', {'scope': replica['scope'],
-                                                                        'name': replica['name'],
-                                                                        'rse': rse_info['rse'],
-                                                                        'file-size': replica['bytes'],
-                                                                        'bytes': replica['bytes'],
-                                                                        'url': replica['pfn'],
-                                                                        'reason': str(error)})
-                                    except:
-                                        logging.critical('Reaper %s-%s: Deletion CRITICAL of %s:%s as %s on %s: %s', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'], str(traceback.format_exc()))
-                            except (ServiceUnavailable, RSEAccessDenied, ResourceTemporaryUnavailable) as error:
-                                for replica in files:
-                                    logging.warning('Reaper %s-%s: Deletion NOACCESS of %s:%s as %s on %s: %s', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'], str(error))
-                                    add_message('deletion-failed', {'scope': replica['scope'],
-                                                                    'name': replica['name'],
-                                                                    'rse': rse_info['rse'],
-                                                                    'file-size': replica['bytes'],
-                                                                    'bytes': replica['bytes'],
-                                                                    'url': replica['pfn'],
-                                                                    'reason': str(error)})
-                                    break
-                            finally:
-                                prot.close()
-                            start = time.time()
-                            with monitor.record_timer_block('reaper.delete_replicas'):
-                                delete_replicas(rse=rse['rse'], files=deleted_files)
-                            logging.debug('Reaper %s-%s: delete_replicas successes %s %s %s', worker_number, child_number, rse['rse'], len(deleted_files), time.time() - start)
-                            monitor.record_counter(counters='reaper.deletion.done', delta=len(deleted_files))
+                            physical_deletions, catalog_deletions = [], []
+                            for replica in files:
+                                logging.info('Reaper %s-%s: Deletion ATTEMPT of %s:%s as %s on %s', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'])
+                                if rse['staging_area'] or rse['rse'].endswith("STAGING"):
+                                    logging.warning('Reaper %s-%s: Deletion STAGING of %s:%s as %s on %s, will only delete the catalog and not do physical deletion',
+                                                    worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'])
+                                    catalog_deletions.append(replica)
+                                elif not replica['pfn']:
+                                    logging.warning('Reaper %s-%s: Deletion UNAVAILABLE of %s:%s as %s on %s', worker_number, child_number, replica['scope'], replica['name'], replica['pfn'], rse['rse'])
+                                    catalog_deletions.append(replica)
+                                else:
+                                    physical_deletions.append(replica)
+
+                            if catalog_deletions:
+                                __catalog_deletions(rse_info=rse_info, replicas=catalog_deletions, status={}, scheme=None, duration=0,
+                                                    worker_number=worker_number, child_number=child_number)
+
+                            if physical_deletions:
+                                # Respect the per-RSE concurrency, the deletions on the other RSEs go on meanwhile
+                                while in_flight[rse['id']] >= max_deletions:
+                                    poll_deletions()
+                                    if in_flight[rse['id']] >= max_deletions:
+                                        time.sleep(0.1)
+                                pool.putRequest(WorkRequest(__delete_files,
+                                                            kwds={'rse_info': rse_info, 'scheme': scheme, 'replicas': physical_deletions},
+                                                            callback=deletion_done, exc_callback=deletion_failed))
+                                in_flight[rse['id']] += 1
 
                         except DatabaseException as error:
                             logging.warning('Reaper %s-%s: DatabaseException %s', worker_number, child_number, str(error))
@@ -318,6 +412,9 @@ def reaper(rses, worker_number=1, child_number=1, total_children=1, chunk_size=1
                 except:
                     logging.critical(traceback.format_exc())
 
+            # Wait for the deletions of this cycle before selecting new replicas
+            pool.wait()
+
             if once:
                 break
 
@@ -328,7 +425,12 @@ def reaper(rses, worker_number=1, child_number=1, total_children=1, chunk_size=1
         except:
             logging.critical(traceback.format_exc())
 
-    die(executable=executable, hostname=hostname, pid=pid, thread=thread, hash_executable=hash_executable)
+    pool.wait()
+    pool.dismissWorkers(deletion_threads, do_join=True)
+    if heartbeat_service:
+        heartbeat_service.unregister(thread)
+    else:
+        die(executable=executable, hostname=hostname, pid=pid, thread=thread, hash_executable=hash_executable)
     logging.info('Graceful stop requested')
     logging.info('Graceful stop done')
     return
@@ -341,7 +443,8 @@ def stop(signum=None, frame=None):
     GRACEFUL_STOP.set()
 
 
-def run(total_workers=1, chunk_size=100, threads_per_worker=None, once=False, greedy=False, rses=[], scheme=None, exclude_rses=None, include_rses=None, delay_seconds=0):
+def run(total_workers=1, chunk_size=100, threads_per_worker=None, once=False, greedy=False, rses=[], scheme=None, exclude_rses=None, include_rses=None, delay_seconds=0,
+        deletion_threads=4, deletion_threads_per_rse=2):
     """
     Starts up the reaper threads.
 
@@ -354,6 +457,9 @@ def run(total_workers=1, chunk_size=100, threads_per_worker=None, once=False, gr
     :param scheme: Force the reaper to use a particular protocol/scheme, e.g., mock.
     :param exclude_rses: RSE expression to exclude RSEs from the Reaper.
     :param include_rses: RSE expression to include RSEs.
+    :param delay_seconds: The delay to query replicas in BEING_DELETED state.
+    :param deletion_threads: The number of threads doing the physical deletions, per reaper thread.
+    :param deletion_threads_per_rse: The maximum number of concurrent deletions on one RSE, per reaper thread.
     """
     logging.info('main: starting processes')
 
@@ -374,11 +480,18 @@ def run(total_workers=1, chunk_size=100, threads_per_worker=None, once=False, gr
     logging.info('Reaper: This instance will work on RSEs: ' + ', '.join([rse['rse'] for rse in rses]))
 
     threads = []
+    heartbeat_services = []
     nb_rses_per_worker = int(math.ceil(len(rses) / float(total_workers))) or 1
     rses = random.sample(rses, len(rses))
     for worker in xrange(total_workers):
+        rses_list = rses[worker * nb_rses_per_worker: worker * nb_rses_per_worker + nb_rses_per_worker]
+        if rses_list:
+            # The children of a worker share the heartbeats of the subset of RSEs, as computed by the reaper
+            heartbeat_service = HeartbeatService(executable=' '.join(sys.argv),
+                                                 hash_executable=hashlib.sha256(sys.argv[0] + ''.join([rse['rse'] for rse in rses_list])).hexdigest())
+            heartbeat_service.start()
+            heartbeat_services.append(heartbeat_service)
         for child in xrange(threads_per_worker or 1):
-            rses_list = rses[worker * nb_rses_per_worker: worker * nb_rses_per_worker + nb_rses_per_worker]
             if not rses_list:
                 logging.warning('Reaper: Empty RSEs list for worker %(worker)s' % locals())
                 continue
@@ -390,8 +503,13 @@ def run(total_workers=1, chunk_size=100, threads_per_worker=None, once=False, gr
                       'greedy': greedy,
                       'rses': rses_list,
                       'delay_seconds': delay_seconds,
-                      'scheme': scheme}
+                      'deletion_threads': deletion_threads,
+                      'deletion_threads_per_rse': deletion_threads_per_rse,
+                      'scheme': scheme,
+                      'heartbeat_service': heartbeat_service}
             threads.append(threading.Thread(target=reaper, kwargs=kwargs, name='Worker: %s, child: %s' % (worker, child + 1)))
     [t.start() for t in threads]
     while threads[0].is_alive():
         [t.join(timeout=3.14) for t in threads]
+    for heartbeat_service in heartbeat_services:
+        heartbeat_service.stop()
@@ -27,14 +27,17 @@ from traceback import format_exc
 from Queue import Queue
 
 from json import loads as jloads, dumps as jdumps
+from repoze.lru import ExpiringLRUCache
 from stomp import Connection
 
 from rucio.common.config import config_get, config_get_bool, config_get_int
+from rucio.common.exception import RSENotFound
 from rucio.core.monitor import record_counter, record_timer
 from rucio.core.did import touch_dids, list_parent_dids
 from rucio.core.heartbeat import live, die, sanity_check
 from rucio.core.lock import touch_dataset_locks
-from rucio.core.replica import touch_replica, touch_collection_replicas
+from rucio.core.replica import touch_replica, touch_replicas, touch_collection_replicas
+from rucio.core.rse import get_rse_id
 from rucio.db.sqla.constants import DIDType
 
 logging.getLogger("stomp").setLevel(logging.CRITICAL)
@@ -45,6 +48,37 @@ logging.basicConfig(stream=stdout,
 
 graceful_stop = Event()
 
+# parent datasets of the recently accessed files, shared by the consumer threads
+PARENT_DATASETS = ExpiringLRUCache(100000, default_timeout=600)
+# number of replicas updated per statement
+TOUCH_CHUNK_SIZE = 100
+
+
+def get_parent_datasets(scope, name):
+    """
+    Return the parent datasets of a file, cached.
+
+    :param scope: The scope of the file.
+    :param name:  The name of the file.
+
+    :returns: A list of (scope, name) tuples.
+    """
+    datasets = PARENT_DATASETS.get((scope, name))
+    if datasets is None:
+        record_counter('daemons.tracer.kronos.parent_cache.miss')
+        datasets = []
+        for did in list_parent_dids(scope, name):
+            if did['type'] != DIDType.DATASET:
+                continue
+            # do not update _dis datasets
+            if did['scope'] == 'panda' and '_dis' in did['name']:
+                continue
+            datasets.append((did['scope'], did['name']))
+        PARENT_DATASETS.put((scope, name), datasets)
+    else:
+        record_counter('daemons.tracer.kronos.parent_cache.hit')
+    return datasets
+
 
 class AMQConsumer(object):
     def __init__(self, broker, conn, queue, chunksize, subscription_id, excluded_usrdns, dataset_queue):
@@ -110,9 +144,10 @@ class AMQConsumer(object):
     def __update_atime(self):
         """
         Bulk update atime.
+
+        The reports of a chunk are aggregated per replica and per dataset, keeping the latest access time.
         """
-        replicas = []
-        rses = []
+        replicas = {}
         for report in self.__reports:
             try:
                 # check if scope in report. if not skip this one.
@@ -164,36 +199,58 @@ class AMQConsumer(object):
                     if 'name' in report:
                         report['filename'] = report['name']
 
-                rses = report['remoteSite'].strip().split(',')
-                for rse in rses:
-                    replicas.append({'name': report['filename'], 'scope': report['scope'], 'rse': rse, 'accessed_at': datetime.utcfromtimestamp(report['traceTimeentryUnix']),
-                                     'traceTimeentryUnix': report['traceTimeentryUnix'], 'eventVersion': report['eventVersion']})
+                for rse in report['remoteSite'].strip().split(','):
+                    key = (report['scope'], report['filename'], rse)
+                    if key in replicas and replicas[key]['traceTimeentryUnix'] >= report['traceTimeentryUnix']:
+                        continue
+                    replicas[key] = {'name': report['filename'], 'scope': report['scope'], 'rse': rse, 'accessed_at': datetime.utcfromtimestamp(report['traceTimeentryUnix']),
+                                     'traceTimeentryUnix': report['traceTimeentryUnix'], 'eventVersion': report['eventVersion']}
             except (KeyError, AttributeError):
                 logging.error(format_exc())
                 record_counter('daemons.tracer.kronos.report_error')
                 continue
 
-            for did in list_parent_dids(report['scope'], report['filename']):
-                if did['type'] != DIDType.DATASET:
-                    continue
-                # do not update _dis datasets
-                if did['scope'] == 'panda' and '_dis' in did['name']:
-                    continue
-                for rse in rses:
-                    self.__dataset_queue.put({'scope': did['scope'], 'name': did['name'], 'did_type': did['type'], 'rse': rse, 'accessed_at': datetime.utcfromtimestamp(report['traceTimeentryUnix'])})
-
+        replicas = replicas.values()
         logging.debug(replicas)
 
+        try:
+            datasets = {}
+            for replica in replicas:
+                for scope, name in get_parent_datasets(replica['scope'], replica['name']):
+                    key = (scope, name, replica['rse'])
+                    datasets[key] = max(datasets.get(key, replica['accessed_at']), replica['accessed_at'])
+            for (scope, name, rse), accessed_at in datasets.iteritems():
+                self.__dataset_queue.put({'scope': scope, 'name': name, 'did_type': DIDType.DATASET, 'rse': rse, 'accessed_at': accessed_at})
+        except:
+            logging.error(format_exc())
+            record_counter('daemons.tracer.kronos.parent_error')
+
         try:
             ts = time()
+            rse_ids = {}
             for replica in replicas:
-                # if touch replica hits a locked row put the trace back into queue for later retry
-                if not touch_replica(replica):
-                    resubmit = {'filename': replica['name'], 'scope': replica['scope'], 'remoteSite': replica['rse'], 'traceTimeentryUnix': replica['traceTimeentryUnix'],
-                                'eventType': 'get', 'usrdn': 'someuser', 'clientState': 'DONE', 'eventVersion': replica['eventVersion']}
-                    self.__conn.send(body=jdumps(resubmit), destination=self.__queue, headers={'appversion': 'rucio', 'resubmitted': '1'})
-                    record_counter('daemons.tracer.kronos.sent_resubmitted')
-                    logging.warning('(kronos_file) hit locked row, resubmitted to queue')
+                if replica['rse'] not in rse_ids:
+                    try:
+                        rse_ids[replica['rse']] = get_rse_id(rse=replica['rse'])
+                    except RSENotFound:
+                        rse_ids[replica['rse']] = None
+                        logging.warning('(kronos_file) unknown rse %s' % replica['rse'])
+                if rse_ids[replica['rse']] is None:
+                    record_counter('daemons.tracer.kronos.unknown_rse')
+                    continue
+                replica['rse_id'] = rse_ids[replica['rse']]
+            replicas = [replica for replica in replicas if 'rse_id' in replica]
+
+            for i in xrange(0, len(replicas), TOUCH_CHUNK_SIZE):
+                chunk = replicas[i:i + TOUCH_CHUNK_SIZE]
+                if touch_replicas(chunk):
+                    continue
+                # one of the rows is locked, retry the replicas one by one
+                record_counter('daemons.tracer.kronos.touch_chunk_locked')
+                for replica in chunk:
+                    # if touch replica hits a locked row put the trace back into queue for later retry
+                    if not touch_replica(replica):
+                        self.__resubmit(replica)
             record_timer('daemons.tracer.kronos.update_atime', (time() - ts) * 1000)
         except:
             logging.error(format_exc())
@@ -201,6 +258,16 @@ class AMQConsumer(object):
 
         logging.info('(kronos_file) updated %d replicas' % len(replicas))
 
+    def __resubmit(self, replica):
+        """
+        Put the trace of a locked replica back into the queue for a later retry.
+        """
+        resubmit = {'filename': replica['name'], 'scope': replica['scope'], 'remoteSite': replica['rse'], 'traceTimeentryUnix': replica['traceTimeentryUnix'],
+                    'eventType': 'get', 'usrdn': 'someuser', 'clientState': 'DONE', 'eventVersion': replica['eventVersion']}
+        self.__conn.send(body=jdumps(resubmit), destination=self.__queue, headers={'appversion': 'rucio', 'resubmitted': '1'})
+        record_counter('daemons.tracer.kronos.sent_resubmitted')
+        logging.warning('(kronos_file) hit locked row, resubmitted to queue')
+
 
 def kronos_file(once=False, thread=0, brokers_resolved=None, dataset_queue=None):
     """
@@ -25,7 +25,7 @@ from sys import exc_info, stdout, argv
 from traceback import format_exception
 
 
-from rucio.api.did import list_new_dids, set_new_dids, get_metadata
+from rucio.api.did import list_new_dids, set_new_dids, get_metadata_bulk
 from rucio.api.subscription import list_subscriptions, update_subscription
 from rucio.db.sqla.constants import DIDType, SubscriptionState
 from rucio.common.exception import (DatabaseException, DataIdentifierNotFound, InvalidReplicationRule, DuplicateRule, RSEBlacklisted,
@@ -73,6 +73,147 @@ def _retrial(func, *args, **kwargs):
             raise
 
 
+def _literal_prefix(pattern):
+    """
+    Return the literal prefix that every string matched by re.match(pattern) starts with.
+
+    :param pattern: The regular expression.
+    :returns: The prefix, possibly empty.
+    """
+    if '|' in pattern or '(?' in pattern:
+        # alternatives and inline flags
+        return ''
+    prefix = ''
+    for char in pattern:
+        if char in '?*{':
+            # the last character is optional
+            return prefix[:-1]
+        if not (char.isalnum() or char in '_-:/ '):
+            return prefix
+        prefix += char
+    return prefix
+
+
+class CompiledSubscription(object):
+    """
+    Subscription with its filter parsed and its regular expressions compiled.
+    """
+
+    def __init__(self, subscription):
+        """
+        :param subscription: The subscription dictionary.
+        :raises ValueError: If the filter is not valid JSON or contains an invalid regular expression.
+        """
+        self.subscription = subscription
+        self.pattern = None
+        self.excluded_pattern = None
+        self.scopes = None
+        self.metadata = []
+        self.split_rule = False
+
+        filter = loads(subscription['filter'])
+        try:
+            for key in filter:
+                values = filter[key]
+                if key == 'pattern':
+                    self.pattern = re.compile(values)
+                elif key == 'excluded_pattern':
+                    self.excluded_pattern = re.compile(values)
+                elif key == 'split_rule':
+                    self.split_rule = values
+                    if values == 'true':
+                        self.split_rule = True
+                    elif values == 'false':
+                        self.split_rule = False
+                elif key == 'scope':
+                    self.scopes = [re.compile(scope) for scope in values]
+                else:
+                    if type(values) is not list:
+                        values = [values, ]
+                    self.metadata.append((str(key), [re.compile(str(value)) for value in values]))
+        except re.error, error:
+            raise ValueError('Invalid regular expression in the filter of subscription %s: %s' % (subscription['name'], error))
+
+        self.scope_prefixes = [''] if self.scopes is None else [_literal_prefix(scope.pattern) for scope in self.scopes]
+        self.name_prefix = '' if self.pattern is None else _literal_prefix(self.pattern.pattern)
+
+    def match(self, did, metadata):
+        """
+        Check if a DID matches the subscription.
+
+        :param did: The DID dictionary.
+        :param metadata: The metadata dictionary of the DID.
+        :returns: True/False
+        """
+        if metadata['hidden']:
+            return False
+        if self.pattern and not self.pattern.match(did['name']):
+            return False
+        if self.excluded_pattern and self.excluded_pattern.match(did['name']):
+            return False
+        if self.scopes is not None and not any(scope.match(did['scope']) for scope in self.scopes):
+            return False
+        for key, values in self.metadata:
+            if key not in metadata:
+                return False
+            value = str(metadata[key])
+            if not any(regexp.match(value) for regexp in values):
+                return False
+        return True
+
+
+class SubscriptionIndex(object):
+    """
+    Index of the compiled subscriptions on the literal prefixes of their scope and name patterns,
+    so that a DID is only matched against the subscriptions it can possibly match.
+    """
+
+    def __init__(self, subscriptions):
+        """
+        :param subscriptions: The list of subscription dictionaries, in priority order.
+        """
+        self.subscriptions = []
+        for subscription in subscriptions:
+            try:
+                self.subscriptions.append(CompiledSubscription(subscription))
+            except ValueError, error:
+                logging.error('%s : Subscription will be skipped' % error)
+
+        self.scopes = {}
+        self.names = {}
+        for position, subscription in enumerate(self.subscriptions):
+            for prefix in subscription.scope_prefixes:
+                self.scopes.setdefault(prefix, set()).add(position)
+            self.names.setdefault(subscription.name_prefix, set()).add(position)
+        self.scope_lengths = sorted(set(len(prefix) for prefix in self.scopes))
+        self.name_lengths = sorted(set(len(prefix) for prefix in self.names))
+
+    @staticmethod
+    def __candidates(index, lengths, value):
+        """
+        Return the positions of the subscriptions with a prefix of value.
+        """
+        positions = set()
+        for length in lengths:
+            if length > len(value):
+                break
+            positions.update(index.get(value[:length], ()))
+        return positions
+
+    def match(self, did, metadata):
+        """
+        Return the subscriptions matching a DID, in priority order.
+
+        :param did: The DID dictionary.
+        :param metadata: The metadata dictionary of the DID.
+        :returns: List of CompiledSubscription.
+        """
+        candidates = self.__candidates(self.scopes, self.scope_lengths, did['scope'])
+        if candidates:
+            candidates &= self.__candidates(self.names, self.name_lengths, did['name'])
+        return [self.subscriptions[position] for position in sorted(candidates) if self.subscriptions[position].match(did, metadata)]
+
+
 def is_matching_subscription(subscription, did, metadata):
     """
     Method to identify if a DID matches a subscription.
@@ -85,46 +226,34 @@ def is_matching_subscription(subscription, did, metadata):
     if metadata['hidden']:
         return False
     try:
-        filter = loads(subscription['filter'])
+        return CompiledSubscription(subscription).match(did, metadata)
     except ValueError, error:
         logging.error('%s : Subscription will be skipped' % error)
         return False
-    # Loop over the keys of filter for subscription
-    for key in filter:
-        values = filter[key]
-        if key == 'pattern':
-            if not re.match(values, did['name']):
-                return False
-        elif key == 'excluded_pattern':
-            if re.match(values, did['name']):
-                return False
-        elif key == 'split_rule':
-            pass
-        elif key == 'scope':
-            match_scope = False
-            for scope in values:
-                if re.match(scope, did['scope']):
-                    match_scope = True
-                    break
-            if not match_scope:
-                return False
-        else:
-            if type(values) is not list:
-                values = [values, ]
-            has_metadata = False
-            for meta in metadata:
-                if str(meta) == str(key):
-                    has_metadata = True
-                    match_meta = False
-                    for value in values:
-                        if re.match(str(value), str(metadata[meta])):
-                            match_meta = True
-                            break
-                    if not match_meta:
-                        return False
-            if not has_metadata:
-                return False
-    return True
+
+
+def get_subscriptions():
+    """
+    Return the active subscriptions in priority order and deactivate the expired ones.
+    """
+    subscriptions = []
+    sub_dict = {3: []}
+    for sub in list_subscriptions(None, None):
+        if sub['state'] != SubscriptionState.INACTIVE and sub['lifetime'] and (datetime.now() > sub['lifetime']):
+            update_subscription(name=sub['name'], account=sub['account'], state=SubscriptionState.INACTIVE)
+
+        elif sub['state'] in [SubscriptionState.ACTIVE, SubscriptionState.UPDATED]:
+            priority = 3
+            if 'policyid' in sub:
+                if int(sub['policyid']) not in sub_dict:
+                    sub_dict[int(sub['policyid'])] = []
+                priority = int(sub['policyid'])
+            sub_dict[priority].append(sub)
+    priorities = sub_dict.keys()
+    priorities.sort()
+    for priority in priorities:
+        subscriptions.extend(sub_dict[priority])
+    return subscriptions
 
 
 def transmogrifier(bulk=5, once=False):
@@ -144,11 +273,17 @@ def transmogrifier(bulk=5, once=False):
     hb_thread = threading.current_thread()
     heartbeat.sanity_check(executable=executable, hostname=hostname)
 
+    try:
+        refresh = int(config_get('transmogrifier', 'subscriptions_refresh'))
+    except:
+        refresh = 60
+    index, index_key, index_time = None, None, 0
+
     while not graceful_stop.is_set():
 
         heart_beat = heartbeat.live(executable, hostname, pid, hb_thread)
 
-        dids, subscriptions = [], []
+        dids = []
         tottime = 0
         prepend_str = 'Thread [%i/%i] : ' % (heart_beat['assign_thread'] + 1, heart_beat['nr_threads'])
 
@@ -156,22 +291,14 @@ def transmogrifier(bulk=5, once=False):
             for did in list_new_dids(thread=heart_beat['assign_thread'], total_threads=heart_beat['nr_threads'], chunk_size=bulk):
                 dids.append({'scope': did['scope'], 'did_type': str(did['did_type']), 'name': did['name']})
 
-            sub_dict = {3: []}
-            for sub in list_subscriptions(None, None):
-                if sub['state'] != SubscriptionState.INACTIVE and sub['lifetime'] and (datetime.now() > sub['lifetime']):
-                    update_subscription(name=sub['name'], account=sub['account'], state=SubscriptionState.INACTIVE)
-
-                elif sub['state'] in [SubscriptionState.ACTIVE, SubscriptionState.UPDATED]:
-                    priority = 3
-                    if 'policyid' in sub:
-                        if int(sub['policyid']) not in sub_dict:
-                            sub_dict[int(sub['policyid'])] = []
-                        priority = int(sub['policyid'])
-                    sub_dict[priority].append(sub)
-            priorities = sub_dict.keys()
-            priorities.sort()
-            for priority in priorities:
-                subscriptions.extend(sub_dict[priority])
+            if index is None or time.time() - index_time > refresh:
+                subscriptions = get_subscriptions()
+                index_time = time.time()
+                key = [(sub['id'], sub['updated_at']) for sub in subscriptions]
+                if key != index_key:
+                    logging.info(prepend_str + 'Compiling %i subscriptions' % len(subscriptions))
+                    index = SubscriptionIndex(subscriptions)
+                    index_key = key
         except SubscriptionNotFound, error:
             logging.warning(prepend_str + 'No subscriptions defined: %s' % (str(error)))
             time.sleep(10)
@@ -190,145 +317,146 @@ def transmogrifier(bulk=5, once=False):
             blacklisted_rse_id = [rse['id'] for rse in list_rses({'availability_write': False})]
             logging.debug(prepend_str + 'In transmogrifier worker')
             identifiers = []
+            metadata_dict = {}
+            collections = [did for did in dids if did['did_type'] == str(DIDType.DATASET) or did['did_type'] == str(DIDType.CONTAINER)]
+            for metadata in get_metadata_bulk(collections):
+                metadata_dict[(metadata['scope'], metadata['name'])] = metadata
             for did in dids:
                 did_success = True
                 if did['did_type'] == str(DIDType.DATASET) or did['did_type'] == str(DIDType.CONTAINER):
                     results['%s:%s' % (did['scope'], did['name'])] = []
                     try:
-                        metadata = get_metadata(did['scope'], did['name'])
-                        for subscription in subscriptions:
-                            if is_matching_subscription(subscription, did, metadata) is True:
-                                filter = loads(subscription['filter'])
-                                split_rule = filter.get('split_rule', False)
-                                if split_rule == 'true':
-                                    split_rule = True
-                                elif split_rule == 'false':
-                                    split_rule = False
-                                stime = time.time()
-                                results['%s:%s' % (did['scope'], did['name'])].append(subscription['id'])
-                                logging.info(prepend_str + '%s:%s matches subscription %s' % (did['scope'], did['name'], subscription['name']))
-                                for rule in loads(subscription['replication_rules']):
-                                    # Get all the rule and subscription parameters
-                                    grouping = rule.get('grouping', 'DATASET')
-                                    lifetime = rule.get('lifetime', None)
-                                    ignore_availability = rule.get('ignore_availability', None)
-                                    weight = rule.get('weight', None)
-                                    source_replica_expression = rule.get('source_replica_expression', None)
-                                    locked = rule.get('locked', None)
-                                    if locked == 'True':
-                                        locked = True
-                                    else:
-                                        locked = False
-                                    purge_replicas = rule.get('purge_replicas', False)
-                                    if purge_replicas == 'True':
-                                        purge_replicas = True
-                                    else:
-                                        purge_replicas = False
-                                    rse_expression = str(rule['rse_expression'])
-                                    comment = str(subscription['comments'])
-                                    subscription_id = str(subscription['id'])
-                                    account = subscription['account']
-                                    copies = int(rule['copies'])
-                                    activity = rule.get('activity', 'User Subscriptions')
+                        if (did['scope'], did['name']) not in metadata_dict:
+                            raise DataIdentifierNotFound("Data identifier '%s:%s' not found" % (did['scope'], did['name']))
+                        metadata = metadata_dict[(did['scope'], did['name'])]
+                        for compiled_subscription in index.match(did, metadata):
+                            subscription = compiled_subscription.subscription
+                            split_rule = compiled_subscription.split_rule
+                            stime = time.time()
+                            results['%s:%s' % (did['scope'], did['name'])].append(subscription['id'])
+                            logging.info(prepend_str + '%s:%s matches subscription %s' % (did['scope'], did['name'], subscription['name']))
+                            for rule in loads(subscription['replication_rules']):
+                                # Get all the rule and subscription parameters
+                                grouping = rule.get('grouping', 'DATASET')
+                                lifetime = rule.get('lifetime', None)
+                                ignore_availability = rule.get('ignore_availability', None)
+                                weight = rule.get('weight', None)
+                                source_replica_expression = rule.get('source_replica_expression', None)
+                                locked = rule.get('locked', None)
+                                if locked == 'True':
+                                    locked = True
+                                else:
+                                    locked = False
+                                purge_replicas = rule.get('purge_replicas', False)
+                                if purge_replicas == 'True':
+                                    purge_replicas = True
+                                else:
+                                    purge_replicas = False
+                                rse_expression = str(rule['rse_expression'])
+                                comment = str(subscription['comments'])
+                                subscription_id = str(subscription['id'])
+                                account = subscription['account']
+                                copies = int(rule['copies'])
+                                activity = rule.get('activity', 'User Subscriptions')
+                                try:
+                                    validate_schema(name='activity', obj=activity)
+                                except InputValidationError, error:
+                                    logging.error(prepend_str + 'Error validating the activity %s' % (str(error)))
+                                    activity = 'User Subscriptions'
+                                if lifetime:
+                                    lifetime = int(lifetime)
+
+                                str_activity = "".join(activity.split())
+                                success = False
+                                nattempt = 5
+                                attemptnr = 0
+                                skip_rule_creation = False
+
+                                if split_rule:
+                                    rses = parse_expression(rse_expression)
+                                    list_of_rses = [rse['rse'] for rse in rses]
+                                    # Check that some rule doesn't already exist for this DID and subscription
+                                    preferred_rse_ids = []
+                                    for rule in list_rules(filters={'subscription_id': subscription_id, 'scope': did['scope'], 'name': did['name']}):
+                                        already_existing_rses = [(rse['rse'], rse['id']) for rse in parse_expression(rule['rse_expression'])]
+                                        for rse, rse_id in already_existing_rses:
+                                            if (rse in list_of_rses) and (rse_id not in preferred_rse_ids):
+                                                preferred_rse_ids.append(rse_id)
+                                    if len(preferred_rse_ids) >= copies:
+                                        skip_rule_creation = True
+
+                                    rse_id_dict = {}
+                                    for rse in rses:
+                                        rse_id_dict[rse['id']] = rse['rse']
                                     try:
-                                        validate_schema(name='activity', obj=activity)
-                                    except InputValidationError, error:
-                                        logging.error(prepend_str + 'Error validating the activity %s' % (str(error)))
-                                        activity = 'User Subscriptions'
-                                    if lifetime:
-                                        lifetime = int(lifetime)
-
-                                    str_activity = "".join(activity.split())
-                                    success = False
-                                    nattempt = 5
-                                    attemptnr = 0
-                                    skip_rule_creation = False
-
-                                    if split_rule:
-                                        rses = parse_expression(rse_expression)
-                                        list_of_rses = [rse['rse'] for rse in rses]
-                                        # Check that some rule doesn't already exist for this DID and subscription
-                                        preferred_rse_ids = []
-                                        for rule in list_rules(filters={'subscription_id': subscription_id, 'scope': did['scope'], 'name': did['name']}):
-                                            already_existing_rses = [(rse['rse'], rse['id']) for rse in parse_expression(rule['rse_expression'])]
-                                            for rse, rse_id in already_existing_rses:
-                                                if (rse in list_of_rses) and (rse_id not in preferred_rse_ids):
-                                                    preferred_rse_ids.append(rse_id)
-                                        if len(preferred_rse_ids) >= copies:
-                                            skip_rule_creation = True
-
-                                        rse_id_dict = {}
-                                        for rse in rses:
-                                            rse_id_dict[rse['id']] = rse['rse']
+                                        rseselector = RSESelector(account=account, rses=rses, weight=weight, copies=copies - len(preferred_rse_ids))
+                                        selected_rses = [rse_id_dict[rse_id] for rse_id, _, _ in rseselector.select_rse(0, preferred_rse_ids=preferred_rse_ids, copies=copies, blacklist=blacklisted_rse_id)]
+                                    except (InsufficientTargetRSEs, InsufficientAccountLimit, InvalidRuleWeight) as error:
+                                        logging.warning(prepend_str + 'Problem getting RSEs for subscription "%s" for account %s : %s. Try including blacklisted sites' %
+                                                        (subscription['name'], account, str(error)))
+                                        # Now including the blacklisted sites
                                         try:
                                             rseselector = RSESelector(account=account, rses=rses, weight=weight, copies=copies - len(preferred_rse_ids))
-                                            selected_rses = [rse_id_dict[rse_id] for rse_id, _, _ in rseselector.select_rse(0, preferred_rse_ids=preferred_rse_ids, copies=copies, blacklist=blacklisted_rse_id)]
+                                            selected_rses = [rse_id_dict[rse_id] for rse_id, _, _ in rseselector.select_rse(0, preferred_rse_ids=preferred_rse_ids, copies=copies, blacklist=[])]
+                                            ignore_availability = True
                                         except (InsufficientTargetRSEs, InsufficientAccountLimit, InvalidRuleWeight) as error:
-                                            logging.warning(prepend_str + 'Problem getting RSEs for subscription "%s" for account %s : %s. Try including blacklisted sites' %
-                                                            (subscription['name'], account, str(error)))
-                                            # Now including the blacklisted sites
-                                            try:
-                                                rseselector = RSESelector(account=account, rses=rses, weight=weight, copies=copies - len(preferred_rse_ids))
-                                                selected_rses = [rse_id_dict[rse_id] for rse_id, _, _ in rseselector.select_rse(0, preferred_rse_ids=preferred_rse_ids, copies=copies, blacklist=[])]
-                                                ignore_availability = True
-                                            except (InsufficientTargetRSEs, InsufficientAccountLimit, InvalidRuleWeight) as error:
-                                                logging.error(prepend_str + 'Problem getting RSEs for subscription "%s" for account %s : %s. Skipping rule creation.' %
-                                                              (subscription['name'], account, str(error)))
-                                                monitor.record_counter(counters='transmogrifier.addnewrule.errortype.%s' % (str(error.__class__.__name__)), delta=1)
-                                                # The DID won't be reevaluated at the next cycle
-                                                did_success = did_success and True
-                                                continue
-
-                                    for attempt in xrange(0, nattempt):
-                                        attemptnr = attempt
-                                        nb_rule = 0
-                                        try:
-                                            if split_rule:
-                                                if not skip_rule_creation:
-                                                    for rse in selected_rses:
-                                                        logging.info(prepend_str + 'Will insert one rule for %s:%s on %s' % (did['scope'], did['name'], rse))
-                                                        add_rule(dids=[{'scope': did['scope'], 'name': did['name']}], account=account, copies=1,
-                                                                 rse_expression=rse, grouping=grouping, weight=weight, lifetime=lifetime, locked=locked,
-                                                                 subscription_id=subscription_id, source_replica_expression=source_replica_expression, activity=activity,
-                                                                 purge_replicas=purge_replicas, ignore_availability=ignore_availability, comment=comment)
-
-                                                        nb_rule += 1
-                                                        if nb_rule == copies:
-                                                            success = True
-                                                            break
-                                            else:
-                                                add_rule(dids=[{'scope': did['scope'], 'name': did['name']}], account=account, copies=copies,
-                                                         rse_expression=rse_expression, grouping=grouping, weight=weight, lifetime=lifetime, locked=locked,
-                                                         subscription_id=subscription['id'], source_replica_expression=source_replica_expression, activity=activity,
-                                                         purge_replicas=purge_replicas, ignore_availability=ignore_availability, comment=comment)
-                                                nb_rule += 1
-                                            monitor.record_counter(counters='transmogrifier.addnewrule.done', delta=nb_rule)
-                                            monitor.record_counter(counters='transmogrifier.addnewrule.activity.%s' % str_activity, delta=nb_rule)
-                                            success = True
-                                            break
-                                        except (InvalidReplicationRule, InvalidRuleWeight, InvalidRSEExpression, StagingAreaRuleRequiresLifetime, DuplicateRule) as error:
-                                            # Errors that won't be retried
-                                            success = True
-                                            logging.error(prepend_str + '%s' % (str(error)))
-                                            monitor.record_counter(counters='transmogrifier.addnewrule.errortype.%s' % (str(error.__class__.__name__)), delta=1)
-                                            break
-                                        except (ReplicationRuleCreationTemporaryFailed, InsufficientTargetRSEs, InsufficientAccountLimit, DatabaseException, RSEBlacklisted) as error:
-                                            # Errors to be retried
-                                            logging.error(prepend_str + '%s Will perform an other attempt %i/%i' % (str(error), attempt + 1, nattempt))
+                                            logging.error(prepend_str + 'Problem getting RSEs for subscription "%s" for account %s : %s. Skipping rule creation.' %
+                                                          (subscription['name'], account, str(error)))
                                             monitor.record_counter(counters='transmogrifier.addnewrule.errortype.%s' % (str(error.__class__.__name__)), delta=1)
-                                        except Exception, error:
-                                            # Unexpected errors
-                                            monitor.record_counter(counters='transmogrifier.addnewrule.errortype.unknown', delta=1)
-                                            exc_type, exc_value, exc_traceback = exc_info()
-                                            logging.critical(prepend_str + ''.join(format_exception(exc_type, exc_value, exc_traceback)).strip())
-
-                                    did_success = (did_success and success)
-                                    if (attemptnr + 1) == nattempt and not success:
-                                        logging.error(prepend_str + 'Rule for %s:%s on %s cannot be inserted' % (did['scope'], did['name'], rse_expression))
-                                    else:
-                                        logging.info(prepend_str + '%s rule(s) inserted in %f seconds' % (str(nb_rule), time.time() - stime))
+                                            # The DID won't be reevaluated at the next cycle
+                                            did_success = did_success and True
+                                            continue
+
+                                for attempt in xrange(0, nattempt):
+                                    attemptnr = attempt
+                                    nb_rule = 0
+                                    try:
+                                        if split_rule:
+                                            if not skip_rule_creation:
+                                                for rse in selected_rses:
+                                                    logging.info(prepend_str + 'Will insert one rule for %s:%s on %s' % (did['scope'], did['name'], rse))
+                                                    add_rule(dids=[{'scope': did['scope'], 'name': did['name']}], account=account, copies=1,
+                                                             rse_expression=rse, grouping=grouping, weight=weight, lifetime=lifetime, locked=locked,
+                                                             subscription_id=subscription_id, source_replica_expression=source_replica_expression, activity=activity,
+                                                             purge_replicas=purge_replicas, ignore_availability=ignore_availability, comment=comment)
+
+                                                    nb_rule += 1
+                                                    if nb_rule == copies:
+                                                        success = True
+                                                        break
+                                        else:
+                                            add_rule(dids=[{'scope': did['scope'], 'name': did['name']}], account=account, copies=copies,
+                                                     rse_expression=rse_expression, grouping=grouping, weight=weight, lifetime=lifetime, locked=locked,
+                                                     subscription_id=subscription['id'], source_replica_expression=source_replica_expression, activity=activity,
+                                                     purge_replicas=purge_replicas, ignore_availability=ignore_availability, comment=comment)
+                                            nb_rule += 1
+                                        monitor.record_counter(counters='transmogrifier.addnewrule.done', delta=nb_rule)
+                                        monitor.record_counter(counters='transmogrifier.addnewrule.activity.%s' % str_activity, delta=nb_rule)
+                                        success = True
+                                        break
+                                    except (InvalidReplicationRule, InvalidRuleWeight, InvalidRSEExpression, StagingAreaRuleRequiresLifetime, DuplicateRule) as error:
+                                        # Errors that won't be retried
+                                        success = True
+                                        logging.error(prepend_str + '%s' % (str(error)))
+                                        monitor.record_counter(counters='transmogrifier.addnewrule.errortype.%s' % (str(error.__class__.__name__)), delta=1)
+                                        break
+                                    except (ReplicationRuleCreationTemporaryFailed, InsufficientTargetRSEs, InsufficientAccountLimit, DatabaseException, RSEBlacklisted) as error:
+                                        # Errors to be retried
+                                        logging.error(prepend_str + '%s Will perform an other attempt %i/%i' % (str(error), attempt + 1, nattempt))
+                                        monitor.record_counter(counters='transmogrifier.addnewrule.errortype.%s' % (str(error.__class__.__name__)), delta=1)
+                                    except Exception, error:
+                                        # Unexpected errors
+                                        monitor.record_counter(counters='transmogrifier.addnewrule.errortype.unknown', delta=1)
+                                        exc_type, exc_value, exc_traceback = exc_info()
+                                        logging.critical(prepend_str + ''.join(format_exception(exc_type, exc_value, exc_traceback)).strip())
+
+                                did_success = (did_success and success)
+                                if (attemptnr + 1) == nattempt and not success:
+                                    logging.error(prepend_str + 'Rule for %s:%s on %s cannot be inserted' % (did['scope'], did['name'], rse_expression))
+                                else:
+                                    logging.info(prepend_str + '%s rule(s) inserted in %f seconds' % (str(nb_rule), time.time() - stime))
                     except DataIdentifierNotFound, error:
-                        logging.warning(prepend_str + error)
+                        logging.warning(prepend_str + str(error))
 
                 if did_success:
                     if did['did_type'] == str(DIDType.FILE):
@@ -14,8 +14,11 @@ SQLAlchemy utilities
 
 '''
 
+from hashlib import md5
+
+from sqlalchemy import and_, or_, tuple_
 from sqlalchemy.ext.compiler import compiles
-from sqlalchemy.sql.expression import Executable, ClauseElement
+from sqlalchemy.sql.expression import Executable, ClauseElement, bindparam, text
 
 
 class InsertFromSelect(Executable, ClauseElement):
@@ -42,3 +45,67 @@ def visit_insert_from_select(element, compiler, **kw):
         sql = "INSERT INTO %s %s" % (compiler.process(element.insert_spec, asfrom=True), compiler.process(element.select))
 
     return sql
+
+
+def scope_name_in(scope_column, name_column, dids, dialect_name):
+    """
+    Build the condition matching a list of (scope, name) tuples.
+    The list must be small enough for a single IN clause.
+
+    :param scope_column: The scope column to match.
+    :param name_column: The name column to match.
+    :param dids: The list of (scope, name) tuples.
+    :param dialect_name: The name of the database dialect in use.
+    """
+    if dialect_name == 'sqlite':
+        # Row values are not supported by older SQLite versions
+        return or_(*[and_(scope_column == scope, name_column == name) for scope, name in dids])
+    return tuple_(scope_column, name_column).in_(dids)
+
+
+def rucio_hash(value):
+    """
+    Return the 32 bit hash of a value, registered as the rucio_hash function on SQLite connections.
+
+    :param value: The value to hash.
+    """
+    if value is None:
+        return None
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return int(md5(str(value)).hexdigest()[:8], 16)
+
+
+def filter_thread_work(session, query, total_threads, thread_id, hash_variable='name'):
+    """
+    Restrict a work query to the rows assigned to a thread, by a stable hash of the rows.
+    The rows are split into total_threads buckets, numbered from 0, on every database.
+
+    :param session: The database session in use.
+    :param query: The query to filter.
+    :param total_threads: The number of threads sharing the work.
+    :param thread_id: The bucket of this thread, from 0 to total_threads - 1.
+    :param hash_variable: The column to hash, or a tuple of columns to hash together.
+    :returns: The filtered query.
+    """
+    if not total_threads or total_threads <= 1:
+        return query
+
+    dialect_name = session.bind.dialect.name
+    if isinstance(hash_variable, (tuple, list)):
+        if dialect_name == 'mysql':
+            hash_variable = 'concat(%s)' % ', '.join(hash_variable)
+        else:
+            hash_variable = ' || '.join(hash_variable)
+
+    bindparams = [bindparam('total_threads', total_threads), bindparam('thread_id', thread_id)]
+    if dialect_name == 'oracle':
+        bindparams = [bindparam('max_bucket', total_threads - 1), bindparam('thread_id', thread_id)]
+        return query.filter(text('ORA_HASH(%s, :max_bucket) = :thread_id' % hash_variable, bindparams=bindparams))
+    elif dialect_name == 'mysql':
+        return query.filter(text('mod(conv(substring(md5(%s), 1, 8), 16, 10), :total_threads) = :thread_id' % hash_variable, bindparams=bindparams))
+    elif dialect_name == 'postgresql':
+        return query.filter(text('mod(abs((\'x\'||md5(%s))::bit(32)::int), :total_threads) = :thread_id' % hash_variable, bindparams=bindparams))
+    elif dialect_name == 'sqlite':
+        return query.filter(text('rucio_hash(%s) %% :total_threads = :thread_id' % hash_variable, bindparams=bindparams))
+    return query
@@ -22,6 +22,7 @@ from inspect import isgeneratorfunction
 from retrying import retry
 from threading import Lock
 from os.path import basename
+from time import time
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.exc import DatabaseError, DisconnectionError, OperationalError, TimeoutError
@@ -30,6 +31,8 @@ from sqlalchemy.orm import sessionmaker, scoped_session
 
 from rucio.common.config import config_get
 from rucio.common.exception import RucioException, DatabaseException
+from rucio.core.monitor import add_request_stat
+from rucio.db.sqla.sautils import rucio_hash
 
 try:
     main_script = os.path.basename(sys.argv[0])
@@ -64,6 +67,11 @@ def _fk_pragma_on_connect(dbapi_con, con_record):
         pass
 
 
+def _sqlite_functions_on_connect(dbapi_con, con_record):
+    """ Registers the hash function used to split the work between threads. """
+    dbapi_con.create_function('rucio_hash', 1, rucio_hash)
+
+
 def mysql_ping_listener(dbapi_conn, connection_rec, connection_proxy):
     """
     Ensures that MySQL connections checked out of the
@@ -120,6 +128,18 @@ def my_on_connect(dbapi_con, connection_record):
     dbapi_con.action = caller
 
 
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """ Starts timing a statement. """
+    if context is not None:
+        context.rucio_start_time = time()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """ Adds the statement to the statistics of the current request. """
+    if context is not None and hasattr(context, 'rucio_start_time'):
+        add_request_stat('db', time() - context.rucio_start_time)
+
+
 def get_engine(echo=True):
     """ Creates a engine to a specific database.
         :returns: engine
@@ -142,8 +162,11 @@ def get_engine(echo=True):
             event.listen(_ENGINE, 'connect', mysql_convert_decimal_to_float)
         elif 'sqlite' in sql_connection:
             event.listen(_ENGINE, 'connect', _fk_pragma_on_connect)
+            event.listen(_ENGINE, 'connect', _sqlite_functions_on_connect)
         elif 'oracle' in sql_connection:
             event.listen(_ENGINE, 'connect', my_on_connect)
+        event.listen(_ENGINE, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(_ENGINE, 'after_cursor_execute', _after_cursor_execute)
     assert _ENGINE
     return _ENGINE
 
@@ -246,6 +246,23 @@ class Default(protocol.RSEProtocol):
         except Exception as error:
             raise exception.ServiceUnavailable(error)
 
+    def delete_bulk(self, paths):
+        """
+        Deletes several files from the connected RSE with one gfal2 bulk unlink.
+
+        :param paths: list of paths to the to be deleted files
+
+        :returns: a dict with the path as key and None, or the raised exception if the deletion failed, as value
+        """
+
+        try:
+            return self.__gfal2_rm_bulk(paths)
+        except TypeError:
+            # gfal2 bindings without bulk support only accept a single path
+            return super(Default, self).delete_bulk(paths)
+        except Exception as error:
+            return dict((path, exception.ServiceUnavailable(error)) for path in paths)
+
     def rename(self, path, new_path):
         """
         Allows to rename a file stored inside the connected RSE.
@@ -361,6 +378,29 @@ class Default(protocol.RSEProtocol):
                 raise exception.SourceNotFound(error)
             raise exception.RucioException(error)
 
+    def __gfal2_rm_bulk(self, paths):
+        """
+        Uses gfal2 to remove several files in one bulk operation.
+
+        :param paths: list of physical file names
+
+        :returns: a dict with the path as key and None, or the exception of the failed removal, as value
+
+        :raises TypeError: if the gfal2 bindings do not support bulk removal.
+        """
+
+        ctx = self.__ctx
+
+        status = {}
+        for path, error in zip(paths, ctx.unlink([str(path) for path in paths])):
+            if not error:
+                status[path] = None
+            elif error.code == errno.ENOENT or 'No such file' in error.message:
+                status[path] = exception.SourceNotFound(error)
+            else:
+                status[path] = exception.ServiceUnavailable(error)
+        return status
+
     def __gfal2_exist(self, path):
         """
         Uses gfal2 to check whether the file exists.
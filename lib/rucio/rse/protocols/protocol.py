@@ -25,10 +25,20 @@ if rsemanager.CLIENT_MODE:
 if rsemanager.SERVER_MODE:
     from rucio.core import replica
 
+try:
+    from repoze.lru import LRUCache
+    # Process-wide cache of the deterministic paths, md5 hashing dominates PFN construction
+    PATH_CACHE = LRUCache(100000)
+except ImportError:
+    PATH_CACHE = None
+
 
 class RSEProtocol(object):
     """ This class is virtual and acts as a base to inherit new protocols from. It further provides some common functionality which applies for the amjority of the protocols."""
 
+    # True if get accepts a checksummer, fed with the data while the file is written
+    streaming_checksum = False
+
     def __init__(self, protocol_attr, rse_settings):
         """ Initializes the object with information about the referred RSE.
 
@@ -85,6 +95,35 @@ class RSEProtocol(object):
                                                          ])
         return pfns
 
+    def lfns2pfns_bulk(self, lfns):
+        """
+            Returns the fully qualified PFNs for a block of files in one pass.
+
+            :param lfns: list of (scope, name, path) tuples, the path can be None.
+
+            :returns: list of PFNs in the order of lfns.
+        """
+        if getattr(self.lfns2pfns, '__func__', None) is not RSEProtocol.lfns2pfns.__func__:
+            # The protocol builds its PFNs on its own
+            pfns = self.lfns2pfns([{'scope': scope, 'name': name, 'path': path} for scope, name, path in lfns])
+            return [pfns['%s:%s' % (scope, name)] for scope, name, path in lfns]
+
+        prefix = self.attributes['prefix']
+        if not prefix.startswith('/'):
+            prefix = ''.join(['/', prefix])
+        if not prefix.endswith('/'):
+            prefix = ''.join([prefix, '/'])
+        base = ''.join([self.attributes['scheme'], '://', self.attributes['hostname'], ':', str(self.attributes['port']), prefix])
+
+        pfns = []
+        for scope, name, path in lfns:
+            if path is None:
+                path = self._get_path(scope=scope, name=name)
+            elif path.startswith('/'):
+                path = path[1:]
+            pfns.append(''.join([base, path]))
+        return pfns
+
     def __lfns2pfns_client(self, lfns):
         """ Provides the path of a replica for non-deterministic sites. Will be assigned to get path by the __init__ method if neccessary.
 
@@ -116,10 +155,19 @@ class RSEProtocol(object):
 
             :returns: RSE specific URI of the physical file
         """
+        key = (self.attributes.get('determinism_type'), scope, name)
+        if PATH_CACHE is not None:
+            path = PATH_CACHE.get(key)
+            if path is not None:
+                return path
         hstr = hashlib.md5('%s:%s' % (scope, name)).hexdigest()
+        path_scope = scope
         if scope.startswith('user') or scope.startswith('group'):
-            scope = scope.replace('.', '/')
-        return '%s/%s/%s/%s' % (scope, hstr[0:2], hstr[2:4], name)
+            path_scope = scope.replace('.', '/')
+        path = '%s/%s/%s/%s' % (path_scope, hstr[0:2], hstr[2:4], name)
+        if PATH_CACHE is not None:
+            PATH_CACHE.put(key, path)
+        return path
 
     def _get_path_nondeterministic_server(self, scope, name):
         """ Provides the path of a replica for non-deterministic sites. Will be assigned to get path by the __init__ method if neccessary. """
@@ -248,6 +296,26 @@ class RSEProtocol(object):
         """
         raise NotImplementedError
 
+    def delete_bulk(self, paths):
+        """
+            Deletes several files from the connected RSE.
+
+            Protocols able to delete many files in one storage operation override this method,
+            the default implementation deletes the files one by one.
+
+            :param paths: list of paths to the to be deleted files
+
+            :returns: a dict with the path as key and None, or the raised exception if the deletion failed, as value
+        """
+        status = {}
+        for path in paths:
+            try:
+                self.delete(path)
+                status[path] = None
+            except Exception as error:
+                status[path] = error
+        return status
+
     def rename(self, path, new_path):
         """ Allows to rename a file stored inside the connected RSE.
 
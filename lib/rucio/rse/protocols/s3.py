@@ -16,6 +16,7 @@ from S3.Exceptions import S3Error, InvalidFileError
 from S3.S3 import S3
 from S3.Config import Config
 from S3.S3Uri import S3Uri
+from S3.Utils import getListFromXml
 
 from rucio.common import exception
 from rucio.rse.protocols import protocol
@@ -168,6 +169,41 @@ class Default(protocol.RSEProtocol):
             else:
                 raise exception.ServiceUnavailable(e)
 
+    def delete_bulk(self, pfns):
+        """
+            Deletes several files from the connected RSE with one multi-object delete request per bucket.
+
+            :param pfns: list of physical file names
+
+            :returns: a dict with the PFN as key and None, or the raised exception if the deletion failed, as value
+        """
+        if not hasattr(self.__s3, 'object_batch_delete_uri_strs'):
+            return super(Default, self).delete_bulk(pfns)
+
+        buckets = {}
+        for pfn in pfns:
+            uri = S3Uri(pfn)
+            buckets.setdefault(uri.bucket(), {})[uri.object()] = pfn
+
+        status = {}
+        for bucket in buckets:
+            keys = buckets[bucket].keys()
+            # A multi-object delete request is limited to 1000 keys
+            for i in xrange(0, len(keys), 1000):
+                chunk = keys[i:i + 1000]
+                try:
+                    response = self.__s3.object_batch_delete_uri_strs(['s3://%s/%s' % (bucket, key) for key in chunk])
+                except S3Error as e:
+                    for key in chunk:
+                        status[buckets[bucket][key]] = exception.ServiceUnavailable(e)
+                    continue
+                for key in chunk:
+                    status[buckets[bucket][key]] = None
+                for error in getListFromXml(response['data'], 'Error'):
+                    if error.get('Key') in buckets[bucket]:
+                        status[buckets[bucket][error['Key']]] = exception.ServiceUnavailable('%s: %s' % (error.get('Code'), error.get('Message')))
+        return status
+
     def rename(self, pfn, new_pfn):
         """ Allows to rename a file stored inside the connected RSE.
 
@@ -18,6 +18,7 @@ import ssl
 
 import xml.etree.ElementTree as ET
 
+from concurrent.futures import ThreadPoolExecutor
 from progressbar import ProgressBar
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.poolmanager import PoolManager
@@ -27,6 +28,9 @@ from xml.parsers import expat
 from rucio.common import exception
 from rucio.rse.protocols import protocol
 
+# Number of concurrent DELETE requests issued by delete_bulk, kept below the connection pool size of the session
+DELETE_BULK_THREADS = 8
+
 
 class TLSv1HttpAdapter(HTTPAdapter):
     '''
@@ -144,6 +148,8 @@ class Default(protocol.RSEProtocol):
 
     """ Implementing access to RSEs using the webDAV protocol."""
 
+    streaming_checksum = True
+
     def connect(self, credentials={}):
         """ Establishes the actual connection to the referred RSE.
 
@@ -237,11 +243,12 @@ class Default(protocol.RSEProtocol):
         except requests.exceptions.ConnectionError as error:
             raise exception.ServiceUnavailable(error)
 
-    def get(self, pfn, dest='.'):
+    def get(self, pfn, dest='.', checksummer=None):
         """ Provides access to files stored inside connected the RSE.
 
             :param pfn Physical file name of requested file
             :param dest Name and path of the files when stored at the client
+            :param checksummer Optional rucio.common.checksum.Checksummer updated with the downloaded data
 
             :raises DestinationNotAccessible, ServiceUnavailable, SourceNotFound, RSEAccessDenied
         """
@@ -263,6 +270,8 @@ class Default(protocol.RSEProtocol):
                             print 'Malformed HTTP response (missing content-length header). Cannot show progress bar.'
                         for chunk in result.iter_content(chunksize):
                             f.write(chunk)
+                            if checksummer:
+                                checksummer.update(chunk)
                             if length:
                                 nchunk += 1
                                 pbar.update(nchunk)
@@ -397,6 +406,25 @@ class Default(protocol.RSEProtocol):
         except requests.exceptions.ReadTimeout, error:
             raise exception.ServiceUnavailable(error)
 
+    def delete_bulk(self, pfns):
+        """ Deletes several files from the connected RSE with concurrent requests on the connections of the session.
+
+            :param pfns List of physical file names
+
+            :returns: a dict with the PFN as key and None, or the raised exception if the deletion failed, as value
+        """
+        def __delete(pfn):
+            try:
+                self.delete(pfn)
+            except Exception as error:
+                return pfn, error
+            return pfn, None
+
+        if not pfns:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(DELETE_BULK_THREADS, len(pfns))) as executor:
+            return dict(executor.map(__delete, pfns))
+
     def mkdir(self, directory):
         """ Internal method to create directories
 
@@ -16,10 +16,14 @@
 
 import copy
 import os
+import time
 
+from Queue import Queue, Empty
+from threading import Thread
 from urlparse import urlparse
 
 from rucio.common import exception, utils
+from rucio.common.checksum import Checksummer
 
 DEFAULT_PROTOCOL = 1
 
@@ -221,11 +225,22 @@ def download(rse_settings, files, dest_dir=None, force_scheme=None, ignore_check
                         if printstatements:
                             print '%s already exists, probably from a failed attempt. Will remove it' % (tempfile)
                         os.unlink(tempfile)
-                    protocol.get(pfn, tempfile)
+                    # Verify the data while it is written if the protocol streams it
+                    checksummer = None
+                    if not ignore_checksum and protocol.streaming_checksum:
+                        checksummer = Checksummer(algorithms=('adler32', ))
+                        protocol.get(pfn, tempfile, checksummer=checksummer)
+                    else:
+                        protocol.get(pfn, tempfile)
                     if printstatements:
                         print 'File downloaded. Will be validated'
 
-                    localchecksum = f['adler32'] if ignore_checksum else utils.adler32(tempfile)
+                    if ignore_checksum:
+                        localchecksum = f['adler32']
+                    elif checksummer:
+                        localchecksum = checksummer.hexdigests()['adler32']
+                    else:
+                        localchecksum = utils.adler32(tempfile)
                     if localchecksum == f['adler32']:
                         if printstatements:
                             print 'File validated'
@@ -293,7 +308,65 @@ def exists(rse_settings, files):
     return [gs, ret]
 
 
-def upload(rse_settings, lfns, source_dir=None, force_pfn=None):
+def __upload_file(protocol, protocol_delete, lfn, source_dir=None, force_pfn=None):
+    """
+        Uploads one file with connected protocols.
+
+        :returns: tuple (pfn, True or the exception)
+    """
+    name = lfn['name']
+    scope = lfn['scope']
+    if 'adler32' not in lfn:
+        return None, exception.RucioException('Missing checksum for file %s:%s' % (lfn['scope'], lfn['name']))
+    if 'filesize' not in lfn:
+        return None, exception.RucioException('Missing filesize for file %s:%s' % (lfn['scope'], lfn['name']))
+
+    if force_pfn:
+        pfn = force_pfn
+    else:
+        pfn = protocol.lfns2pfns(lfn).values()[0]
+
+    # Check if file replica is already on the storage system
+    if protocol.overwrite is False and protocol.exists(pfn):
+        return pfn, exception.FileReplicaAlreadyExists('File %s in scope %s already exists on storage' % (name, scope))
+
+    # If renaming is supported the file is uploaded to a temporary name and renamed once verified
+    target = '%s.rucio.upload' % pfn if protocol.renaming else pfn
+    if protocol.renaming and protocol.exists(target):  # Check for left over of previous unsuccessful attempts
+        try:
+            protocol_delete.delete('%s.rucio.upload' % protocol_delete.lfns2pfns(lfn).values()[0])
+        except Exception:
+            pass  # The upload overwrites it
+
+    try:  # Try uploading file
+        protocol.put(name, target, source_dir)
+    except Exception as e:
+        return pfn, e
+
+    valid = None
+    try:  # Get metadata of file to verify if upload was successful
+        stats = protocol.stat(target)
+        if ('adler32' in stats) and ('adler32' in lfn):
+            valid = stats['adler32'] == lfn['adler32']
+        if (valid is None) and ('filesize' in stats) and ('filesize' in lfn):
+            valid = stats['filesize'] == lfn['filesize']
+    except NotImplementedError:
+        valid = True  # If the protocol doesn't support stat of a file, we agreed on assuming that the file was uploaded without error
+    except Exception as e:
+        return pfn, e
+
+    if not valid:
+        return pfn, exception.RucioException('Replica %s is corrupted.' % pfn)
+
+    if protocol.renaming:  # The upload finished successful and the file can be renamed
+        try:
+            protocol.rename(target, pfn)
+        except Exception as e:
+            return pfn, e
+    return pfn, True
+
+
+def upload(rse_settings, lfns, source_dir=None, force_pfn=None, threads=1):
     """
         Uploads a file to the connected storage.
         Providing a list indicates the bulk mode.
@@ -302,6 +375,8 @@ def upload(rse_settings, lfns, source_dir=None, force_pfn=None):
                                                                                                     {'name': '2_rse_local_put.raw', 'scope': 'user.jdoe', 'filesize': 4711, 'adler32': 'RSSMICETHMISBA837464F'}]
         :param source_dir:  path to the local directory including the source files
         :param force_pfn: use the given PFN -- can lead to dark data, use sparingly
+        :param threads:     number of files uploaded in parallel in bulk mode, each thread connects once and reuses its connections for all its files
+                            The start and end times of the upload of each file are stored in its dict as 'transferStart' and 'transferEnd'.
 
         :returns: True/False for a single file or a dict object with 'scope:name' as keys and True or the exception as value for each file in bulk mode
 
@@ -311,116 +386,70 @@ def upload(rse_settings, lfns, source_dir=None, force_pfn=None):
         :raises ServiceUnavailable: for any other reason
     """
     ret = {}
-    gs = True  # gs represents the global status which indicates if every operation worked in bulk mode
-
-    protocol = create_protocol(rse_settings, 'write')
-    protocol.connect()
-    protocol_delete = create_protocol(rse_settings, 'delete')
-    protocol_delete.connect()
+    pfns = {}
 
     lfns = [lfns] if not type(lfns) is list else lfns
+    queue = Queue()
     for lfn in lfns:
-        name = lfn['name']
-        scope = lfn['scope']
-        if 'adler32' not in lfn:
-            gs = False
-            ret['%s:%s' % (scope, name)] = exception.RucioException('Missing checksum for file %s:%s' % (lfn['scope'], lfn['name']))
-            continue
-        if 'filesize' not in lfn:
-            gs = False
-            ret['%s:%s' % (scope, name)] = exception.RucioException('Missing filesize for file %s:%s' % (lfn['scope'], lfn['name']))
-            continue
-
-        if force_pfn:
-            pfn = force_pfn
-        else:
-            pfn = protocol.lfns2pfns(lfn).values()[0]
+        queue.put(lfn)
 
-        # First check if renaming operation is supported
-        if protocol.renaming:
+    errors = []
 
-            # Check if file replica is already on the storage system
-            if protocol.overwrite is False and protocol.exists(pfn):
-                ret['%s:%s' % (scope, name)] = exception.FileReplicaAlreadyExists('File %s in scope %s already exists on storage' % (name, scope))
-                gs = False
-            else:
-                if protocol.exists('%s.rucio.upload' % pfn):  # Check for left over of previous unsuccessful attempts
-                    try:
-                        protocol_delete.delete('%s.rucio.upload', protocol_delete.lfns2pfns(lfn).values()[0])
-                    except Exception as e:
-                        ret['%s:%s' % (scope, name)] = exception.RSEOperationNotSupported('Unable to remove temporary file %s.rucio.upload: %s' % (pfn, str(e)))
-                try:  # Try uploading file
-                    protocol.put(name, '%s.rucio.upload' % pfn, source_dir)
-                except Exception as e:
-                    gs = False
-                    ret['%s:%s' % (scope, name)] = e
-                    continue
-
-                valid = None
-                try:  # Get metadata of file to verify if upload was successful
-                    stats = protocol.stat('%s.rucio.upload' % pfn)
-                    if ('adler32' in stats) and ('adler32' in lfn):
-                        valid = stats['adler32'] == lfn['adler32']
-                    if (valid is None) and ('filesize' in stats) and ('filesize' in lfn):
-                        valid = stats['filesize'] == lfn['filesize']
-                except NotImplementedError:
-                    valid = True  # If the protocol doesn't support stat of a file, we agreed on assuming that the file was uploaded without error
-                except Exception as e:
-                    gs = False
-                    ret['%s:%s' % (scope, name)] = e
-                    continue
-
-                if valid:  # The upload finished successful and the file can be renamed
-                    try:
-                        protocol.rename('%s.rucio.upload' % pfn, pfn)
-                        ret['%s:%s' % (scope, name)] = True
-                    except Exception as e:
-                        gs = False
-                        ret['%s:%s' % (scope, name)] = e
-                else:
-                    gs = False
-                    ret['%s:%s' % (scope, name)] = exception.RucioException('Replica %s is corrupted.' % pfn)
-        else:
-
-            # Check if file replica is already on the storage system
-            if protocol.overwrite is False and protocol.exists(pfn):
-                ret['%s:%s' % (scope, name)] = exception.FileReplicaAlreadyExists('File %s in scope %s already exists on storage' % (name, scope))
-                gs = False
-            else:
-                try:  # Try uploading file
-                    protocol.put(name, pfn, source_dir)
-                except Exception as e:
-                    gs = False
-                    ret['%s:%s' % (scope, name)] = e
-                    continue
-
-                valid = None
-                try:  # Get metadata of file to verify if upload was successful
-                    stats = protocol.stat(pfn)
-                    if ('adler32' in stats) and ('adler32' in lfn):
-                        valid = stats['adler32'] == lfn['adler32']
-                    if (valid is None) and ('filesize' in stats) and ('filesize' in lfn):
-                        valid = stats['filesize'] == lfn['filesize']
-                except NotImplementedError:
-                    valid = True  # If the protocol doesn't support stat of a file, we agreed on assuming that the file was uploaded without error
+    def worker():
+        # The files are left in the queue for the connected threads
+        try:
+            protocol = create_protocol(rse_settings, 'write')
+            protocol.connect()
+        except Exception as e:
+            errors.append(e)
+            return
+        try:
+            protocol_delete = create_protocol(rse_settings, 'delete')
+            protocol_delete.connect()
+        except Exception as e:
+            errors.append(e)
+            protocol.close()
+            return
+        try:
+            while True:
+                try:
+                    lfn = queue.get_nowait()
+                except Empty:
+                    return
+                key = '%s:%s' % (lfn['scope'], lfn['name'])
+                lfn['transferStart'] = time.time()
+                try:
+                    pfns[key], ret[key] = __upload_file(protocol, protocol_delete, lfn, source_dir, force_pfn)
                 except Exception as e:
-                    gs = False
-                    ret['%s:%s' % (scope, name)] = e
-                    continue
-
-                if not valid:
-                    gs = False
-                    ret['%s:%s' % (scope, name)] = exception.RucioException('Replica %s is corrupted.' % pfn)
-
-    protocol.close()
-    protocol_delete.close()
+                    ret[key] = e
+                lfn['transferEnd'] = time.time()
+        finally:
+            protocol.close()
+            protocol_delete.close()
+
+    threads = max(1, min(threads, len(lfns)))
+    if threads == 1:
+        worker()
+    else:
+        workers = [Thread(target=worker) for _ in xrange(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+    for lfn in lfns:  # The files left by threads which failed to connect
+        lfn_key = '%s:%s' % (lfn['scope'], lfn['name'])
+        if lfn_key not in ret:
+            ret[lfn_key] = errors[0] if errors else exception.RucioException('File %s was not uploaded.' % lfn_key)
+
+    gs = all([ret[key] is True for key in ret])  # gs represents the global status which indicates if every operation worked in bulk mode
     if len(ret) == 1:
         for x in ret:
             if isinstance(ret[x], Exception):
                 raise ret[x]
             else:
                 return {'success': ret[x],
-                        'pfn': pfn}
+                        'pfn': pfns[x]}
     return [gs, ret]
 
 
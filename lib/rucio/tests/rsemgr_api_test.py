@@ -20,7 +20,7 @@ from rucio.rse import rsemanager as mgr
 
 
 class MgrTestCases():
-    files_local = ["1_rse_local_put.raw", "2_rse_local_put.raw", "3_rse_local_put.raw", "4_rse_local_put.raw"]
+    files_local = ["1_rse_local_put.raw", "2_rse_local_put.raw", "3_rse_local_put.raw", "4_rse_local_put.raw", "5_rse_local_put.raw", "6_rse_local_put.raw"]
     files_remote = ['1_rse_remote_get.raw', '2_rse_remote_get.raw', '3_rse_remote_get.raw', '4_rse_remote_get.raw',
                     '1_rse_remote_delete.raw', '2_rse_remote_delete.raw', '3_rse_remote_delete.raw', '4_rse_remote_delete.raw',
                     '1_rse_remote_exists.raw', '2_rse_remote_exists.raw',
@@ -108,6 +108,15 @@ class MgrTestCases():
         if not (status and details['user.%s:1_rse_local_put.raw' % self.user] and details['user.%s:2_rse_local_put.raw' % self.user]):
             raise Exception('Return not as expected: %s, %s' % (status, details))
 
+    def test_put_mgr_ok_multi_threads(self):
+        """(RSE/PROTOCOLS): Put multiple files to storage in parallel (Success)"""
+        files = ['5_rse_local_put.raw', '6_rse_local_put.raw']
+        status, details = mgr.upload(self.rse_settings, [{'name': f, 'scope': 'user.%s' % self.user,
+                                                          'adler32': adler32('%s/%s' % (self.tmpdir, f)), 'filesize': os.stat('%s/%s' % (self.tmpdir, f))[os.path.stat.ST_SIZE]} for f in files],
+                                     self.tmpdir, threads=2)
+        if not (status and all([details['user.%s:%s' % (self.user, f)] is True for f in files])):
+            raise Exception('Return not as expected: %s, %s' % (status, details))
+
     def test_put_mgr_ok_single(self):
         """(RSE/PROTOCOLS): Put a single file to storage (Success)"""
         mgr.upload(self.rse_settings, {'name': '3_rse_local_put.raw', 'scope': 'user.%s' % self.user,
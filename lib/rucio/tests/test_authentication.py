@@ -10,10 +10,16 @@
  - Vincent Garonne,  <vincent.garonne@cern.ch> , 2011-2017
 '''
 
-from nose.tools import assert_equal, assert_is_not_none, assert_greater
+from nose.tools import assert_equal, assert_is_none, assert_is_not_none, assert_greater
 from paste.fixture import TestApp
 
-from rucio.api.authentication import get_auth_token_user_pass
+from rucio.api.account import add_account, del_account
+from rucio.api.authentication import get_auth_token_user_pass, validate_auth_token
+from rucio.common.utils import generate_uuid
+from rucio.core.authentication import revoke_auth_token, TOKEN_CACHE, TOKENREGION
+from rucio.db.sqla import models
+from rucio.db.sqla.session import get_session
+from rucio.tests.common import account_name_generator
 from rucio.web.rest.authentication import APP
 
 
@@ -26,6 +32,42 @@ class TestAuthCoreApi(object):
         result = get_auth_token_user_pass(account='root', username='ddmlab', password='secret', appid='test', ip='127.0.0.1')
         assert_is_not_none(result)
 
+    def test_validate_revoke_auth_token(self):
+        """AUTHENTICATION (CORE): Validate and revoke a token."""
+        token = get_auth_token_user_pass(account='root', username='ddmlab', password='secret', appid='test', ip='127.0.0.1')
+        assert_equal(validate_auth_token(token)['account'], 'root')
+        assert_equal(validate_auth_token(' %s ' % token)['account'], 'root')
+        revoke_auth_token(token)
+        assert_is_none(validate_auth_token(token))
+
+        bad_token = 'root-%s' % generate_uuid()
+        assert_is_none(validate_auth_token(bad_token))
+        assert_is_none(validate_auth_token(bad_token))
+
+    def test_revoked_auth_token_in_cache(self):
+        """AUTHENTICATION (CORE): A revoked token put back in the cache region by another process is not valid."""
+        token = get_auth_token_user_pass(account='root', username='ddmlab', password='secret', appid='test', ip='127.0.0.1')
+        value = validate_auth_token(token)
+        assert_equal(value['account'], 'root')
+        revoke_auth_token(token)
+
+        TOKENREGION.set(token, value)
+        TOKEN_CACHE.invalidate(token)
+        assert_is_none(validate_auth_token(token))
+
+    def test_del_account_revokes_auth_tokens(self):
+        """AUTHENTICATION (CORE): The tokens of a deleted account are revoked."""
+        account = account_name_generator()
+        add_account(account, 'USER', 'rucio@email.com', 'root')
+        token = '%s-%s' % (account, generate_uuid())
+        session = get_session()
+        models.Token(account=account, token=token, ip='127.0.0.1').save(session=session)
+        session.commit()
+        assert_equal(validate_auth_token(token)['account'], account)
+
+        del_account(account, 'root')
+        assert_is_none(validate_auth_token(token))
+
 
 class TestAuthRestApi(object):
     '''
@@ -0,0 +1,60 @@
+# Copyright European Organization for Nuclear Research (CERN)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import hashlib
+import os
+import shutil
+import tempfile
+import zlib
+
+from nose.tools import assert_equal, assert_true
+
+from rucio.common.checksum import Checksummer, file_checksums, files_checksums
+from rucio.common.utils import adler32, md5
+
+
+class TestChecksum(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.files = {}
+        for i, size in enumerate([0, 1, 1024 * 1024 + 7, 3 * 1024 * 1024]):
+            data = os.urandom(size)
+            path = os.path.join(self.tmpdir, 'file_%i' % i)
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.files[path] = {'adler32': '%08x' % (zlib.adler32(data) & 0xffffffff), 'md5': hashlib.md5(data).hexdigest()}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_file_checksums(self):
+        """ CHECKSUM: Compute adler32 and md5 of a file in one pass """
+        for path, checksums in self.files.items():
+            assert_equal(file_checksums(path, buffer_size=4096), checksums)
+            assert_equal(file_checksums(path), checksums)
+            assert_equal(adler32(path), checksums['adler32'])
+            assert_equal(md5(path), checksums['md5'])
+
+    def test_files_checksums(self):
+        """ CHECKSUM: Compute the checksums of several files in parallel """
+        missing = os.path.join(self.tmpdir, 'missing')
+        results = files_checksums(self.files.keys() + [missing], threads=3)
+        assert_true(isinstance(results.pop(missing), IOError))
+        assert_equal(results, self.files)
+
+    def test_checksummer(self):
+        """ CHECKSUM: Compute the checksums of a stream """
+        checksummer = Checksummer(('adler32', 'md5', 'sha1'))
+        data = os.urandom(10000)
+        for i in xrange(0, len(data), 333):
+            checksummer.update(data[i:i + 333])
+        digests = checksummer.hexdigests()
+        assert_equal(digests['adler32'], '%08x' % (zlib.adler32(data) & 0xffffffff))
+        assert_equal(digests['md5'], hashlib.md5(data).hexdigest())
+        assert_equal(digests['sha1'], hashlib.sha1(data).hexdigest())
+        assert_equal(checksummer.bytes, len(data))
@@ -10,10 +10,22 @@
   - Wen Guan, <wen.guan@cern.ch>, 2015
 '''
 
+import threading
 import time
 
+from nose.tools import assert_equal, assert_false, assert_true
+
+from rucio.common.utils import generate_uuid
+from rucio.core import rse as rse_core
 from rucio.daemons.mock.conveyorinjector import request_transfer
 from rucio.daemons.conveyor import submitter, poller, finisher, throttler
+from rucio.daemons.conveyor.scheduler import SubmissionScheduler
+from rucio.daemons.conveyor.utils import get_transfers_from_sources
+from rucio.db.sqla import models
+from rucio.db.sqla.constants import RSEType
+from rucio.db.sqla.session import get_session
+from rucio.rse import rsemanager
+from rucio.tests.common import rse_name_generator
 
 
 class TestConveyorSubmitter:
@@ -31,3 +43,205 @@ class TestConveyorSubmitter:
         time.sleep(5)
         poller.run(once=True)
         finisher.run(once=True)
+
+
+class TestSubmissionScheduler:
+    """ TestSubmissionScheduler Class."""
+
+    @staticmethod
+    def __jobs(external_host, nb_jobs, nb_files, src_rse='SRC', dst_rse='DST'):
+        return {external_host: [{'files': [{'metadata': {'request_id': '%s_%s_%s' % (external_host, i, j), 'src_rse': src_rse, 'dst_rse': dst_rse}} for j in xrange(nb_files)],
+                                 'job_params': {}} for i in xrange(nb_jobs)]}
+
+    def test_slow_host_does_not_block(self):
+        """ CONVEYOR (SCHEDULER): A slow FTS host does not hold back the other hosts."""
+        release = threading.Event()
+        submitted = []
+
+        def submit(external_host, job):
+            if external_host == 'slow':
+                release.wait(10)
+            submitted.append(external_host)
+            return True
+
+        scheduler = SubmissionScheduler(submit, total_threads=4, max_inflight_per_host=1)
+        scheduler.start()
+        scheduler.add(self.__jobs('slow', 2, 1))
+        scheduler.add(self.__jobs('fast', 5, 1))
+        for _ in xrange(50):
+            if submitted.count('fast') == 5:
+                break
+            time.sleep(0.1)
+        assert_equal(submitted.count('fast'), 5)
+        assert_equal(submitted.count('slow'), 0)
+        assert_true(scheduler.is_scheduled('slow_1_0'))
+        release.set()
+        assert_true(scheduler.wait(timeout=10))
+        assert_equal(submitted.count('slow'), 2)
+        scheduler.stop()
+
+    def test_job_size_feedback(self):
+        """ CONVEYOR (SCHEDULER): The job size shrinks on errors and the jobs are split accordingly."""
+        sizes = []
+
+        def submit(external_host, job):
+            sizes.append(len(job['files']))
+            return len(sizes) > 1
+
+        scheduler = SubmissionScheduler(submit, total_threads=1, max_job_size=8)
+        scheduler.start()
+        scheduler.add(self.__jobs('host', 1, 20))
+        assert_true(scheduler.wait(timeout=10))
+        scheduler.stop()
+        assert_equal(sizes[:2], [8, 4])
+        assert_equal(sum(sizes), 20)
+
+    def test_link_limit(self):
+        """ CONVEYOR (SCHEDULER): The in-flight submissions of a link are limited."""
+        lock = threading.Lock()
+        inflight = {'current': 0, 'max': 0}
+
+        def submit(external_host, job):
+            with lock:
+                inflight['current'] += 1
+                inflight['max'] = max(inflight['max'], inflight['current'])
+            time.sleep(0.05)
+            with lock:
+                inflight['current'] -= 1
+            return True
+
+        scheduler = SubmissionScheduler(submit, total_threads=4, max_inflight_per_link=1)
+        scheduler.start()
+        scheduler.add(self.__jobs('host1', 3, 1))
+        scheduler.add(self.__jobs('host2', 3, 1))
+        assert_true(scheduler.wait(timeout=10))
+        scheduler.stop()
+        assert_equal(inflight['max'], 1)
+
+    def test_request_done_during_refill(self):
+        """ CONVEYOR (SCHEDULER): A request submitted while the queue is refilled is not scheduled twice."""
+        release = threading.Event()
+        submitted = []
+
+        def submit(external_host, job):
+            release.wait(10)
+            submitted.extend([file['metadata']['request_id'] for file in job['files']])
+            return True
+
+        scheduler = SubmissionScheduler(submit, total_threads=1)
+        scheduler.start()
+        scheduler.add(self.__jobs('host', 1, 1))
+        for _ in xrange(50):
+            if not scheduler.pending_files():
+                break
+            time.sleep(0.1)
+
+        # the request is in-flight, the database still returns it as queued
+        scheduled = scheduler.scheduled_request_ids()
+        transfers = {'host_0_0': {}, 'new': {}}
+        release.set()
+        assert_true(scheduler.wait(timeout=10))
+        assert_false(scheduler.is_scheduled('host_0_0'))
+
+        assert_equal(scheduler.unscheduled(transfers, scheduled).keys(), ['new'])
+        assert_equal(submitted, ['host_0_0'])
+        scheduler.stop()
+
+
+class TestTransfersFromSources:
+    """ TestTransfersFromSources Class."""
+
+    @staticmethod
+    def __add_rse(scheme='mock', rse_type=RSEType.DISK):
+        rse = rse_name_generator()
+        rse_id = rse_core.add_rse(rse)
+        rse_core.add_protocol(rse, {'scheme': scheme, 'hostname': 'localhost', 'port': 123, 'prefix': '/test/conveyor',
+                                    'impl': 'rucio.rse.protocols.mock.Default',
+                                    'domains': {'lan': {'read': 1, 'write': 1, 'delete': 1},
+                                                'wan': {'read': 1, 'write': 1, 'delete': 1}}})
+        if rse_type != RSEType.DISK:
+            session = get_session()
+            session.query(models.RSE).filter_by(id=rse_id).update({'rse_type': rse_type})
+            session.commit()
+        return rse, rse_id
+
+    def setup(self):
+        self.dst, self.dst_id = self.__add_rse()
+        rse_core.add_rse_attribute(self.dst, 'fts', 'https://fts:8446')
+        self.disk, self.disk_id = self.__add_rse()
+        self.tape, self.tape_id = self.__add_rse(rse_type=RSEType.TAPE)
+
+    def __rows(self, sources, attributes=None, name=None):
+        """ The request x source rows of one request, sources are (rse, rse_id, rse_type, path, ranking). """
+        request_id, name = generate_uuid(), name or 'file_%s' % generate_uuid()
+        return [(request_id, None, 'mock', name, None, 'deadbeef', 1L, 'User Subscriptions', attributes, None, self.dst_id,
+                 rse_id, rse, True, rse_type, path, 0, None, ranking, 1) for rse, rse_id, rse_type, path, ranking in sources]
+
+    def test_first_tape_source_allowed(self):
+        """ CONVEYOR (UTILS): The first source of a request is used even if it is a tape not allowed by the request."""
+        only_tape = self.__rows([(self.tape, self.tape_id, RSEType.TAPE, None, 0)], attributes={'allow_tape_source': False})
+        tape_after_disk = self.__rows([(self.disk, self.disk_id, RSEType.DISK, None, 0), (self.tape, self.tape_id, RSEType.TAPE, None, 1)],
+                                      attributes={'allow_tape_source': False})
+        tape_allowed = self.__rows([(self.disk, self.disk_id, RSEType.DISK, None, 0), (self.tape, self.tape_id, RSEType.TAPE, None, 1)])
+        rows = sorted(only_tape + tape_after_disk + tape_allowed, key=lambda row: row[0])
+
+        transfers, reqs_no_source, reqs_scheme_mismatch, reqs_only_tape_source = get_transfers_from_sources(rows)
+        assert_equal((reqs_no_source, reqs_scheme_mismatch, reqs_only_tape_source), ([], [], []))
+        assert_equal([source[0] for source in transfers[only_tape[0][0]]['sources']], [self.tape])
+        assert_equal(transfers[only_tape[0][0]]['bring_online'], 43200)
+        assert_equal([source[0] for source in transfers[tape_after_disk[0][0]]['sources']], [self.disk])
+        assert_equal(transfers[tape_after_disk[0][0]]['bring_online'], None)
+        assert_equal([source[0] for source in transfers[tape_allowed[0][0]]['sources']], [self.tape])
+
+    def test_source_without_ranking(self):
+        """ CONVEYOR (UTILS): A source without ranking is ranked 0."""
+        tape_then_disk = self.__rows([(self.tape, self.tape_id, RSEType.TAPE, None, 0), (self.disk, self.disk_id, RSEType.DISK, None, None)])
+        transfers = get_transfers_from_sources(tape_then_disk)[0]
+        transfer = transfers[tape_then_disk[0][0]]
+        assert_equal([(source[0], source[3]) for source in transfer['sources']], [(self.disk, 0)])
+        assert_equal(transfer['bring_online'], None)
+        assert_equal(transfer['file_metadata']['src_type'], 'DISK')
+
+    def test_request_outcomes(self):
+        """ CONVEYOR (UTILS): Every request is either a transfer, without source or with a scheme mismatch."""
+        root, root_id = self.__add_rse(scheme='root')
+        disk = [(self.disk, self.disk_id, RSEType.DISK, None, 0)]
+        requests = {'transfer': [self.__rows(disk) for _ in xrange(3)],
+                    'no_source': [self.__rows([(None, None, None, None, None)]),
+                                  [row[:19] + (None, ) for row in self.__rows(disk)],
+                                  self.__rows(disk, attributes={'source_replica_expression': root})],
+                    'scheme_mismatch': [self.__rows([(root, root_id, RSEType.DISK, None, 0)])]}
+        # a scheme mismatch source does not hide the other sources
+        requests['transfer'].append(self.__rows([(root, root_id, RSEType.DISK, None, 0)] + disk))
+        rows = sorted([row for rows in requests.itervalues() for request in rows for row in request], key=lambda row: row[0])
+
+        transfers, reqs_no_source, reqs_scheme_mismatch, reqs_only_tape_source = get_transfers_from_sources(rows, block_size=2)
+        assert_equal(sorted(transfers), sorted([request[0][0] for request in requests['transfer']]))
+        assert_equal(sorted(reqs_no_source), sorted([request[0][0] for request in requests['no_source']]))
+        assert_equal(sorted(reqs_scheme_mismatch), sorted([request[0][0] for request in requests['scheme_mismatch']]))
+        assert_equal(reqs_only_tape_source, [])
+
+        # the destination does not support the schemes
+        transfers, reqs_no_source, reqs_scheme_mismatch, reqs_only_tape_source = get_transfers_from_sources(rows, schemes=['srm'])
+        assert_equal((transfers, reqs_only_tape_source), ({}, []))
+        assert_equal(sorted(reqs_no_source), sorted([request[0][0] for request in requests['no_source']]))
+        assert_equal(sorted(reqs_scheme_mismatch), sorted([request[0][0] for request in requests['transfer'] + requests['scheme_mismatch']]))
+
+    def test_source_urls_in_blocks(self):
+        """ CONVEYOR (UTILS): The source urls computed in blocks are the urls of the source protocols."""
+        disk2, disk2_id = self.__add_rse()
+        requests = []
+        for i in xrange(7):
+            path = 'path/file_%i' % i if i % 2 else None
+            requests.append(self.__rows([(self.disk, self.disk_id, RSEType.DISK, path, 0), (disk2, disk2_id, RSEType.DISK, path, 0)]))
+        rows = sorted([row for request in requests for row in request], key=lambda row: row[0])
+
+        expected = {}
+        for request in requests:
+            name, path = request[0][3], request[0][15]
+            expected[request[0][0]] = sorted([(rse, rsemanager.create_protocol(rsemanager.get_rse_info(rse), 'read', ['mock']).lfns2pfns({'scope': 'mock', 'name': name, 'path': path}).values()[0])
+                                              for rse in (self.disk, disk2)])
+
+        for block_size in (1, 3, 1000):
+            transfers = get_transfers_from_sources(rows, block_size=block_size)[0]
+            assert_equal(dict([(request_id, sorted([source[:2] for source in transfer['sources']])) for request_id, transfer in transfers.iteritems()]), expected)
@@ -9,12 +9,27 @@
 # - Vincent Garonne, <vincent.garonne@cern.ch>, 2013
 # - Martin Barisits, <martin.barisits@cern.ch>, 2014
 
+from datetime import datetime, timedelta
+
 from nose.tools import assert_equal
 
 from rucio.core import account_counter, rse_counter
 from rucio.core.rse import get_rse
 from rucio.daemons.abacus.rse import rse_update
 from rucio.daemons.abacus.account import account_update
+from rucio.db.sqla import models
+from rucio.db.sqla.session import get_session, read_session, transactional_session
+
+
+@transactional_session
+def increase_in_one_transaction(increases, session=None):
+    for increase in increases:
+        increase(session=session)
+
+
+@read_session
+def count_updated_counters(model, rse_id, session=None):
+    return session.query(model).filter_by(rse_id=rse_id).count()
 
 
 class TestCoreRSECounter():
@@ -66,6 +81,43 @@ class TestCoreRSECounter():
             del cnt['updated_at']
             assert_equal(cnt, {'files': count, 'bytes': sum})
 
+    def test_aggregated_deltas(self):
+        """ RSE COUNTER (CORE): Aggregate the increases of a transaction and apply them in batches """
+        rse_id = get_rse('MOCK').id
+        rse_update(once=True)
+        cnt_before = rse_counter.get_counter(rse_id=rse_id)
+
+        increase_in_one_transaction([lambda session: rse_counter.increase(rse_id=rse_id, files=1, bytes=10, session=session)] * 5)
+        assert_equal(count_updated_counters(models.UpdatedRSECounter, rse_id), 1)
+        rse_counter.increase(rse_id=rse_id, files=2, bytes=20)
+        rse_counter.decrease(rse_id=rse_id, files=1, bytes=10)
+        assert_equal(count_updated_counters(models.UpdatedRSECounter, rse_id), 3)
+
+        rse_update(once=True, bulk=2)
+        assert_equal(count_updated_counters(models.UpdatedRSECounter, rse_id), 0)
+        cnt = rse_counter.get_counter(rse_id=rse_id)
+        assert_equal(cnt['files'], cnt_before['files'] + 6)
+        assert_equal(cnt['bytes'], cnt_before['bytes'] + 60)
+
+    def test_batches_in_creation_order(self):
+        """ RSE COUNTER (CORE): Apply the oldest updates first when the batch is limited """
+        rse_id = get_rse('MOCK').id
+        rse_update(once=True)
+        cnt_before = rse_counter.get_counter(rse_id=rse_id)
+
+        # The oldest update has the greatest id, so an ordering by id would apply the newest update first
+        now = datetime.utcnow()
+        session = get_session()
+        for i, id in enumerate(['ffffffffffffffffffffffffffffff%02d' % i for i in xrange(3)][::-1]):
+            models.UpdatedRSECounter(id=id, rse_id=rse_id, files=1, bytes=10 ** i, created_at=now - timedelta(minutes=10 - i)).save(session=session)
+        session.commit()
+
+        assert_equal(rse_counter.update_rse_counters(total_workers=0, worker_number=0, limit=2), 2)
+        assert_equal(count_updated_counters(models.UpdatedRSECounter, rse_id), 1)
+        cnt = rse_counter.get_counter(rse_id=rse_id)
+        assert_equal(cnt['bytes'], cnt_before['bytes'] + 11)
+        rse_update(once=True)
+
 
 class TestCoreAccountCounter():
 
@@ -116,3 +168,22 @@ class TestCoreAccountCounter():
             cnt = account_counter.get_counter(rse_id=rse_id, account=account)
             del cnt['updated_at']
             assert_equal(cnt, {'files': count, 'bytes': sum})
+
+    def test_aggregated_deltas(self):
+        """ACCOUNT COUNTER (CORE): Aggregate the increases of a transaction and apply them in batches """
+        rse_id = get_rse('MOCK').id
+        account = 'jdoe'
+        account_update(once=True)
+        cnt_before = account_counter.get_counter(rse_id=rse_id, account=account)
+
+        increase_in_one_transaction([lambda session: account_counter.increase(rse_id=rse_id, account=account, files=1, bytes=10, session=session)] * 5)
+        assert_equal(count_updated_counters(models.UpdatedAccountCounter, rse_id), 1)
+        account_counter.increase(rse_id=rse_id, account=account, files=2, bytes=20)
+        account_counter.decrease(rse_id=rse_id, account=account, files=1, bytes=10)
+        assert_equal(count_updated_counters(models.UpdatedAccountCounter, rse_id), 3)
+
+        account_update(once=True, bulk=2)
+        assert_equal(count_updated_counters(models.UpdatedAccountCounter, rse_id), 0)
+        cnt = account_counter.get_counter(rse_id=rse_id, account=account)
+        assert_equal(cnt['files'], cnt_before['files'] + 6)
+        assert_equal(cnt['bytes'], cnt_before['bytes'] + 60)
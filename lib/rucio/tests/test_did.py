@@ -32,7 +32,8 @@ from rucio.common.exception import (DataIdentifierNotFound, DataIdentifierAlread
 from rucio.common.utils import generate_uuid
 from rucio.core.account_limit import set_account_limit
 from rucio.core.did import (list_dids, add_did, delete_dids, get_did_atime, touch_dids, attach_dids,
-                            get_metadata, set_metadata, get_did)
+                            get_metadata, get_metadata_bulk, set_metadata, get_did, list_files, list_child_datasets,
+                            list_collection_tree)
 from rucio.core.rse import get_rse_id
 from rucio.core.replica import add_replica
 from rucio.db.sqla.constants import DIDType
@@ -97,6 +98,18 @@ class TestDIDCore:
         set_metadata(scope=tmp_scope, name=lfn, key='bytes', value=724963577L)
         assert_equal(get_metadata(scope=tmp_scope, name=lfn)['bytes'], 724963577L)
 
+    def test_get_metadata_bulk(self):
+        """ DATA IDENTIFIERS (CORE): Get the metadata of several data identifiers at once"""
+        tmp_scope = 'mock'
+        dsns = ['dsn_%s' % generate_uuid() for i in xrange(3)]
+        for dsn in dsns:
+            add_did(scope=tmp_scope, name=dsn, type=DIDType.DATASET, account='root')
+
+        dids = [{'scope': tmp_scope, 'name': dsn} for dsn in dsns] + [{'scope': tmp_scope, 'name': 'dsn_%s' % generate_uuid()}]
+        metadata = list(get_metadata_bulk(dids))
+        assert_equal(sorted(meta['name'] for meta in metadata), sorted(dsns))
+        assert_equal(set(meta['did_type'] for meta in metadata), set([DIDType.DATASET]))
+
     def test_get_did_with_dynamic(self):
         """ DATA IDENTIFIERS (CORE): Get did with dynamic resolve of size"""
         tmp_scope = 'mock'
@@ -116,6 +129,27 @@ class TestDIDCore:
         assert_equal(get_did(scope=tmp_scope, name=tmp_dsn1, dynamic=True)['bytes'], 20)
         assert_equal(get_did(scope=tmp_scope, name=tmp_dsn4, dynamic=True)['bytes'], 20)
 
+    def test_list_collection_tree(self):
+        """ DATA IDENTIFIERS (CORE): Expand nested containers"""
+        tmp_scope = 'mock'
+        top, cnt1, cnt2 = ['cnt_%s' % generate_uuid() for i in xrange(3)]
+        dsns = ['dsn_%s' % generate_uuid() for i in xrange(3)]
+        files = [{'scope': tmp_scope, 'name': 'lfn.%s' % generate_uuid(), 'bytes': 1L, 'adler32': '0cc737eb'} for i in xrange(6)]
+
+        for cnt in (top, cnt1, cnt2):
+            add_did(scope=tmp_scope, name=cnt, type=DIDType.CONTAINER, account='root')
+        for i, dsn in enumerate(dsns):
+            add_did(scope=tmp_scope, name=dsn, type=DIDType.DATASET, account='root')
+            attach_dids(scope=tmp_scope, name=dsn, rse='MOCK', dids=files[2 * i:2 * i + 2], account='root')
+        attach_dids(scope=tmp_scope, name=cnt1, dids=[{'scope': tmp_scope, 'name': dsns[0]}, {'scope': tmp_scope, 'name': dsns[1]}], account='root')
+        attach_dids(scope=tmp_scope, name=cnt2, dids=[{'scope': tmp_scope, 'name': dsns[1]}, {'scope': tmp_scope, 'name': dsns[2]}], account='root')
+        attach_dids(scope=tmp_scope, name=top, dids=[{'scope': tmp_scope, 'name': cnt1}, {'scope': tmp_scope, 'name': cnt2}], account='root')
+
+        tree = [(did['child_name'], did['level']) for did in list_collection_tree(dids=[(tmp_scope, top)])]
+        assert_equal(sorted(tree), sorted([(cnt1, 1), (cnt2, 1), (dsns[0], 2), (dsns[1], 2), (dsns[1], 2), (dsns[2], 2)]))
+        assert_equal(sorted(did['name'] for did in list_child_datasets(scope=tmp_scope, name=top)), sorted(dsns))
+        assert_equal(sorted(did['name'] for did in list_files(scope=tmp_scope, name=top)), sorted(did['name'] for did in files))
+
 
 class TestDIDApi:
 
@@ -0,0 +1,139 @@
+# Copyright European Organization for Nuclear Research (CERN)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import urlparse
+
+from nose.tools import assert_equal, assert_true
+
+from rucio.transfertool import fts3
+
+
+class FakeResponse(object):
+    """ Response of the fake FTS3 server """
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self):
+        if isinstance(self.content, Exception):
+            raise self.content
+        return self.content
+
+
+class FakeSession(object):
+    """ Session of the fake FTS3 server, answering the bulk queries of the jobs """
+
+    def __init__(self, jobs):
+        """
+        :param jobs: Dictionary {transfer_id: job response}, a job response can be an exception raised by the request,
+                     a HTTP status code returned for the whole chunk, or an exception raised while parsing the chunk.
+        """
+        self.jobs = jobs
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        transfer_ids = urlparse.urlparse(url).path.split('/')[-1].split(',')
+        self.requested.append(transfer_ids)
+        responses = [self.jobs[transfer_id] for transfer_id in transfer_ids]
+        for response in responses:
+            if isinstance(response, IOError):
+                raise response
+            if isinstance(response, (int, ValueError)):
+                return FakeResponse(response if isinstance(response, int) else 200, response)
+        return FakeResponse(207, responses)
+
+
+def job_response(transfer_id, http_status='200 Ok', job_state='FINISHED'):
+    return {'job_id': transfer_id,
+            'http_status': http_status,
+            'job_state': job_state,
+            'job_metadata': {},
+            'files': [{'file_state': job_state,
+                       'source_surl': 'mock://source/%s' % transfer_id,
+                       'dest_surl': 'mock://dest/%s' % transfer_id,
+                       'start_time': '2017-01-01T00:00:00',
+                       'finish_time': '2017-01-01T00:01:00',
+                       'reason': None,
+                       'file_metadata': {'request_id': 'request_%s' % transfer_id}}]}
+
+
+class TestFTS3BulkQuery(object):
+
+    transfer_host = 'https://fts3.test:8446'
+
+    def setup(self):
+        self.chunk_size = getattr(fts3, '__QUERY_CHUNK_SIZE')
+        self.parallelism = getattr(fts3, '__QUERY_PARALLELISM')
+        setattr(fts3, '__QUERY_CHUNK_SIZE', 2)
+        setattr(fts3, '__QUERY_PARALLELISM', 3)
+        self.client = fts3.FTS3Client(self.transfer_host)
+        getattr(fts3, '__CLIENTS')[self.transfer_host] = self.client
+
+    def teardown(self):
+        setattr(fts3, '__QUERY_CHUNK_SIZE', self.chunk_size)
+        setattr(fts3, '__QUERY_PARALLELISM', self.parallelism)
+        getattr(fts3, '__CLIENTS').pop(self.transfer_host, None)
+
+    def test_bulk_query_chunks(self):
+        """ FTS3: Query the transfers in several chunks and merge the responses by transfer id """
+        transfer_ids = ['transfer_%i' % i for i in xrange(7)]
+        jobs = dict([(transfer_id, job_response(transfer_id)) for transfer_id in transfer_ids])
+        jobs['transfer_3'] = job_response('transfer_3', http_status='404 Not Found')
+        jobs['transfer_4'] = job_response('transfer_4', job_state='ACTIVE')
+        self.client.session = FakeSession(jobs)
+
+        responses = fts3.bulk_query(transfer_ids, self.transfer_host)
+        assert_equal(sorted(self.client.session.requested), [transfer_ids[0:2], transfer_ids[2:4], transfer_ids[4:6], transfer_ids[6:7]])
+        assert_equal(sorted(responses), transfer_ids)
+        for transfer_id in transfer_ids:
+            if transfer_id == 'transfer_3':
+                assert_equal(responses[transfer_id], None)
+            elif transfer_id == 'transfer_4':
+                assert_equal(responses[transfer_id], {})
+            else:
+                response = responses[transfer_id]['request_%s' % transfer_id]
+                assert_equal(response['transfer_id'], transfer_id)
+                assert_equal(response['dst_url'], 'mock://dest/%s' % transfer_id)
+                assert_equal(response['duration'], 60)
+
+    def test_bulk_query_failing_chunks(self):
+        """ FTS3: Report the failure of a chunk on its transfers only """
+        transfer_ids = ['transfer_%i' % i for i in xrange(8)]
+        jobs = dict([(transfer_id, job_response(transfer_id)) for transfer_id in transfer_ids])
+        jobs['transfer_1'] = IOError('Connection refused')
+        jobs['transfer_3'] = 500
+        jobs['transfer_5'] = ValueError('No JSON object could be decoded')
+        self.client.session = FakeSession(jobs)
+
+        responses = fts3.bulk_query(transfer_ids, self.transfer_host)
+        assert_equal(len(self.client.session.requested), 4)
+        assert_equal(sorted(responses), transfer_ids)
+        for transfer_id in transfer_ids[:6]:
+            assert_true(isinstance(responses[transfer_id], Exception))
+        for transfer_id in transfer_ids[6:]:
+            assert_equal(responses[transfer_id]['request_%s' % transfer_id]['file_state'], 'FINISHED')
+
+    def test_bulk_query_single_chunk(self):
+        """ FTS3: Query a small bulk of transfers in one call """
+        transfer_ids = ['transfer_0', 'transfer_1']
+        self.client.session = FakeSession(dict([(transfer_id, job_response(transfer_id)) for transfer_id in transfer_ids]))
+        responses = fts3.bulk_query(transfer_ids, self.transfer_host)
+        assert_equal(self.client.session.requested, [transfer_ids])
+        assert_equal(sorted(responses), transfer_ids)
+
+    def test_get_jobs_response(self):
+        """ FTS3: Parse the jobs of a bulk query response by transfer id """
+        jobs_response = [job_response('transfer_0', http_status='404 Not Found'),
+                         job_response('transfer_1', job_state='ACTIVE'),
+                         dict(job_response('transfer_2'), files=[]),
+                         job_response('transfer_3', http_status='500 Internal Server Error')]
+        responses = fts3.get_jobs_response(self.transfer_host, jobs_response)
+        assert_equal(sorted(responses), ['transfer_0', 'transfer_1', 'transfer_2'])
+        assert_equal(responses['transfer_0'], None)
+        assert_equal(responses['transfer_1'], {'job_state': 'ACTIVE', 'new_state': None, 'transfer_id': 'transfer_1'})
+        assert_true(isinstance(responses['transfer_2'], Exception))
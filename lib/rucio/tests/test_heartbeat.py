@@ -13,7 +13,7 @@ import threading
 
 from nose.tools import assert_equal
 
-from rucio.core.heartbeat import live, die, cardiac_arrest
+from rucio.core.heartbeat import live, die, cardiac_arrest, live_many, HeartbeatService
 
 
 class TestHeartbeat:
@@ -70,5 +70,37 @@ class TestHeartbeat:
         die('test0', 'host2', pids[2], threads[2])
         assert_equal(live('test0', 'host3', pids[3], threads[3]), {'assign_thread': 1, 'nr_threads': 2})
 
+    def test_heartbeat_service(self):
+        """ HEARTBEAT (CORE): Heartbeats of the threads of a process sent by a service"""
+
+        pid = self.__pid()
+        stop = threading.Event()
+        threads = [threading.Thread(target=stop.wait) for _ in xrange(2)]
+        [thread.start() for thread in threads]
+        threads.sort(key=lambda thread: thread.ident)
+        service = HeartbeatService('test1', hostname='host1', pid=pid)
+        assert_equal(service.register(threads[0]), {'assign_thread': 0, 'nr_threads': 1})
+        assert_equal(service.register(threads[1]), {'assign_thread': 1, 'nr_threads': 2})
+        assert_equal(service.assignment(threads[0]), {'assign_thread': 0, 'nr_threads': 2})
+
+        other_thread = self.__thread()
+        other_pid = self.__pid()
+        generation = live_many('test1', 'host0', other_pid, [other_thread])
+        assert_equal(generation, live_many('test1', 'host0', self.__pid(), []))
+        service.beat()
+        assert_equal(service.assignment(threads[0]), {'assign_thread': 1, 'nr_threads': 3})
+        assert_equal(service.assignment(threads[1]), {'assign_thread': 2, 'nr_threads': 3})
+
+        service.unregister(threads[0])
+        service.beat()
+        assert_equal(service.assignment(threads[1]), {'assign_thread': 1, 'nr_threads': 2})
+
+        # a thread which ended without unregistering is removed
+        stop.set()
+        threads[1].join()
+        service.beat()
+        assert_equal(service.threads, {})
+        assert_equal(live('test1', 'host0', other_pid, other_thread), {'assign_thread': 0, 'nr_threads': 1})
+
     def tearDown(self):
         cardiac_arrest()
@@ -13,11 +13,30 @@
 Hermes Test
 """
 
+from nose.tools import assert_equal
+
 from rucio.common.config import config_get
 from rucio.core.message import add_message
 from rucio.daemons.hermes import hermes
 
 
+class MockConnection(object):
+    ''' STOMP connection confirming the receipts of the sent messages. '''
+
+    def __init__(self, listener):
+        self.listener = listener
+        self.sent = []
+        self.transport = type('Transport', (object,), {'_Transport__host_and_ports': [('mock.broker', 61613)]})()
+
+    def is_connected(self):
+        return True
+
+    def send(self, body, destination, headers):
+        self.sent.append(body)
+        if 'receipt' in headers:
+            self.listener.on_receipt({'receipt-id': headers['receipt']}, None)
+
+
 class TestHermes(object):
     ''' Test the messaging deamon. '''
 
@@ -39,3 +58,19 @@ class TestHermes(object):
                                   Thank you, and have a very safe, and productive day.'''})
 
         hermes.run(once=True, send_email=False)
+
+    def test_broker_sender(self):
+        ''' HERMES (DAEMON): Test the delivery of batches confirmed by receipts. '''
+        listener = hermes.HermesListener('mock.broker')
+        conn = MockConnection(listener)
+        delivered, failed = [], []
+        sender = hermes.BrokerSender(conn=conn, listener=listener, connect=None, destination='/topic/test',
+                                     delivered=delivered.extend, failed=failed.extend, batch_size=3)
+        for i in xrange(10):
+            sender.queue.put({'id': i, 'body': str(i)})
+        sender.start()
+        sender.stop()
+        sender.join()
+        assert_equal(conn.sent, [str(i) for i in xrange(10)])
+        assert_equal(sorted(message['id'] for message in delivered), range(10))
+        assert_equal(failed, [])
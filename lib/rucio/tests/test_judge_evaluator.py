@@ -15,7 +15,7 @@ from rucio.core.account_limit import set_account_limit
 from rucio.core.did import add_did, attach_dids, detach_dids
 from rucio.core.lock import get_replica_locks, get_dataset_locks
 from rucio.core.rse import add_rse_attribute, get_rse
-from rucio.core.rule import add_rule, get_rule
+from rucio.core.rule import add_rule, get_rule, get_updated_dids
 from rucio.daemons.judge.evaluator import re_evaluator
 from rucio.daemons.abacus.account import account_update
 from rucio.db.sqla.constants import DIDType
@@ -257,3 +257,27 @@ class TestJudgeEvaluator():
         # Check if the Locks are created properly
         for file in files:
             assert(len(get_replica_locks(scope=file['scope'], name=file['name'])) == 2)
+
+    def test_judge_coalesce_attach_detach(self):
+        """ JUDGE EVALUATOR: Test the judge when several attach and detach events of a dataset are pending"""
+        scope = 'mock'
+        dataset = 'dataset_' + str(uuid())
+        add_did(scope, dataset, DIDType.from_sym('DATASET'), 'jdoe')
+        rule_id = add_rule(dids=[{'scope': scope, 'name': dataset}], account='jdoe', copies=1, rse_expression=self.rse1, grouping='DATASET', weight=None, lifetime=None, locked=False, subscription_id=None)[0]
+
+        files = []
+        for i in xrange(3):
+            files.extend(create_files(2, scope, self.rse1))
+            attach_dids(scope, dataset, files[-2:], 'jdoe')
+        detach_dids(scope, dataset, files[:2])
+        assert(len([did for did in get_updated_dids(total_workers=0, worker_number=0) if (did.scope, did.name) == (scope, dataset)]) == 4)
+
+        # Fake judge
+        re_evaluator(once=True)
+
+        assert(len([did for did in get_updated_dids(total_workers=0, worker_number=0) if (did.scope, did.name) == (scope, dataset)]) == 0)
+        for file in files[:2]:
+            assert(len(get_replica_locks(scope=file['scope'], name=file['name'])) == 0)
+        for file in files[2:]:
+            assert(len(get_replica_locks(scope=file['scope'], name=file['name'])) == 1)
+        assert(4 == get_rule(rule_id)['locks_ok_cnt'])
@@ -14,7 +14,7 @@
 
 from nose.tools import assert_equal, assert_in, assert_is_instance, assert_raises
 
-from rucio.core.message import add_message, retrieve_messages, delete_messages, truncate_messages
+from rucio.core.message import add_message, add_messages, retrieve_messages, delete_messages, truncate_messages
 from rucio.common.exception import InvalidObject
 
 
@@ -59,3 +59,23 @@ class TestMessagesCore():
         delete_messages(to_delete)
 
         assert_equal(retrieve_messages(), [])
+
+    def test_add_messages(self):
+        """ MESSAGE (CORE): Test the bulk insertion of messages """
+
+        truncate_messages()
+        add_messages([{'event_type': 'TEST', 'payload': {'number': i}} for i in xrange(10)])
+        assert_equal(sorted(message['payload']['number'] for message in retrieve_messages(20)), range(10))
+
+        with assert_raises(InvalidObject):
+            add_messages([{'event_type': 'TEST', 'payload': {'type': int}}])
+
+    def test_retrieve_messages_threads(self):
+        """ MESSAGE (CORE): Test that the threads retrieve disjoint parts of the messages """
+
+        truncate_messages()
+        add_messages([{'event_type': 'TEST', 'payload': {'number': i}} for i in xrange(30)])
+        numbers = []
+        for thread in xrange(3):
+            numbers.extend([message['payload']['number'] for message in retrieve_messages(30, thread=thread, total_threads=3)])
+        assert_equal(sorted(numbers), range(30))
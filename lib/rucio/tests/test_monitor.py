@@ -9,7 +9,11 @@
 # - Luis Rodrigues, <luis.rodrigues@cern.ch>, 2013
 # - Martin Barisits, <martin.barisits@cern.ch>, 2017
 
+from nose.tools import assert_equal, assert_true
+
+from rucio.api.permission import has_permission
 from rucio.core import monitor
+from rucio.core.scope import list_scopes
 
 
 class TestMonitor(object):
@@ -51,3 +55,17 @@ class TestMonitor(object):
         with monitor.record_timer_block(['test.context_timer', ('test.context_timer_normal10', 10)]):
             var_a = 2 * 100
             var_a = var_a * 1
+
+    @staticmethod
+    def test_request_stats():
+        """MONITOR (CORE): Collect the statements and permission checks of a request """
+        monitor.start_request_stats()
+        list_scopes()
+        has_permission(issuer='root', action='add_scope', kwargs={'account': 'root'})
+        stats = monitor.stop_request_stats()
+        assert_true(stats['db'][0] >= 1)
+        assert_true(stats['db'][1] >= 0)
+        assert_equal(stats['permission'][0], 1)
+        # Nothing is collected outside of a request
+        list_scopes()
+        assert_equal(monitor.stop_request_stats(), {})
@@ -17,8 +17,10 @@ from nose.tools import assert_true, assert_false
 
 from rucio.api.permission import has_permission
 from rucio.common.config import config_get
+from rucio.core.account import add_account, add_account_attribute, del_account_attribute
 from rucio.core.scope import add_scope
-from rucio.tests.common import scope_name_generator
+from rucio.db.sqla.constants import AccountType
+from rucio.tests.common import account_name_generator, scope_name_generator
 
 
 class TestPermissionCoreApi(object):
@@ -68,3 +70,15 @@ class TestPermissionCoreApi(object):
         gsscred = 'ddmlab@CERN.CH'
         assert_true(has_permission(issuer='root', action='get_auth_token_gss', kwargs={'account': 'root', 'gsscred': gsscred}))
         assert_false(has_permission(issuer='root', action='get_auth_token_gss', kwargs={'account': self.usr, 'gsscred': gsscred}))
+
+    def test_permission_admin_attribute(self):
+        """ PERMISSION(CORE): Check that the cached decisions follow the admin attribute """
+        account = account_name_generator()
+        add_account(account=account, type=AccountType.USER, email='rucio@email.com')
+        assert_false(has_permission(issuer=account, action='add_rse', kwargs={}))
+        assert_false(has_permission(issuer=account, action='add_rse', kwargs={}))
+        add_account_attribute(account=account, key='admin', value=True)
+        assert_true(has_permission(issuer=account, action='add_rse', kwargs={}))
+        assert_true(has_permission(issuer=account, action='update_rse', kwargs={}))
+        del_account_attribute(account=account, key='admin')
+        assert_false(has_permission(issuer=account, action='add_rse', kwargs={}))
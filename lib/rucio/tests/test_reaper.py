@@ -9,10 +9,15 @@
   Authors:
   - Vincent Garonne, <vincent.garonne@cern.ch>, 2013-2017
 '''
+from datetime import datetime, timedelta
+
+from nose.tools import assert_equal
+
 from rucio.common.utils import generate_uuid
 from rucio.core import rse as rse_core
 from rucio.core import replica as replica_core
 from rucio.daemons.reaper.reaper import reaper
+from rucio.tests.common import rse_name_generator
 
 
 def test_reaper():
@@ -29,3 +34,26 @@ def test_reaper():
     rses = [rse_core.get_rse('MOCK'), ]
     reaper(once=True, rses=rses)
     reaper(once=True, rses=rses)
+
+
+def test_reaper_concurrent_deletion():
+    """ REAPER (DAEMON): Test the concurrent deletion of replicas with tombstones."""
+    rse = rse_name_generator()
+    rse_core.add_rse(rse)
+    rse_core.add_protocol(rse, {'scheme': 'mock',
+                                'hostname': 'localhost',
+                                'port': 123,
+                                'prefix': '/test/reaper',
+                                'impl': 'rucio.rse.protocols.mock.Default',
+                                'domains': {'lan': {'read': 1, 'write': 1, 'delete': 1},
+                                            'wan': {'read': 1, 'write': 1, 'delete': 1}}})
+    rse_core.set_rse_limits(rse=rse, name='MaxDeletionThreads', value=1)
+
+    files = [{'scope': 'mock', 'name': 'lfn' + generate_uuid(), 'bytes': 1L, 'adler32': '0cc737eb',
+              'tombstone': datetime.utcnow() - timedelta(days=1)} for i in xrange(25)]
+    replica_core.add_replicas(rse=rse, files=files, account='root')
+
+    reaper(once=True, rses=[rse_core.get_rse(rse)], greedy=True, chunk_size=7, deletion_threads=3)
+
+    for replica in replica_core.list_replicas(dids=[{'scope': file['scope'], 'name': file['name']} for file in files]):
+        assert_equal(replica['rses'], {})
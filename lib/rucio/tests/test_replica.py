@@ -11,11 +11,13 @@
 # - Cedric Serfon, <cedric.serfon@cern.ch>, 2014-2016
 # - Thomas Beermann, <thomas.beermann@cern.ch>, 2014
 
+import zlib
+
 import xmltodict
 
 from datetime import datetime, timedelta
 from json import dumps, loads
-from nose.tools import assert_equal, assert_in, assert_raises
+from nose.tools import assert_equal, assert_in, assert_raises, assert_true
 from paste.fixture import TestApp
 
 
@@ -31,10 +33,12 @@ from rucio.core.replica import (add_replica, add_replicas, delete_replicas,
                                 update_replica_lock_counter, get_replica, list_replicas,
                                 declare_bad_file_replicas, list_bad_replicas,
                                 update_replicas_paths, update_replica_state,
-                                get_replica_atime, touch_replica)
+                                get_replica_atime, touch_replica, touch_replicas, DID_CHUNK_SIZE)
+from rucio.core.rse import get_rse_id
 from rucio.daemons.necromancer import run
 from rucio.rse import rsemanager as rsemgr
 from rucio.web.rest.authentication import APP as auth_app
+from rucio.web.rest.common import STREAM_BLOCK_SIZE
 from rucio.web.rest.replica import APP as rep_app
 
 
@@ -134,6 +138,21 @@ class TestReplicaCore:
 
         assert_equal(nbfiles, replica_cpt)
 
+    def test_list_replicas_bulk(self):
+        """ REPLICA (CORE): List replicas for more files than fit in one query """
+        tmp_scope = 'mock'
+        nbfiles = 2 * DID_CHUNK_SIZE + 3
+        files = [{'scope': tmp_scope, 'name': 'file_%s' % generate_uuid(), 'bytes': 1L, 'adler32': '0cc737eb', 'meta': {'events': 10}} for i in xrange(nbfiles)]
+        add_replicas(rse='MOCK', files=files, account='root', ignore_availability=True)
+        add_replicas(rse='MOCK3', files=files[:10], account='root', ignore_availability=True)
+        dids = [{'scope': f['scope'], 'name': f['name'], 'type': DIDType.FILE} for f in files]
+        dids.append({'scope': tmp_scope, 'name': 'file_%s' % generate_uuid(), 'type': DIDType.FILE})
+
+        replicas = [replica for replica in list_replicas(dids=dids, pfns=False)]
+        assert_equal(nbfiles, len(replicas))
+        assert_equal(nbfiles + 10, sum([len(replica['rses']) for replica in replicas]))
+        assert_equal(sorted([f['name'] for f in files]), sorted([replica['name'] for replica in replicas]))
+
     def test_delete_replicas(self):
         """ REPLICA (CORE): Delete replicas """
         tmp_scope = 'mock'
@@ -225,6 +244,33 @@ class TestReplicaCore:
         for i in range(0, nbfiles - 1):
             assert_equal(None, get_replica_atime({'scope': files2[i]['scope'], 'name': files2[i]['name'], 'rse': 'MOCK'}))
 
+    def test_touch_replicas_bulk(self):
+        """ REPLICA (CORE): Touch the accessed_at timestamp of several replicas at once"""
+        tmp_scope = 'mock'
+        nbfiles = 5
+        files = [{'scope': tmp_scope, 'name': 'file_%s' % generate_uuid(), 'bytes': 1L, 'adler32': '0cc737eb', 'meta': {'events': 10}} for i in xrange(nbfiles)]
+        add_replicas(rse='MOCK', files=files, account='root', ignore_availability=True)
+        rse_id = get_rse_id(rse='MOCK')
+
+        now = datetime.utcnow()
+        now -= timedelta(microseconds=now.microsecond)
+
+        assert_equal(touch_replicas([{'rse_id': rse_id, 'scope': tmp_scope, 'name': f['name'], 'accessed_at': now - timedelta(seconds=i)} for i, f in enumerate(files[:-1])]), True)
+
+        for i in xrange(nbfiles - 1):
+            assert_equal(now - timedelta(seconds=i), get_replica_atime({'scope': tmp_scope, 'name': files[i]['name'], 'rse': 'MOCK'}))
+            assert_equal(now - timedelta(seconds=i), get_did_atime(scope=tmp_scope, name=files[i]['name']))
+        assert_equal(None, get_replica_atime({'scope': tmp_scope, 'name': files[-1]['name'], 'rse': 'MOCK'}))
+
+        # A file touched on several RSEs keeps the latest access
+        add_replicas(rse='MOCK3', files=files[:1], account='root', ignore_availability=True)
+        later = now + timedelta(seconds=10)
+        assert_equal(touch_replicas([{'rse_id': rse_id, 'scope': tmp_scope, 'name': files[0]['name'], 'accessed_at': later},
+                                     {'rse_id': get_rse_id(rse='MOCK3'), 'scope': tmp_scope, 'name': files[0]['name'], 'accessed_at': now + timedelta(seconds=5)}]), True)
+        assert_equal(later, get_replica_atime({'scope': tmp_scope, 'name': files[0]['name'], 'rse': 'MOCK'}))
+        assert_equal(now + timedelta(seconds=5), get_replica_atime({'scope': tmp_scope, 'name': files[0]['name'], 'rse': 'MOCK3'}))
+        assert_equal(later, get_did_atime(scope=tmp_scope, name=files[0]['name']))
+
     def test_list_replicas_all_states(self):
         """ REPLICA (CORE): list file replicas with all_states"""
         tmp_scope = 'mock'
@@ -246,6 +292,54 @@ class TestReplicaCore:
 
         assert_equal(nbfiles, replica_cpt)
 
+    def test_list_replicas_gzip(self):
+        """ REPLICA (REST): List replicas with a gzip compressed json stream """
+        tmp_scope = 'mock'
+        files = [{'scope': tmp_scope, 'name': 'file_%s' % generate_uuid(), 'bytes': 1L, 'adler32': '0cc737eb', 'meta': {'events': 10}} for i in xrange(5)]
+        add_replicas(rse='MOCK', files=files, account='root')
+
+        mw = []
+        headers1 = {'X-Rucio-Account': 'root', 'X-Rucio-Username': 'ddmlab', 'X-Rucio-Password': 'secret'}
+        r1 = TestApp(auth_app.wsgifunc(*mw)).get('/userpass', headers=headers1, expect_errors=True)
+        assert_equal(r1.status, 200)
+        token = str(r1.header('X-Rucio-Auth-Token'))
+
+        data = dumps({'dids': [{'scope': f['scope'], 'name': f['name']} for f in files]})
+        r2 = TestApp(rep_app.wsgifunc(*mw)).post('/list', headers={'X-Rucio-Auth-Token': token}, params=data, expect_errors=True)
+        assert_equal(r2.status, 200)
+        r3 = TestApp(rep_app.wsgifunc(*mw)).post('/list', headers={'X-Rucio-Auth-Token': token, 'Accept-Encoding': 'gzip'}, params=data, expect_errors=True)
+        assert_equal(r3.status, 200)
+        assert_equal(r3.header('Content-Encoding'), 'gzip')
+        body = zlib.decompress(r3.body, 16 + zlib.MAX_WBITS)
+        assert_equal(sorted([loads(line) for line in body.split('\n') if line]), sorted([loads(line) for line in r2.body.split('\n') if line]))
+        assert_equal(len([line for line in body.split('\n') if line]), 5)
+
+    def test_list_replicas_stream_blocks(self):
+        """ REPLICA (REST): List more replicas than fit in one block of the json stream """
+        tmp_scope = 'mock'
+        files = [{'scope': tmp_scope, 'name': 'file_%s' % generate_uuid(), 'bytes': 1L, 'adler32': '0cc737eb', 'meta': {'events': 10}} for i in xrange(500)]
+        add_replicas(rse='MOCK', files=files, account='root')
+
+        mw = []
+        headers1 = {'X-Rucio-Account': 'root', 'X-Rucio-Username': 'ddmlab', 'X-Rucio-Password': 'secret'}
+        r1 = TestApp(auth_app.wsgifunc(*mw)).get('/userpass', headers=headers1, expect_errors=True)
+        assert_equal(r1.status, 200)
+        token = str(r1.header('X-Rucio-Auth-Token'))
+
+        data = dumps({'dids': [{'scope': f['scope'], 'name': f['name']} for f in files]})
+        r2 = TestApp(rep_app.wsgifunc(*mw)).post('/list', headers={'X-Rucio-Auth-Token': token}, params=data, expect_errors=True)
+        assert_equal(r2.status, 200)
+        assert_true(len(r2.body) > STREAM_BLOCK_SIZE)
+        assert_true(r2.body.endswith('\n'))
+        # every line is a complete replica, none is cut at a block boundary
+        replicas = [loads(line) for line in r2.body.split('\n') if line]
+        assert_equal(sorted([replica['name'] for replica in replicas]), sorted([f['name'] for f in files]))
+
+        r3 = TestApp(rep_app.wsgifunc(*mw)).post('/list', headers={'X-Rucio-Auth-Token': token, 'Accept-Encoding': 'gzip'}, params=data, expect_errors=True)
+        assert_equal(r3.status, 200)
+        assert_equal(r3.header('Content-Encoding'), 'gzip')
+        assert_equal(zlib.decompress(r3.body, 16 + zlib.MAX_WBITS), r2.body)
+
 
 class TestReplicaClients:
 
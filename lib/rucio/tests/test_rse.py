@@ -17,6 +17,9 @@
  - Wen Guan, <wen.guan@cern.ch>, 2015
 '''
 
+import time
+
+from datetime import datetime
 from json import dumps
 from nose.tools import raises, assert_equal, assert_true, assert_in, assert_raises
 from paste.fixture import TestApp
@@ -27,7 +30,10 @@ from rucio.common.exception import (Duplicate, RSENotFound, RSEProtocolNotSuppor
                                     InvalidObject, RSEProtocolDomainNotSupported, RSEProtocolPriorityError, ResourceTemporaryUnavailable)
 from rucio.common.utils import generate_uuid
 from rucio.core.rse import (add_rse, get_rse_id, del_rse, list_rses, rse_exists, add_rse_attribute, list_rse_attributes,
-                            set_rse_transfer_limits, get_rse_transfer_limits, delete_rse_transfer_limits)
+                            set_rse_transfer_limits, get_rse_transfer_limits, delete_rse_transfer_limits,
+                            get_rse, get_rse_limits, get_rse_protocols, get_rse_snapshot, set_rse_limits, update_rse, add_protocol,
+                            del_rse_attribute, RSESnapshot)
+from rucio.db.sqla.session import get_session
 from rucio.rse import rsemanager as mgr
 from rucio.tests.common import rse_name_generator
 from rucio.web.rest.rse import APP as rse_app
@@ -72,6 +78,55 @@ class TestRSECoreApi(object):
         assert_in('tier', attr.keys())
         assert_in(rse, attr.keys())
 
+    def test_rse_snapshot_invalidation(self):
+        """ RSE (CORE): Test that changes of RSE metadata are reflected in the RSE snapshot """
+        rse = rse_name_generator()
+        rse_id = add_rse(rse)
+        assert_equal(get_rse_snapshot().lookup(rse=rse)['rse']['id'], rse_id)
+        assert_equal(get_rse(rse).availability, 7)
+
+        add_rse_attribute(rse=rse, key='cloud', value='de')
+        assert_equal(list_rse_attributes(rse=None, rse_id=rse_id)['cloud'], 'de')
+        set_rse_limits(rse=rse, name='MinFreeSpace', value=10)
+        assert_equal(get_rse_limits(rse=rse, name='MinFreeSpace'), {'MinFreeSpace': 10})
+        add_protocol(rse, {'scheme': 'root', 'hostname': 'localhost', 'port': 1094, 'prefix': '/test/', 'impl': 'rucio.rse.protocols.xrootd.Default',
+                           'domains': {'lan': {'read': 1, 'write': 1, 'delete': 1}, 'wan': {'read': 1, 'write': 1, 'delete': 1}}})
+        assert_equal([p['scheme'] for p in get_rse_protocols(rse)['protocols']], ['root'])
+        update_rse(rse, {'availability_write': False})
+        assert_equal(get_rse(rse).availability, 5)
+
+        # Uncommitted changes are seen by their own session only
+        session = get_session()
+        add_rse_attribute(rse=rse, key='country', value='us', session=session)
+        assert_equal(list_rse_attributes(rse=rse, session=session)['country'], 'us')
+        session.rollback()
+        session.remove()
+        assert_true('country' not in list_rse_attributes(rse=rse))
+
+        del_rse(rse)
+        assert_equal(get_rse_snapshot().lookup(rse=rse), None)
+        assert_raises(RSENotFound, get_rse, rse)
+
+    def test_rse_snapshot_deletion_of_other_process(self):
+        """ RSE (CORE): Test that the hard deletions of RSE metadata are seen by the RSE snapshots of other processes """
+        rse = rse_name_generator()
+        rse_id = add_rse(rse)
+        add_rse_attribute(rse=rse, key='cloud', value='de')
+
+        # A snapshot of another process, which does not share the generation and loaded the RSE a while ago
+        session = get_session()
+        snapshot = RSESnapshot()
+        snapshot.get(session=session)
+        assert_equal(snapshot.lookup(rse_id=rse_id)['attributes']['cloud'], 'de')
+        snapshot.watermark = datetime.utcnow()
+
+        del_rse_attribute(rse=rse, key='cloud')
+        snapshot.checked_at, snapshot.refreshed_at = time.time(), 0
+        snapshot.get(session=session)
+        assert_true('cloud' not in snapshot.lookup(rse_id=rse_id)['attributes'])
+        session.remove()
+        del_rse(rse)
+
     def test_create_and_check_rse_transfer_limits(self):
         """ RSE (CORE): Test the creation, query, and deletion of a RSE transfer limit"""
         rse = rse_name_generator()
@@ -11,7 +11,7 @@
 from random import choice
 from string import ascii_uppercase, digits, ascii_lowercase
 
-from nose.tools import assert_equal, raises, assert_raises
+from nose.tools import assert_equal, assert_not_equal, raises, assert_raises
 
 from rucio.core import rse
 from rucio.core import rse_expression_parser
@@ -130,6 +130,31 @@ class TestRSEExpressionParserCore(object):
         assert_equal(sorted([t_rse['id'] for t_rse in rse_expression_parser.parse_expression("(((((%s))))|%s=us)&%s|(%s=at|%s=de)" %
                                                                                              (self.tag1, self.attribute, self.tag2, self.attribute, self.attribute))]), sorted([self.rse1_id, self.rse2_id, self.rse5_id]))
 
+    def test_attribute_index_invalidation(self):
+        """ RSE_EXPRESSION_PARSER (CORE) Test that attribute changes are reflected in compiled expressions """
+        expression = "%s&%s=uk" % (self.tag2, self.attribute)
+        assert_equal([t_rse['id'] for t_rse in rse_expression_parser.parse_expression(expression)], [self.rse4_id])
+        rse.del_rse_attribute(self.rse4, self.attribute)
+        rse.add_rse_attribute(self.rse4, self.attribute, "de")
+        assert_raises(InvalidRSEExpression, rse_expression_parser.parse_expression, expression)
+        rse.del_rse_attribute(self.rse4, self.attribute)
+        rse.add_rse_attribute(self.rse4, self.attribute, "uk")
+        assert_equal([t_rse['id'] for t_rse in rse_expression_parser.parse_expression(expression)], [self.rse4_id])
+
+    def test_attribute_index_snapshot(self):
+        """ RSE_EXPRESSION_PARSER (CORE) Test that a rebuilt attribute index does not change the index in use """
+        expression = "%s=uk" % self.attribute
+        index = rse_expression_parser.INDEX.get(session=None)
+        bitmap = rse_expression_parser.compile_expression(expression).resolve_elements(index=index)
+        # a new RSE shifts the positions of the RSEs sorted after it
+        rse_name = 'MOCK_' + rse_name_generator()
+        rse.add_rse(rse_name)
+        rse.add_rse_attribute(rse_name, self.attribute, "fr")
+        new_index = rse_expression_parser.INDEX.get(session=None)
+        assert_not_equal(new_index.version, index.version)
+        assert_equal([t_rse['id'] for t_rse in index.get_rses(bitmap)], [self.rse4_id])
+        assert_equal([t_rse['id'] for t_rse in new_index.get_rses(rse_expression_parser.compile_expression(expression).resolve_elements(index=new_index))], [self.rse4_id])
+
     @staticmethod
     def test_list_on_availability():
         """ RSE_EXPRESSION_PARSER (CORE) List rses based on availability filter"""
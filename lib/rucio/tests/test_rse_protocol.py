@@ -0,0 +1,77 @@
+# Copyright European Organization for Nuclear Research (CERN)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import hashlib
+
+from nose.tools import assert_equal, assert_not_equal
+
+from rucio.rse.protocols import protocol
+
+
+def hashed_path(path_scope, scope, name):
+    hstr = hashlib.md5('%s:%s' % (scope, name)).hexdigest()
+    return '%s/%s/%s/%s' % (path_scope, hstr[0:2], hstr[2:4], name)
+
+
+class PrefixedNames(protocol.RSEProtocol):
+    """ Protocol building its own PFNs """
+
+    def lfns2pfns(self, lfns):
+        return dict([('%s:%s' % (lfn['scope'], lfn['name']), 'mock:///%s' % lfn['name']) for lfn in lfns])
+
+
+class TestRSEProtocol(object):
+
+    def setup(self):
+        self.path_cache = protocol.PATH_CACHE
+        if self.path_cache is not None:
+            self.path_cache.clear()
+        self.lfns = [('user.jdoe', 'file_%i' % i, None) for i in xrange(10)] + \
+                    [('data17', 'file_%i' % i, None) for i in xrange(10)] + \
+                    [('data17', 'file_%i' % i, '/some/path/file_%i' % i) for i in xrange(10, 12)]
+
+    def teardown(self):
+        protocol.PATH_CACHE = self.path_cache
+
+    @staticmethod
+    def __protocol(cls=protocol.RSEProtocol, prefix='test/rucio'):
+        return cls({'scheme': 'mock', 'hostname': 'localhost', 'port': 0, 'prefix': prefix, 'impl': 'rucio.rse.protocols.mock.Default'},
+                   {'rse': 'MOCK', 'deterministic': True})
+
+    def test_lfns2pfns_bulk(self):
+        """ RSE PROTOCOL: Build the PFNs of a block of files like the PFNs of single files """
+        for prefix in ('test/rucio', '/test/rucio/'):
+            prot = self.__protocol(prefix=prefix)
+            pfns = prot.lfns2pfns_bulk(self.lfns)
+            assert_equal(pfns, [prot.lfns2pfns({'scope': scope, 'name': name, 'path': path}).values()[0] for scope, name, path in self.lfns])
+            assert_equal(pfns[0], 'mock://localhost:0/test/rucio/%s' % hashed_path('user/jdoe', 'user.jdoe', 'file_0'))
+            assert_equal(pfns[-1], 'mock://localhost:0/test/rucio/some/path/file_11')
+
+        prot = self.__protocol(cls=PrefixedNames)
+        assert_equal(prot.lfns2pfns_bulk(self.lfns[:2]), ['mock:///file_0', 'mock:///file_1'])
+
+    def test_path_cache(self):
+        """ RSE PROTOCOL: Cached and uncached deterministic paths are identical """
+        prot = self.__protocol()
+        uncached = [prot._get_path(scope, name) for scope, name, _ in self.lfns]
+        cached = [prot._get_path(scope, name) for scope, name, _ in self.lfns]
+        protocol.PATH_CACHE = None
+        assert_equal(cached, uncached)
+        assert_equal([prot._get_path(scope, name) for scope, name, _ in self.lfns], uncached)
+
+    def test_path_cache_key(self):
+        """ RSE PROTOCOL: The cached paths are keyed by scope, name and algorithm """
+        if self.path_cache is None:
+            return
+        prot = self.__protocol()
+        assert_not_equal(prot._get_path('user.jdoe', 'file_0'), prot._get_path('data17', 'file_0'))
+        assert_not_equal(prot._get_path('data17', 'file_0'), prot._get_path('data17', 'file_1'))
+        assert_equal(self.path_cache.get(('default', 'data17', 'file_0')), prot._get_path('data17', 'file_0'))
+
+        # The paths of another algorithm are not mixed up with the default ones
+        self.path_cache.put(('other', 'data17', 'file_2'), 'data17/file_2')
+        assert_equal(prot._get_path('data17', 'file_2'), hashed_path('data17', 'data17', 'file_2'))
@@ -113,6 +113,10 @@ class TestRsePOSIX(object):
         """POSIX (RSE/PROTOCOLS): Put multiple files to storage providing LFNs and PFNs (Success)"""
         self.mtc.test_put_mgr_ok_multi()
 
+    def test_put_mgr_ok_multi_threads(self):
+        """POSIX (RSE/PROTOCOLS): Put multiple files to storage in parallel (Success)"""
+        self.mtc.test_put_mgr_ok_multi_threads()
+
     def test_put_mgr_ok_single(self):
         """POSIX (RSE/PROTOCOLS): Put a single file to storage (Success)"""
         self.mtc.test_put_mgr_ok_single()
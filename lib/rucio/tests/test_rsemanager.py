@@ -0,0 +1,94 @@
+# Copyright European Organization for Nuclear Research (CERN)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import os
+import shutil
+import tempfile
+
+from nose.tools import assert_equal, assert_false, assert_true, raises
+
+from rucio.common import exception
+from rucio.common.utils import adler32
+from rucio.rse import rsemanager as mgr
+from rucio.rse.protocols import posix
+
+CONNECTIONS = []
+
+
+class TrackedConnection(posix.Default):
+    """ Posix protocol keeping track of its open connections """
+
+    def connect(self):
+        CONNECTIONS.append(self)
+
+    def close(self):
+        CONNECTIONS.remove(self)
+
+
+class UnreachableDelete(posix.Default):
+    """ Protocol failing to connect """
+
+    def connect(self):
+        raise exception.RSEAccessDenied('Unreachable')
+
+
+class TestRSEManagerUpload(object):
+
+    def setup(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.prefix = tempfile.mkdtemp()
+        self.lfns = []
+        for i in xrange(5):
+            name = 'file_%i' % i
+            path = os.path.join(self.source_dir, name)
+            with open(path, 'wb') as f:
+                f.write(os.urandom(1024 + i))
+            self.lfns.append({'scope': 'user.jdoe', 'name': name, 'adler32': adler32(path), 'filesize': 1024 + i})
+
+    def teardown(self):
+        shutil.rmtree(self.source_dir)
+        shutil.rmtree(self.prefix)
+
+    def __rse_settings(self, impl='rucio.rse.protocols.posix.Default'):
+        domains = {'lan': {'read': 1, 'write': 1, 'delete': 1}, 'wan': {'read': 1, 'write': 1, 'delete': 1, 'third_party_copy': 1}}
+        return {'rse': 'MOCK-UPLOAD', 'id': 'mock-upload', 'domain': ['wan'], 'deterministic': True, 'volatile': False, 'rse_type': 'DISK',
+                'lfn2pfn_algorithm': 'hash', 'verify_checksum': True, 'read_protocol': 1, 'write_protocol': 1, 'delete_protocol': 1,
+                'protocols': [{'scheme': 'file', 'hostname': 'localhost', 'port': 0, 'prefix': self.prefix + '/', 'impl': impl,
+                               'extended_attributes': None, 'domains': domains}]}
+
+    def test_upload_threads(self):
+        """ RSEMANAGER: Upload files in parallel """
+        status, details = mgr.upload(self.__rse_settings(), self.lfns, self.source_dir, threads=3)
+        assert_true(status)
+        assert_equal(sorted(details), sorted(['user.jdoe:%s' % lfn['name'] for lfn in self.lfns]))
+        assert_true(all([details[key] is True for key in details]))
+        assert_true(all([lfn['transferStart'] <= lfn['transferEnd'] for lfn in self.lfns]))
+
+    def test_upload_threads_connect_failure(self):
+        """ RSEMANAGER: Upload files in parallel when the threads fail to connect """
+        status, details = mgr.upload(self.__rse_settings(impl='rucio.rse.protocols.not_existing.Default'), self.lfns, self.source_dir, threads=3)
+        assert_false(status)
+        assert_equal(sorted(details), sorted(['user.jdoe:%s' % lfn['name'] for lfn in self.lfns]))
+        assert_true(all([isinstance(details[key], ImportError) for key in details]))
+
+    def test_upload_threads_delete_connect_failure(self):
+        """ RSEMANAGER: Upload files in parallel when the threads fail to connect the delete protocol """
+        rse_settings = self.__rse_settings(impl='rucio.tests.test_rsemanager.TrackedConnection')
+        delete_protocol = dict(rse_settings['protocols'][0], scheme='mock', impl='rucio.tests.test_rsemanager.UnreachableDelete')
+        delete_protocol['domains'] = {'lan': {'read': 0, 'write': 0, 'delete': 1}, 'wan': {'read': 0, 'write': 0, 'delete': 1, 'third_party_copy': 0}}
+        rse_settings['protocols'][0]['domains']['wan']['delete'] = 0
+        rse_settings['protocols'].append(delete_protocol)
+
+        status, details = mgr.upload(rse_settings, self.lfns, self.source_dir, threads=3)
+        assert_false(status)
+        assert_true(all([isinstance(details[key], exception.RSEAccessDenied) for key in details]))
+        assert_equal(CONNECTIONS, [])
+
+    @raises(ImportError)
+    def test_upload_single_connect_failure(self):
+        """ RSEMANAGER: Upload a single file when the connection fails """
+        mgr.upload(self.__rse_settings(impl='rucio.rse.protocols.not_existing.Default'), self.lfns[0], self.source_dir)
@@ -27,7 +27,8 @@ from rucio.client.ruleclient import RuleClient
 from rucio.client.subscriptionclient import SubscriptionClient
 from rucio.common.utils import generate_uuid as uuid
 from rucio.common.exception import (RuleNotFound, AccessDenied, InsufficientAccountLimit, DuplicateRule, RSEBlacklisted,
-                                    RuleReplaceFailed, ManualRuleApprovalBlocked, InputValidationError, UnsupportedOperation)
+                                    RuleReplaceFailed, ManualRuleApprovalBlocked, InputValidationError, UnsupportedOperation,
+                                    InsufficientTargetRSEs)
 from rucio.core.account_counter import get_counter as get_account_counter
 from rucio.daemons.judge.evaluator import re_evaluator
 from rucio.core.did import add_did, attach_dids, set_status
@@ -36,7 +37,7 @@ from rucio.core.account import add_account_attribute
 from rucio.core.account_limit import set_account_limit
 from rucio.core.request import get_request_by_did
 from rucio.core.replica import add_replica, get_replica
-from rucio.core.rse import add_rse_attribute, get_rse, add_rse, update_rse, get_rse_id, del_rse_attribute
+from rucio.core.rse import add_rse_attribute, get_rse, add_rse, update_rse, get_rse_id, del_rse_attribute, set_rse_usage, set_rse_limits
 from rucio.core.rse_counter import get_counter as get_rse_counter
 from rucio.core.rule import add_rule, get_rule, delete_rule, add_rules, update_rule, reduce_rule
 from rucio.daemons.abacus.account import account_update
@@ -366,6 +367,22 @@ class TestReplicationRuleCore():
             assert(len(t1.intersection(rse_locks)) == 2)
             assert_in(self.rse1_id, rse_locks)
 
+    def test_add_rule_insufficient_free_space(self):
+        """ REPLICATION RULE (CORE): Add a replication rule on a RSE without enough free space"""
+        scope = 'mock'
+        rse = rse_name_generator()
+        rse_id = add_rse(rse)
+        set_account_limit('jdoe', rse_id, -1)
+        set_rse_usage(rse=rse, source='storage', used=100, free=50)
+        set_rse_limits(rse=rse, name='MinFreeSpace', value=40)
+        files = create_files(1, scope, self.rse1, bytes=20)
+
+        assert_raises(InsufficientTargetRSEs, add_rule, dids=[{'scope': scope, 'name': files[0]['name']}], account='jdoe', copies=1, rse_expression=rse, grouping='NONE', weight=None, lifetime=None, locked=False, subscription_id=None)
+
+        set_rse_limits(rse=rse, name='MinFreeSpace', value=0)
+        add_rule(dids=[{'scope': scope, 'name': files[0]['name']}], account='jdoe', copies=1, rse_expression=rse, grouping='NONE', weight=None, lifetime=None, locked=False, subscription_id=None)
+        assert_in(rse_id, [lock['rse_id'] for lock in get_replica_locks(scope=scope, name=files[0]['name'])])
+
     def test_add_rule_container_dataset_with_weights(self):
         """ REPLICATION RULE (CORE): Add a replication rule on a container, DATASET Grouping, WEIGHTS"""
         scope = 'mock'
@@ -522,6 +539,21 @@ class TestReplicationRuleCore():
         assert(account_counter_before_1['bytes'] - 3 * 100 == account_counter_after_1['bytes'])
         assert(account_counter_before_2['bytes'] + 3 * 100 == account_counter_after_2['bytes'])
 
+    def test_add_rules_replica_lock_cnt(self):
+        """ REPLICATION RULE (CORE): Add two replication rules creating new replicas and check the lock count of the replicas"""
+        scope = 'mock'
+        files = create_files(3, scope, self.rse1, bytes=100)
+        dataset = 'dataset_' + str(uuid())
+        add_did(scope, dataset, DIDType.from_sym('DATASET'), 'jdoe')
+        attach_dids(scope, dataset, files, 'jdoe')
+
+        add_rule(dids=[{'scope': scope, 'name': dataset}], account='jdoe', copies=1, rse_expression=self.rse3, grouping='DATASET', weight=None, lifetime=None, locked=False, subscription_id=None)
+        add_rule(dids=[{'scope': scope, 'name': dataset}], account='root', copies=1, rse_expression=self.rse3, grouping='DATASET', weight=None, lifetime=None, locked=False, subscription_id=None)
+
+        for file in files:
+            assert(len(get_replica_locks(scope=file['scope'], name=file['name'])) == 2)
+            assert(get_replica(rse=self.rse3, scope=file['scope'], name=file['name'])['lock_cnt'] == 2)
+
     def test_rse_counter_unavailable_replicas(self):
         """ REPLICATION RULE (CORE): Test if creating UNAVAILABLE replicas updates the RSE Counter correctly"""
 
@@ -25,7 +25,7 @@ from rucio.core.did import add_did, set_new_dids
 from rucio.core.rse import add_rse, get_rse_id
 from rucio.core.rule import add_rule
 from rucio.core.scope import add_scope
-from rucio.daemons.transmogrifier import run
+from rucio.daemons.transmogrifier import run, is_matching_subscription, SubscriptionIndex
 from rucio.db.sqla.constants import DIDType
 from rucio.web.rest.authentication import APP as auth_app
 from rucio.web.rest.subscription import APP as subs_app
@@ -43,6 +43,25 @@ class TestSubscriptionCoreApi():
     def tearDownClass(cls):
         pass
 
+    def test_subscription_index(self):
+        """ SUBSCRIPTION (DAEMON): Test the matching of the DIDs against the compiled subscriptions """
+        subscriptions = [{'id': 1, 'name': 'pattern', 'filter': dumps({'scope': ['data1.*'], 'pattern': 'AOD\\..*'})},
+                         {'id': 2, 'name': 'metadata', 'filter': dumps({'project': self.projects, 'datatype': ['AOD', ], 'excluded_pattern': self.pattern1})},
+                         {'id': 3, 'name': 'alternative', 'filter': dumps({'scope': ['mc|data12'], 'split_rule': 'true'})},
+                         {'id': 4, 'name': 'invalid', 'filter': dumps({'pattern': '(AOD'})},
+                         {'id': 5, 'name': 'corrupted', 'filter': '{'}]
+        index = SubscriptionIndex(subscriptions)
+        metadata = {'hidden': False, 'project': 'data12_8TeV', 'datatype': 'AOD'}
+        dids = [({'scope': 'data12_8TeV', 'name': 'AOD.123'}, [1, 2, 3]),
+                ({'scope': 'data12_8TeV', 'name': 'ESD.123'}, [2, 3]),
+                ({'scope': 'mc15_13TeV', 'name': 'AOD.123'}, [2, 3]),
+                ({'scope': 'user.jdoe', 'name': 'AOD.123'}, [2])]
+        for did, expected in dids:
+            assert_equal([subscription.subscription['id'] for subscription in index.match(did, metadata)], expected)
+            assert_equal([subscription['id'] for subscription in subscriptions if is_matching_subscription(subscription, did, metadata)], expected)
+        assert_equal(index.match(dids[0][0], {'hidden': True}), [])
+        assert_equal([subscription.split_rule for subscription in index.match(dids[0][0], metadata)], [False, False, True])
+
     def test_create_and_update_and_list_subscription(self):
         """ SUBSCRIPTION (API): Test the creation of a new subscription, update it, list it """
         subscription_name = uuid()
@@ -0,0 +1,28 @@
+# Copyright European Organization for Nuclear Research (CERN)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import datetime
+
+from json import dumps
+
+from nose.tools import assert_equal
+
+from rucio.common.utils import APIEncoder, render_json_stream
+
+
+class TestUtils(object):
+
+    @staticmethod
+    def test_render_json_stream():
+        """ UTILS: Render a stream of rows as newline-delimited JSON in blocks """
+        block_size = 4
+        for nb_rows in (0, 1, block_size, block_size + 1, 3 * block_size):
+            rows = [{'scope': 'mock', 'name': u'file_%i' % i, 'bytes': i, 'created_at': datetime.datetime(2017, 1, 1, 0, 0, i),
+                     'states': {'MOCK': 'AVAILABLE'}, 'pfns': ['mock://localhost/file_%i' % i]} for i in xrange(nb_rows)]
+            blocks = list(render_json_stream(iter(rows), block_size=block_size))
+            assert_equal(''.join(blocks), ''.join([dumps(row, cls=APIEncoder) + '\n' for row in rows]))
+            assert_equal(len(blocks), (nb_rows + block_size - 1) / block_size)
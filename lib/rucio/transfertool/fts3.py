@@ -15,16 +15,18 @@ import json
 import logging
 import requests
 import sys
+import threading
 import time
 import urlparse
 import uuid
 import traceback
 
 from ConfigParser import NoOptionError
-from dogpile.cache import make_region
-from dogpile.cache.api import NoValue
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
-from rucio.common.config import config_get, config_get_bool
+from rucio.common.config import config_get, config_get_bool, config_get_int
+from rucio.common.utils import chunks
 from rucio.core.monitor import record_counter, record_timer
 from rucio.db.sqla.constants import FTSState
 
@@ -41,8 +43,109 @@ try:
 except NoOptionError:
     __USE_DETERMINISTIC_ID = False
 
-REGION_SHORT = make_region().configure('dogpile.cache.memory',
-                                       expiration_time=1800)
+try:
+    __POOL_SIZE = config_get_int('conveyor', 'fts_pool_size')
+except NoOptionError:
+    __POOL_SIZE = 10
+try:
+    __QUERY_CHUNK_SIZE = config_get_int('conveyor', 'fts_query_chunk_size')
+except NoOptionError:
+    __QUERY_CHUNK_SIZE = 50
+try:
+    __QUERY_PARALLELISM = config_get_int('conveyor', 'fts_query_parallelism')
+except NoOptionError:
+    __QUERY_PARALLELISM = 4
+
+__CLIENTS = {}
+__CLIENTS_LOCK = threading.Lock()
+
+
+class FTS3Client(object):
+    """
+    Persistent client of one FTS3 server. The connections are pooled and kept alive between the calls,
+    the identity of the client on the server is cached.
+    """
+
+    whoami_lifetime = 1800
+
+    def __init__(self, external_host, cert=None, pool_size=10):
+        """
+        :param external_host: FTS server as a string.
+        :param cert: Path of the user certificate and key, used for https servers.
+        :param pool_size: Maximum number of connections kept alive to the server.
+        """
+        self.external_host = external_host
+        self.session = requests.Session()
+        self.session.mount(external_host, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.headers.update({'Content-Type': 'application/json'})
+        if external_host.startswith('https://'):
+            self.session.verify = False
+            self.session.cert = (cert, cert)
+        self.lock = threading.Lock()
+        self.__whoami = None
+        self.__whoami_at = 0
+
+    def get(self, path, **kwargs):
+        """
+        Send a GET request to the server.
+
+        :param path: Path of the resource, starting with /.
+        :returns: The response.
+        """
+        return self.session.get('%s%s' % (self.external_host, path), **kwargs)
+
+    def post(self, path, **kwargs):
+        """
+        Send a POST request to the server.
+
+        :param path: Path of the resource, starting with /.
+        :returns: The response.
+        """
+        return self.session.post('%s%s' % (self.external_host, path), **kwargs)
+
+    def delete(self, path, **kwargs):
+        """
+        Send a DELETE request to the server.
+
+        :param path: Path of the resource, starting with /.
+        :returns: The response.
+        """
+        return self.session.delete('%s%s' % (self.external_host, path), **kwargs)
+
+    def whoami(self, timeout=None, refresh=False):
+        """
+        Return the credential information of the client on the server, cached.
+
+        :param timeout: Timeout of the request in seconds.
+        :param refresh: Query the server even if the information is cached.
+        :returns: Credentials as stored by the FTS3 server as a dictionary, or None.
+        """
+        with self.lock:
+            if not refresh and self.__whoami and self.__whoami_at > time.time() - self.whoami_lifetime:
+                return self.__whoami
+        r = self.get('/whoami', timeout=timeout)
+        if r is None or r.status_code != 200:
+            raise Exception('Could not retrieve credentials: %s' % (r.content if r is not None else r))
+        with self.lock:
+            self.__whoami = r.json()
+            self.__whoami_at = time.time()
+            return self.__whoami
+
+
+def get_client(external_host):
+    """
+    Get the persistent client of a FTS3 server.
+
+    :param external_host: FTS server as a string.
+    :returns: FTS3Client.
+    """
+    client = __CLIENTS.get(external_host)
+    if client is None:
+        with __CLIENTS_LOCK:
+            client = __CLIENTS.get(external_host)
+            if client is None:
+                client = __CLIENTS[external_host] = FTS3Client(external_host, cert=__USERCERT, pool_size=__POOL_SIZE)
+    return client
 
 
 def get_transfer_baseid_voname(external_host):
@@ -55,40 +158,11 @@ def get_transfer_baseid_voname(external_host):
     """
     result = (None, None)
     try:
-        key = 'voname: %s' % external_host
-        result = REGION_SHORT.get(key)
-        if type(result) is NoValue:
-            logging.debug("Refresh transfer baseid and voname for %s" % external_host)
-
-            r = None
-            if external_host.startswith('https://'):
-                try:
-                    r = requests.get('%s/whoami' % external_host,
-                                     verify=False,
-                                     cert=(__USERCERT, __USERCERT),
-                                     headers={'Content-Type': 'application/json'},
-                                     timeout=5)
-                except:
-                    logging.warn('Could not get baseid and voname from %s - %s' % (external_host, str(traceback.format_exc())))
-            else:
-                try:
-                    r = requests.get('%s/whoami' % external_host,
-                                     headers={'Content-Type': 'application/json'},
-                                     timeout=5)
-                except:
-                    logging.warn('Could not get baseid and voname from %s - %s' % (external_host, str(traceback.format_exc())))
-
-            if r and r.status_code == 200:
-                baseid = str(r.json()['base_id'])
-                voname = str(r.json()['vos'][0])
-                result = (baseid, voname)
-
-                REGION_SHORT.set(key, result)
-
-                logging.debug("Get baseid %s and voname %s from %s" % (baseid, voname, external_host))
-            else:
-                logging.warn("Failed to get baseid and voname from %s, error: %s" % (external_host, r.text if r is not None else r))
-                result = (None, None)
+        r = get_client(external_host).whoami(timeout=5)
+        baseid = str(r['base_id'])
+        voname = str(r['vos'][0])
+        result = (baseid, voname)
+        logging.debug("Get baseid %s and voname %s from %s" % (baseid, voname, external_host))
     except:
         logging.warning("Failed to get baseid and voname from %s: %s" % (external_host, traceback.format_exc()))
         result = (None, None)
@@ -178,28 +252,12 @@ def submit_transfers(transfers, job_metadata):
         params_str = json.dumps(params_dict)
 
         transfer_host = transfer['external_host']
-        if transfer_host.startswith('https://'):
-            try:
-                ts = time.time()
-                r = requests.post('%s/jobs' % transfer_host,
-                                  verify=False,
-                                  cert=(__USERCERT, __USERCERT),
-                                  data=params_str,
-                                  headers={'Content-Type': 'application/json'},
-                                  timeout=5)
-                record_timer('transfertool.fts3.submit_transfer.%s' % __extract_host(transfer_host), (time.time() - ts) * 1000)
-            except:
-                logging.warn('Could not submit transfer to %s' % transfer_host)
-        else:
-            try:
-                ts = time.time()
-                r = requests.post('%s/jobs' % transfer_host,
-                                  data=params_str,
-                                  headers={'Content-Type': 'application/json'},
-                                  timeout=5)
-                record_timer('transfertool.fts3.submit_transfer.%s' % __extract_host(transfer_host), (time.time() - ts) * 1000)
-            except:
-                logging.warn('Could not submit transfer to %s' % transfer_host)
+        try:
+            ts = time.time()
+            r = get_client(transfer_host).post('/jobs', data=params_str, timeout=5)
+            record_timer('transfertool.fts3.submit_transfer.%s' % __extract_host(transfer_host), (time.time() - ts) * 1000)
+        except:
+            logging.warn('Could not submit transfer to %s' % transfer_host)
 
         if r and r.status_code == 200:
             record_counter('transfertool.fts3.%s.submission.success' % __extract_host(transfer_host))
@@ -275,28 +333,12 @@ def submit_bulk_transfers(external_host, files, job_params, timeout=None):
     params_str = json.dumps(params_dict)
 
     r = None
-    if external_host.startswith('https://'):
-        try:
-            ts = time.time()
-            r = requests.post('%s/jobs' % external_host,
-                              verify=False,
-                              cert=(__USERCERT, __USERCERT),
-                              data=params_str,
-                              headers={'Content-Type': 'application/json'},
-                              timeout=timeout)
-            record_timer('transfertool.fts3.submit_transfer.%s' % __extract_host(external_host), (time.time() - ts) * 1000 / len(files))
-        except:
-            logging.warn('Could not submit transfer to %s - %s' % (external_host, str(traceback.format_exc())))
-    else:
-        try:
-            ts = time.time()
-            r = requests.post('%s/jobs' % external_host,
-                              data=params_str,
-                              headers={'Content-Type': 'application/json'},
-                              timeout=timeout)
-            record_timer('transfertool.fts3.submit_transfer.%s' % __extract_host(external_host), (time.time() - ts) * 1000 / len(files))
-        except:
-            logging.warn('Could not submit transfer to %s - %s' % (external_host, str(traceback.format_exc())))
+    try:
+        ts = time.time()
+        r = get_client(external_host).post('/jobs', data=params_str, timeout=timeout)
+        record_timer('transfertool.fts3.submit_transfer.%s' % __extract_host(external_host), (time.time() - ts) * 1000 / len(files))
+    except:
+        logging.warn('Could not submit transfer to %s - %s' % (external_host, str(traceback.format_exc())))
 
     if r and r.status_code == 200:
         record_counter('transfertool.fts3.%s.submission.success' % __extract_host(external_host), len(files))
@@ -321,18 +363,7 @@ def query(transfer_id, transfer_host):
     :returns: Transfer status information as a dictionary.
     """
 
-    job = None
-
-    if transfer_host.startswith('https://'):
-        job = requests.get('%s/jobs/%s' % (transfer_host, transfer_id),
-                           verify=False,
-                           cert=(__USERCERT, __USERCERT),
-                           headers={'Content-Type': 'application/json'},
-                           timeout=5)
-    else:
-        job = requests.get('%s/jobs/%s' % (transfer_host, transfer_id),
-                           headers={'Content-Type': 'application/json'},
-                           timeout=5)
+    job = get_client(transfer_host).get('/jobs/%s' % transfer_id, timeout=5)
     if job and job.status_code == 200:
         record_counter('transfertool.fts3.%s.query.success' % __extract_host(transfer_host))
         return job.json()
@@ -352,42 +383,13 @@ def query_latest(transfer_host, state, last_nhours=1):
 
     jobs = None
 
-    if transfer_host.startswith('https://'):
-        try:
-            whoami = requests.get('%s/whoami' % (transfer_host),
-                                  verify=False,
-                                  cert=(__USERCERT, __USERCERT),
-                                  headers={'Content-Type': 'application/json'})
-            if whoami and whoami.status_code == 200:
-                delegation_id = whoami.json()['delegation_id']
-            else:
-                raise Exception('Could not retrieve delegation id: %s', whoami.content)
-            state_string = ','.join(state)
-            jobs = requests.get('%s/jobs?dlg_id=%s&state_in=%s&time_window=%s' % (transfer_host,
-                                                                                  delegation_id,
-                                                                                  state_string,
-                                                                                  last_nhours),
-                                verify=False,
-                                cert=(__USERCERT, __USERCERT),
-                                headers={'Content-Type': 'application/json'})
-        except Exception:
-            logging.warn('Could not query latest terminal states from %s' % transfer_host)
-    else:
-        try:
-            whoami = requests.get('%s/whoami' % (transfer_host),
-                                  headers={'Content-Type': 'application/json'})
-            if whoami and whoami.status_code == 200:
-                delegation_id = whoami.json()['delegation_id']
-            else:
-                raise Exception('Could not retrieve delegation id: %s', whoami.content)
-            state_string = ','.join(state)
-            jobs = requests.get('%s/jobs?dlg_id=%s&state_in=%s&time_window=%s' % (transfer_host,
-                                                                                  delegation_id,
-                                                                                  state_string,
-                                                                                  last_nhours),
-                                headers={'Content-Type': 'application/json'})
-        except Exception:
-            logging.warn('Could not query latest terminal states from %s' % transfer_host)
+    try:
+        client = get_client(transfer_host)
+        delegation_id = client.whoami()['delegation_id']
+        state_string = ','.join(state)
+        jobs = client.get('/jobs?dlg_id=%s&state_in=%s&time_window=%s' % (delegation_id, state_string, last_nhours))
+    except Exception:
+        logging.warn('Could not query latest terminal states from %s' % transfer_host)
 
     if jobs and (jobs.status_code == 200 or jobs.status_code == 207):
         record_counter('transfertool.fts3.%s.query_latest.success' % __extract_host(transfer_host))
@@ -409,18 +411,7 @@ def query_details(transfer_id, transfer_host):
     :returns: Detailed transfer status information as a dictionary.
     """
 
-    files = None
-
-    if transfer_host.startswith('https://'):
-        files = requests.get('%s/jobs/%s/files' % (transfer_host, transfer_id),
-                             verify=False,
-                             cert=(__USERCERT, __USERCERT),
-                             headers={'Content-Type': 'application/json'},
-                             timeout=5)
-    else:
-        files = requests.get('%s/jobs/%s/files' % (transfer_host, transfer_id),
-                             headers={'Content-Type': 'application/json'},
-                             timeout=5)
+    files = get_client(transfer_host).get('/jobs/%s/files' % transfer_id, timeout=5)
     if files and (files.status_code == 200 or files.status_code == 207):
         record_counter('transfertool.fts3.%s.query_details.success' % __extract_host(transfer_host))
         return files.json()
@@ -584,33 +575,22 @@ def bulk_query_responses(jobs_response, transfer_host):
     return responses
 
 
-def bulk_query(transfer_ids, transfer_host, timeout=None):
+def __bulk_query_chunk(transfer_ids, transfer_host, timeout=None):
     """
-    Query the status of a bulk of transfers in FTS3 via JSON.
+    Query the status of the jobs and of their files in one call.
 
     :param transfer_ids: FTS transfer identifiers as a list.
     :param transfer_host: FTS server as a string.
     :returns: Transfer status information as a dictionary.
     """
 
-    jobs = None
-
-    if type(transfer_ids) is not list:
-        transfer_ids = [transfer_ids]
-
     responses = {}
-    fts_session = requests.Session()
-    xfer_ids = ','.join(transfer_ids)
-    if transfer_host.startswith('https://'):
-        jobs = fts_session.get('%s/jobs/%s?files=file_state,dest_surl,finish_time,start_time,reason,source_surl,file_metadata' % (transfer_host, xfer_ids),
-                               verify=False,
-                               cert=(__USERCERT, __USERCERT),
-                               headers={'Content-Type': 'application/json'},
-                               timeout=timeout)
-    else:
-        jobs = fts_session.get('%s/jobs/%s?files=file_state,dest_surl,finish_time,start_time,reason,source_surl,file_metadata' % (transfer_host, xfer_ids),
-                               headers={'Content-Type': 'application/json'},
-                               timeout=timeout)
+    jobs = None
+    try:
+        jobs = get_client(transfer_host).get('/jobs/%s?files=file_state,dest_surl,finish_time,start_time,reason,source_surl,file_metadata' % ','.join(transfer_ids),
+                                             timeout=timeout)
+    except Exception as error:
+        logging.warn('Could not query transfers on %s - %s' % (transfer_host, str(error)))
 
     if jobs is None:
         record_counter('transfertool.fts3.%s.bulk_query.failure' % __extract_host(transfer_host))
@@ -631,12 +611,40 @@ def bulk_query(transfer_ids, transfer_host, timeout=None):
     return responses
 
 
-def get_jobs_response(transfer_host, fts_session, jobs_response):
+def bulk_query(transfer_ids, transfer_host, timeout=None):
+    """
+    Query the status of a bulk of transfers in FTS3 via JSON.
+    Large bulks are split in chunks which are queried in parallel over the pooled connections.
+
+    :param transfer_ids: FTS transfer identifiers as a list.
+    :param transfer_host: FTS server as a string.
+    :returns: Transfer status information as a dictionary.
+    """
+
+    if type(transfer_ids) is not list:
+        transfer_ids = [transfer_ids]
+
+    if len(transfer_ids) <= __QUERY_CHUNK_SIZE or __QUERY_PARALLELISM <= 1:
+        return __bulk_query_chunk(transfer_ids, transfer_host, timeout)
+
+    responses = {}
+    id_chunks = list(chunks(transfer_ids, __QUERY_CHUNK_SIZE))
+    with ThreadPoolExecutor(max_workers=min(__QUERY_PARALLELISM, len(id_chunks))) as executor:
+        futures = [(id_chunk, executor.submit(__bulk_query_chunk, id_chunk, transfer_host, timeout)) for id_chunk in id_chunks]
+        for id_chunk, future in futures:
+            try:
+                responses.update(future.result())
+            except Exception as error:
+                for transfer_id in id_chunk:
+                    responses[transfer_id] = error
+    return responses
+
+
+def get_jobs_response(transfer_host, jobs_response):
     """
-    Parse FTS bulk query response and query details for finished jobs.
+    Parse FTS bulk query response, the files of the jobs are included in the response.
 
     :param transfer_host: FTS server as a string.
-    :fts_session: query request as a session.
     :jobs_response: FTS bulk query response as a dict.
     :returns: Transfer status information as a dictionary.
     """
@@ -655,21 +663,12 @@ def get_jobs_response(transfer_host, fts_session, jobs_response):
                 responses[transfer_id]['job_state'] = job_response['job_state']
                 responses[transfer_id]['new_state'] = None
                 responses[transfer_id]['transfer_id'] = transfer_id
+            elif job_response.get('files'):
+                record_counter('transfertool.fts3.%s.jobs_response.success' % __extract_host(transfer_host))
+                responses[transfer_id] = format_response(transfer_host, job_response, job_response['files'])
             else:
-                if transfer_host.startswith("https"):
-                    files = fts_session.get('%s/jobs/%s/files' % (transfer_host, transfer_id),
-                                            verify=False,
-                                            cert=(__USERCERT, __USERCERT),
-                                            headers={'Content-Type': 'application/json'})
-                else:
-                    files = fts_session.get('%s/jobs/%s/files' % (transfer_host, transfer_id),
-                                            headers={'Content-Type': 'application/json'})
-                if files and (files.status_code == 200 or files.status_code == 207):
-                    record_counter('transfertool.fts3.%s.jobs_response.success' % __extract_host(transfer_host))
-                    responses[transfer_id] = format_response(transfer_host, job_response, files.json())
-                else:
-                    record_counter('transfertool.fts3.%s.jobs_response.failure' % __extract_host(transfer_host))
-                    responses[transfer_id] = Exception('Could not retrieve files information: %s', files)
+                record_counter('transfertool.fts3.%s.jobs_response.failure' % __extract_host(transfer_host))
+                responses[transfer_id] = Exception('Could not retrieve files information of %s' % transfer_id)
     return responses
 
 
@@ -683,38 +682,20 @@ def new_bulk_query(transfer_ids, transfer_host):
     """
 
     responses = {}
-    if transfer_host.startswith('https://'):
-        fts_session = requests.Session()
-        jobs = fts_session.get('%s/jobs/%s' % (transfer_host, ','.join(transfer_ids)),
-                               verify=False,
-                               cert=(__USERCERT, __USERCERT),
-                               headers={'Content-Type': 'application/json'})
-        if jobs and (jobs.status_code == 200 or jobs.status_code == 207):
-            record_counter('transfertool.fts3.%s.new_bulk.success' % __extract_host(transfer_host))
-            jobs_response = jobs.json()
-            responses = get_jobs_response(transfer_host, fts_session, jobs_response)
-            for transfer_id in transfer_ids:
-                if transfer_id not in responses.keys():
-                    responses[transfer_id] = None
-        else:
-            record_counter('transfertool.fts3.%s.new_bulk.failure' % __extract_host(transfer_host))
-            for transfer_id in transfer_ids:
-                responses[transfer_id] = Exception('Could not retrieve transfer information: %s' % jobs)
+    jobs = get_client(transfer_host).get('/jobs/%s?files=file_state,dest_surl,finish_time,start_time,reason,source_surl,file_metadata' % ','.join(transfer_ids))
+    if jobs and (jobs.status_code == 200 or jobs.status_code == 207):
+        record_counter('transfertool.fts3.%s.new_bulk.success' % __extract_host(transfer_host))
+        jobs_response = jobs.json()
+        if type(jobs_response) is not list:
+            jobs_response = [jobs_response]
+        responses = get_jobs_response(transfer_host, jobs_response)
+        for transfer_id in transfer_ids:
+            if transfer_id not in responses.keys():
+                responses[transfer_id] = None
     else:
-        fts_session = requests.Session()
-        jobs = fts_session.get('%s/jobs/%s' % (transfer_host, transfer_id),
-                               headers={'Content-Type': 'application/json'})
-        if jobs and (jobs.status_code == 200 or jobs.status_code == 207):
-            record_counter('transfertool.fts3.%s.new_bulk.success' % __extract_host(transfer_host))
-            jobs_response = jobs.json()
-            responses = get_jobs_response(transfer_host, fts_session, jobs_response)
-            for transfer_id in transfer_ids:
-                if transfer_id not in responses.keys():
-                    responses[transfer_id] = None
-        else:
-            record_counter('transfertool.fts3.%s.new_bulk.failure' % __extract_host(transfer_host))
-            for transfer_id in transfer_ids:
-                responses[transfer_id] = Exception('Could not retrieve transfer information: %s' % jobs)
+        record_counter('transfertool.fts3.%s.new_bulk.failure' % __extract_host(transfer_host))
+        for transfer_id in transfer_ids:
+            responses[transfer_id] = Exception('Could not retrieve transfer information: %s' % jobs)
 
     return responses
 
@@ -727,16 +708,7 @@ def cancel(transfer_id, transfer_host):
     :param transfer_host: FTS server as a string.
     """
 
-    job = None
-
-    if transfer_host.startswith('https://'):
-        job = requests.delete('%s/jobs/%s' % (transfer_host, transfer_id),
-                              verify=False,
-                              cert=(__USERCERT, __USERCERT),
-                              headers={'Content-Type': 'application/json'})
-    else:
-        job = requests.delete('%s/jobs/%s' % (transfer_host, transfer_id),
-                              headers={'Content-Type': 'application/json'})
+    job = get_client(transfer_host).delete('/jobs/%s' % transfer_id)
     if job and job.status_code == 200:
         record_counter('transfertool.fts3.%s.cancel.success' % __extract_host(transfer_host))
         return job.json()
@@ -754,22 +726,10 @@ def update_priority(transfer_id, transfer_host, priority):
     :param priority: FTS job priority as an integer from 1 to 5.
     """
 
-    job = None
     params_dict = {"params": {"priority": priority}}
     params_str = json.dumps(params_dict)
 
-    if transfer_host.startswith('https://'):
-        job = requests.post('%s/jobs/%s' % (transfer_host, transfer_id),
-                            verify=False,
-                            data=params_str,
-                            cert=(__USERCERT, __USERCERT),
-                            headers={'Content-Type': 'application/json'},
-                            timeout=3)
-    else:
-        job = requests.post('%s/jobs/%s' % (transfer_host, transfer_id),
-                            data=params_str,
-                            headers={'Content-Type': 'application/json'},
-                            timeout=3)
+    job = get_client(transfer_host).post('/jobs/%s' % transfer_id, data=params_str, timeout=3)
     if job and job.status_code == 200:
         record_counter('transfertool.fts3.%s.update_priority.success' % __extract_host(transfer_host))
         return job.json()
@@ -787,23 +747,13 @@ def whoami(transfer_host):
     :returns: Credentials as stored by the FTS3 server as a dictionary.
     """
 
-    r = None
-
-    if transfer_host.startswith('https://'):
-        r = requests.get('%s/whoami' % transfer_host,
-                         verify=False,
-                         cert=(__USERCERT, __USERCERT),
-                         headers={'Content-Type': 'application/json'})
-    else:
-        r = requests.get('%s/whoami' % transfer_host,
-                         headers={'Content-Type': 'application/json'})
-
-    if r and r.status_code == 200:
-        record_counter('transfertool.fts3.%s.whoami.success' % __extract_host(transfer_host))
-        return r.json()
-
-    record_counter('transfertool.fts3.%s.whoami.failure' % __extract_host(transfer_host))
-    raise Exception('Could not retrieve credentials: %s', r.content)
+    try:
+        r = get_client(transfer_host).whoami(refresh=True)
+    except:
+        record_counter('transfertool.fts3.%s.whoami.failure' % __extract_host(transfer_host))
+        raise
+    record_counter('transfertool.fts3.%s.whoami.success' % __extract_host(transfer_host))
+    return r
 
 
 def version(transfer_host):
@@ -815,16 +765,7 @@ def version(transfer_host):
     :returns: FTS3 server information as a dictionary.
     """
 
-    r = None
-
-    if transfer_host.startswith('https://'):
-        r = requests.get('%s/' % transfer_host,
-                         verify=False,
-                         cert=(__USERCERT, __USERCERT),
-                         headers={'Content-Type': 'application/json'})
-    else:
-        r = requests.get('%s/' % transfer_host,
-                         headers={'Content-Type': 'application/json'})
+    r = get_client(transfer_host).get('/')
 
     if r and r.status_code == 200:
         record_counter('transfertool.fts3.%s.version.success' % __extract_host(transfer_host))
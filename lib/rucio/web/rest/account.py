@@ -26,8 +26,8 @@ from rucio.api.account_limit import get_account_limits, get_account_limit, get_a
 from rucio.api.rule import list_replication_rules
 from rucio.api.scope import add_scope, get_scopes
 from rucio.common.exception import AccountNotFound, Duplicate, AccessDenied, RucioException, RuleNotFound, RSENotFound, IdentityError
-from rucio.common.utils import generate_http_error, APIEncoder, render_json
-from rucio.web.rest.common import rucio_loadhook, RucioController
+from rucio.common.utils import generate_http_error, render_json, render_json_stream
+from rucio.web.rest.common import rucio_compression, rucio_loadhook, rucio_metrics, RucioController
 
 
 LOGGER = getLogger("rucio.account")
@@ -565,8 +565,8 @@ class Rules(RucioController):
             filters.update(params)
 
         try:
-            for rule in list_replication_rules(filters=filters):
-                yield dumps(rule, cls=APIEncoder) + '\n'
+            for block in render_json_stream(list_replication_rules(filters=filters)):
+                yield block
         except RuleNotFound, e:
             raise generate_http_error(404, 'RuleNotFound', e.args[0][0])
         except Exception, e:
@@ -600,8 +600,8 @@ class Usage1(RucioController):
         """
         header('Content-Type', 'application/x-json-stream')
         try:
-            for usage in get_account_usage(account=account, rse=None, issuer=ctx.env.get('issuer')):
-                yield dumps(usage, cls=APIEncoder) + '\n'
+            for block in render_json_stream(get_account_usage(account=account, rse=None, issuer=ctx.env.get('issuer'))):
+                yield block
         except AccountNotFound, e:
             raise generate_http_error(404, 'AccountNotFound', e.args[0][0])
         except AccessDenied, e:
@@ -638,8 +638,8 @@ class Usage2(RucioController):
         """
         header('Content-Type', 'application/x-json-stream')
         try:
-            for usage in get_account_usage(account=account, rse=rse, issuer=ctx.env.get('issuer')):
-                yield dumps(usage, cls=APIEncoder) + '\n'
+            for block in render_json_stream(get_account_usage(account=account, rse=rse, issuer=ctx.env.get('issuer'))):
+                yield block
         except AccountNotFound, e:
             raise generate_http_error(404, 'AccountNotFound', e.args[0][0])
         except RSENotFound, e:
@@ -666,4 +666,6 @@ class Usage2(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
+APP.add_processor(rucio_compression)
 application = APP.wsgifunc()
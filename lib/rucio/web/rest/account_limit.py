@@ -19,7 +19,7 @@ from web import application, loadhook, ctx, data, Created, InternalError, OK
 from rucio.api.account_limit import set_account_limit, delete_account_limit
 from rucio.common.exception import RSENotFound, AccessDenied, AccountNotFound
 from rucio.common.utils import generate_http_error
-from rucio.web.rest.common import rucio_loadhook, RucioController
+from rucio.web.rest.common import rucio_loadhook, rucio_metrics, RucioController
 
 
 LOGGER = getLogger("rucio.account_limit")
@@ -114,4 +114,5 @@ class AccountLimit(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
 application = APP.wsgifunc()
@@ -10,13 +10,13 @@
   - Vincent Garonne, <vincent.garonne@cern.ch>, 2017
 '''
 
-from json import dumps
 from logging import getLogger, StreamHandler, DEBUG
 from traceback import format_exc
 from web import application, loadhook, header, InternalError
 
 from rucio.api.did import list_archive_content
-from rucio.web.rest.common import rucio_loadhook, RucioController
+from rucio.common.utils import render_json_stream
+from rucio.web.rest.common import rucio_compression, rucio_loadhook, rucio_metrics, RucioController
 
 LOGGER, SH = getLogger("rucio.meta"), StreamHandler()
 SH.setLevel(DEBUG)
@@ -37,8 +37,8 @@ class Archive(RucioController):
         """
         header('Content-Type', 'application/x-json-stream')
         try:
-            for file in list_archive_content(scope=scope, name=name):
-                yield dumps(file) + '\n'
+            for block in render_json_stream(list_archive_content(scope=scope, name=name)):
+                yield block
         except Exception, error:
             print format_exc()
             raise InternalError(error)
@@ -50,4 +50,6 @@ class Archive(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
+APP.add_processor(rucio_compression)
 application = APP.wsgifunc()
@@ -12,16 +12,40 @@
 REST utilities
 """
 
+import os
+import zlib
+
+from ConfigParser import NoOptionError, NoSectionError
+from cProfile import Profile
 from json import loads
+from random import random
 from time import time
 from traceback import format_exc
 from web import BadRequest, ctx, data, header, InternalError
 from web.webapi import Created, HTTPError, OK, seeother
 
 from rucio.api.authentication import validate_auth_token
+from rucio.common.config import config_get
 from rucio.common.exception import RucioException
 from rucio.common.utils import generate_http_error, generate_uuid
-from rucio.core.monitor import record_timer
+from rucio.core.monitor import add_request_stat, record_counter, record_timer, start_request_stats, stop_request_stats
+
+# Size of the blocks written to the client by the streamed responses
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# A sample of the requests is profiled, the profiles of the requests slower than the threshold (seconds) are dumped
+try:
+    PROFILE_RATE = float(config_get('monitor', 'profile_rate'))
+except (NoOptionError, NoSectionError):
+    PROFILE_RATE = 0
+try:
+    PROFILE_THRESHOLD = float(config_get('monitor', 'profile_threshold'))
+except (NoOptionError, NoSectionError):
+    PROFILE_THRESHOLD = 10
+try:
+    PROFILE_DIR = config_get('monitor', 'profile_dir')
+except (NoOptionError, NoSectionError):
+    PROFILE_DIR = '/tmp'
 
 
 def rucio_loadhook():
@@ -43,7 +67,9 @@ def rucio_loadhook():
     else:
         header('Content-Type', 'application/octet-stream')
 
+    start_request_stats()
     auth_token = ctx.env.get('HTTP_X_RUCIO_AUTH_TOKEN')
+    start_time = time()
     try:
         auth = validate_auth_token(auth_token)
     except RucioException, e:
@@ -51,6 +77,7 @@ def rucio_loadhook():
     except Exception, e:
         print format_exc()
         raise InternalError(e)
+    add_request_stat('auth', time() - start_time)
 
     if auth is None:
         raise generate_http_error(401, 'CannotAuthenticate', 'Cannot authenticate with given credentials')
@@ -70,11 +97,112 @@ def rucio_unloadhook():
     # print ctx.env.get('request_id'), ctx.env.get('REQUEST_METHOD'), ctx.env.get('REQUEST_URI'), ctx.data, duration, ctx.env.get('issuer'), ip
     # Record a time serie for each REST operations
     time_serie_name = '.'.join(('http', 'methods', ctx.env.get('REQUEST_METHOD'), 'resources.'))
-    time_serie_name += '.'.join(filter(None, ctx.env.get('SCRIPT_NAME').split('/'))[:4])
+    time_serie_name += '.'.join(filter(None, (ctx.env.get('SCRIPT_NAME') or '').split('/'))[:4])
     if ctx.path == '/list':
         time_serie_name += '.list'
     time_serie_name = time_serie_name.replace('..', '.').lower()
     record_timer(time_serie_name, duration * 1000)
+    # Breakdown of the request: auth, permission and db time with their number of calls, and response size
+    for operation, (count, seconds) in stop_request_stats().items():
+        record_timer('%s.%s' % (time_serie_name, operation), seconds * 1000)
+        record_counter('%s.%s.count' % (time_serie_name, operation), count)
+    record_counter('%s.bytes' % time_serie_name, ctx.env.get('response_bytes', 0))
+
+
+def rucio_metrics(handler):
+    """ Processor counting the response bytes and recording the request with rucio_unloadhook, profiles a sample of the requests. """
+    profile = Profile() if PROFILE_RATE and random() < PROFILE_RATE else None
+    ctx.env['response_bytes'] = 0
+
+    def call(function):
+        if profile is None:
+            return function()
+        profile.enable()
+        try:
+            return function()
+        finally:
+            profile.disable()
+
+    def finish():
+        if profile is not None and time() - ctx.env['start_time'] > PROFILE_THRESHOLD:
+            resource = '_'.join(filter(None, (ctx.env.get('SCRIPT_NAME') or '').split('/')))
+            try:
+                profile.dump_stats(os.path.join(PROFILE_DIR, 'rucio_%s_%s_%s.prof' % (ctx.env.get('REQUEST_METHOD'), resource, ctx.env.get('request_id'))))
+            except Exception:
+                print format_exc()
+        rucio_unloadhook()
+
+    try:
+        result = call(handler)
+    except HTTPError, error:
+        ctx.env['response_bytes'] += len(error.data or '')
+        finish()
+        raise
+    except:
+        finish()
+        raise
+    if not (result and hasattr(result, 'next')):
+        if isinstance(result, basestring):
+            ctx.env['response_bytes'] += len(result)
+        finish()
+        return result
+
+    def stream(result):
+        try:
+            while True:
+                try:
+                    chunk = call(result.next)
+                except StopIteration:
+                    return
+                ctx.env['response_bytes'] += len(chunk)
+                yield chunk
+        finally:
+            finish()
+
+    return stream(result)
+
+
+def rucio_compression(handler):
+    """ Processor joining the chunks of the streamed responses into blocks and compressing the json streams with gzip for the clients accepting it. """
+    result = handler()
+    if not (result and hasattr(result, 'next')):
+        return result
+
+    def blocks(result):
+        # One write to the client per block instead of one per chunk
+        block, size = [], 0
+        for chunk in result:
+            if isinstance(chunk, unicode):
+                chunk = chunk.encode('utf-8')
+            block.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_BLOCK_SIZE:
+                yield ''.join(block)
+                block, size = [], 0
+        if block:
+            yield ''.join(block)
+
+    def compress(result):
+        # The controller sets the headers before its first chunk
+        try:
+            block = result.next()
+        except StopIteration:
+            return
+        if 'gzip' not in ctx.env.get('HTTP_ACCEPT_ENCODING', '') or ('Content-Type', 'application/x-json-stream') not in ctx.headers:
+            yield block
+            for block in result:
+                yield block
+            return
+        header('Content-Encoding', 'gzip')
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        yield compressor.compress(block)
+        for block in result:
+            compressed = compressor.compress(block)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    return compress(blocks(result))
 
 
 def load_json_data():
@@ -16,7 +16,7 @@ from web import application, ctx, Created, loadhook, header
 
 from rucio.api import config
 from rucio.common.utils import generate_http_error
-from rucio.web.rest.common import rucio_loadhook, RucioController, exception_wrAPPer
+from rucio.web.rest.common import rucio_loadhook, rucio_metrics, RucioController, exception_wrAPPer
 
 
 LOGGER = getLogger("rucio.config")
@@ -159,4 +159,5 @@ class OptionSet(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
 application = APP.wsgifunc()
@@ -14,7 +14,7 @@
 # - Cedric Serfon, <cedric.serfon@cern.ch>, 2014-2015
 # - Martin Baristis, <martin.barisits@cern.ch>, 2014-2015
 
-from json import dumps, loads
+from json import loads
 from traceback import format_exc
 from urlparse import parse_qs
 from web import application, ctx, data, Created, header, InternalError, OK, loadhook
@@ -32,8 +32,8 @@ from rucio.common.exception import (ScopeNotFound, DataIdentifierNotFound,
                                     UnsupportedStatus, UnsupportedOperation,
                                     RSENotFound, RucioException, RuleNotFound,
                                     InvalidMetadata)
-from rucio.common.utils import generate_http_error, render_json, APIEncoder
-from rucio.web.rest.common import rucio_loadhook, RucioController
+from rucio.common.utils import generate_http_error, render_json, render_json_stream
+from rucio.web.rest.common import rucio_compression, rucio_loadhook, rucio_metrics, RucioController
 
 URLS = (
     '/(.*)/$', 'Scope',
@@ -123,8 +123,8 @@ class Search(RucioController):
                     filters[k] = v[0]
 
         try:
-            for did in list_dids(scope=scope, filters=filters, type=type, long=long):
-                yield dumps(did) + '\n'
+            for block in render_json_stream(list_dids(scope=scope, filters=filters, type=type, long=long)):
+                yield block
         except UnsupportedOperation, error:
             raise generate_http_error(409, 'UnsupportedOperation', error.args[0][0])
         except KeyNotFound, error:
@@ -495,8 +495,8 @@ class Files(RucioController):
             if 'long' in params:
                 long = True
         try:
-            for file in list_files(scope=scope, name=name, long=long):
-                yield dumps(file) + "\n"
+            for block in render_json_stream(list_files(scope=scope, name=name, long=long)):
+                yield block
         except DataIdentifierNotFound, error:
             raise generate_http_error(404, 'DataIdentifierNotFound', error.args[0][0])
         except RucioException, error:
@@ -626,8 +626,8 @@ class Rules(RucioController):
         """
         header('Content-Type', 'application/x-json-stream')
         try:
-            for rule in list_replication_rules({'scope': scope, 'name': name}):
-                yield dumps(rule, cls=APIEncoder) + '\n'
+            for block in render_json_stream(list_replication_rules({'scope': scope, 'name': name})):
+                yield block
         except RuleNotFound, error:
             raise generate_http_error(404, 'RuleNotFound', error.args[0][0])
         except RucioException, error:
@@ -653,8 +653,8 @@ class AssociatedRules(RucioController):
         """
         header('Content-Type', 'application/x-json-stream')
         try:
-            for rule in list_associated_replication_rules_for_file(scope=scope, name=name):
-                yield dumps(rule, cls=APIEncoder) + '\n'
+            for block in render_json_stream(list_associated_replication_rules_for_file(scope=scope, name=name)):
+                yield block
         except RucioException, error:
             raise generate_http_error(500, error.__class__.__name__, error.args[0])
         except Exception, error:
@@ -678,8 +678,8 @@ class GUIDLookup(RucioController):
         """
         header('Content-Type', 'application/x-json-stream')
         try:
-            for dataset in get_dataset_by_guid(guid):
-                yield dumps(dataset, cls=APIEncoder) + '\n'
+            for block in render_json_stream(get_dataset_by_guid(guid)):
+                yield block
         except DataIdentifierNotFound, error:
             raise generate_http_error(404, 'DataIdentifierNotFound', error.args[0][0])
         except RucioException, error:
@@ -752,8 +752,8 @@ class NewDIDs(RucioController):
         if 'type' in params:
             type = params['type'][0]
         try:
-            for did in list_new_dids(type):
-                yield dumps(did, cls=APIEncoder) + '\n'
+            for block in render_json_stream(list_new_dids(type)):
+                yield block
         except RucioException, error:
             raise generate_http_error(500, error.__class__.__name__, error.args[0])
         except Exception, error:
@@ -811,4 +811,6 @@ class Resurrect(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
+APP.add_processor(rucio_compression)
 application = APP.wsgifunc()
@@ -16,7 +16,7 @@ from web import application, ctx, loadhook, header
 
 from rucio.api.heartbeat import list_heartbeats
 from rucio.common.utils import APIEncoder
-from rucio.web.rest.common import rucio_loadhook, RucioController, exception_wrAPPer
+from rucio.web.rest.common import rucio_loadhook, rucio_metrics, RucioController, exception_wrAPPer
 
 
 LOGGER = getLogger("rucio.heartbeat")
@@ -54,4 +54,5 @@ class Heartbeat(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
 application = APP.wsgifunc()
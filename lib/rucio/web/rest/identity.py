@@ -19,7 +19,7 @@ from web import application, ctx, BadRequest, Created, InternalError, loadhook
 
 from rucio.api.identity import (add_identity, add_account_identity,
                                 list_accounts_for_identity)
-from rucio.web.rest.common import rucio_loadhook, RucioController
+from rucio.web.rest.common import rucio_loadhook, rucio_metrics, RucioController
 
 
 URLS = (
@@ -169,4 +169,5 @@ class Accounts(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
 application = APP.wsgifunc()
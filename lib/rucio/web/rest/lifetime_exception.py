@@ -16,8 +16,8 @@ from web import application, ctx, data, header, BadRequest, Created, InternalErr
 
 from rucio.api.lifetime_exception import list_exceptions, add_exception, update_exception
 from rucio.common.exception import LifetimeExceptionNotFound, UnsupportedOperation, InvalidObject, RucioException, AccessDenied, LifetimeExceptionDuplicate
-from rucio.common.utils import generate_http_error, APIEncoder
-from rucio.web.rest.common import rucio_loadhook
+from rucio.common.utils import generate_http_error, render_json_stream
+from rucio.web.rest.common import rucio_compression, rucio_loadhook, rucio_metrics
 
 
 URLS = ('/', 'LifetimeException',
@@ -41,8 +41,8 @@ class LifetimeException:
         """
         header('Content-Type', 'application/x-json-stream')
         try:
-            for exception in list_exceptions():
-                yield dumps(exception, cls=APIEncoder) + '\n'
+            for block in render_json_stream(list_exceptions()):
+                yield block
         except LifetimeExceptionNotFound as error:
             raise generate_http_error(404, 'LifetimeExceptionNotFound', error.args[0][0])
         except RucioException as error:
@@ -110,8 +110,8 @@ class LifetimeExceptionId:
         """
         header('Content-Type', 'application/json')
         try:
-            for exception in list_exceptions(exception_id):
-                yield dumps(exception, cls=APIEncoder) + '\n'
+            for block in render_json_stream(list_exceptions(exception_id)):
+                yield block
 
         except LifetimeExceptionNotFound as error:
             raise generate_http_error(404, 'LifetimeExceptionNotFound', error.args[0][0])
@@ -168,4 +168,6 @@ class LifetimeExceptionId:
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
+APP.add_processor(rucio_compression)
 application = APP.wsgifunc()
@@ -15,8 +15,8 @@ from web import application, ctx, header, InternalError, loadhook
 
 from rucio.api.lock import get_dataset_locks_by_rse, get_dataset_locks
 from rucio.common.exception import RucioException
-from rucio.common.utils import generate_http_error, render_json
-from rucio.web.rest.common import rucio_loadhook
+from rucio.common.utils import generate_http_error, render_json_stream
+from rucio.web.rest.common import rucio_compression, rucio_loadhook, rucio_metrics
 
 LOGGER = getLogger("rucio.lock")
 SH = StreamHandler()
@@ -50,8 +50,8 @@ class LockByRSE(object):
                 did_type = params['did_type'][0]
         try:
             if did_type == 'dataset':
-                for lock in get_dataset_locks_by_rse(rse):
-                    yield render_json(**lock) + '\n'
+                for block in render_json_stream(get_dataset_locks_by_rse(rse)):
+                    yield block
             else:
                 raise InternalError('Wrong did_type specified')
         except RucioException, error:
@@ -83,8 +83,8 @@ class LockByScopeName(object):
                 did_type = params['did_type'][0]
         try:
             if did_type == 'dataset':
-                for lock in get_dataset_locks(scope, name):
-                    yield render_json(**lock) + '\n'
+                for block in render_json_stream(get_dataset_locks(scope, name)):
+                    yield block
             else:
                 raise InternalError('Wrong did_type specified')
         except RucioException, error:
@@ -99,4 +99,6 @@ class LockByScopeName(object):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
+APP.add_processor(rucio_compression)
 application = APP.wsgifunc()
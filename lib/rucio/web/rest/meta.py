@@ -17,7 +17,7 @@ from web import application, ctx, data, Created, InternalError, loadhook, header
 from rucio.api.meta import add_key, add_value, list_keys, list_values
 from rucio.common.exception import Duplicate, InvalidValueForKey, KeyNotFound, UnsupportedValueType, RucioException
 from rucio.common.utils import generate_http_error
-from rucio.web.rest.common import rucio_loadhook, RucioController
+from rucio.web.rest.common import rucio_loadhook, rucio_metrics, RucioController
 
 
 LOGGER = getLogger("rucio.meta")
@@ -148,4 +148,5 @@ class Values(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
 application = APP.wsgifunc()
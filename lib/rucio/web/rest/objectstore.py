@@ -11,13 +11,13 @@
 
 
 import traceback
-from web import application, header, data, loadhook, unloadhook, InternalError, OK
+from web import application, header, data, loadhook, InternalError, OK
 # from web import application, ctx, header, data, loadhook, unloadhook, InternalError, found, OK
 
 from rucio.common.exception import RucioException
 from rucio.common.utils import generate_http_error, parse_response, render_json
 from rucio.common import objectstore
-from rucio.web.rest.common import rucio_loadhook, rucio_unloadhook, RucioController
+from rucio.web.rest.common import rucio_loadhook, rucio_metrics, RucioController
 
 
 URLS = ('/info/(.+)$', 'ObjectStoreInfo',
@@ -171,5 +171,5 @@ class ObjectStoreRename(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
-APP.add_processor(unloadhook(rucio_unloadhook))
+APP.add_processor(rucio_metrics)
 application = APP.wsgifunc()
@@ -16,7 +16,7 @@ from json import dumps, loads
 from traceback import format_exc
 from urllib import unquote
 from urlparse import parse_qs
-from web import application, ctx, Created, data, header, InternalError, loadhook, OK, unloadhook
+from web import application, ctx, Created, data, header, InternalError, loadhook, OK
 
 from geoip2.errors import AddressNotFoundError
 
@@ -33,8 +33,8 @@ from rucio.common.exception import (AccessDenied, DataIdentifierAlreadyExists,
                                     RSENotFound, UnsupportedOperation, ReplicaNotFound)
 from rucio.common.replicas_selector import random_order, geoIP_order
 
-from rucio.common.utils import generate_http_error, parse_response, APIEncoder
-from rucio.web.rest.common import rucio_loadhook, rucio_unloadhook, RucioController
+from rucio.common.utils import generate_http_error, parse_response, render_json_stream
+from rucio.web.rest.common import rucio_compression, rucio_loadhook, rucio_metrics, RucioController
 
 URLS = ('/list/?$', 'ListReplicas',
         '/?$', 'Replicas',
@@ -97,7 +97,12 @@ class Replicas(RucioController):
                 header('Content-Type', 'application/metalink4+xml')
                 yield '<?xml version="1.0" encoding="UTF-8"?>\n<metalink xmlns="urn:ietf:params:xml:ns:metalink">\n'
 
-            # then, stream the replica information
+            # then, stream the replica information, the json stream in blocks of rows
+            if metalink is None:
+                for block in render_json_stream(list_replicas(dids=dids, schemes=schemes)):
+                    yield block
+                return
+
             for rfile in list_replicas(dids=dids, schemes=schemes):
                 client_ip = ctx.env.get('HTTP_X_FORWARDED_FOR')
                 if client_ip is None:
@@ -116,10 +121,7 @@ class Replicas(RucioController):
                         pass
                 else:
                     replicas = random_order(dictreplica, client_ip)
-                if metalink is None:
-                    yield dumps(rfile) + '\n'
-
-                elif metalink == 3:
+                if metalink == 3:
                     idx = 0
                     yield ' <file name="' + rfile['name'] + '">\n'
 
@@ -342,13 +344,19 @@ class ListReplicas(RucioController):
                 header('Content-Type', 'application/metalink4+xml')
                 yield '<?xml version="1.0" encoding="UTF-8"?>\n<metalink xmlns="urn:ietf:params:xml:ns:metalink">\n'
 
-            # then, stream the replica information
-            for rfile in list_replicas(dids=dids, schemes=schemes,
-                                       unavailable=unavailable,
-                                       request_id=ctx.env.get('request_id'),
-                                       ignore_availability=ignore_availability,
-                                       all_states=all_states,
-                                       rse_expression=rse_expression):
+            # then, stream the replica information, the json stream in blocks of rows
+            rfiles = list_replicas(dids=dids, schemes=schemes,
+                                   unavailable=unavailable,
+                                   request_id=ctx.env.get('request_id'),
+                                   ignore_availability=ignore_availability,
+                                   all_states=all_states,
+                                   rse_expression=rse_expression)
+            if metalink is None:
+                for block in render_json_stream(rfiles):
+                    yield block
+                return
+
+            for rfile in rfiles:
                 client_ip = ctx.env.get('HTTP_X_FORWARDED_FOR')
                 if client_ip is None:
                     client_ip = ctx.ip
@@ -362,9 +370,7 @@ class ListReplicas(RucioController):
                     replicas = geoIP_order(dictreplica, client_ip)
                 else:
                     replicas = random_order(dictreplica, client_ip)
-                if metalink is None:
-                    yield dumps(rfile, cls=APIEncoder) + '\n'
-                elif metalink == 3:
+                if metalink == 3:
                     idx = 0
                     yield ' <file name="' + rfile['name'] + '">\n  <resources>\n'
                     for replica in replicas:
@@ -434,8 +440,8 @@ class ReplicasDIDs(RucioController):
             raise generate_http_error(400, 'ValueError', 'Cannot decode json parameter list')
 
         try:
-            for pfn in get_did_from_pfns(pfns, rse):
-                yield dumps(pfn) + '\n'
+            for block in render_json_stream(get_did_from_pfns(pfns, rse)):
+                yield block
         except RucioException, e:
             raise generate_http_error(500, e.__class__.__name__, e.args[0][0])
         except Exception, e:
@@ -564,8 +570,8 @@ class BadReplicasStates(RucioController):
         except Exception, e:
             print format_exc()
             raise InternalError(e)
-        for row in result:
-            yield dumps(row, cls=APIEncoder) + '\n'
+        for block in render_json_stream(result):
+            yield block
 
 
 class BadReplicasSummary(RucioController):
@@ -603,8 +609,8 @@ class BadReplicasSummary(RucioController):
         except Exception, e:
             print format_exc()
             raise InternalError(e)
-        for row in result:
-            yield dumps(row, cls=APIEncoder) + '\n'
+        for block in render_json_stream(result):
+            yield block
 
 
 class DatasetReplicas(RucioController):
@@ -633,8 +639,8 @@ class DatasetReplicas(RucioController):
             if 'deep' in params:
                 deep = params['deep'][0]
         try:
-            for row in list_dataset_replicas(scope=scope, name=name, deep=deep):
-                yield dumps(row, cls=APIEncoder) + '\n'
+            for block in render_json_stream(list_dataset_replicas(scope=scope, name=name, deep=deep)):
+                yield block
         except RucioException, e:
             raise generate_http_error(500, e.__class__.__name__, e.args[0][0])
         except Exception, e:
@@ -659,8 +665,8 @@ class ReplicasRSE(RucioController):
         """
         header('Content-Type', 'application/x-json-stream')
         try:
-            for row in list_datasets_per_rse(rse=rse):
-                yield dumps(row, cls=APIEncoder) + '\n'
+            for block in render_json_stream(list_datasets_per_rse(rse=rse)):
+                yield block
         except RucioException, e:
             raise generate_http_error(500, e.__class__.__name__, e.args[0][0])
         except Exception, e:
@@ -674,5 +680,6 @@ class ReplicasRSE(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
-APP.add_processor(unloadhook(rucio_unloadhook))
+APP.add_processor(rucio_metrics)
+APP.add_processor(rucio_compression)
 application = APP.wsgifunc()
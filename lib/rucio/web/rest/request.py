@@ -16,7 +16,7 @@ from web import application, ctx, loadhook, header
 
 from rucio.api import request
 from rucio.common.utils import generate_http_error, APIEncoder
-from rucio.web.rest.common import rucio_loadhook, RucioController, exception_wrAPPer
+from rucio.web.rest.common import rucio_loadhook, rucio_metrics, RucioController, exception_wrAPPer
 
 
 LOGGER = getLogger("rucio.request")
@@ -63,4 +63,5 @@ class RequestGet(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
 application = APP.wsgifunc()
@@ -26,8 +26,8 @@ from rucio.api.rse import (add_rse, update_rse, list_rses, del_rse, add_rse_attr
                            get_rse_usage, list_rse_usage_history,
                            set_rse_limits, get_rse_limits, parse_rse_expression)
 from rucio.common.exception import Duplicate, AccessDenied, RSENotFound, RucioException, RSEOperationNotSupported, RSEProtocolNotSupported, InvalidObject, RSEProtocolDomainNotSupported, RSEProtocolPriorityError, InvalidRSEExpression
-from rucio.common.utils import generate_http_error, render_json, APIEncoder
-from rucio.web.rest.common import rucio_loadhook, RucioController
+from rucio.common.utils import generate_http_error, render_json, render_json_stream
+from rucio.web.rest.common import rucio_compression, rucio_loadhook, rucio_metrics, RucioController
 
 URLS = (
     '/(.+)/attr/(.+)', 'Attributes',
@@ -675,8 +675,8 @@ class RSEAccountUsageLimit:
         header('Content-Type', 'application/json')
         try:
             usage = get_rse_account_usage(rse=rse)
-            for row in usage:
-                yield dumps(row, cls=APIEncoder) + '\n'
+            for block in render_json_stream(usage):
+                yield block
         except RSENotFound, error:
             raise generate_http_error(404, 'RSENotFound', error[0][0])
         except RucioException, error:
@@ -692,4 +692,6 @@ class RSEAccountUsageLimit:
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
+APP.add_processor(rucio_compression)
 application = APP.wsgifunc()
@@ -18,7 +18,7 @@ from web import application, ctx, header, Created, InternalError, loadhook
 from rucio.api.scope import add_scope, get_scopes, list_scopes
 from rucio.common.exception import AccountNotFound, Duplicate, RucioException
 from rucio.common.utils import generate_http_error
-from rucio.web.rest.common import rucio_loadhook, RucioController
+from rucio.web.rest.common import rucio_loadhook, rucio_metrics, RucioController
 
 
 LOGGER = getLogger("rucio.scope")
@@ -116,4 +116,5 @@ class ScopeList(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
 application = APP.wsgifunc()
@@ -11,7 +11,7 @@
  - Thomas Beermann, <thomas.beermann@cern.ch>, 2014
 """
 
-from json import dumps, loads
+from json import loads
 from urlparse import parse_qs
 
 from web import application, ctx, data, header, BadRequest, Created, InternalError, loadhook
@@ -19,8 +19,8 @@ from web import application, ctx, data, header, BadRequest, Created, InternalErr
 from rucio.api.rule import list_replication_rules
 from rucio.api.subscription import list_subscriptions, add_subscription, update_subscription, list_subscription_rule_states, get_subscription_by_id
 from rucio.common.exception import InvalidObject, RucioException, SubscriptionDuplicate, SubscriptionNotFound, RuleNotFound, AccessDenied
-from rucio.common.utils import generate_http_error, APIEncoder, render_json
-from rucio.web.rest.common import rucio_loadhook, RucioController
+from rucio.common.utils import generate_http_error, render_json, render_json_stream
+from rucio.web.rest.common import rucio_compression, rucio_loadhook, rucio_metrics, RucioController
 
 URLS = (
     '/Id/(.*)', 'SubscriptionId',
@@ -52,8 +52,8 @@ class Subscription:
         """
         header('Content-Type', 'application/x-json-stream')
         try:
-            for subscription in list_subscriptions(name=name, account=account):
-                yield dumps(subscription, cls=APIEncoder) + '\n'
+            for block in render_json_stream(list_subscriptions(name=name, account=account)):
+                yield block
         except SubscriptionNotFound, error:
             raise generate_http_error(404, 'SubscriptionNotFound', error[0][0])
         except Exception as error:
@@ -194,11 +194,11 @@ class Rules:
             subscriptions = [subscription['id'] for subscription in list_subscriptions(name=name, account=account)]
             if len(subscriptions) > 0:
                 if state:
-                    for rule in list_replication_rules({'subscription_id': subscriptions[0], 'state': state}):
-                        yield dumps(rule, cls=APIEncoder) + '\n'
+                    for block in render_json_stream(list_replication_rules({'subscription_id': subscriptions[0], 'state': state})):
+                        yield block
                 else:
-                    for rule in list_replication_rules({'subscription_id': subscriptions[0]}):
-                        yield dumps(rule, cls=APIEncoder) + '\n'
+                    for block in render_json_stream(list_replication_rules({'subscription_id': subscriptions[0]})):
+                        yield block
         except RuleNotFound as error:
             raise generate_http_error(404, 'RuleNotFound', error.args[0][0])
         except SubscriptionNotFound as error:
@@ -234,8 +234,8 @@ class States(RucioController):
         """
         header('Content-Type', 'application/x-json-stream')
         try:
-            for row in list_subscription_rule_states(account=account):
-                yield dumps(row, cls=APIEncoder) + '\n'
+            for block in render_json_stream(list_subscription_rule_states(account=account)):
+                yield block
         except RucioException as error:
             raise generate_http_error(500, error.__class__.__name__, error.args[0])
         except Exception as error:
@@ -275,4 +275,6 @@ class SubscriptionId:
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
+APP.add_processor(rucio_compression)
 application = APP.wsgifunc()
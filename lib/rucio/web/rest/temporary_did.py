@@ -16,7 +16,7 @@ from rucio.api.temporary_did import (add_temporary_dids)
 from rucio.common.exception import RucioException
 from rucio.common.utils import generate_http_error
 
-from rucio.web.rest.common import rucio_loadhook, RucioController
+from rucio.web.rest.common import rucio_loadhook, rucio_metrics, RucioController
 
 URLS = ('', 'BulkDIDS',)
 
@@ -52,4 +52,5 @@ class Compose(RucioController):
 
 APP = application(URLS, globals())
 APP.add_processor(loadhook(rucio_loadhook))
+APP.add_processor(rucio_metrics)
 application = APP.wsgifunc()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# Copyright European Organization for Nuclear Research (CERN)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#                       http://www.apache.org/licenses/LICENSE-2.0
+
+"""
+Benchmark of the conveyor source selection.
+
+Record the queued transfer requests and their source replicas of a database into a file,
+then replay them through the source selection of the conveyor submitter:
+
+    benchmark_conveyor_transfers.py --record requests.json --limit 100000
+    benchmark_conveyor_transfers.py --replay requests.json --repeat 5
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from rucio.core import request
+from rucio.daemons.conveyor.utils import get_transfers_from_sources
+from rucio.db.sqla.constants import RSEType
+
+
+def record(filename, limit=None, activity=None):
+    """
+    Dump the request x source rows of the queued transfer requests into a file.
+    """
+    rows = []
+    for row in request.list_transfer_requests_and_source_replicas(process=0, total_processes=1, thread=0, total_threads=1,
+                                                                  limit=limit, activity=activity):
+        row = list(row)
+        if row[14] is not None:
+            row[14] = str(row[14])
+        rows.append(row)
+    with open(filename, 'w') as f:
+        json.dump(rows, f, default=str)
+    print 'Recorded %s rows into %s' % (len(rows), filename)
+
+
+def replay(filename, repeat=1, schemes=None, block_size=1000):
+    """
+    Run the source selection over the rows of a file and print the timings.
+    """
+    with open(filename) as f:
+        rows = json.load(f)
+    for row in rows:
+        if row[14] is not None:
+            row[14] = RSEType.from_sym(row[14])
+    rows.sort(key=lambda row: row[0])
+
+    timings = []
+    for _ in xrange(repeat):
+        start = time.time()
+        transfers, reqs_no_source, reqs_scheme_mismatch, reqs_only_tape_source = get_transfers_from_sources(rows, schemes=schemes, block_size=block_size)
+        timings.append(time.time() - start)
+
+    print 'Rows: %s, transfers: %s, no source: %s, scheme mismatch: %s, only tape source: %s' % (len(rows), len(transfers), len(reqs_no_source), len(reqs_scheme_mismatch), len(reqs_only_tape_source))
+    print 'Best: %.3fs (%.0f rows/s), mean: %.3fs' % (min(timings), len(rows) / max(min(timings), 1e-6), sum(timings) / len(timings))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Record and replay the conveyor source selection')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--record', metavar='FILE', help='Record the queued transfer requests into FILE')
+    group.add_argument('--replay', metavar='FILE', help='Replay the requests recorded in FILE')
+    parser.add_argument('--limit', type=int, default=None, help='Maximum number of requests to record')
+    parser.add_argument('--activity', default=None, help='Only record the requests of this activity')
+    parser.add_argument('--repeat', type=int, default=1, help='Number of replays')
+    parser.add_argument('--schemes', default=None, help='Comma separated list of allowed schemes')
+    parser.add_argument('--block-size', type=int, default=1000, help='Number of requests per block of source url computation')
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, limit=args.limit, activity=args.activity)
+    else:
+        replay(args.replay, repeat=args.repeat, schemes=args.schemes.split(',') if args.schemes else None, block_size=args.block_size)
+    sys.exit(0)